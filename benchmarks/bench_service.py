@@ -0,0 +1,329 @@
+"""Benchmark de las funciones más usadas de `supabase_service`.
+
+Corre cada función contra el backend local (SQLite en memoria) con una latencia
+artificial por round trip y un dataset sembrado del tamaño pedido, y mide:
+
+- round trips y filas por llamada (contadores del `LocalClient`),
+- tiempo de pared (mediana, mínimo y máximo de `--repeat` corridas, tras una de calentamiento),
+- pico de memoria de una corrida aparte con `tracemalloc` (no se mezcla con los tiempos).
+
+Uso:
+    python benchmarks/bench_service.py --ots 5000 --latency-ms 40 --save benchmarks/base.json
+    python benchmarks/bench_service.py --ots 5000 --latency-ms 40 --compare benchmarks/base.json
+
+`--compare` marca como regresión cualquier round trip de más o un tiempo/pico de memoria
+que crezca más que `--threshold` (%); en ese caso sale con código 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# Nunca contra Supabase: el módulo de servicios arranca con el backend local y después
+# se le cambia el cliente por el sembrado acá
+os.environ["PLOTMASTER_BACKEND"] = "local"
+os.environ["PLOTMASTER_LOCAL_DB"] = ":memory:"
+
+from plotmaster.core.services import supabase_service as svc  # noqa: E402
+from plotmaster.core.services.local_backend import LocalClient  # noqa: E402
+from plotmaster.core.services.resilience import guard_client  # noqa: E402
+
+ZONAS = ('Asunción', 'Luque', 'San Lorenzo', 'Lambaré', 'Capiatá', 'Otro')
+ESTADOS = ('Pendiente', 'Aprobado', 'Entregado', 'Finalizado', 'Cancelado')
+FORMAS_PAGO = ('Contado', 'Crédito')
+FECHA_INICIAL = date(2023, 1, 1)
+DIAS_DATASET = 730
+
+VENDEDOR_CI = '1000'
+VENDEDOR_PW = 'bench'
+CLIENTE_CI = '80000000'
+PRIMERA_OT = 1000
+SEED_CHUNK = 1000
+
+
+def seed(client: LocalClient, ots: int, clientes: int, usuarios: int, abonos: float, rng: random.Random):
+    """Siembra usuarios, clientes, OTs y abonos en bloques (sin latencia)."""
+    latency, client.latency = client.latency, 0.0
+    try:
+        salt, pw_hash = svc._hash_password(VENDEDOR_PW)
+        filas = [{'ci_ruc': str(int(VENDEDOR_CI) + i), 'nombre': f'Vendedor {i}', 'password_hash': pw_hash,
+                  'salt': salt, 'pw_iteraciones': svc.PASSWORD_ITERATIONS} for i in range(max(1, usuarios))]
+        client.table('usuarios').insert(filas).execute()
+
+        for ini in range(0, max(1, clientes), SEED_CHUNK):
+            filas = [{'nombre': f'Cliente {i}', 'ci_ruc': str(int(CLIENTE_CI) + i), 'telefono': f'0981{i:06d}',
+                      'zona': rng.choice(ZONAS)} for i in range(ini, min(max(1, clientes), ini + SEED_CHUNK))]
+            client.table('clientes').insert(filas).execute()
+
+        cliente_ids = [r['id'] for r in client.table('clientes').select('id').execute().data]
+        vendedor_ids = [r['id'] for r in client.table('usuarios').select('id').execute().data]
+        for ini in range(0, ots, SEED_CHUNK):
+            filas = []
+            for n in range(ini, min(ots, ini + SEED_CHUNK)):
+                valor = rng.randrange(50, 5000) * 1000
+                estado = rng.choice(ESTADOS)
+                filas.append({
+                    'ot_nro': PRIMERA_OT + n,
+                    'cliente_id': rng.choice(cliente_ids),
+                    'vendedor_id': rng.choice(vendedor_ids),
+                    'descripcion': f'Ploteo {n}',
+                    'valor_total': valor,
+                    'sena': valor // 4,
+                    'forma_pago': rng.choice(FORMAS_PAGO),
+                    'solicita_envio': rng.random() < 0.2,
+                    'status': estado,
+                    'fecha_creacion': (FECHA_INICIAL + timedelta(days=rng.randrange(DIAS_DATASET))).isoformat(),
+                })
+            client.table('ordenes_trabajo').insert(filas).execute()
+
+        ot_ids = [r['id'] for r in client.table('ordenes_trabajo').select('id').execute().data]
+        cant_abonos = int(len(ot_ids) * abonos)
+        for ini in range(0, cant_abonos, SEED_CHUNK):
+            filas = [{'ot_id': rng.choice(ot_ids), 'monto': rng.randrange(10, 500) * 1000}
+                     for _ in range(ini, min(cant_abonos, ini + SEED_CHUNK))]
+            client.table('abonos').insert(filas).execute()
+    finally:
+        client.latency = latency
+    return {'ots': ots, 'clientes': max(1, clientes), 'usuarios': max(1, usuarios), 'abonos': cant_abonos}
+
+
+class Escenario:
+    """Una función a medir: `preparar(i)` arma los argumentos de la corrida `i` (fuera del tiempo)."""
+
+    def __init__(self, nombre, fn, preparar=None):
+        self.nombre = nombre
+        self.fn = fn
+        self.preparar = preparar or (lambda i: ((), {}))
+
+
+def escenarios(ots: int, rng: random.Random):
+    desde = FECHA_INICIAL + timedelta(days=DIAS_DATASET // 2)
+    hasta = desde + timedelta(days=30)
+    proxima = {'ot': PRIMERA_OT + ots}
+    vendedor_id = svc.get_user_by_ci_ruc(VENDEDOR_CI)
+    vendedor_id = vendedor_id.get('id') if isinstance(vendedor_id, dict) else None
+
+    def ot_existente(_i):
+        return (PRIMERA_OT + rng.randrange(max(1, ots)),), {}
+
+    def nueva_ot(_i, con_ids=False):
+        nro = proxima['ot']
+        proxima['ot'] += 1
+        datos = {'ot_nro': nro, 'fecha': hasta.isoformat(), 'ci_ruc': CLIENTE_CI, 'valor': 150000, 'sena': 50000,
+                 'forma_pago': 'Contado', 'envio_status': False, 'status': 'Pendiente',
+                 'descripcion': 'Benchmark', 'vendedor': VENDEDOR_CI}
+        if con_ids:
+            # Como el vendedor con sesión: ids ya resueltos, sin lookups
+            datos['vendedor_id'] = vendedor_id
+            datos['cliente_id'] = svc.get_client_id_by_ci_ruc(CLIENTE_CI)
+        return (datos,), {}
+
+    return [
+        Escenario('get_all_work_orders', svc.get_all_work_orders),
+        Escenario('get_work_orders_between', svc.get_work_orders_between,
+                  lambda i: ((desde, hasta), {'sort_desc': True})),
+        Escenario('get_work_orders_between[filtros]', svc.get_work_orders_between,
+                  lambda i: ((desde, hasta), {'status': 'Finalizado', 'forma_pago': 'Contado'})),
+        Escenario('get_work_order_by_ot', svc.get_work_order_by_ot, ot_existente),
+        Escenario('add_sena_to_order', svc.add_sena_to_order,
+                  lambda i: ((ot_existente(i)[0][0], 10000), {})),
+        Escenario('insert_work_order', svc.insert_work_order, nueva_ot),
+        Escenario('insert_work_order[sesion]', svc.insert_work_order,
+                  lambda i: nueva_ot(i, con_ids=True)),
+        Escenario('verify_user_credentials', svc.verify_user_credentials,
+                  lambda i: ((VENDEDOR_CI, VENDEDOR_PW), {})),
+    ]
+
+
+def _limpiar_caches():
+    # Cada corrida arranca en frío, como la primera apertura de una pantalla
+    svc._clientes_cache.clear()
+    svc._usuarios_cache.clear()
+
+
+def medir(client: LocalClient, esc: Escenario, repeat: int, warm: bool):
+    """Corre `esc` una vez de calentamiento + `repeat` medidas + una con `tracemalloc`."""
+    muestras, round_trips, filas, fallos = [], [], [], []
+
+    def _una(i, memoria=False):
+        args, kwargs = esc.preparar(i)
+        if not warm:
+            _limpiar_caches()
+        client.reset_stats()
+        if memoria:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        try:
+            resultado = esc.fn(*args, **kwargs)
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000.0
+            pico = tracemalloc.get_traced_memory()[1] if memoria else None
+            if memoria:
+                tracemalloc.stop()
+        if isinstance(resultado, tuple) and len(resultado) == 2 and resultado[0] is False:
+            fallos.append(str(resultado[1]))
+        return ms, client.stats(), pico
+
+    _una(0)
+    for i in range(1, repeat + 1):
+        ms, stats, _ = _una(i)
+        muestras.append(ms)
+        round_trips.append(stats['round_trips'])
+        filas.append(stats['rows'])
+    _, _, pico = _una(repeat + 1, memoria=True)
+
+    return {
+        'wall_ms': {
+            'median': statistics.median(muestras),
+            'min': min(muestras),
+            'max': max(muestras),
+        },
+        'round_trips': statistics.median(round_trips),
+        'rows': statistics.median(filas),
+        'peak_kb': pico / 1024.0,
+        'errors': len(fallos),
+        'last_error': fallos[-1] if fallos else None,
+    }
+
+
+def run(ots=2000, clientes=300, usuarios=10, abonos=0.5, latency_ms=0.0, repeat=5, warm=False,
+        solo=None, semilla=1):
+    """Siembra una base nueva, la conecta al servicio y mide cada escenario."""
+    rng = random.Random(semilla)
+    client = LocalClient(':memory:', latency=latency_ms / 1000.0)
+    anterior = svc.supabase
+    svc.supabase = guard_client(client)
+    try:
+        dataset = seed(client, ots, clientes, usuarios, abonos, rng)
+        resultados = {}
+        for esc in escenarios(ots, rng):
+            if solo and not any(s in esc.nombre for s in solo):
+                continue
+            resultados[esc.nombre] = medir(client, esc, repeat, warm)
+    finally:
+        svc.supabase = anterior
+        client.close()
+    return {
+        'meta': {
+            'dataset': dataset,
+            'latency_ms': latency_ms,
+            'repeat': repeat,
+            'warm': warm,
+            'seed': semilla,
+            'pw_iterations': svc.PASSWORD_ITERATIONS,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+        },
+        'results': resultados,
+    }
+
+
+def _fmt(valor, decimales=1):
+    return "-" if valor is None else f"{valor:.{decimales}f}"
+
+
+def imprimir(reporte: dict):
+    meta = reporte['meta']
+    ds = meta['dataset']
+    print(f"Dataset: {ds['ots']} OTs, {ds['clientes']} clientes, {ds['usuarios']} usuarios, {ds['abonos']} abonos"
+          f" | latencia {meta['latency_ms']} ms/round trip | {meta['repeat']} corridas"
+          f" | caches {'calientes' if meta['warm'] else 'en frío'}")
+    print(f"{'FUNCIÓN':<34}{'RT':>6}{'FILAS':>8}{'MED ms':>10}{'MÍN ms':>10}{'MÁX ms':>10}{'PICO KB':>10}{'ERR':>5}")
+    for nombre, r in reporte['results'].items():
+        w = r['wall_ms']
+        print(f"{nombre:<34}{r['round_trips']:>6g}{r['rows']:>8g}{_fmt(w['median']):>10}{_fmt(w['min']):>10}"
+              f"{_fmt(w['max']):>10}{_fmt(r['peak_kb'], 0):>10}{r['errors']:>5}")
+        if r['last_error']:
+            print(f"    último error: {r['last_error']}")
+
+
+def comparar(actual: dict, base: dict, threshold: float = 20.0) -> list:
+    """Imprime las diferencias contra `base`; retorna la lista de regresiones."""
+    claves = ('dataset', 'latency_ms', 'repeat', 'warm', 'pw_iterations')
+    distintas = [k for k in claves if actual['meta'].get(k) != base['meta'].get(k)]
+    if distintas:
+        print(f"Aviso: la línea base se midió con otros parámetros ({', '.join(distintas)}).")
+
+    def _delta(nuevo, viejo):
+        return None if not viejo else (nuevo - viejo) * 100.0 / viejo
+
+    regresiones = []
+    print(f"\n{'FUNCIÓN':<34}{'RT':^11}{'MED ms':^27}{'PICO KB':^25}")
+    for nombre, r in actual['results'].items():
+        b = base['results'].get(nombre)
+        if b is None:
+            print(f"{nombre:<34}  (sin línea base)")
+            continue
+        d_ms = _delta(r['wall_ms']['median'], b['wall_ms']['median'])
+        d_mem = _delta(r['peak_kb'], b['peak_kb'])
+        marcas = []
+        if r['round_trips'] > b['round_trips']:
+            marcas.append('round trips')
+        if d_ms is not None and d_ms > threshold:
+            marcas.append('tiempo')
+        if d_mem is not None and d_mem > threshold:
+            marcas.append('memoria')
+        if marcas:
+            regresiones.append((nombre, marcas))
+        print(f"{nombre:<34}{b['round_trips']:>4g} → {r['round_trips']:<4g}"
+              f"{_fmt(b['wall_ms']['median']):>9} → {_fmt(r['wall_ms']['median']):<8}({_fmt(d_ms, 0):>4}%)"
+              f"{_fmt(b['peak_kb'], 0):>8} → {_fmt(r['peak_kb'], 0):<7}({_fmt(d_mem, 0):>4}%)"
+              f"{'  ← ' + ', '.join(marcas) if marcas else ''}")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de round trips y latencia de supabase_service.")
+    parser.add_argument('--ots', type=int, default=2000, help="OTs a sembrar (por defecto 2000)")
+    parser.add_argument('--clientes', type=int, default=300, help="clientes a sembrar (por defecto 300)")
+    parser.add_argument('--usuarios', type=int, default=10, help="vendedores a sembrar (por defecto 10)")
+    parser.add_argument('--abonos', type=float, default=0.5, help="abonos por OT (por defecto 0.5)")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="latencia simulada por round trip")
+    parser.add_argument('--repeat', type=int, default=5, help="corridas medidas por función (por defecto 5)")
+    parser.add_argument('--warm', action='store_true', help="no vaciar las caches de lookup entre corridas")
+    parser.add_argument('--only', action='append', help="medir solo funciones que contengan este texto")
+    parser.add_argument('--seed', type=int, default=1, help="semilla del dataset")
+    parser.add_argument('--save', help="guardar el resultado como línea base (JSON)")
+    parser.add_argument('--compare', help="comparar contra una línea base guardada")
+    parser.add_argument('--threshold', type=float, default=20.0, help="%% de aumento que cuenta como regresión")
+    args = parser.parse_args(argv)
+
+    reporte = run(ots=max(1, args.ots), clientes=args.clientes, usuarios=args.usuarios, abonos=args.abonos,
+                  latency_ms=max(0.0, args.latency_ms), repeat=max(1, args.repeat), warm=args.warm,
+                  solo=args.only, semilla=args.seed)
+    imprimir(reporte)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2)
+        print(f"\nLínea base guardada en {args.save}")
+
+    if args.compare:
+        try:
+            with open(args.compare, encoding='utf-8') as f:
+                base = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo leer la línea base: {e}")
+            return 2
+        regresiones = comparar(reporte, base, args.threshold)
+        if regresiones:
+            print(f"\n{len(regresiones)} regresión(es): " + "; ".join(f"{n} ({', '.join(m)})" for n, m in regresiones))
+            return 1
+        print("\nSin regresiones.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
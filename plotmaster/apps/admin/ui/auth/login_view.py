@@ -1,11 +1,9 @@
 import customtkinter as ctk
 from tkinter import messagebox
 
-# Importar funciones de supabase para autenticación
-from plotmaster.core.services.supabase_service import (
-    create_admin,
-    verify_admin_credentials,
-)
+# Autenticación y registro en segundo plano (no congelan la ventana)
+from plotmaster.core.services.auth import login_admin, register_admin
+from plotmaster.core.ui.auth_progress import AuthProgressPanel
 
 
 class LoginFrame(ctk.CTkFrame):
@@ -26,10 +24,13 @@ class LoginFrame(ctk.CTkFrame):
         self.contrasena_entry = ctk.CTkEntry(self, placeholder_text="Contraseña", show="*", width=250, height=40, corner_radius=10)
         self.contrasena_entry.pack(pady=10)
 
-        ingresar_btn = ctk.CTkButton(self, text="INGRESAR", command=self._intentar_login,
-                                     width=250, height=40, corner_radius=10,
-                                     fg_color="#5E835E", hover_color="#4B6B4B", font=ctk.CTkFont(size=14, weight="bold"))
-        ingresar_btn.pack(pady=(25, 5))
+        self.ingresar_btn = ctk.CTkButton(self, text="INGRESAR", command=self._intentar_login,
+                                          width=250, height=40, corner_radius=10,
+                                          fg_color="#5E835E", hover_color="#4B6B4B", font=ctk.CTkFont(size=14, weight="bold"))
+        self.ingresar_btn.pack(pady=(25, 5))
+        # Búsqueda + PBKDF2 corren en segundo plano; el panel muestra el avance
+        self.auth_panel = AuthProgressPanel(self)
+        self.contrasena_entry.bind("<Return>", lambda _e: self._intentar_login())
 
         registrate_btn = ctk.CTkButton(self, text="REGISTRATE", command=self._abrir_ventana_registro,
                            fg_color="transparent", text_color=("gray10", "gray90"),
@@ -37,9 +38,14 @@ class LoginFrame(ctk.CTkFrame):
         registrate_btn.pack(pady=(5, 20))
 
     def _intentar_login(self):
+        if self.auth_panel.busy:
+            return
         ci = self.ci_entry.get().strip()
         contrasena = self.contrasena_entry.get().strip()
-        ok, result = verify_admin_credentials(ci, contrasena)
+        self.auth_panel.run(login_admin(ci, contrasena), lambda ok, result: self._on_login_result(ci, ok, result),
+                            busy_widgets=(self.ingresar_btn,), after=self.ingresar_btn)
+
+    def _on_login_result(self, ci, ok, result):
         if ok:
             admin_info = result or {}
             nombre_usuario = admin_info.get('nombre', ci)
@@ -54,7 +60,7 @@ class LoginFrame(ctk.CTkFrame):
         parent_toplevel = self.winfo_toplevel()
         ventana_registro = ctk.CTkToplevel(parent_toplevel)
         ventana_registro.title("Registrar Administrador")
-        ventana_registro.geometry("420x360")
+        ventana_registro.geometry("420x430")
         ventana_registro.resizable(False, False)
 
         ctk.CTkLabel(ventana_registro, text="REGISTRO ADMINISTRADOR", font=ctk.CTkFont(size=18, weight="bold")).pack(pady=18)
@@ -79,15 +85,23 @@ class LoginFrame(ctk.CTkFrame):
             if not ci_reg or not nombre_reg or not contrasena_reg:
                 messagebox.showwarning("Campos Requeridos", "CI, Nombre y Contraseña son obligatorios.")
                 return
-            ok, msg = create_admin(nombre_reg, ci_reg, contrasena_reg, email_reg)
-            if ok:
-                messagebox.showinfo("Registro Exitoso", msg)
-                ventana_registro.destroy()
-            else:
-                messagebox.showerror("Error de Registro", msg)
-
-        ctk.CTkButton(ventana_registro, text="REGISTRAR", command=_registrar,
-                      width=320, fg_color="#5E835E", hover_color="#4B6B4B").pack(pady=16)
+            if registro_panel.busy:
+                return
+
+            def _on_registro(ok, msg):
+                if ok:
+                    messagebox.showinfo("Registro Exitoso", msg)
+                    ventana_registro.destroy()
+                else:
+                    messagebox.showerror("Error de Registro", msg)
+
+            registro_panel.run(register_admin(nombre_reg, ci_reg, contrasena_reg, email_reg), _on_registro,
+                               busy_widgets=(registrar_btn,), pady=(0, 10))
+
+        registrar_btn = ctk.CTkButton(ventana_registro, text="REGISTRAR", command=_registrar,
+                                      width=320, fg_color="#5E835E", hover_color="#4B6B4B")
+        registrar_btn.pack(pady=16)
+        registro_panel = AuthProgressPanel(ventana_registro, width=320)
 
         try:
             ventana_registro.transient(parent_toplevel)
@@ -1,4 +1,6 @@
 import customtkinter as ctk
+from plotmaster.core.ui.backend_status import BackendStatusLabel
+from plotmaster.core.ui.diagnostics import bind_diagnostics_shortcut
 from ..modules.work_orders_list.ot_registration_list_adm import ModuloOTs
 from ..modules.client.client_registration import ModuloClientes
 from ..modules.users.users import ModuloAccesos
@@ -152,7 +154,13 @@ class MainAppFrame(ctk.CTkFrame):
                    anchor="e",
                    font=ctk.CTkFont(size=13, weight="normal"),
                    text_color="white")
-        self.user_label.grid(row=0, column=1, padx=20, sticky="e")
+        self.user_label.grid(row=0, column=2, padx=20, sticky="e")
+
+        # Estado de la conexión: si el backend no responde se ve acá en lugar de "Cargando…" eterno
+        self.backend_status_label = BackendStatusLabel(self.header_frame)
+        self.backend_status_label.grid(row=0, column=1, padx=(20, 0), sticky="e")
+        # Panel de diagnóstico oculto (latencias y round trips por función): Ctrl+Shift+D
+        bind_diagnostics_shortcut(self)
 
         # ------------------------------------------------------------------
         # 2. Creación del Marco de Navegación (Sidebar)
@@ -1,7 +1,9 @@
 import customtkinter as ctk
-from tkinter import ttk, messagebox
-import threading
-from plotmaster.core.services.supabase_service import get_all_clients, update_client, get_work_orders_by_client
+from tkinter import messagebox
+from plotmaster.core.services import async_service
+from plotmaster.core.services.supabase_service import update_client
+from plotmaster.core.ui.remote_search import RemoteSearch
+from plotmaster.core.ui.virtual_table import VirtualTreeview
 
 # --- CONFIGURACIÓN GLOBAL ---
 ctk.set_appearance_mode("light") # Fondo claro siempre
@@ -16,6 +18,9 @@ class ModuloClientes(ctk.CTkFrame):
         # Control de cargas en background para evitar bloqueos al cambiar de fila
         self._ots_request_id = 0
         self._ultima_seleccion = None
+        # Sin coincidencias en la lista cargada se busca en el servidor (tildes, errores de tipeo)
+        self._busqueda = RemoteSearch(self, async_service.search_clients, self.actualizar_tabla)
+        self._clientes_remotos = {}
 
         self.grid_columnconfigure(0, weight=1)
         self.grid_columnconfigure(1, weight=0)
@@ -46,7 +51,8 @@ class ModuloClientes(ctk.CTkFrame):
         cont_tabla.grid_columnconfigure(0, weight=1)
 
         columnas = ("nro", "ruc", "nombre", "tel", "email", "ciudad")
-        self.tabla = ttk.Treeview(cont_tabla, columns=columnas, show="headings")
+        # Virtual: solo se crean ítems para lo visible (clave de fila: id del cliente)
+        self.tabla = VirtualTreeview(cont_tabla, columns=columnas, show="headings")
 
         # --- SCROLLBARS ---
         scroll_v = ctk.CTkScrollbar(cont_tabla, orientation="vertical", command=self.tabla.yview)
@@ -156,19 +162,25 @@ class ModuloClientes(ctk.CTkFrame):
         if not tabla or not tabla.winfo_exists():
             return
 
-        try:
-            children = tabla.get_children()
-        except Exception:
-            return
-
-        for i in children:
-            tabla.delete(i)
         busq = self.entry_busqueda.get().lower()
-        for c in self.clientes:
-            nombre = c.get('nombre') or ''
-            ci_ruc = c.get('ci_ruc') or ''
-            if busq in nombre.lower() or busq in ci_ruc:
-                tabla.insert("", "end", values=(c.get('id') or '', ci_ruc, nombre, c.get('telefono') or '', c.get('email') or '', c.get('zona') or ''))
+        visibles = [c for c in self.clientes if busq in c.nombre.lower() or busq in c.ci_ruc]
+        if busq.strip() and not visibles:
+            self._busqueda.request(busq)
+        # Los del servidor que ya están en la lista se muestran con el registro local
+        por_id = {c.id: c for c in self.clientes}
+        ya = {c.id for c in visibles}
+        self._clientes_remotos = {}
+        for r in self._busqueda.results_for(busq):
+            if r.id in ya:
+                continue
+            ya.add(r.id)
+            visibles.append(por_id.get(r.id, r))
+            if r.id not in por_id:
+                self._clientes_remotos[r.ci_ruc.strip()] = r
+        tabla.set_rows([
+            (c.id if c.id is not None else c.ci_ruc, (c.id or '', c.ci_ruc, c.nombre, c.telefono, c.email, c.zona), ())
+            for c in visibles
+        ])
 
     def al_seleccionar_cliente(self, e):
         sel = self.tabla.selection()
@@ -181,19 +193,19 @@ class ModuloClientes(ctk.CTkFrame):
             ci_ruc = ''
 
         # Intentar encontrar el cliente por CI/RUC, si no por id, si no por nombre (tolerante)
-        cliente = next((c for c in self.clientes if str(c.get('ci_ruc') or '').strip() == ci_ruc), None)
+        cliente = next((c for c in self.clientes if c.ci_ruc.strip() == ci_ruc), None) or self._clientes_remotos.get(ci_ruc)
         if not cliente:
             # intentar por id (columna 0)
             try:
                 vid = str(valores[0]).strip()
-                cliente = next((c for c in self.clientes if str(c.get('id') or '') == vid), None)
+                cliente = next((c for c in self.clientes if str(c.id or '') == vid), None)
             except Exception:
                 cliente = None
         if not cliente:
             # intentar por nombre (columna 2)
             try:
                 vname = str(valores[2]).strip().lower()
-                cliente = next((c for c in self.clientes if (c.get('nombre') or '').strip().lower() == vname), None)
+                cliente = next((c for c in self.clientes if c.nombre.strip().lower() == vname), None)
             except Exception:
                 cliente = None
         if not cliente:
@@ -202,22 +214,22 @@ class ModuloClientes(ctk.CTkFrame):
             messagebox.showwarning("No encontrado", "No se encontró el cliente correspondiente a la fila seleccionada.")
             return
         self.seleccion_ci = ci_ruc
-        self.lbl_nombre.configure(text=(cliente.get('nombre') or '---').upper())
+        self.lbl_nombre.configure(text=(cliente.nombre or '---').upper())
         self.val_ruc.configure(text=ci_ruc)
         # Set entry values
-        self.val_tel.delete(0, 'end'); self.val_tel.insert(0, cliente.get('telefono') or '')
-        self.val_email.delete(0, 'end'); self.val_email.insert(0, cliente.get('email') or '')
+        self.val_tel.delete(0, 'end'); self.val_tel.insert(0, cliente.telefono)
+        self.val_email.delete(0, 'end'); self.val_email.insert(0, cliente.email)
         # habilitar combobox y asignar valor
         try:
             if hasattr(self.val_ciudad, 'configure'):
                 self.val_ciudad.configure(state="normal")
             # set value
             try:
-                self.val_ciudad.set(cliente.get('zona') or '')
+                self.val_ciudad.set(cliente.zona)
             except Exception:
                 # fallback en caso de que CTkComboBox no tenga set
                 try:
-                    self.val_ciudad.delete(0, 'end'); self.val_ciudad.insert(0, cliente.get('zona') or '')
+                    self.val_ciudad.delete(0, 'end'); self.val_ciudad.insert(0, cliente.zona)
                 except Exception:
                     pass
         except Exception:
@@ -235,14 +247,12 @@ class ModuloClientes(ctk.CTkFrame):
 
         self._ots_request_id += 1
         req_id = self._ots_request_id
-        threading.Thread(target=self._fetch_ots_background, args=(ci_ruc, req_id), daemon=True).start()
-
-    def _fetch_ots_background(self, ci_ruc, req_id):
-        try:
-            ok, data = get_work_orders_by_client(ci_ruc)
-        except Exception as ex:
-            ok, data = False, f"Error llamando a get_work_orders_by_client: {ex}"
-        self.after(0, lambda: self._apply_ots_response(ci_ruc, req_id, ok, data))
+        async_service.run_in_tk(
+            self,
+            async_service.get_work_orders_by_client(ci_ruc, as_records=True),
+            lambda res: self._apply_ots_response(ci_ruc, req_id, *res),
+            on_error=lambda ex: self._apply_ots_response(ci_ruc, req_id, False, f"Error llamando a get_work_orders_by_client: {ex}"),
+        )
 
     def _apply_ots_response(self, ci_ruc, req_id, ok, data):
         # Ignorar respuestas viejas o de otra selección
@@ -259,8 +269,7 @@ class ModuloClientes(ctk.CTkFrame):
         if not data:
             self._safe_set_lbl_ots("Sin órdenes registradas", "gray")
             return
-        ot_nros = [str(r.get('ot_nro') or r.get('ot') or '') for r in data]
-        texto_ots = " , ".join([f"#{n}" for n in ot_nros if n])
+        texto_ots = " , ".join(f"#{d.ot}" for d in data if d.ot)
         if texto_ots:
             self._safe_set_lbl_ots(texto_ots, "black")
         else:
@@ -295,14 +304,12 @@ class ModuloClientes(ctk.CTkFrame):
 
     def _load_clientes_async(self):
         self._set_loading(True)
-        threading.Thread(target=self._fetch_clientes_background, daemon=True).start()
-
-    def _fetch_clientes_background(self):
-        try:
-            ok, data = get_all_clients()
-        except Exception as exc:
-            ok, data = False, f"Error inesperado: {exc}"
-        self.after(0, lambda: self._apply_clientes(ok, data))
+        async_service.run_in_tk(
+            self,
+            async_service.get_all_clients(),
+            lambda res: self._apply_clientes(*res),
+            on_error=lambda exc: self._apply_clientes(False, f"Error inesperado: {exc}"),
+        )
 
     def _apply_clientes(self, ok, data):
         if not self.winfo_exists():
@@ -2,6 +2,7 @@ import customtkinter as ctk
 from tkinter import ttk, messagebox
 from datetime import datetime
 from plotmaster.core.services import supabase_service as svc
+from plotmaster.core.ui.virtual_table import VirtualTreeview
 
 # --- CONFIGURACIÓN GLOBAL ---
 ctk.set_appearance_mode("light")
@@ -42,7 +43,8 @@ class ModuloAccesos(ctk.CTkFrame):
         cont_tabla.pack(expand=True, fill="both", padx=15, pady=5)
 
         columnas = ("id", "fecha_registro", "nombre", "ci_ruc", "telefono", "email", "zona")
-        self.tabla = ttk.Treeview(cont_tabla, columns=columnas, show="headings")
+        # Virtual: solo se crean ítems para lo visible (clave de fila: id del usuario)
+        self.tabla = VirtualTreeview(cont_tabla, columns=columnas, show="headings")
 
         anchos = {"id": 60, "fecha_registro": 140, "nombre": 220, "ci_ruc": 120, "telefono": 110, "email": 180, "zona": 100}
         for col in columnas:
@@ -126,11 +128,11 @@ class ModuloAccesos(ctk.CTkFrame):
     def _llenar_form_usuario(self, usuario):
         self._set_form_state(True)
         campos = [
-            (self.entry_ci, usuario.get('ci_ruc') or ''),
-            (self.entry_nombre, usuario.get('nombre') or ''),
-            (self.entry_email, usuario.get('email') or ''),
-            (self.entry_tel, usuario.get('telefono') or ''),
-            (self.entry_zona, usuario.get('zona') or ''),
+            (self.entry_ci, usuario.ci_ruc),
+            (self.entry_nombre, usuario.nombre),
+            (self.entry_email, usuario.email),
+            (self.entry_tel, usuario.telefono),
+            (self.entry_zona, usuario.zona),
         ]
         for entry, valor in campos:
             try:
@@ -146,6 +148,7 @@ class ModuloAccesos(ctk.CTkFrame):
             messagebox.showerror("Error", f"No fue posible obtener usuarios: {data}")
         # Resetear formulario y selección para evitar mostrar datos stale
         self.usuario_seleccionado = None
+        self.tabla.selection_set(())
         self._set_form_state(False)
         self.lbl_info.configure(text="Seleccione un usuario de la lista", text_color="gray")
         try:
@@ -155,21 +158,20 @@ class ModuloAccesos(ctk.CTkFrame):
         self.actualizar_tabla_local()
 
     def actualizar_tabla_local(self, e=None):
-        for i in self.tabla.get_children():
-            self.tabla.delete(i)
         busq = self.entry_busqueda.get().lower() if hasattr(self, 'entry_busqueda') else ""
+        filas = []
         for u in (self.usuarios or []):
-            nombre = (u.get('nombre') or "").lower()
-            ci_ruc = (u.get('ci_ruc') or "").lower()
-            if busq in nombre or busq in ci_ruc:
-                created = u.get('fecha_registro') or u.get('created_at') or u.get('created') or ""
+            if busq in u.nombre.lower() or busq in u.ci_ruc.lower():
+                created = u.fecha_registro or ""
                 if created:
                     try:
                         # Presentar fecha legible si es ISO
                         created = created.replace('T', ' ')[:19]
                     except Exception:
                         pass
-                self.tabla.insert("", "end", values=(u.get('id'), created, u.get('nombre'), u.get('ci_ruc'), u.get('telefono'), u.get('email'), u.get('zona')))
+                key = u.id if u.id is not None else u.ci_ruc
+                filas.append((key, (u.id, created, u.nombre, u.ci_ruc, u.telefono, u.email, u.zona), ()))
+        self.tabla.set_rows(filas)
 
     def al_seleccionar_fila(self, e):
         sel = self.tabla.selection()
@@ -182,26 +184,26 @@ class ModuloAccesos(ctk.CTkFrame):
         except Exception:
             ci_ruc = ''
         # Buscar en la lista cargada
-        self.usuario_seleccionado = next((c for c in (self.usuarios or []) if str(c.get('ci_ruc') or '').strip() == ci_ruc), None)
+        self.usuario_seleccionado = next((c for c in (self.usuarios or []) if c.ci_ruc.strip() == ci_ruc), None)
         if not self.usuario_seleccionado:
             # intentar por id
             try:
                 vid = str(vals[0]).strip()
-                self.usuario_seleccionado = next((c for c in (self.usuarios or []) if str(c.get('id') or '') == vid), None)
+                self.usuario_seleccionado = next((c for c in (self.usuarios or []) if str(c.id or '') == vid), None)
             except Exception:
                 self.usuario_seleccionado = None
         if not self.usuario_seleccionado:
             # intentar por nombre
             try:
                 vname = str(vals[2]).strip().lower()
-                self.usuario_seleccionado = next((c for c in (self.usuarios or []) if (c.get('nombre') or '').strip().lower() == vname), None)
+                self.usuario_seleccionado = next((c for c in (self.usuarios or []) if c.nombre.strip().lower() == vname), None)
             except Exception:
                 self.usuario_seleccionado = None
         if not self.usuario_seleccionado:
             print(f"Usuario no encontrado para fila: {vals}")
             return
         if self.usuario_seleccionado:
-            self.lbl_info.configure(text=f"{self.usuario_seleccionado.get('nombre')}\nCI/RUC: {self.usuario_seleccionado.get('ci_ruc')}", text_color="black")
+            self.lbl_info.configure(text=f"{self.usuario_seleccionado.nombre}\nCI/RUC: {self.usuario_seleccionado.ci_ruc}", text_color="black")
             self._llenar_form_usuario(self.usuario_seleccionado)
             self.lbl_edit_status.configure(text="Listo para editar", text_color="gray")
 
@@ -221,19 +223,20 @@ class ModuloAccesos(ctk.CTkFrame):
             'zona': self.entry_zona.get().strip(),
         }
         new_ci = self.entry_ci.get().strip()
-        if new_ci and new_ci != (u.get('ci_ruc') or '').strip():
+        if new_ci and new_ci != u.ci_ruc.strip():
             updates['ci_ruc'] = new_ci
 
-        if u.get('id'):
-            ok, msg = svc.update_user_by_id(u.get('id'), updates)
+        if u.id:
+            ok, msg = svc.update_user_by_id(u.id, updates)
         else:
-            ok, msg = svc.update_user(u.get('ci_ruc'), updates)
+            ok, msg = svc.update_user(u.ci_ruc, updates)
 
         if ok:
             messagebox.showinfo("Éxito", "Usuario actualizado correctamente.")
             # mantener UI en línea con los datos cambiados
-            self.usuario_seleccionado.update(updates)
-            self.lbl_info.configure(text=f"{self.usuario_seleccionado.get('nombre')}\nCI/RUC: {self.usuario_seleccionado.get('ci_ruc', new_ci)}", text_color="black")
+            for campo, valor in updates.items():
+                setattr(u, campo, valor)
+            self.lbl_info.configure(text=f"{u.nombre}\nCI/RUC: {u.ci_ruc}", text_color="black")
             self.lbl_edit_status.configure(text="Cambios guardados", text_color="#27AE60")
             self.cargar_usuarios()
         else:
@@ -244,8 +247,8 @@ class ModuloAccesos(ctk.CTkFrame):
         u = self.usuario_seleccionado
         if not u:
             return
-        if messagebox.askyesno("Confirmar", f"¿Desea eliminar definitivamente a {u.get('nombre')} (CI/RUC: {u.get('ci_ruc')})?"):
-            ok, msg = svc.delete_user(u.get('ci_ruc'))
+        if messagebox.askyesno("Confirmar", f"¿Desea eliminar definitivamente a {u.nombre} (CI/RUC: {u.ci_ruc})?"):
+            ok, msg = svc.delete_user(u.ci_ruc)
             if ok:
                 messagebox.showinfo("Eliminado", "Usuario borrado del sistema.")
                 self.cargar_usuarios()
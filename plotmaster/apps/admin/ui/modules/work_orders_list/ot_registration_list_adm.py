@@ -1,18 +1,26 @@
 import customtkinter as ctk
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import messagebox
 from datetime import datetime
 import threading
 from plotmaster.core.services.supabase_service import (
     add_sena_to_order,
     cancel_work_order,
     delete_abono,
-    get_all_work_orders,
     get_work_order_by_ot,
+    get_work_orders_by_refs,
     update_work_order_details,
     update_work_order_status,
     update_work_order_value,
+    update_work_orders_status,
 )
+from plotmaster.core.services import async_service, realtime
+from plotmaster.core.services.ot_frame import WorkOrderFrame
+from plotmaster.core.services.ot_sync import WorkOrderSync
+from plotmaster.core.services.records import Abono, WorkOrder
+from plotmaster.core.ui.remote_search import RemoteSearch, merge_work_orders
+from plotmaster.core.ui.virtual_table import VirtualTreeview
+from plotmaster.core.utils.formatting import clean_amount, format_amount, format_date, format_gs
 from ..cancel.ot_cancel import VentanaCancelacion
 
 # --- CONFIGURACIÓN DE ESTILO ---
@@ -23,44 +31,20 @@ FORMA_PAGO_OPTIONS = ["Contado", "Crédito"]
 ENVIO_OPTIONS = ["Con Envío", "Sin Envío (Retira)"]
 
 
-def _clean_amount(valor) -> int:
-    if isinstance(valor, (int, float)):
-        try:
-            return int(round(valor))
-        except Exception:
-            return 0
-    s = str(valor).strip()
-    neg = s.startswith("-")
-    digits = "".join(ch for ch in s if ch.isdigit())
-    if not digits:
-        return 0
-    num = int(digits)
-    return -num if neg else num
-
-
-def _to_int_amount(valor):
-    return _clean_amount(valor)
-
+def _fila(d):
+    """Fila de la tabla de la OT `d` (se arma al cargar y al sincronizar, no en cada redibujo)."""
+    return (d.ot, (d.ot, d.fecha, d.vendedor, d.cliente, d.descripcion, format_gs(d.monto),
+                   format_gs(d.abonado), d.forma_pago, d.estado), (d.tag,))
 
-def _format_gs(valor):
-    return f"{_to_int_amount(valor):,} Gs.".replace(",", ".")
 
+# Acciones en lote: estado destino -> (texto del botón, color, estado requerido)
+ACCIONES_LOTE = (
+    ("Aprobado", "Aprobar", "#27AE60", "Pendiente"),
+    ("Rechazado", "Rechazar", "#E74C3C", "Pendiente"),
+    ("Entregado", "Marcar entregado", "#F39C12", "Aprobado"),
+    ("Finalizado", "Finalizar", "#27AE60", "Entregado"),
+)
 
-def _format_amount_text(valor):
-    return f"{_to_int_amount(valor):,}".replace(",", ".")
-
-def _format_date_detail(raw_fecha):
-    if not raw_fecha:
-        return ""
-    fecha_texto = str(raw_fecha).split('T')[0]
-    try:
-        fecha_dt = datetime.strptime(fecha_texto, "%Y-%m-%d")
-        return fecha_dt.strftime("%d/%m/%Y")
-    except Exception:
-        return fecha_texto
-
-def _envio_label_from_flag(flag):
-    return "Con Envío" if flag else "Sin Envío (Retira)"
 
 class VentanaAbono(ctk.CTkToplevel):
     def __init__(self, parent, callback):
@@ -83,7 +67,7 @@ class VentanaAbono(ctk.CTkToplevel):
         self.btn_confirmar.pack(pady=25)
 
     def enviar_datos(self):
-        monto = _clean_amount(self.monto_var.get())
+        monto = clean_amount(self.monto_var.get())
         if monto:
             self.callback(monto)
             self.destroy()
@@ -96,7 +80,7 @@ class VentanaAbono(ctk.CTkToplevel):
                 return
             self._fmt_lock = True
             raw = "".join(ch for ch in var.get() if ch.isdigit())
-            var.set(_format_amount_text(raw) if raw else "")
+            var.set(format_amount(raw) if raw else "")
             self._fmt_lock = False
         try:
             var.trace_add("write", _on_change)
@@ -118,7 +102,19 @@ class ModuloOTs(ctk.CTkFrame):
         self.detalle_cache = {}
         # Control de carga de detalle para no bloquear la UI
         self._detalle_request_id = 0
+        self._detalle_future = None
         self._detalle_inflight_ot = None
+        # Identificador de la carga en curso (descarta páginas de cargas anteriores)
+        self._ots_load_id = 0
+        # Espejo local: después de la carga inicial "Actualizar" solo pide lo modificado
+        self._ot_sync = WorkOrderSync()
+        # Columnas e índice de búsqueda de `datos_ots` (filtros y totales del pie)
+        self._ots_frame = WorkOrderFrame(self.datos_ots, search_fields=('cliente', 'ot', 'descripcion', 'vendedor'),
+                                       row=_fila)
+        # Búsqueda en el servidor mientras la carga sigue o si en lo cargado no hay nada
+        self._cargando = False
+        self._busqueda = RemoteSearch(self, self._buscar_en_servidor, self.actualizar_tabla)
+        self._ots_remotas = {}
 
         self.grid_columnconfigure(0, weight=1)
         self.grid_columnconfigure(1, weight=0)
@@ -127,6 +123,12 @@ class ModuloOTs(ctk.CTkFrame):
         self.crear_planilla_izquierda()
         self.crear_detalle_derecha()
         self._load_ots_async()
+        # Cambios de otros usuarios (Realtime, o polling si no hay canal)
+        self._realtime_off = realtime.listen(self._recibir_cambios)
+
+    def destroy(self):
+        self._realtime_off()
+        super().destroy()
 
     def crear_planilla_izquierda(self):
         self.frame_izq = ctk.CTkFrame(self, fg_color="white", corner_radius=10, border_width=1, border_color="#D0D0D0")
@@ -145,7 +147,7 @@ class ModuloOTs(ctk.CTkFrame):
         self.combo_filtro.pack(side="left", padx=20)
         # Botón actualizar (recarga desde BD)
         try:
-            self.btn_actualizar = ctk.CTkButton(header, text="Actualizar", width=110, command=self._load_ots_async)
+            self.btn_actualizar = ctk.CTkButton(header, text="Actualizar", width=110, command=self._refresh_ots_async)
             self.btn_actualizar.pack(side="left", padx=6)
         except Exception:
             self.btn_actualizar = None
@@ -155,13 +157,29 @@ class ModuloOTs(ctk.CTkFrame):
         self.entry_busqueda.pack(side="right")
         self.entry_busqueda.bind("<KeyRelease>", self._on_search_change)
 
+        # Barra de acciones en lote: solo visible con más de una OT seleccionada
+        self._lote_en_curso = False
+        self.barra_lote = ctk.CTkFrame(self.frame_izq, fg_color="#EEF2F7", corner_radius=8)
+        self.lbl_lote = ctk.CTkLabel(self.barra_lote, text="", font=("Arial", 12, "bold"))
+        self.lbl_lote.pack(side="left", padx=(12, 8), pady=6)
+        self.botones_lote = {}
+        for estado, texto, color, _requerido in ACCIONES_LOTE:
+            btn = ctk.CTkButton(self.barra_lote, text=texto, width=110, height=28, fg_color=color,
+                                command=lambda e=estado: self.aplicar_estado_lote(e))
+            btn.pack(side="left", padx=4, pady=6)
+            self.botones_lote[estado] = btn
+        self._barra_lote_antes = None
+
         cont_tabla_v = ctk.CTkFrame(self.frame_izq, fg_color="transparent")
         cont_tabla_v.pack(expand=True, fill="both", padx=15, pady=(0, 5))
         cont_tabla_v.grid_rowconfigure(0, weight=1)
         cont_tabla_v.grid_columnconfigure(0, weight=1)
 
         columnas = ("ot", "fecha", "vendedor", "cliente", "descripcion", "monto", "abonado", "pago", "estado")
-        self.tabla = ttk.Treeview(cont_tabla_v, columns=columnas, show="headings")
+        # Ctrl/Shift + clic seleccionan varias OTs para las acciones en lote.
+        # Solo se crean ítems para lo visible; la clave de cada fila es el nro de OT.
+        self.tabla = VirtualTreeview(cont_tabla_v, columns=columnas, show="headings", selectmode="extended")
+        self._cont_tabla = cont_tabla_v
 
         self.scroll_v_tabla = ctk.CTkScrollbar(cont_tabla_v, orientation="vertical", command=self.tabla.yview)
         self.scroll_h_tabla = ctk.CTkScrollbar(cont_tabla_v, orientation="horizontal", command=self.tabla.xview)
@@ -188,6 +206,10 @@ class ModuloOTs(ctk.CTkFrame):
         self.scroll_v_tabla.grid(row=0, column=1, sticky="ns")
         self.scroll_h_tabla.grid(row=1, column=0, sticky="ew")
 
+        # Pie con los totales de las filas visibles
+        self.lbl_totales = ctk.CTkLabel(self.frame_izq, text="", font=("Arial", 12, "bold"), text_color="#374151", anchor="e")
+        self.lbl_totales.pack(fill="x", padx=20, pady=(0, 10))
+
         self.tabla.bind("<<TreeviewSelect>>", self.al_seleccionar_fila)
         self.actualizar_tabla()
 
@@ -201,51 +223,158 @@ class ModuloOTs(ctk.CTkFrame):
 
     def _load_ots_async(self):
         self._set_loading_state(True)
-        threading.Thread(target=self._fetch_ots_background, daemon=True).start()
+        self._ots_load_id += 1
+        threading.Thread(target=self._fetch_ots_background, args=(self._ots_load_id,), daemon=True).start()
+
+    def _refresh_ots_async(self, quiet=False):
+        # Sin carga inicial completa todavía no hay marca de agua: recargar todo
+        if not self._ot_sync.primed:
+            self._load_ots_async()
+            return
+        self._set_loading_state(True)
+        self._ots_load_id += 1
+        threading.Thread(target=self._sync_ots_background, args=(self._ots_load_id, quiet), daemon=True).start()
+
+    def _recibir_cambios(self, batch):
+        # Llega desde el loop de fondo: se pasa al hilo de Tk
+        try:
+            self.after(0, lambda: self._on_cambios(batch))
+        except Exception:
+            pass  # la planilla ya se cerró
+
+    def _on_cambios(self, batch):
+        if self._cargando:
+            # La carga en curso ya trae lo último (o se reintenta cuando termine)
+            self.after(500, lambda: self._on_cambios(batch))
+            return
+        if batch.resync:
+            # Polling o reconexión: no se sabe qué cambió, se pide el delta
+            if self._ot_sync.primed:
+                self._refresh_ots_async(quiet=True)
+            return
+        for ot in batch.ots:
+            self.detalle_cache.pop(str(ot), None)
+        por_id = {d.id: d.ot for d in self.datos_ots if d.id is not None}
+        threading.Thread(target=self._patch_ots_background,
+                         args=(self._ots_load_id, batch, por_id), daemon=True).start()
+
+    def _patch_ots_background(self, load_id, batch, por_id):
+        # Solo las OTs avisadas; las pedidas que no vuelven se borraron
+        try:
+            ok, rows = get_work_orders_by_refs(tuple(sorted(batch.ots)), tuple(sorted(batch.ids)), as_records=True)
+        except Exception as exc:
+            ok, rows = False, f"Error inesperado: {exc}"
+        payload = rows
+        if ok:
+            vistas_ot = {d.ot for d in rows}
+            vistas_id = {d.id for d in rows}
+            deleted = {str(ot) for ot in batch.ots} - vistas_ot
+            deleted.update(por_id[i] for i in batch.ids if i not in vistas_id and i in por_id)
+            payload = {'upserted': rows, 'deleted': sorted(deleted)}
+        self.after(0, lambda: self._apply_ots_delta(load_id, ok, payload, quiet=True))
+
+    def _fetch_ots_background(self, load_id):
+        # Las páginas llegan por keyset: la primera se muestra apenas llega
+        first = True
+        try:
+            for ok, page in self._ot_sync.iter_full_load():
+                if load_id != self._ots_load_id:
+                    return
+                mapped = self._listables(WorkOrder.from_rows(page)) if ok else page
+                self.after(0, lambda ok=ok, mapped=mapped, first=first: self._apply_ots_result(load_id, ok, mapped, first))
+                first = False
+                if not ok:
+                    break
+        except Exception as exc:
+            err = f"Error inesperado: {exc}"
+            self.after(0, lambda: self._apply_ots_result(load_id, False, err, first))
+        self.after(0, lambda: self._finish_ots_load(load_id))
 
-    def _fetch_ots_background(self):
+    def _sync_ots_background(self, load_id, quiet=False):
         try:
-            ok, data = get_all_work_orders()
+            ok, payload = self._ot_sync.refresh()
+            if ok:
+                payload = {'upserted': WorkOrder.from_rows(payload.get('upserted')), 'deleted': payload.get('deleted')}
         except Exception as exc:
-            ok, data = False, f"Error inesperado: {exc}"
-        mapped = self._map_ots(data) if ok else data
-        self.after(0, lambda: self._apply_ots_result(ok, mapped))
-
-    def _map_ots(self, data_rows):
-        mapped = []
-        for r in data_rows:
-            status_val = (r.get('status') or '').strip().lower()
-            if status_val == 'rechazado':
+            ok, payload = False, f"Error inesperado: {exc}"
+        self.after(0, lambda: self._apply_ots_delta(load_id, ok, payload, quiet))
+        self.after(0, lambda: self._finish_ots_load(load_id))
+
+    def _apply_ots_delta(self, load_id, ok, payload, quiet=False):
+        """Aplica el delta (`WorkOrder` nuevas o cambiadas, números borrados) sobre `datos_ots`
+        en el lugar; solo invalida el detalle de las OTs tocadas.
+
+        Con `quiet` (cambios avisados por Realtime) un error se imprime en vez de un diálogo.
+        """
+        if load_id != self._ots_load_id:
+            return
+        if not ok:
+            if quiet:
+                print(f"No se pudo actualizar OTs: {payload}")
+            else:
+                messagebox.showwarning("Advertencia", f"No se pudo actualizar OTs: {payload}")
+            return
+        upserted = payload.get('upserted') or []
+        deleted = {str(ot) for ot in (payload.get('deleted') or [])}
+        if not upserted and not deleted:
+            return
+        # El frame comparte la lista `datos_ots`: parchea filas sueltas sin rearmar columnas
+        frame = self._ots_frame
+        frame.ensure(self.datos_ots)
+        nuevas = []
+        for nuevo in upserted:
+            ot = nuevo.ot
+            self.detalle_cache.pop(ot, None)
+            if not self._listables([nuevo]):
+                # Pasó a Rechazado: el admin no la lista
+                deleted.add(ot)
                 continue
-            envia_flag = bool(r.get('solicita_envio'))
-            mapped.append({
-                'ot': str(r.get('ot_nro') or r.get('ot') or ''),
-                'fecha': (r.get('fecha_creacion') or r.get('created_at') or '').split('T')[0] if r.get('fecha_creacion') or r.get('created_at') else '',
-                'vendedor': r.get('vendedor') or '',
-                'cliente': r.get('cliente') or r.get('cliente_ci_ruc') or r.get('ci_ruc') or '',
-                'descripcion': r.get('descripcion') or '',
-                'monto': int(r.get('valor_total') or 0),
-                'pagos': r.get('pagos') or [],
-                'sena': r.get('sena', 0) or 0,
-                'abonado_total': r.get('abonado_total', 0) or 0,
-                'pago': r.get('forma_pago') or '',
-                'estado': r.get('status') or '',
-                'envio': _envio_label_from_flag(envia_flag),
-                'solicita_envio': envia_flag,
-                'fecha_entrega': r.get('fecha_entrega'),
-            })
+            i = frame.index_of(ot)
+            if i is not None:
+                # Actualizar el mismo objeto mantiene válida la referencia de `ot_seleccionada`
+                actual = frame.records[i]
+                actual.copy_from(nuevo)
+                frame.sync(actual)
+                if actual is self.ot_seleccionada:
+                    self.refrescar_detalle()
+            else:
+                nuevas.append(nuevo)
+        frame.add(nuevas)
+        if deleted:
+            frame.remove(deleted)
+            for ot in deleted:
+                self.detalle_cache.pop(ot, None)
+            if self.ot_seleccionada and self.ot_seleccionada.ot in deleted:
+                self.ot_seleccionada = None
+        self.actualizar_tabla()
+
+    def _listables(self, ots):
+        # Se arma una vez por carga (en el hilo de fondo), con la fila de la tabla ya
+        # formateada; el admin no lista las rechazadas
+        mapped = [d for d in ots if d.tag != 'rechazado']
+        for d in mapped:
+            d.fila = _fila(d)
         return mapped
 
-    def _apply_ots_result(self, ok, payload):
-        self._set_loading_state(False)
+    def _apply_ots_result(self, load_id, ok, payload, first=True):
+        if load_id != self._ots_load_id:
+            return
         if not ok:
             messagebox.showwarning("Advertencia", f"No se pudo cargar OTs: {payload}")
             return
-        self.datos_ots = payload
-        self.detalle_cache.clear()
+        if first:
+            self.datos_ots = payload
+            self.detalle_cache.clear()
+        else:
+            self.datos_ots.extend(payload)
         self.actualizar_tabla()
 
+    def _finish_ots_load(self, load_id):
+        if load_id == self._ots_load_id:
+            self._set_loading_state(False)
+
     def _set_loading_state(self, is_loading: bool):
+        self._cargando = is_loading
         btn = getattr(self, 'btn_actualizar', None)
         if not btn:
             return
@@ -361,47 +490,46 @@ class ModuloOTs(ctk.CTkFrame):
         linea.pack(fill="x", padx=10, pady=15)
 
     def actualizar_tabla(self, e=None):
-        for i in self.tabla.get_children(): self.tabla.delete(i)
         busq = self.entry_busqueda.get().lower()
         filtro = self.filtro_var.get()
-        for d in self.datos_ots:
-            cliente_lower = (d.get('cliente') or '').lower()
-            descripcion_lower = (d.get('descripcion') or '').lower()
-            vendedor_lower = (d.get('vendedor') or '').lower()
-            if (filtro == "Todos" or d.get("estado") == filtro) and \
-               (busq in cliente_lower or busq in str(d.get('ot')) or busq in descripcion_lower or busq in vendedor_lower):
-                # Preferir campo 'abonado_total' (nuevo esquema). Fallback: 'sena' o suma de pagos
-                if d.get('abonado_total') is not None:
-                    try:
-                        abono = float(d.get('abonado_total') or 0)
-                    except Exception:
-                        abono = sum(p.get('m', 0) for p in d.get('pagos', []))
-                else:
-                    sena_val = d.get('sena', None)
-                    if sena_val is None:
-                        abono = sum(p.get('m', 0) for p in d.get('pagos', []))
-                    else:
-                        try:
-                            abono = float(sena_val)
-                        except Exception:
-                            abono = sum(p.get('m', 0) for p in d.get('pagos', []))
-                tag = (d.get("estado") or '').lower()
-                monto_str = _format_gs(d.get('monto', 0))
-                abono_str = _format_gs(abono)
-                self.tabla.insert("", "end", values=(d.get("ot"), d.get("fecha"), d.get("vendedor"), d.get("cliente"), d.get("descripcion"), monto_str, abono_str, d.get("pago"), d.get("estado")), tags=(tag,))
+        # Estado sobre las columnas del frame; el texto, con su índice de trigramas
+        frame = self._ots_frame
+        frame.ensure(self.datos_ots)
+        if self.ot_seleccionada is not None:
+            frame.sync(self.ot_seleccionada)
+        visibles = frame.positions(estados=None if filtro == "Todos" else (filtro,), texto=busq)
+        if busq.strip() and (self._cargando or len(visibles) == 0):
+            self._busqueda.request(busq)
+        filas, remotas, totales = merge_work_orders(
+            frame, visibles, self._busqueda.results_for(busq), None if filtro == "Todos" else filtro
+        )
+        self._ots_remotas = {d.ot: d for d in remotas}
+        self.tabla.set_rows([d.fila for d in filas])
+        self._mostrar_totales(totales)
+
+    def _buscar_en_servidor(self, texto):
+        async def _buscar():
+            ok, rows = await async_service.search_work_orders(texto, as_records=True)
+            return (True, self._listables(rows)) if ok else (ok, rows)
+        return _buscar()
+
+    def _mostrar_totales(self, t):
+        self.lbl_totales.configure(text=f"{t['count']} OTs   ·   Total: {format_gs(t['monto'])}   ·   "
+                                        f"Abonado: {format_gs(t['abonado'])}   ·   Saldo: {format_gs(t['saldo'])}")
 
     def al_seleccionar_fila(self, e):
         sel = self.tabla.selection()
-        if not sel:
+        self._actualizar_barra_lote(sel)
+        if len(sel) != 1:
             return
-        id_ot = str(self.tabla.item(sel[0])['values'][0])
-        self.ot_seleccionada = next((x for x in self.datos_ots if x["ot"] == id_ot), None)
+        id_ot = sel[0]
+        self.ot_seleccionada = next((x for x in self.datos_ots if x.ot == id_ot), None) or self._ots_remotas.get(id_ot)
         if not self.ot_seleccionada:
             return
 
         cached = self.detalle_cache.get(id_ot)
         if cached:
-            self._merge_detalle_data(self.ot_seleccionada, cached)
+            self.ot_seleccionada.merge_detail(cached)
             self.refrescar_detalle()
             self._set_detalle_status("Detalle desde caché", "#6B7280")
             return
@@ -413,14 +541,15 @@ class ModuloOTs(ctk.CTkFrame):
         self._detalle_inflight_ot = id_ot
         self._set_detalle_status("Cargando detalle…", "#6B7280")
 
-        threading.Thread(target=self._fetch_detalle_async, args=(id_ot, req_id), daemon=True).start()
-
-    def _fetch_detalle_async(self, id_ot, req_id):
-        try:
-            ok, detalle = get_work_order_by_ot(id_ot)
-        except Exception as exc:
-            ok, detalle = False, f"Error inesperado: {exc}"
-        self.after(0, lambda: self._apply_detalle_async(id_ot, req_id, ok, detalle))
+        # Al cambiar rápido de selección la consulta anterior se cancela en vez de quedar en vuelo
+        if self._detalle_future is not None:
+            self._detalle_future.cancel()
+        self._detalle_future = async_service.run_in_tk(
+            self,
+            async_service.get_work_order_by_ot(id_ot),
+            lambda res: self._apply_detalle_async(id_ot, req_id, *res),
+            on_error=lambda exc: self._apply_detalle_async(id_ot, req_id, False, f"Error inesperado: {exc}"),
+        )
 
     def _apply_detalle_async(self, id_ot, req_id, ok, detalle):
         # Descartar respuestas obsoletas
@@ -430,20 +559,11 @@ class ModuloOTs(ctk.CTkFrame):
             self._set_detalle_status("No se pudo cargar el detalle", "#B91C1C")
             return
         self.detalle_cache[id_ot] = detalle
-        if self.ot_seleccionada and str(self.ot_seleccionada.get("ot")) == str(id_ot):
-            self._merge_detalle_data(self.ot_seleccionada, detalle)
+        if self.ot_seleccionada and self.ot_seleccionada.ot == str(id_ot):
+            self.ot_seleccionada.merge_detail(detalle)
             self.refrescar_detalle()
             self._set_detalle_status("Detalle actualizado", "#059669")
 
-    def _merge_detalle_data(self, base, detalle):
-        base['pagos'] = detalle.get('pagos', [])
-        base['abonado_total'] = detalle.get('abonado_total', base.get('abonado_total', 0))
-        base['fecha_entrega'] = detalle.get('fecha_entrega', base.get('fecha_entrega'))
-        base['solicita_envio'] = detalle.get('solicita_envio', base.get('solicita_envio', False))
-        envio_flag = bool(base.get('solicita_envio'))
-        base['envio'] = _envio_label_from_flag(envio_flag)
-        base['pago'] = detalle.get('forma_pago', base.get('pago'))
-
     def _set_detalle_status(self, text, color):
         try:
             self.lbl_detalle_status.configure(text=text, text_color=color)
@@ -452,14 +572,14 @@ class ModuloOTs(ctk.CTkFrame):
 
     def actualizar_precio_total(self):
         if not self.ot_seleccionada: return
-        nuevo_m = _clean_amount(self.entry_precio_total.get())
+        nuevo_m = clean_amount(self.entry_precio_total.get())
         if nuevo_m:
-            ot_n = self.ot_seleccionada.get('ot')
+            ot_n = self.ot_seleccionada.ot
             ok, msg = update_work_order_value(ot_n, nuevo_m)
             if ok:
-                self.ot_seleccionada['monto'] = nuevo_m
+                self.ot_seleccionada.monto = nuevo_m
                 # Invalidar cache para forzar recarga con datos frescos
-                self.detalle_cache.pop(str(ot_n), None)
+                self.detalle_cache.pop(ot_n, None)
                 self.refrescar_detalle()
                 self.actualizar_tabla()
             else:
@@ -470,16 +590,15 @@ class ModuloOTs(ctk.CTkFrame):
     def eliminar_pago(self, indice):
         if not self.ot_seleccionada:
             return
-        pagos = self.ot_seleccionada.get('pagos', [])
+        pagos = self.ot_seleccionada.pagos
         if indice < 0 or indice >= len(pagos):
             messagebox.showerror("Error", "Pago no encontrado en la lista.")
             return
-        pago = pagos[indice]
-        pago_id = pago.get('id')
+        pago_id = pagos[indice].id
         if not pago_id:
             # Fallback: si no hay id, pedir confirmación y eliminar localmente
             if messagebox.askyesno("Confirmar", "Pago sin id. ¿Eliminar localmente?"):
-                self.ot_seleccionada['pagos'].pop(indice)
+                pagos.pop(indice)
                 self.refrescar_detalle(); self.actualizar_tabla()
             return
         if not messagebox.askyesno("Confirmar", "¿Desea eliminar este registro de pago? Esta acción es irreversible."):
@@ -488,16 +607,16 @@ class ModuloOTs(ctk.CTkFrame):
         if ok:
             # Recargar detalle de la OT desde la DB
             try:
-                ok_det, detalle = get_work_order_by_ot(self.ot_seleccionada.get('ot'))
+                ok_det, detalle = get_work_order_by_ot(self.ot_seleccionada.ot)
                 if ok_det and detalle:
-                    self.ot_seleccionada['pagos'] = detalle.get('pagos', [])
-                    self.ot_seleccionada['abonado_total'] = detalle.get('abonado_total', self.ot_seleccionada.get('abonado_total', 0))
+                    self.ot_seleccionada.merge_detail(detalle)
+                    self.detalle_cache[self.ot_seleccionada.ot] = detalle
                 else:
                     # En caso de fallo, eliminar localmente
-                    self.ot_seleccionada['pagos'].pop(indice)
+                    pagos.pop(indice)
             except Exception:
                 try:
-                    self.ot_seleccionada['pagos'].pop(indice)
+                    pagos.pop(indice)
                 except Exception:
                     pass
             self.refrescar_detalle(); self.actualizar_tabla()
@@ -508,45 +627,35 @@ class ModuloOTs(ctk.CTkFrame):
         d = self.ot_seleccionada
         if not d:
             return
-        estado_texto = d.get('estado') or '---'
-        estado_lower = (estado_texto or '').lower()
+        estado_texto = d.estado or '---'
+        estado_lower = d.tag
         try:
-            self.lbl_ot_chip.configure(text=f"OT {d.get('ot')}")
+            self.lbl_ot_chip.configure(text=f"OT {d.ot}")
             self._update_estado_chip(estado_lower, estado_texto)
         except Exception:
             pass
-        self.lbl_vendedor.configure(text=d['vendedor'])
-        self.lbl_cliente.configure(text=d['cliente'])
-        self.lbl_desc.configure(text=d['descripcion'] or "---")
-        pago_actual = d.get('pago') or FORMA_PAGO_OPTIONS[0]
-        if pago_actual not in FORMA_PAGO_OPTIONS:
-            pago_actual = FORMA_PAGO_OPTIONS[0]
+        self.lbl_vendedor.configure(text=d.vendedor)
+        self.lbl_cliente.configure(text=d.cliente)
+        self.lbl_desc.configure(text=d.descripcion or "---")
+        pago_actual = d.forma_pago if d.forma_pago in FORMA_PAGO_OPTIONS else FORMA_PAGO_OPTIONS[0]
         self.lbl_pago.set(pago_actual)
-        envio_flag = bool(d.get('solicita_envio'))
-        self.lbl_envio.set(_envio_label_from_flag(envio_flag))
-        self.precio_total_var.set(_format_amount_text(d.get('monto')))
+        self.lbl_envio.set(d.envio)
+        self.precio_total_var.set(format_amount(d.monto))
 
         for w in self.container_historial.winfo_children(): w.destroy()
-        if d.get('abonado_total') is not None:
-            try:
-                abono = float(d.get('abonado_total') or 0)
-            except Exception:
-                abono = sum(p.get('m', 0) for p in d.get('pagos', []))
-        else:
-            abono = sum(p.get('m', 0) for p in d.get('pagos', []))
-        for i, p in enumerate(d.get('pagos', [])):
+        for i, p in enumerate(d.pagos):
             f = ctk.CTkFrame(self.container_historial, fg_color="white")
             f.pack(fill="x", pady=2, padx=5)
-            ctk.CTkLabel(f, text=f"📅 {p['f']}", font=("Arial", 10)).pack(side="left", padx=5)
-            ctk.CTkLabel(f, text=_format_gs(p.get('m')), font=("Arial", 10, "bold")).pack(side="left", padx=5)
+            ctk.CTkLabel(f, text=f"📅 {p.fecha}", font=("Arial", 10)).pack(side="left", padx=5)
+            ctk.CTkLabel(f, text=format_gs(p.monto), font=("Arial", 10, "bold")).pack(side="left", padx=5)
             btn_del = ctk.CTkButton(f, text="X", width=20, height=20, fg_color="#E74C3C", command=lambda idx=i: self.eliminar_pago(idx))
             btn_del.pack(side="right", padx=5)
 
-        self.lbl_total_view.configure(text=_format_gs(d.get('monto')))
-        self.lbl_abonado.configure(text=_format_gs(abono))
-        self.lbl_saldo.configure(text=_format_gs(d.get('monto', 0) - abono))
+        self.lbl_total_view.configure(text=format_gs(d.monto))
+        self.lbl_abonado.configure(text=format_gs(d.abonado))
+        self.lbl_saldo.configure(text=format_gs(d.saldo))
 
-        self._mostrar_fecha_entrega(d.get('fecha_entrega'), estado_lower)
+        self._mostrar_fecha_entrega(d.fecha_entrega, estado_lower)
         self._actualizar_boton_cancelar(estado_lower)
         
         if estado_lower == 'pendiente':
@@ -599,7 +708,7 @@ class ModuloOTs(ctk.CTkFrame):
     def _mostrar_fecha_entrega(self, raw_fecha, estado_lower):
         debe_mostrar = estado_lower in ('entregado', 'finalizado') and bool(raw_fecha)
         if debe_mostrar:
-            fecha_texto = _format_date_detail(raw_fecha) or "---"
+            fecha_texto = format_date(raw_fecha) or "---"
             self.lbl_fecha_entrega_val.configure(text=fecha_texto)
             if not self.frame_fecha_entrega.winfo_manager():
                 self.frame_fecha_entrega.pack(fill="x", pady=2)
@@ -631,9 +740,9 @@ class ModuloOTs(ctk.CTkFrame):
         solicita_envio = envio_label == ENVIO_OPTIONS[0]
 
         cambios = {}
-        if forma_pago != (self.ot_seleccionada.get('pago') or ""):
+        if forma_pago != self.ot_seleccionada.forma_pago:
             cambios['forma_pago'] = forma_pago
-        if bool(self.ot_seleccionada.get('solicita_envio')) != solicita_envio:
+        if self.ot_seleccionada.solicita_envio != solicita_envio:
             cambios['solicita_envio'] = solicita_envio
 
         # También verificar si el precio total fue modificado y persistirlo
@@ -642,8 +751,8 @@ class ModuloOTs(ctk.CTkFrame):
         nuevo_val = None
         try:
             if nuevo_text != '':
-                nuevo_val = _clean_amount(nuevo_text)
-                precio_actual = _to_int_amount(self.ot_seleccionada.get('monto'))
+                nuevo_val = clean_amount(nuevo_text)
+                precio_actual = self.ot_seleccionada.monto
                 if nuevo_val != precio_actual:
                     precio_cambiado = True
         except Exception:
@@ -657,19 +766,18 @@ class ModuloOTs(ctk.CTkFrame):
         errors = []
         # Primero persistir detalles (forma/envío) si hay cambios
         if cambios:
-            ok, msg = update_work_order_details(self.ot_seleccionada.get('ot'), cambios)
+            ok, msg = update_work_order_details(self.ot_seleccionada.ot, cambios)
             if ok:
-                self.ot_seleccionada['pago'] = forma_pago
-                self.ot_seleccionada['solicita_envio'] = solicita_envio
-                self.ot_seleccionada['envio'] = _envio_label_from_flag(solicita_envio)
+                self.ot_seleccionada.forma_pago = forma_pago
+                self.ot_seleccionada.solicita_envio = solicita_envio
             else:
                 errors.append(f"detalle: {msg}")
 
         # Luego persistir precio si cambió
         if precio_cambiado:
-            ok2, msg2 = update_work_order_value(self.ot_seleccionada.get('ot'), int(nuevo_val))
+            ok2, msg2 = update_work_order_value(self.ot_seleccionada.ot, int(nuevo_val))
             if ok2:
-                self.ot_seleccionada['monto'] = int(nuevo_val)
+                self.ot_seleccionada.monto = int(nuevo_val)
             else:
                 errors.append(f"precio: {msg2}")
 
@@ -677,7 +785,7 @@ class ModuloOTs(ctk.CTkFrame):
             messagebox.showerror("Error", f"Algunos cambios no se pudieron guardar: {'; '.join(errors)}")
         else:
             messagebox.showinfo("Actualizado", "Cambios guardados correctamente.")
-            self.detalle_cache.pop(str(self.ot_seleccionada.get('ot')), None)
+            self.detalle_cache.pop(self.ot_seleccionada.ot, None)
         self.refrescar_detalle(); self.actualizar_tabla()
 
     def abrir_ventana_pago(self):
@@ -686,26 +794,23 @@ class ModuloOTs(ctk.CTkFrame):
     def registrar_abono_final(self, m):
         if not self.ot_seleccionada:
             return
-        ot_n = self.ot_seleccionada.get('ot')
+        ot_n = self.ot_seleccionada.ot
         ok, msg = add_sena_to_order(ot_n, m)
         if ok:
             messagebox.showinfo("Abono registrado", msg)
             # Intentar recargar historial de abonos de la OT y refrescar detalle
             try:
                 ok_det, detalle = get_work_order_by_ot(ot_n)
-                if ok_det and detalle:
-                    self.ot_seleccionada['pagos'] = detalle.get('pagos', [])
-                    self.ot_seleccionada['abonado_total'] = detalle.get('abonado_total', self.ot_seleccionada.get('abonado_total', 0))
-                    self.detalle_cache[ot_n] = detalle
-                else:
-                    # Fallback: añadir en memoria si la consulta falla
-                    self.ot_seleccionada.setdefault('pagos', []).append({"m": m, "f": datetime.now().strftime("%d/%m/%y")})
-                # Refrescar vista y tabla
-                self.refrescar_detalle(); self.actualizar_tabla()
             except Exception:
-                # Fallback: mantener en memoria y actualizar UI
-                self.ot_seleccionada.setdefault('pagos', []).append({"m": m, "f": datetime.now().strftime("%d/%m/%y")})
-                self.refrescar_detalle(); self.actualizar_tabla()
+                ok_det, detalle = False, None
+            if ok_det and detalle:
+                self.ot_seleccionada.merge_detail(detalle)
+                self.detalle_cache[ot_n] = detalle
+            else:
+                # Fallback: el abono ya quedó registrado; reflejarlo en memoria
+                self.ot_seleccionada.pagos.insert(0, Abono(monto=float(m), fecha=datetime.now().strftime("%Y-%m-%d")))
+                self.ot_seleccionada.abonado += m
+            self.refrescar_detalle(); self.actualizar_tabla()
         else:
             messagebox.showerror("Error al registrar abono", f"No se pudo registrar abono: {msg}")
 
@@ -714,12 +819,11 @@ class ModuloOTs(ctk.CTkFrame):
         if not self.ot_seleccionada:
             messagebox.showinfo("Info", "Seleccione primero una OT para refrescar sus pagos.")
             return
-        ot_n = self.ot_seleccionada.get('ot')
+        ot_n = self.ot_seleccionada.ot
         try:
             ok_det, detalle = get_work_order_by_ot(ot_n)
             if ok_det and detalle:
-                self.ot_seleccionada['pagos'] = detalle.get('pagos', [])
-                self.ot_seleccionada['abonado_total'] = detalle.get('abonado_total', self.ot_seleccionada.get('abonado_total', 0))
+                self.ot_seleccionada.merge_detail(detalle)
                 self.detalle_cache[ot_n] = detalle
                 self.refrescar_detalle(); self.actualizar_tabla()
             else:
@@ -729,7 +833,7 @@ class ModuloOTs(ctk.CTkFrame):
 
     def cambiar_estado(self, nuevo_estado):
         if self.ot_seleccionada:
-            ot_n = self.ot_seleccionada.get('ot')
+            ot_n = self.ot_seleccionada.ot
             # Normalizar para la DB: usar Title-case exacto del ENUM
             try:
                 estado_db = str(nuevo_estado).strip().title()
@@ -738,8 +842,8 @@ class ModuloOTs(ctk.CTkFrame):
             ok, msg = update_work_order_status(ot_n, estado_db)
             if ok:
                 # Mantener la presentación en UI con Title-case
-                self.ot_seleccionada['estado'] = estado_db if isinstance(estado_db, str) else nuevo_estado
-                self.detalle_cache.pop(str(ot_n), None)
+                self.ot_seleccionada.estado = estado_db if isinstance(estado_db, str) else nuevo_estado
+                self.detalle_cache.pop(ot_n, None)
                 self.actualizar_tabla()
                 self.refrescar_detalle()
             else:
@@ -751,16 +855,16 @@ class ModuloOTs(ctk.CTkFrame):
                 return
             self._fmt_lock = True
             raw = "".join(ch for ch in var.get() if ch.isdigit())
-            var.set(_format_amount_text(raw) if raw else "")
+            var.set(format_amount(raw) if raw else "")
             self._fmt_lock = False
         try:
             var.trace_add("write", _on_change)
         except Exception:
             pass
     
-    def abrir_modal_entrega(self):
-        # Modal que pide fecha de entrega obligatoria
-        if not self.ot_seleccionada:
+    def abrir_modal_entrega(self, lote=None):
+        # Modal que pide fecha de entrega obligatoria (para la OT seleccionada o para `lote`)
+        if not self.ot_seleccionada and not lote:
             return
         win = ctk.CTkToplevel(self)
         win.title("Registrar Entrega")
@@ -807,11 +911,15 @@ class ModuloOTs(ctk.CTkFrame):
                 messagebox.showerror("Error", "Seleccione una fecha válida.")
                 return
             fecha_payload = fecha_obj.isoformat()
-            ok, msg = update_work_order_status(self.ot_seleccionada.get('ot'), 'Entregado', fecha_entrega=fecha_payload)
+            if lote:
+                win.destroy()
+                self.aplicar_estado_lote("Entregado", fecha_entrega=fecha_payload)
+                return
+            ok, msg = update_work_order_status(self.ot_seleccionada.ot, 'Entregado', fecha_entrega=fecha_payload)
             if ok:
-                self.ot_seleccionada['estado'] = 'Entregado'
-                self.ot_seleccionada['fecha_entrega'] = fecha_payload
-                self.detalle_cache.pop(str(self.ot_seleccionada.get('ot')), None)
+                self.ot_seleccionada.estado = 'Entregado'
+                self.ot_seleccionada.fecha_entrega = fecha_payload
+                self.detalle_cache.pop(self.ot_seleccionada.ot, None)
                 win.destroy()
                 self.actualizar_tabla()
                 self.refrescar_detalle()
@@ -829,7 +937,7 @@ class ModuloOTs(ctk.CTkFrame):
     def abrir_modal_cancelacion(self):
         if not self.ot_seleccionada:
             return
-        VentanaCancelacion(self, self.ot_seleccionada.get('ot'), self.confirmar_cancelacion)
+        VentanaCancelacion(self, self.ot_seleccionada.ot, self.confirmar_cancelacion)
 
     def confirmar_cancelacion(self, datos_cancelacion):
         admin_id = self.admin_context.get('id')
@@ -842,10 +950,11 @@ class ModuloOTs(ctk.CTkFrame):
         ok, msg = cancel_work_order(ot_nro, admin_id, motivo=motivo, reembolso=reembolso)
         if ok:
             for d in self.datos_ots:
-                if d.get('ot') == ot_nro:
-                    d['estado'] = 'Cancelado'
-            if self.ot_seleccionada and self.ot_seleccionada.get('ot') == ot_nro:
-                self.ot_seleccionada['estado'] = 'Cancelado'
+                if d.ot == str(ot_nro):
+                    d.estado = 'Cancelado'
+                    self._ots_frame.sync(d)
+            if self.ot_seleccionada and self.ot_seleccionada.ot == str(ot_nro):
+                self.ot_seleccionada.estado = 'Cancelado'
             self.detalle_cache.pop(str(ot_nro), None)
             messagebox.showinfo("Cancelada", "La orden fue cancelada correctamente.")
             self.actualizar_tabla()
@@ -865,17 +974,116 @@ class ModuloOTs(ctk.CTkFrame):
             if not manager:
                 self.btn_cancelar.pack(pady=5, fill="x", padx=10)
 
+    # --- ACCIONES EN LOTE ---
+
+    def _ots_seleccionadas(self):
+        ots = self.tabla.selection()
+        por_ot = dict(self._ots_remotas)
+        por_ot.update((d.ot, d) for d in self.datos_ots)
+        return [por_ot[ot] for ot in ots if ot in por_ot]
+
+    def _actualizar_barra_lote(self, sel):
+        if len(sel) > 1 and not self._lote_en_curso:
+            seleccion = self._ots_seleccionadas()
+            estados = {d.tag for d in seleccion}
+            self.lbl_lote.configure(text=f"{len(seleccion)} OTs seleccionadas")
+            for estado, _texto, _color, requerido in ACCIONES_LOTE:
+                aplicables = requerido.lower() in estados
+                self.botones_lote[estado].configure(state="normal" if aplicables else "disabled")
+            if not self.barra_lote.winfo_manager():
+                self.barra_lote.pack(fill="x", padx=15, pady=(0, 8), before=self._cont_tabla)
+        elif len(sel) <= 1 and not self._lote_en_curso:
+            if self.barra_lote.winfo_manager():
+                self.barra_lote.pack_forget()
+
+    def aplicar_estado_lote(self, nuevo_estado, fecha_entrega=None):
+        accion = next(a for a in ACCIONES_LOTE if a[0] == nuevo_estado)
+        requerido = accion[3]
+        seleccion = self._ots_seleccionadas()
+        aplicables = [d.ot for d in seleccion if d.tag == requerido.lower()]
+        omitidas = [d.ot for d in seleccion if d.ot not in aplicables]
+        if not aplicables:
+            messagebox.showinfo("Info", f"Ninguna de las OTs seleccionadas está en estado {requerido}.")
+            return
+        if nuevo_estado == "Entregado" and fecha_entrega is None:
+            self.abrir_modal_entrega(lote=aplicables)
+            return
+        aviso = f"\n({len(omitidas)} OTs no están en estado {requerido} y se omiten)" if omitidas else ""
+        # La entrega ya se confirmó en el modal de fecha
+        if fecha_entrega is None and not messagebox.askyesno("Confirmar", f"¿{accion[1]} {len(aplicables)} OTs?{aviso}"):
+            return
+        self._lote_en_curso = True
+        self.lbl_lote.configure(text=f"Actualizando {len(aplicables)} OTs…")
+        for btn in self.botones_lote.values():
+            btn.configure(state="disabled")
+        threading.Thread(target=self._aplicar_estado_lote_background,
+                         args=(aplicables, omitidas, nuevo_estado, requerido, fecha_entrega), daemon=True).start()
+
+    def _aplicar_estado_lote_background(self, ots, omitidas, nuevo_estado, requerido, fecha_entrega):
+        try:
+            resultados = update_work_orders_status(ots, nuevo_estado, fecha_entrega=fecha_entrega, from_status=requerido)
+        except Exception as exc:
+            resultados = {ot: (False, f"Error inesperado: {exc}") for ot in ots}
+        self.after(0, lambda: self._aplicar_resultados_lote(resultados, omitidas, nuevo_estado, requerido, fecha_entrega))
+
+    def _aplicar_resultados_lote(self, resultados, omitidas, nuevo_estado, requerido, fecha_entrega):
+        """Actualiza las OTs que cambiaron (cargadas o solo de la búsqueda en el servidor)
+        y redibuja la tabla una sola vez."""
+        self._lote_en_curso = False
+        if not self.winfo_exists():
+            return
+        ok_ots = {ot for ot, (ok, _msg) in resultados.items() if ok}
+        frame = self._ots_frame
+        for ot in ok_ots:
+            self.detalle_cache.pop(ot, None)
+            i = frame.index_of(ot)
+            d = frame.records[i] if i is not None else self._ots_remotas.get(ot)
+            if d is None:
+                continue
+            d.estado = nuevo_estado
+            if fecha_entrega:
+                d.fecha_entrega = fecha_entrega
+            frame.sync(d)
+        if nuevo_estado == "Rechazado":
+            # El admin no lista las rechazadas (tampoco entre los resultados del servidor)
+            frame.remove(ok_ots)
+            self._busqueda.results = [d for d in self._busqueda.results if d.ot not in ok_ots]
+        if self.ot_seleccionada and self.ot_seleccionada.ot in ok_ots and nuevo_estado == "Rechazado":
+            self.ot_seleccionada = None
+        self.actualizar_tabla()
+        self._actualizar_barra_lote(())
+        if self.ot_seleccionada:
+            self.refrescar_detalle()
+
+        fallidas = [(ot, msg) for ot, (ok, msg) in resultados.items() if not ok]
+        lineas = [f"{len(ok_ots)} OTs pasaron a {nuevo_estado}."]
+        if fallidas:
+            lineas.append("")
+            lineas.append("No se actualizaron:")
+            lineas.extend(f"  OT {ot}: {msg}" for ot, msg in fallidas[:15])
+            if len(fallidas) > 15:
+                lineas.append(f"  … y {len(fallidas) - 15} más")
+        if omitidas:
+            lineas.append("")
+            lineas.append(f"Omitidas (no estaban en estado {requerido}): " + ", ".join(omitidas[:20])
+                          + (" …" if len(omitidas) > 20 else ""))
+        if fallidas:
+            messagebox.showwarning("Resultado", "\n".join(lineas))
+        else:
+            messagebox.showinfo("Resultado", "\n".join(lineas))
+
     def rechazar_ot(self):
         if self.ot_seleccionada:
-            ot_nro = self.ot_seleccionada.get('ot')
+            ot_nro = self.ot_seleccionada.ot
             if messagebox.askyesno("Confirmar", f"¿Está seguro de rechazar la OT {ot_nro}? Esto marcará la OT como rechazada."):
                 ok, msg = update_work_order_status(ot_nro, 'Rechazado')
                 if ok:
                     # actualizar localmente y ocultarla del listado del admin
-                    self.ot_seleccionada['estado'] = 'Rechazado'
-                    self.datos_ots = [d for d in self.datos_ots if d.get('ot') != ot_nro]
+                    self.ot_seleccionada.estado = 'Rechazado'
+                    self._ots_frame.remove([ot_nro])
+                    self._busqueda.results = [d for d in self._busqueda.results if d.ot != ot_nro]
                     self.ot_seleccionada = None
-                    self.detalle_cache.pop(str(ot_nro), None)
+                    self.detalle_cache.pop(ot_nro, None)
                     self.actualizar_tabla()
                     # Limpiar textos de detalle
                     messagebox.showinfo("Rechazada", "La OT ha sido marcada como rechazada.")
@@ -0,0 +1,411 @@
+"""Variante asyncio de `supabase_service`.
+
+Todas las corrutinas corren en un único event loop en un hilo de fondo, con el cliente
+async de Supabase (`acreate_client`). Así varias consultas en vuelo no necesitan un hilo
+del sistema cada una, y el fan-out se escribe con `asyncio.gather`.
+
+Desde Tk:
+
+    run_in_tk(self, get_work_order_by_ot(ot_nro), self._apply_detalle)
+
+Desde código sincrónico (scripts, pruebas):
+
+    ok, ots = run_sync(get_all_work_orders())
+
+Las funciones de lectura más usadas por la UI están implementadas en forma nativa y
+devuelven lo mismo que su par sincrónico. El resto de las funciones públicas de
+`supabase_service` también se pueden pedir acá (`async_service.insert_client(...)`):
+devuelven una corrutina que corre la versión sincrónica en un pool chico de hilos.
+
+Con `PLOTMASTER_BACKEND=local` las consultas van al backend SQLite desde ese mismo pool.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import os
+import sys
+import threading
+
+from plotmaster.core.services import supabase_service as _sync
+from plotmaster.core.services.resilience import CallPolicy
+from plotmaster.core.services.supabase_service import (
+    OT_PAGE_SIZE,
+    SEARCH_LIMIT,
+    _clientes_cache,
+    _usuarios_cache,
+)
+from plotmaster.core.services.transport import HTTP_MAX_CONCURRENCY, create_async_http_client
+from plotmaster.core.utils import tracing
+
+# Cada cuánto el puente de Tk revisa si terminó una corrutina
+TK_POLL_INTERVAL_MS = 30
+# Hilos para las funciones sin versión nativa y para el backend local
+_FALLBACK_WORKERS = 4
+
+_NO_CONNECTION = "No hay conexión con la base de datos."
+
+
+# --- EVENT LOOP DE FONDO ---
+
+class AsyncRuntime:
+    """Event loop propio en un hilo daemon; se arranca la primera vez que se usa."""
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                ready = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(ready,), name="plotmaster-asyncio", daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    def _run(self, ready):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.set_default_executor(
+            concurrent.futures.ThreadPoolExecutor(_FALLBACK_WORKERS, thread_name_prefix="plotmaster-async-sync")
+        )
+        ready.set()
+        self._loop.run_forever()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Agenda `coro` en el loop de fondo; se puede llamar desde cualquier hilo."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+_runtime = AsyncRuntime()
+
+
+def submit(coro) -> concurrent.futures.Future:
+    return _runtime.submit(coro)
+
+
+def run_sync(coro, timeout: float = None):
+    """Corre `coro` en el loop de fondo y espera el resultado (no usar desde el hilo de Tk)."""
+    return submit(coro).result(timeout)
+
+
+def run_in_tk(widget, coro, on_done, on_error=None, interval_ms: int = TK_POLL_INTERVAL_MS):
+    """Corre `coro` en el loop de fondo y entrega el resultado en el hilo de Tk.
+
+    `on_done(resultado)` se llama vía `widget.after`. Si el widget se destruye antes,
+    la corrutina se cancela. Retorna el `Future` (se puede cancelar con `.cancel()`).
+    """
+    future = submit(coro)
+
+    def _poll():
+        try:
+            alive = bool(widget.winfo_exists())
+        except Exception:
+            alive = False
+        if not alive:
+            future.cancel()
+            return
+        if not future.done():
+            widget.after(interval_ms, _poll)
+            return
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            if on_error is not None:
+                on_error(exc)
+            else:
+                print(f"Error en tarea async: {exc}")
+            return
+        on_done(future.result())
+
+    widget.after(interval_ms, _poll)
+    return future
+
+
+# --- CLIENTE ASYNC ---
+
+class _State:
+    """Cliente, semáforo y política; se crean dentro del loop de fondo."""
+    client = None
+    semaphore = None
+    policy = None
+    local = False
+    lock = None
+
+
+async def _get_client():
+    if _State.lock is None:
+        _State.lock = asyncio.Lock()
+    async with _State.lock:
+        if _State.client is None:
+            _State.semaphore = asyncio.Semaphore(HTTP_MAX_CONCURRENCY)
+            # Mismo breaker que el servicio sincrónico: un solo estado de conexión para la UI
+            sync_policy = getattr(_sync.supabase, 'policy', None)
+            _State.policy = CallPolicy(breaker=sync_policy.breaker) if sync_policy else CallPolicy()
+            _State.client = await _create_client()
+    return _State.client
+
+
+async def _create_client():
+    backend = (os.environ.get("PLOTMASTER_BACKEND") or "supabase").strip().lower()
+    if backend in ("local", "sqlite"):
+        # SQLite no tiene cliente async: se usa el mismo cliente local desde el pool de hilos
+        _State.local = True
+        return getattr(_sync.supabase, 'unwrapped', _sync.supabase)
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        return None
+    try:
+        from supabase import AsyncClientOptions, acreate_client
+        return await acreate_client(url, key, options=AsyncClientOptions(httpx_client=create_async_http_client()))
+    except Exception as e:
+        print(f"Error al crear el cliente async de Supabase: {e}")
+        return None
+
+
+async def _execute(query, idempotent: bool = True):
+    """`.execute()` con límite de concurrencia, plazo, reintentos (lecturas) y breaker."""
+    async def _attempt():
+        async with _State.semaphore:
+            if _State.local or not inspect.iscoroutinefunction(query.execute):
+                return await asyncio.get_running_loop().run_in_executor(None, query.execute)
+            return await query.execute()
+    return await _State.policy.acall(_attempt, idempotent=idempotent)
+
+
+# --- LECTURAS NATIVAS ---
+# Consulta y procesado de la respuesta son los de `supabase_service` (`_*_query` /
+# `_*_result`); acá solo cambia que el `.execute()` se espera en el loop.
+
+async def find_client_by_ci_ruc(ci_ruc: str):
+    client = await _get_client()
+    if not client: return None
+    try:
+        return _sync._client_by_ci_ruc_result(ci_ruc, await _execute(_sync._client_by_ci_ruc_query(client, ci_ruc)))
+    except Exception as e:
+        print(f"Error al buscar cliente: {e}")
+        return None
+
+
+async def get_client_id_by_ci_ruc(ci_ruc: str):
+    client = await _get_client()
+    if not client: return None
+    found, cid = _clientes_cache.lookup(('ci_ruc', ci_ruc))
+    if found:
+        return cid
+    try:
+        return _sync._client_id_result(ci_ruc, await _execute(_sync._client_id_query(client, ci_ruc)))
+    except Exception as e:
+        print(f"Error al obtener id de cliente: {e}")
+        return None
+
+
+async def _rows_by_ids(cache, table, ids):
+    client = await _get_client()
+    if not client or not ids: return {}
+    result, missing = cache.get_many(ids)
+    if not missing:
+        return result
+    try:
+        response = await _execute(_sync._rows_by_ids_query(client, table, missing))
+        return _sync._rows_by_ids_result(cache, missing, result, response)
+    except Exception as e:
+        print(f"Error al obtener {table} por ids: {e}")
+        return result
+
+
+async def get_clients_by_ids(ids: list):
+    return await _rows_by_ids(_clientes_cache, 'clientes', ids)
+
+
+async def get_users_by_ids(ids: list):
+    return await _rows_by_ids(_usuarios_cache, 'usuarios', ids)
+
+
+async def get_all_clients():
+    client = await _get_client()
+    if not client: return False, _NO_CONNECTION
+    try:
+        return True, _sync._clients_result(await _execute(_sync._all_clients_query(client)))
+    except Exception as e:
+        print(f"Error al obtener clientes: {e}")
+        return False, f"Error inesperado al obtener clientes: {e}"
+
+
+async def get_all_users():
+    client = await _get_client()
+    if not client: return False, _NO_CONNECTION
+    try:
+        return True, _sync._users_result(await _execute(_sync._all_users_query(client)))
+    except Exception as e:
+        print(f"Error al obtener usuarios: {e}")
+        return False, f"Error inesperado al obtener usuarios: {e}"
+
+
+async def _resolve_vendedor_id(vendedor):
+    # La resolución por CI/RUC usa la cache compartida; sin cache va al pool de hilos
+    return await asyncio.get_running_loop().run_in_executor(None, _sync._resolve_vendedor_id, vendedor)
+
+
+async def iter_work_orders(vendedor=None, page_size: int = OT_PAGE_SIZE, vendedor_id=None, as_records: bool = False):
+    """Generador async de páginas `(True, filas)` / `(False, mensaje)`, igual que la versión sincrónica."""
+    client = await _get_client()
+    if not client:
+        yield False, _NO_CONNECTION
+        return
+    page_size = max(1, int(page_size or OT_PAGE_SIZE))
+    if vendedor_id is None and vendedor is not None:
+        vendedor_id = await _resolve_vendedor_id(vendedor)
+        if vendedor_id is None:
+            yield True, []
+            return
+    last_ot = None
+    while True:
+        try:
+            response = await _execute(_sync._work_orders_page_query(client, vendedor_id, last_ot, page_size))
+            rows = response.data or []
+            page = _sync._work_orders_result(rows, as_records)
+        except Exception as e:
+            print(f"Error al obtener página de órdenes de trabajo: {e}")
+            yield False, f"Error inesperado al obtener las órdenes de trabajo: {e}"
+            return
+        yield True, page
+        if len(rows) < page_size:
+            return
+        last_ot = rows[-1].get('ot_nro')
+
+
+async def _collect_work_orders(vendedor=None, vendedor_id=None):
+    data = []
+    async for ok, page in iter_work_orders(vendedor=vendedor, vendedor_id=vendedor_id):
+        if not ok:
+            return False, page
+        data.extend(page)
+    return True, data
+
+
+async def get_all_work_orders():
+    return await _collect_work_orders()
+
+
+async def get_work_orders_by_vendedor(vendedor: str = None, vendedor_id=None):
+    return await _collect_work_orders(vendedor=vendedor, vendedor_id=vendedor_id)
+
+
+async def get_work_order_by_ot(ot_nro):
+    client = await _get_client()
+    if not client: return False, _NO_CONNECTION
+    try:
+        return True, _sync._work_order_detail_result(await _execute(_sync._work_order_detail_query(client, ot_nro)))
+    except Exception as e:
+        print(f"Error al obtener OT: {e}")
+        return False, f"Error inesperado al obtener la OT: {e}"
+
+
+async def get_work_orders_by_client(ci_ruc: str, as_records: bool = False):
+    client = await _get_client()
+    if not client: return False, _NO_CONNECTION
+    try:
+        cid = await get_client_id_by_ci_ruc(ci_ruc)
+        if cid is None:
+            return True, []
+        response = await _execute(_sync._client_work_orders_query(client, cid))
+        return True, _sync._client_work_orders_result(ci_ruc, response, as_records)
+    except Exception as e:
+        print(f"Error al obtener OTs por cliente: {e}")
+        return False, f"Error inesperado al obtener OTs: {e}"
+
+
+async def search_work_orders(query: str, status: str = None, limit: int = SEARCH_LIMIT, vendedor=None, vendedor_id=None,
+                             as_records: bool = False):
+    client = await _get_client()
+    if not client: return False, _NO_CONNECTION
+    texto = str(query or '').strip()
+    if not texto:
+        return True, []
+    try:
+        if vendedor_id is None and vendedor is not None:
+            vendedor_id = await _resolve_vendedor_id(vendedor)
+            if vendedor_id is None:
+                return True, []
+        response = await _execute(_sync._search_work_orders_query(client, texto, status, limit, vendedor_id))
+        return True, _sync._work_orders_result(response.data or [], as_records)
+    except Exception as e:
+        print(f"Error al buscar OTs: {e}")
+        return False, f"Error inesperado al buscar OTs: {e}"
+
+
+async def search_clients(query: str, limit: int = SEARCH_LIMIT):
+    client = await _get_client()
+    if not client: return False, _NO_CONNECTION
+    texto = str(query or '').strip()
+    if not texto:
+        return True, []
+    try:
+        return True, _sync._clients_result(await _execute(_sync._search_clients_query(client, texto, limit)))
+    except Exception as e:
+        print(f"Error al buscar clientes: {e}")
+        return False, f"Error inesperado al buscar clientes: {e}"
+
+
+# --- FAN-OUT ---
+
+async def get_work_orders_by_ots(ot_nros):
+    """Detalle de varias OTs en paralelo: `{ot_nro: (ok, detalle)}`."""
+    ot_nros = list(dict.fromkeys(ot_nros))
+    results = await asyncio.gather(*(get_work_order_by_ot(n) for n in ot_nros))
+    return dict(zip(ot_nros, results))
+
+
+async def get_client_overview(ci_ruc: str):
+    """Datos del cliente y su historial de OTs pedidos a la vez.
+
+    Retorna `(True, {'cliente': Client | None, 'ots': [...]})` o `(False, mensaje)`.
+    """
+    cliente, (ok, ots) = await asyncio.gather(find_client_by_ci_ruc(ci_ruc), get_work_orders_by_client(ci_ruc))
+    if not ok:
+        return False, ots
+    return True, {'cliente': cliente, 'ots': ots}
+
+
+# --- ESCRITURAS ---
+
+async def update_work_order_status(ot_nro, status, fecha_entrega=None):
+    client = await _get_client()
+    if not client: return False, _NO_CONNECTION
+    try:
+        response = await _execute(_sync._status_update_query(client, ot_nro, status, fecha_entrega), idempotent=False)
+        return _sync._status_update_result(response)
+    except Exception as e:
+        print(f"Error al actualizar estado OT: {e}")
+        return False, f"Error al actualizar estado: {e}"
+    finally:
+        # Las lecturas sincrónicas en vuelo no deben devolver el estado anterior
+        _sync._reads.bump()
+
+
+tracing.instrument_module(sys.modules[__name__], exclude=('submit', 'run_sync', 'run_in_tk'))
+
+
+# --- RESTO DE LA API: VERSIÓN SINCRÓNICA EN EL POOL DE HILOS ---
+
+def _to_thread(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
+    return wrapper
+
+
+def __getattr__(name):
+    fn = getattr(_sync, name, None) if not name.startswith('_') else None
+    if fn is None or not callable(fn) or inspect.isclass(fn):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    wrapper = _to_thread(fn)
+    globals()[name] = wrapper
+    return wrapper
@@ -0,0 +1,134 @@
+"""Autenticación y registro fuera del hilo de Tk.
+
+El login hace un round trip y un PBKDF2 de ~100k iteraciones; corrido en el hilo de la
+UI congela la ventana. `AuthTask` ejecuta la operación en un hilo de fondo y deja el
+avance y el resultado en una cola que la vista consulta con `after` (Tk no es seguro
+para llamar desde otros hilos).
+
+    task = login_user(ci, contrasena)
+    task.watch(self, on_progress=..., on_done=lambda ok, result: ...)
+    ...
+    task.cancel()   # el resultado ya no se entrega
+
+La cancelación se revisa entre pasos (búsqueda, hash, escritura): un PBKDF2 en curso no
+se interrumpe, pero su resultado se descarta.
+"""
+import queue
+import threading
+
+from plotmaster.core.services.supabase_service import (
+    CANCELLED_MESSAGE,
+    authenticate_user,
+    create_admin,
+    create_user,
+    verify_admin_credentials,
+)
+
+# Cada cuánto la vista revisa la cola de eventos
+POLL_INTERVAL_MS = 50
+
+
+class AuthTask:
+    """Corre `fn(*args, progress=..., cancelled=..., **kwargs)` en un hilo de fondo.
+
+    `fn` debe retornar `(ok, resultado)` como el resto de los servicios.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._events = queue.Queue()
+        self._cancel = threading.Event()
+        self._thread = None
+        self._finished = threading.Event()
+        self.result = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self._finished.is_set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _progress(self, mensaje, fraccion):
+        self._events.put(('progress', (mensaje, fraccion)))
+
+    def _run(self):
+        try:
+            result = self._fn(*self._args, progress=self._progress, cancelled=self._cancel.is_set, **self._kwargs)
+        except Exception as e:
+            print(f"Error en operación de autenticación: {e}")
+            result = (False, f"Error inesperado: {e}")
+        if self.cancelled:
+            result = (False, CANCELLED_MESSAGE)
+        self.result = result
+        self._finished.set()
+        self._events.put(('done', result))
+
+    def poll(self):
+        """Vacía la cola: lista de `('progress', (mensaje, fraccion))` / `('done', (ok, resultado))`."""
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def watch(self, widget, on_progress=None, on_done=None, interval_ms: int = POLL_INTERVAL_MS):
+        """Consulta la cola desde el hilo de Tk con `widget.after` hasta terminar.
+
+        Si se canceló no se llama a `on_done`; si el widget se destruye, se cancela.
+        """
+        def _tick():
+            try:
+                alive = bool(widget.winfo_exists())
+            except Exception:
+                alive = False
+            if not alive:
+                # Widget destruido: nadie va a mostrar el resultado
+                self.cancel()
+                return
+            finished = None
+            for kind, payload in self.poll():
+                if kind == 'progress':
+                    if on_progress is not None and not self.cancelled:
+                        on_progress(*payload)
+                else:
+                    finished = payload
+            if finished is not None:
+                if on_done is not None and not self.cancelled:
+                    on_done(*finished)
+                return
+            widget.after(interval_ms, _tick)
+        self.start()
+        widget.after(interval_ms, _tick)
+        return self
+
+
+def login_user(ci_ruc: str, password: str) -> AuthTask:
+    """Login de vendedor en segundo plano; `on_done(ok, UserSession | mensaje)`."""
+    return AuthTask(authenticate_user, ci_ruc, password)
+
+
+def login_admin(ci_ruc: str, password: str) -> AuthTask:
+    """Login de administrador en segundo plano; `on_done(ok, dict | mensaje)`."""
+    return AuthTask(verify_admin_credentials, ci_ruc, password)
+
+
+def register_user(nombre: str, ci_ruc: str, password: str, email: str = None) -> AuthTask:
+    return AuthTask(create_user, nombre, ci_ruc, password, email)
+
+
+def register_admin(nombre: str, ci_ruc: str, password: str, email: str = None) -> AuthTask:
+    return AuthTask(create_admin, nombre, ci_ruc, password, email)
@@ -0,0 +1,676 @@
+"""Importación masiva de clientes y OTs históricas desde CSV o XLSX.
+
+Las filas se leen de a una (la planilla nunca se carga entera), se validan y normalizan
+por lotes (CI/RUC, zonas de `ciudades_central`, `forma_pagos`, `ordenes_estados`,
+montos en Gs. y fechas), las claves foráneas de cada lote se resuelven con una consulta
+`in` y se escriben con un upsert por lote (`on_conflict` = `ci_ruc` / `ot_nro`).
+Las OTs que ya existen no se tocan salvo que se pida (`on_existing='update'`): un número
+histórico que cae en el rango vivo pisaría estado, cliente y montos de una OT real.
+
+- Checkpoint: después de cada lote se guarda la última fila escrita en
+  `<archivo>.import.json`; si la importación se corta, la siguiente corrida sigue desde
+  ahí (el upsert hace que repetir un lote no duplique nada).
+- Reporte de errores: las filas rechazadas van a `<archivo>.errores.csv` con la fila,
+  la columna, el motivo y los valores originales, para corregirlas y volver a importar.
+
+Uso:
+
+    python -m plotmaster.core.services.bulk_import clientes clientes.xlsx
+    python -m plotmaster.core.services.bulk_import ots historico.csv --estado Finalizado
+    python -m plotmaster.core.services.bulk_import ots correcciones.csv --actualizar-existentes
+"""
+import argparse
+import csv
+import json
+import os
+import re
+from datetime import date, datetime
+
+try:
+    from openpyxl import load_workbook
+except ImportError:  # pragma: no cover - dependencia opcional
+    load_workbook = None
+
+from plotmaster.core.services import supabase_service as _svc
+from plotmaster.core.services.resilience import TRANSIENT_ERRORS
+from plotmaster.core.utils.search_index import fold
+
+# Filas por lote (validación + un upsert)
+IMPORT_CHUNK_SIZE = 500
+
+ZONAS = (
+    'Areguá', 'Asunción', 'Capiatá', 'Fernando de la Mora', 'Guarambaré', 'Itá', 'Itauguá',
+    'J. Augusto Saldívar', 'Lambaré', 'Limpio', 'Luque', 'Mariano Roque Alonso', 'Nueva Italia',
+    'Ñemby', 'San Antonio', 'San Lorenzo', 'Villa Elisa', 'Villeta', 'Ypané', 'Ypacaraí', 'Otro',
+)
+FORMAS_PAGO = ('Crédito', 'Contado')
+ESTADOS_OT = ('Rechazado', 'Pendiente', 'Aprobado', 'Entregado', 'Finalizado', 'Cancelado')
+
+# Encabezados aceptados por campo (se comparan sin tildes ni mayúsculas)
+_COLUMNAS_CLIENTES = {
+    'nombre': ('nombre', 'razon social', 'cliente', 'nombre cliente'),
+    'ci_ruc': ('ci ruc', 'ci', 'ruc', 'ci/ruc', 'documento', 'cedula'),
+    'telefono': ('telefono', 'tel', 'celular', 'movil'),
+    'zona': ('zona', 'ciudad', 'localidad'),
+    'email': ('email', 'correo', 'e-mail', 'mail'),
+}
+_COLUMNAS_OTS = {
+    'ot_nro': ('ot nro', 'ot', 'nro ot', 'n ot', 'numero', 'nro'),
+    'fecha_creacion': ('fecha', 'fecha creacion'),
+    'cliente': ('cliente', 'ci cliente', 'ci ruc', 'ci/ruc', 'cliente ci ruc', 'ruc cliente'),
+    'vendedor': ('vendedor', 'ci vendedor', 'vendedor ci ruc'),
+    'descripcion': ('descripcion', 'detalle', 'trabajo'),
+    'valor_total': ('valor total', 'valor', 'total', 'monto', 'precio'),
+    'sena': ('sena', 'anticipo'),
+    'abonado_total': ('abonado total', 'abonado', 'pagado'),
+    'forma_pago': ('forma pago', 'forma de pago', 'pago'),
+    'status': ('estado', 'status'),
+    'solicita_envio': ('solicita envio', 'envio', 'delivery'),
+    'fecha_entrega': ('fecha entrega', 'entregado el'),
+}
+
+_CI_RE = re.compile(r'^\d{3,12}(-\d)?$')
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+_DECIMALES_RE = re.compile(r'^(\d+)[.,](\d{1,2})$')
+_FORMATOS_FECHA = ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%y', '%d.%m.%Y')
+_SI = ('si', 's', 'x', 'true', '1', 'yes', 'envio', 'con envio')
+_NO = ('no', 'n', 'false', '0', 'retira', 'sin envio')
+
+
+def _texto_clave(value) -> str:
+    """`fold` de las planillas con espacios simples y la ñ como n ("Seña", "Ñemby")."""
+    return ' '.join(fold(value).replace('ñ', 'n').replace('_', ' ').split())
+
+
+_ZONAS_POR_CLAVE = {_texto_clave(z): z for z in ZONAS}
+_ESTADOS_POR_CLAVE = {_texto_clave(e): e for e in ESTADOS_OT}
+
+
+def _texto(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+# --- NORMALIZACIÓN DE CAMPOS (levantan ValueError con el motivo) ---
+
+def normalize_ci_ruc(value) -> str:
+    """`'1.234.567'` -> `'1234567'`, `'80012345 - 6'` -> `'80012345-6'`."""
+    text = re.sub(r'[\s.]', '', _texto(value)).upper()
+    if not text:
+        raise ValueError("CI/RUC vacío.")
+    if not _CI_RE.match(text):
+        raise ValueError(f"CI/RUC inválido: '{value}'.")
+    return text
+
+
+def normalize_zona(value):
+    """Zona de `ciudades_central`; vacía -> None, ciudades fuera de Central -> 'Otro'."""
+    clave = _texto_clave(value)
+    if not clave:
+        return None
+    return _ZONAS_POR_CLAVE.get(clave, 'Otro')
+
+
+def normalize_forma_pago(value):
+    clave = _texto_clave(value)
+    if not clave:
+        return None
+    if clave.startswith('cred'):
+        return 'Crédito'
+    if clave in ('contado', 'efectivo', 'cash'):
+        return 'Contado'
+    raise ValueError(f"Forma de pago desconocida: '{value}' (Crédito o Contado).")
+
+
+def parse_estado(value, default='Pendiente'):
+    """Estado de la OT; a diferencia de `records.normalize_estado`, uno desconocido es un error."""
+    clave = _texto_clave(value)
+    if not clave:
+        return default
+    if clave in _ESTADOS_POR_CLAVE:
+        return _ESTADOS_POR_CLAVE[clave]
+    raise ValueError(f"Estado desconocido: '{value}'.")
+
+
+def parse_monto(value, requerido=False) -> int:
+    """Monto en Gs. (sin decimales): acepta `1.500.000`, `1,500,000`, `Gs. 1500000` o números."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        monto = int(round(value))
+    else:
+        text = _texto(value).lower().replace('gs', '').replace('₲', '').replace(' ', '').strip('.')
+        if not text:
+            if requerido:
+                raise ValueError("Monto vacío.")
+            return 0
+        dec = _DECIMALES_RE.match(text)
+        if dec:
+            # "1500000.0" de una exportación: la parte decimal no son miles; se redondea
+            # igual que una celda numérica ("1,50" y 1.5 dan lo mismo)
+            monto = int(round(float(f"{dec.group(1)}.{dec.group(2)}")))
+        else:
+            text = text.replace('.', '').replace(',', '')
+            if not text.isdigit():
+                raise ValueError(f"Monto inválido: '{value}'.")
+            monto = int(text)
+    if monto < 0:
+        raise ValueError(f"Monto negativo: '{value}'.")
+    return monto
+
+
+def parse_fecha(value, requerido=False):
+    """Fecha ISO (`YYYY-MM-DD`) desde celdas de fecha o textos `dd/mm/aaaa`, `aaaa-mm-dd`..."""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = _texto(value).replace('T', ' ').split(' ')[0]
+    if not text:
+        if requerido:
+            raise ValueError("Fecha vacía.")
+        return None
+    for fmt in _FORMATOS_FECHA:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Fecha inválida: '{value}'.")
+
+
+def parse_envio(value) -> bool:
+    clave = _texto_clave(value)
+    if not clave or clave in _NO:
+        return False
+    if clave in _SI:
+        return True
+    raise ValueError(f"Envío inválido: '{value}' (Sí/No).")
+
+
+def _normalize_cliente(raw: dict):
+    """Fila de planilla -> (payload para `clientes`, clave, [(columna, motivo)])."""
+    payload, errores = {}, []
+
+    def _campo(nombre, fn):
+        try:
+            payload[nombre] = fn(raw.get(nombre))
+        except ValueError as e:
+            errores.append((nombre, str(e)))
+
+    _campo('ci_ruc', normalize_ci_ruc)
+    _campo('nombre', lambda v: _texto(v) or _raise("Nombre vacío."))
+    _campo('telefono', lambda v: _texto(v) or _raise("Teléfono vacío."))
+    _campo('zona', normalize_zona)
+    _campo('email', _email)
+    return payload, payload.get('ci_ruc'), errores
+
+
+def _email(value):
+    text = _texto(value).lower()
+    if not text:
+        return None
+    if not _EMAIL_RE.match(text):
+        raise ValueError(f"Email inválido: '{value}'.")
+    return text
+
+
+def _raise(mensaje):
+    raise ValueError(mensaje)
+
+
+def _ot_nro(value) -> int:
+    text = _texto(value).lstrip('#')
+    if not text.isdigit() or int(text) <= 0:
+        raise ValueError(f"Número de OT inválido: '{value}'.")
+    return int(text)
+
+
+# --- LECTURA ---
+
+def _detect_encoding(path) -> str:
+    with open(path, 'rb') as f:
+        sample = f.read(64 * 1024)
+    try:
+        sample.decode('utf-8')
+        return 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        # Un corte al final de la muestra no es un error de codificación
+        return 'utf-8-sig' if e.start >= len(sample) - 4 else 'cp1252'
+
+
+def iter_rows(path, hoja=None):
+    """Genera `(nro_fila, encabezados, valores)` fila por fila; `nro_fila` es el de la planilla."""
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext in ('.xlsx', '.xlsm'):
+        yield from _iter_xlsx(path, hoja)
+    else:
+        yield from _iter_csv(path)
+
+
+def _iter_csv(path):
+    encoding = _detect_encoding(path)
+    with open(path, newline='', encoding=encoding) as f:
+        sample = f.read(16 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        headers = next(reader, None)
+        if headers is None:
+            return
+        for nro, values in enumerate(reader, start=2):
+            yield nro, headers, values
+
+
+def _iter_xlsx(path, hoja=None):
+    if load_workbook is None:
+        raise RuntimeError("Instala 'openpyxl' para importar archivos Excel.")
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[hoja] if hoja else wb.active
+        headers = None
+        for nro, values in enumerate(ws.iter_rows(values_only=True), start=1):
+            if headers is None:
+                if any(v not in (None, '') for v in values):
+                    headers = [_texto(v) for v in values]
+                continue
+            yield nro, headers, list(values)
+    finally:
+        wb.close()
+
+
+def _map_headers(headers, columnas):
+    """`{campo: índice}` a partir de los encabezados de la planilla."""
+    alias = {}
+    for campo, nombres in columnas.items():
+        for nombre in nombres:
+            alias.setdefault(_texto_clave(nombre), campo)
+    indices = {}
+    for i, header in enumerate(headers):
+        campo = alias.get(_texto_clave(header).replace('.', '').replace('º', '').replace('°', '').strip())
+        if campo and campo not in indices:
+            indices[campo] = i
+    return indices
+
+
+# --- IMPORTACIÓN ---
+
+class ImportJob:
+    """Importación de un archivo (`tipo` = 'clientes' u 'ots') con checkpoint y reporte de errores.
+
+    `on_existing='update'` actualiza las filas que ya existen (mismo CI/RUC u OT);
+    `'skip'` las deja como están. Por defecto los clientes se actualizan y las OTs no:
+    cada OT existente se omite y queda en el reporte de errores. En OTs,
+    `estado_por_defecto` se usa cuando la planilla no trae estado y `vendedor_por_defecto`
+    (CI/RUC o nombre) cuando no trae vendedor.
+    """
+
+    TIPOS = ('clientes', 'ots')
+
+    def __init__(self, tipo: str, path, hoja=None, chunk_size: int = IMPORT_CHUNK_SIZE, on_existing: str = None,
+                 estado_por_defecto: str = 'Pendiente', vendedor_por_defecto=None,
+                 checkpoint_path=None, errores_path=None):
+        if tipo not in self.TIPOS:
+            raise ValueError(f"Tipo de importación desconocido: {tipo}")
+        self.tipo = tipo
+        self.path = os.path.abspath(str(path))
+        self.hoja = hoja
+        self.chunk_size = max(1, int(chunk_size))
+        if on_existing is None:
+            on_existing = 'update' if tipo == 'clientes' else 'skip'
+        if on_existing not in ('update', 'skip'):
+            raise ValueError(f"on_existing desconocido: {on_existing}")
+        self.skip_existing = on_existing == 'skip'
+        self.estado_por_defecto = parse_estado(estado_por_defecto)
+        self.vendedor_por_defecto = _texto(vendedor_por_defecto) or None
+        self.checkpoint_path = checkpoint_path or self.path + '.import.json'
+        self.errores_path = errores_path or self.path + '.errores.csv'
+        self.tabla = 'clientes' if tipo == 'clientes' else 'ordenes_trabajo'
+        self.clave = 'ci_ruc' if tipo == 'clientes' else 'ot_nro'
+        self._columnas = _COLUMNAS_CLIENTES if tipo == 'clientes' else _COLUMNAS_OTS
+        self._indices = {}
+        self._headers = []
+        self._cliente_ids = {}
+        self._vendedor_ids = {}
+        self._errores_file = None
+        self._errores_writer = None
+        self._reanudado = False
+        self.resumen = self._resumen_vacio()
+
+    @staticmethod
+    def _resumen_vacio():
+        return {'fila': 1, 'leidas': 0, 'escritas': 0, 'omitidas': 0, 'errores': 0, 'completo': False,
+                'reporte_errores': None}
+
+    # Checkpoint -------------------------------------------------------------
+    def _firma(self):
+        st = os.stat(self.path)
+        return {'tipo': self.tipo, 'archivo': self.path, 'hoja': self.hoja, 'tamano': st.st_size,
+                'modificado': int(st.st_mtime)}
+
+    def _cargar_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('firma') != self._firma():
+            print(f"Checkpoint ignorado: el archivo cambió desde la última corrida ({self.checkpoint_path}).")
+            return False
+        self.resumen.update(data.get('resumen') or {})
+        return True
+
+    def _guardar_checkpoint(self):
+        tmp = self.checkpoint_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'firma': self._firma(), 'resumen': self.resumen}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.checkpoint_path)
+
+    def _borrar_checkpoint(self):
+        try:
+            os.remove(self.checkpoint_path)
+        except OSError:
+            pass
+
+    # Reporte de errores -----------------------------------------------------
+    def _reportar(self, nro, valores, errores, contar='errores'):
+        if self._errores_writer is None:
+            # Al reanudar se agrega al reporte de la corrida anterior
+            append = self._reanudado and os.path.exists(self.errores_path)
+            self._errores_file = open(self.errores_path, 'a' if append else 'w', newline='', encoding='utf-8-sig')
+            self._errores_writer = csv.writer(self._errores_file)
+            if not append:
+                self._errores_writer.writerow(['fila', 'columna', 'error'] + list(self._headers))
+            self.resumen['reporte_errores'] = self.errores_path
+        originales = [_texto(v) for v in valores]
+        for columna, motivo in errores:
+            self._errores_writer.writerow([nro, columna, motivo] + originales)
+        self.resumen[contar] += 1
+
+    def _recortar_reporte(self, hasta):
+        """Al reanudar deja en el reporte solo las filas hasta el checkpoint: el lote que se
+        cortó ya reportó sus errores y se vuelve a procesar entero."""
+        if not os.path.exists(self.errores_path):
+            return
+        with open(self.errores_path, newline='', encoding='utf-8-sig') as f:
+            filas = list(csv.reader(f))
+        if not filas:
+            return
+        conservar = [filas[0]] + [r for r in filas[1:] if r and r[0].isdigit() and int(r[0]) <= hasta]
+        if len(conservar) == len(filas):
+            return
+        with open(self.errores_path, 'w', newline='', encoding='utf-8-sig') as f:
+            csv.writer(f).writerows(conservar)
+
+    def _cerrar_reporte(self):
+        if self._errores_file is not None:
+            self._errores_file.close()
+            self._errores_file = self._errores_writer = None
+
+    # Lotes ------------------------------------------------------------------
+    def _raw(self, valores):
+        return {campo: (valores[i] if i < len(valores) else None) for campo, i in self._indices.items()}
+
+    def _normalizar(self, lote):
+        """Valida el lote; retorna `[(nro, valores, payload, clave)]` de las filas válidas."""
+        validas = []
+        for nro, valores in lote:
+            raw = self._raw(valores)
+            if self.tipo == 'clientes':
+                payload, clave, errores = _normalize_cliente(raw)
+            else:
+                payload, clave, errores = self._normalizar_ot(raw)
+            if errores:
+                self._reportar(nro, valores, errores)
+            else:
+                validas.append((nro, valores, payload, clave))
+        # Postgres no acepta dos veces la misma clave en un upsert: vale la última aparición
+        ultima = {clave: nro for nro, _v, _p, clave in validas}
+        unicas = []
+        for nro, valores, payload, clave in validas:
+            if ultima[clave] != nro:
+                self._reportar(nro, valores, [(self.clave, f"Repetida más abajo (fila {ultima[clave]}); se usa esa.")])
+            else:
+                unicas.append((nro, valores, payload, clave))
+        return unicas
+
+    def _normalizar_ot(self, raw):
+        payload, errores = {}, []
+        campos = (
+            ('ot_nro', _ot_nro),
+            ('fecha_creacion', lambda v: parse_fecha(v, requerido=True)),
+            ('valor_total', lambda v: parse_monto(v, requerido=True)),
+            ('sena', parse_monto),
+            ('abonado_total', parse_monto),
+            ('forma_pago', normalize_forma_pago),
+            ('status', lambda v: parse_estado(v, self.estado_por_defecto)),
+            ('solicita_envio', parse_envio),
+            ('fecha_entrega', parse_fecha),
+            ('descripcion', lambda v: _texto(v) or None),
+        )
+        for campo, fn in campos:
+            # Columnas que no vienen en la planilla quedan con el default de la tabla
+            if campo not in self._indices and campo not in ('ot_nro', 'fecha_creacion', 'valor_total', 'status'):
+                continue
+            try:
+                payload[campo] = fn(raw.get(campo))
+            except ValueError as e:
+                errores.append((campo, str(e)))
+        try:
+            payload['cliente_id'] = normalize_ci_ruc(raw.get('cliente'))
+        except ValueError as e:
+            errores.append(('cliente', str(e)))
+        vendedor = _texto(raw.get('vendedor')) or self.vendedor_por_defecto
+        if vendedor:
+            # CI/RUC con el mismo formato que los clientes; si no, se busca por nombre
+            ci = re.sub(r'[\s.]', '', vendedor)
+            payload['vendedor_id'] = ci if _CI_RE.match(ci) else vendedor
+        else:
+            errores.append(('vendedor', "Vendedor vacío."))
+        return payload, payload.get('ot_nro'), errores
+
+    def _resolver_claves(self, filas):
+        """Cambia CI/RUC de cliente y CI/RUC o nombre de vendedor por sus ids (consultas `in` por lote)."""
+        clientes = {p['cliente_id'] for _n, _v, p, _c in filas} - set(self._cliente_ids)
+        vendedores = {p['vendedor_id'] for _n, _v, p, _c in filas} - set(self._vendedor_ids)
+        self._cliente_ids.update(self._buscar_ids('clientes', 'ci_ruc', clientes))
+        faltan = vendedores
+        for columna in ('ci_ruc', 'nombre'):
+            encontrados = self._buscar_ids('usuarios', columna, faltan)
+            self._vendedor_ids.update(encontrados)
+            faltan = faltan - set(encontrados)
+        for clave in clientes:
+            self._cliente_ids.setdefault(clave, None)
+        for clave in faltan:
+            self._vendedor_ids[clave] = None
+
+        resueltas = []
+        for nro, valores, payload, clave in filas:
+            errores = []
+            cid = self._cliente_ids.get(payload['cliente_id'])
+            vid = self._vendedor_ids.get(payload['vendedor_id'])
+            if cid is None:
+                errores.append(('cliente', f"Cliente {payload['cliente_id']} no registrado (importar primero los clientes)."))
+            if vid is None:
+                errores.append(('vendedor', f"Vendedor '{payload['vendedor_id']}' no registrado."))
+            if errores:
+                self._reportar(nro, valores, errores)
+                continue
+            resueltas.append((nro, valores, dict(payload, cliente_id=cid, vendedor_id=vid), clave))
+        return resueltas
+
+    def _buscar_ids(self, tabla, columna, valores):
+        encontrados = {}
+        valores = sorted(valores)
+        for i in range(0, len(valores), _svc.BULK_CHUNK_SIZE):
+            tanda = valores[i:i + _svc.BULK_CHUNK_SIZE]
+            resp = _svc.supabase.table(tabla).select(f'id,{columna}').in_(columna, tanda).execute()
+            for r in (resp.data or []):
+                encontrados.setdefault(str(r.get(columna)), r.get('id'))
+        return encontrados
+
+    def _escribir(self, filas):
+        """Upsert del lote; si falla, se parte en mitades para aislar las filas con error."""
+        if not filas:
+            return
+        try:
+            resp = (
+                _svc.supabase.table(self.tabla)
+                .upsert([p for _n, _v, p, _c in filas], on_conflict=self.clave, ignore_duplicates=self.skip_existing)
+                .execute()
+            )
+        except TRANSIENT_ERRORS:
+            # Sin conexión no tiene sentido seguir partiendo: se corta y se reanuda después
+            raise
+        except Exception as e:
+            if len(filas) == 1:
+                nro, valores, _p, _c = filas[0]
+                mensaje = getattr(e, 'message', None) or str(e)
+                self._reportar(nro, valores, [('', f"Rechazada por la base de datos: {mensaje}")])
+                return
+            mitad = len(filas) // 2
+            self._escribir(filas[:mitad])
+            self._escribir(filas[mitad:])
+            return
+        if not self.skip_existing:
+            self.resumen['escritas'] += len(filas)
+            return
+        # Con `ignore_duplicates` solo vuelven las filas insertadas
+        insertadas = {str(r.get(self.clave)) for r in (getattr(resp, 'data', None) or [])}
+        for nro, valores, _p, clave in filas:
+            if str(clave) in insertadas:
+                self.resumen['escritas'] += 1
+            elif self.tipo == 'ots':
+                self._reportar(nro, valores, [(self.clave, f"La OT {clave} ya existe; no se modificó "
+                                                           "(--actualizar-existentes para sobrescribirla).")],
+                               contar='omitidas')
+            else:
+                self.resumen['omitidas'] += 1
+
+    def _procesar_lote(self, lote):
+        filas = self._normalizar(lote)
+        if self.tipo == 'ots' and filas:
+            filas = self._resolver_claves(filas)
+        self._escribir(filas)
+        self.resumen['leidas'] += len(lote)
+        self.resumen['fila'] = lote[-1][0]
+        self._guardar_checkpoint()
+
+    def run(self, progress=None, cancelled=None, reanudar: bool = True):
+        """Importa el archivo. `progress(resumen)` se llama después de cada lote.
+
+        Retorna `(True, resumen)` al terminar (aunque haya filas con error, ver
+        `resumen['errores']`) o `(False, mensaje)` si no se pudo seguir; en ese caso el
+        checkpoint queda guardado para reanudar.
+        """
+        if not _svc.supabase:
+            return False, "No hay conexión con la base de datos."
+        if not os.path.exists(self.path):
+            return False, f"No existe el archivo {self.path}."
+        self.resumen = self._resumen_vacio()
+        self._reanudado = reanudar and self._cargar_checkpoint()
+        desde = self.resumen['fila']
+        lote = []
+        try:
+            if self._reanudado:
+                self._recortar_reporte(desde)
+            for nro, headers, valores in iter_rows(self.path, self.hoja):
+                if not self._indices:
+                    self._headers = headers
+                    self._indices = _map_headers(headers, self._columnas)
+                    requeridas = ('ci_ruc', 'nombre', 'telefono') if self.tipo == 'clientes' \
+                        else ('ot_nro', 'fecha_creacion', 'cliente', 'valor_total')
+                    faltan = [c for c in requeridas if c not in self._indices]
+                    if faltan:
+                        return False, f"Faltan columnas en el archivo: {', '.join(faltan)}."
+                if nro <= desde or not any(_texto(v) for v in valores):
+                    continue
+                lote.append((nro, valores))
+                if len(lote) >= self.chunk_size:
+                    self._procesar_lote(lote)
+                    lote = []
+                    if progress:
+                        progress(dict(self.resumen))
+                    if cancelled and cancelled():
+                        return False, f"Importación cancelada en la fila {self.resumen['fila']}; se puede reanudar."
+            if lote:
+                self._procesar_lote(lote)
+        except TRANSIENT_ERRORS as e:
+            print(f"Error de conexión durante la importación: {e}")
+            return False, f"Se perdió la conexión después de la fila {self.resumen['fila']}; vuelva a ejecutar para reanudar. ({e})"
+        except Exception as e:
+            print(f"Error al importar {self.path}: {e}")
+            return False, f"Error inesperado al importar: {e}"
+        finally:
+            self._cerrar_reporte()
+            # Clientes nuevos pueden estar en la cache negativa; las lecturas en vuelo quedan viejas
+            _svc._clientes_cache.clear()
+            _svc._reads.bump()
+        if not self._indices:
+            return False, "El archivo está vacío."
+        self.resumen['completo'] = True
+        self._borrar_checkpoint()
+        if progress:
+            progress(dict(self.resumen))
+        return True, dict(self.resumen)
+
+
+def import_clients(path, **kwargs):
+    """Importa clientes (`nombre`, `ci_ruc`, `telefono`, `zona`, `email`). Ver `ImportJob`."""
+    run_kwargs = {k: kwargs.pop(k) for k in ('progress', 'cancelled', 'reanudar') if k in kwargs}
+    return ImportJob('clientes', path, **kwargs).run(**run_kwargs)
+
+
+def import_work_orders(path, **kwargs):
+    """Importa OTs históricas; los clientes y vendedores tienen que existir. Ver `ImportJob`."""
+    run_kwargs = {k: kwargs.pop(k) for k in ('progress', 'cancelled', 'reanudar') if k in kwargs}
+    return ImportJob('ots', path, **kwargs).run(**run_kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa clientes u OTs desde un CSV o XLSX.")
+    parser.add_argument('tipo', choices=ImportJob.TIPOS)
+    parser.add_argument('archivo')
+    parser.add_argument('--hoja', help="Hoja del XLSX (por defecto la activa).")
+    parser.add_argument('--lote', type=int, default=IMPORT_CHUNK_SIZE, help="Filas por lote.")
+    parser.add_argument('--omitir-existentes', action='store_true',
+                        help="No actualizar clientes que ya existen (las OTs existentes nunca se tocan por defecto).")
+    parser.add_argument('--actualizar-existentes', action='store_true',
+                        help="Sobrescribir OTs que ya existen con los datos de la planilla.")
+    parser.add_argument('--estado', default='Pendiente', help="Estado para OTs sin estado.")
+    parser.add_argument('--vendedor', help="Vendedor (CI/RUC o nombre) para OTs sin vendedor.")
+    parser.add_argument('--desde-cero', action='store_true', help="Ignorar el checkpoint anterior.")
+    parser.add_argument('--errores', help="Ruta del reporte de errores (CSV).")
+    args = parser.parse_args(argv)
+
+    if args.omitir_existentes and args.actualizar_existentes:
+        parser.error("--omitir-existentes y --actualizar-existentes no se pueden usar juntos.")
+    on_existing = 'skip' if args.omitir_existentes else 'update' if args.actualizar_existentes else None
+    try:
+        job = ImportJob(
+            args.tipo, args.archivo, hoja=args.hoja, chunk_size=args.lote,
+            on_existing=on_existing,
+            estado_por_defecto=args.estado, vendedor_por_defecto=args.vendedor, errores_path=args.errores,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    def _progress(r):
+        print(f"Fila {r['fila']}: {r['escritas']} escritas, {r['omitidas']} omitidas, {r['errores']} con error")
+
+    ok, result = job.run(progress=_progress, reanudar=not args.desde_cero)
+    if not ok:
+        print(result)
+        return 1
+    print(f"Importación terminada: {result['leidas']} filas leídas, {result['escritas']} escritas, "
+          f"{result['omitidas']} omitidas, {result['errores']} con error.")
+    if result['reporte_errores']:
+        print(f"Detalle de errores: {result['reporte_errores']}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
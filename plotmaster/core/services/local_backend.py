@@ -0,0 +1,1228 @@
+"""Backend local (SQLite) compatible con el subconjunto de PostgREST que usa el servicio.
+
+Permite ejecutar, perfilar y medir `supabase_service` sin un proyecto de Supabase:
+el esquema se crea a partir de `schema_db.sql` (traducido a SQLite) y el cliente
+expone la misma cadena de llamadas que `supabase-py`:
+
+    client.table('ordenes_trabajo').select('id,ot_nro').eq('status', 'Pendiente').execute()
+
+Se activa con la variable de entorno `PLOTMASTER_BACKEND=local`. La ruta de la base
+se toma de `PLOTMASTER_LOCAL_DB` (por defecto `plotmaster_local.db` en la raíz) y
+`PLOTMASTER_LOCAL_LATENCY_MS` agrega una latencia artificial por cada round trip.
+
+`watch_changes` avisa de las escrituras en las tablas pedidas (con la forma de los
+eventos de Supabase Realtime); lo usa el servidor Realtime local (`local_realtime`).
+"""
+import inspect
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+_ROOT_DIR = Path(__file__).resolve().parents[3]
+SCHEMA_PATH = _ROOT_DIR / "schema_db.sql"
+DEFAULT_DB_PATH = _ROOT_DIR / "plotmaster_local.db"
+
+# Marca de tiempo con el mismo formato que devuelve PostgREST para timestamptz
+_NOW_SQL = "(strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))"
+
+
+class LocalAPIError(Exception):
+    """Equivalente local de `postgrest.exceptions.APIError` (mismos campos)."""
+
+    def __init__(self, error: dict):
+        self._raw_error = error
+        self.message = error.get('message')
+        self.code = error.get('code')
+        self.hint = error.get('hint')
+        self.details = error.get('details')
+        super().__init__(self.message or '')
+
+    def json(self):
+        return self._raw_error
+
+
+class LocalResponse:
+    """Respuesta con la misma forma que `postgrest.APIResponse` (`data` y `count`)."""
+
+    __slots__ = ('data', 'count')
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+    def __repr__(self):
+        size = len(self.data) if isinstance(self.data, list) else int(self.data is not None)
+        return f"LocalResponse(rows={size}, count={self.count})"
+
+
+# --- TRADUCCIÓN DEL ESQUEMA POSTGRES -> SQLITE ---
+
+def _split_statements(sql_text: str):
+    """Divide el script en sentencias respetando comentarios, strings y bloques $$."""
+    statements = []
+    buf = []
+    i = 0
+    n = len(sql_text)
+    in_quote = False
+    in_dollar = False
+    while i < n:
+        ch = sql_text[i]
+        if not in_quote and not in_dollar and sql_text.startswith('--', i):
+            end = sql_text.find('\n', i)
+            i = n if end == -1 else end + 1
+            continue
+        if not in_quote and sql_text.startswith('$$', i):
+            in_dollar = not in_dollar
+            buf.append('$$')
+            i += 2
+            continue
+        if not in_dollar and ch == "'":
+            in_quote = not in_quote
+        if ch == ';' and not in_quote and not in_dollar:
+            stmt = ''.join(buf).strip()
+            if stmt:
+                statements.append(stmt)
+            buf = []
+        else:
+            buf.append(ch)
+        i += 1
+    tail = ''.join(buf).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+def _split_top_level(text: str, sep: str = ','):
+    """Divide por `sep` ignorando separadores dentro de paréntesis o comillas."""
+    parts = []
+    depth = 0
+    in_quote = False
+    current = []
+    for ch in text:
+        if ch == "'":
+            in_quote = not in_quote
+        elif not in_quote and ch == '(':
+            depth += 1
+        elif not in_quote and ch == ')':
+            depth -= 1
+        if ch == sep and depth == 0 and not in_quote:
+            parts.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    last = ''.join(current).strip()
+    if last:
+        parts.append(last)
+    return parts
+
+
+def _strip_schema(name: str) -> str:
+    return name.split('.', 1)[1] if name.lower().startswith('public.') else name
+
+
+class _Schema:
+    """Resultado de traducir `schema_db.sql`: DDL de SQLite y metadatos por tabla."""
+
+    def __init__(self):
+        self.enums = {}
+        self.tables = {}          # tabla -> [(columna, definición sqlite)]
+        self.column_types = {}    # tabla -> {columna: tipo lógico}
+        self.unique_columns = {}  # tabla -> set(columnas únicas/pk)
+        self.enum_columns = {}    # tabla -> {columna: nombre del ENUM}
+        self.foreign_keys = []    # dicts {name, table, column, ref_table, ref_column, clause}
+        self.indexes = []
+        self.triggers = []
+        self.sequences = {}       # secuencia -> valor inicial
+
+    def ddl(self):
+        stmts = []
+        for table, columns in self.tables.items():
+            parts = [definition for _, definition in columns]
+            for fk in self.foreign_keys:
+                if fk['table'] == table:
+                    parts.append(fk['clause'])
+            stmts.append(f"CREATE TABLE IF NOT EXISTS {table} (\n  " + ",\n  ".join(parts) + "\n)")
+        stmts.extend(self.indexes)
+        stmts.extend(self.triggers)
+        # SQLite no tiene secuencias: se emulan con una tabla interna (ver `_nextval`)
+        stmts.append(
+            "CREATE TABLE IF NOT EXISTS _sequences (name TEXT PRIMARY KEY, last_value INTEGER NOT NULL, is_called INTEGER NOT NULL DEFAULT 0)"
+        )
+        for name, start in self.sequences.items():
+            stmts.append(f"INSERT OR IGNORE INTO _sequences (name, last_value, is_called) VALUES ('{name}', {int(start)}, 0)")
+        return stmts
+
+
+_ENUM_RE = re.compile(r"CREATE\s+TYPE\s+([\w.]+)\s+AS\s+ENUM\s*\((.*?)\)", re.IGNORECASE | re.DOTALL)
+_TABLE_RE = re.compile(r"^CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w.]+)\s*\((.*)\)\s*$", re.IGNORECASE | re.DOTALL)
+_FK_RE = re.compile(
+    r"ALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?([\w.]+)\s+ADD\s+CONSTRAINT\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s+"
+    r"FOREIGN\s+KEY\s*\((\w+)\)\s+REFERENCES\s+([\w.]+)\s*\((\w+)\)(.*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+_SEQUENCE_RE = re.compile(
+    r"^CREATE\s+SEQUENCE\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w.]+)(?:.*?\bSTART\s+(?:WITH\s+)?(\d+))?",
+    re.IGNORECASE | re.DOTALL,
+)
+_TRIGGER_RE = re.compile(
+    r"^CREATE\s+(?:OR\s+REPLACE\s+)?TRIGGER\s+(\w+)\s+(?:BEFORE|AFTER)\s+(INSERT|UPDATE|DELETE)\s+ON\s+([\w.]+)\s+"
+    r"FOR\s+EACH\s+ROW\s+EXECUTE\s+(?:FUNCTION|PROCEDURE)\s+([\w.]+)\s*\(\s*\)\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+# Las funciones plpgsql no se traducen: cada función de trigger de `schema_db.sql`
+# tiene acá su cuerpo equivalente en SQLite (`{table}` se reemplaza por la tabla).
+_TRIGGER_BODIES = {
+    'update_updated_at_column': (
+        f"AFTER UPDATE ON {{table}} FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at "
+        f"BEGIN UPDATE {{table}} SET updated_at = {_NOW_SQL} WHERE rowid = NEW.rowid; END"
+    ),
+    'consumir_reserva_ot': (
+        "AFTER INSERT ON {table} FOR EACH ROW "
+        "BEGIN DELETE FROM ot_nro_reservas WHERE ot_nro = NEW.ot_nro; END"
+    ),
+    'registrar_ot_eliminada': (
+        f"AFTER DELETE ON {{table}} FOR EACH ROW "
+        f"BEGIN INSERT INTO ordenes_trabajo_eliminadas (ot_nro, deleted_at) VALUES (OLD.ot_nro, {_NOW_SQL}) "
+        f"ON CONFLICT (ot_nro) DO UPDATE SET deleted_at = excluded.deleted_at; END"
+    ),
+}
+_INDEX_RE = re.compile(r"^CREATE\s+(UNIQUE\s+)?INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s+ON\s+([\w.]+)\s*\((.*)\)\s*$", re.IGNORECASE | re.DOTALL)
+
+
+def _translate_column(schema: _Schema, table: str, line: str):
+    m = re.match(r"^(\w+)\s+(.*)$", line.strip(), re.DOTALL)
+    if not m:
+        return None
+    col, rest = m.group(1), ' '.join(m.group(2).split())
+    low = rest.lower()
+    if col.upper() in ('CONSTRAINT', 'CHECK', 'UNIQUE', 'PRIMARY', 'FOREIGN'):
+        return line.strip()
+
+    is_serial = low.startswith('bigserial') or low.startswith('serial') or 'nextval(' in low
+    if is_serial and 'primary key' in low:
+        schema.column_types[table][col] = 'integer'
+        schema.unique_columns[table].add(col)
+        return f"{col} INTEGER PRIMARY KEY AUTOINCREMENT"
+
+    type_token = rest.split(' ', 1)[0]
+    type_low = type_token.lower()
+    remainder = rest[len(type_token):]
+    check = ''
+    enum_name = _strip_schema(type_token)
+    if enum_name in schema.enums:
+        logical, sql_type = 'enum', 'TEXT'
+        schema.enum_columns.setdefault(table, {})[col] = enum_name
+        values = ', '.join("'" + v.replace("'", "''") + "'" for v in schema.enums[enum_name])
+        check = f" CHECK ({col} IN ({values}))"
+    elif type_low in ('bigint', 'integer', 'int', 'smallint', 'int4', 'int8'):
+        logical, sql_type = 'integer', 'INTEGER'
+    elif type_low.startswith('numeric') or type_low in ('real', 'double', 'float'):
+        logical, sql_type = 'numeric', 'NUMERIC'
+    elif type_low in ('boolean', 'bool'):
+        logical, sql_type = 'boolean', 'INTEGER'
+    else:
+        # text, date, timestamptz y demás se guardan como texto ISO
+        logical, sql_type = type_low, 'TEXT'
+
+    remainder = re.sub(r"::[\w.]+", "", remainder)
+    remainder = re.sub(r"DEFAULT\s+now\(\)", f"DEFAULT {_NOW_SQL}", remainder, flags=re.IGNORECASE)
+    remainder = re.sub(r"DEFAULT\s+true\b", "DEFAULT 1", remainder, flags=re.IGNORECASE)
+    remainder = re.sub(r"DEFAULT\s+false\b", "DEFAULT 0", remainder, flags=re.IGNORECASE)
+    if re.search(r"\b(UNIQUE|PRIMARY\s+KEY)\b", remainder, re.IGNORECASE):
+        schema.unique_columns[table].add(col)
+    schema.column_types[table][col] = logical
+    return f"{col} {sql_type}{remainder}{check}"
+
+
+def translate_schema(sql_text: str) -> _Schema:
+    """Traduce el DDL de Postgres del repositorio a sentencias equivalentes de SQLite."""
+    schema = _Schema()
+    for stmt in _split_statements(sql_text):
+        for m in _ENUM_RE.finditer(stmt):
+            values = re.findall(r"'((?:[^']|'')*)'", m.group(2))
+            schema.enums[_strip_schema(m.group(1))] = [v.replace("''", "'") for v in values]
+
+        m = _TABLE_RE.match(stmt)
+        if m:
+            table = _strip_schema(m.group(1))
+            schema.column_types[table] = {}
+            schema.unique_columns[table] = set()
+            columns = []
+            for line in _split_top_level(m.group(2)):
+                definition = _translate_column(schema, table, line)
+                if definition:
+                    columns.append((line.split()[0], definition))
+            schema.tables[table] = columns
+            continue
+
+        m = _FK_RE.match(stmt)
+        if m:
+            table, name, col, ref_table, ref_col, actions = m.groups()
+            clause = f"CONSTRAINT {name} FOREIGN KEY ({col}) REFERENCES {_strip_schema(ref_table)} ({ref_col}) {' '.join(actions.split())}"
+            schema.foreign_keys.append({
+                'name': name,
+                'table': _strip_schema(table),
+                'column': col,
+                'ref_table': _strip_schema(ref_table),
+                'ref_column': ref_col,
+                'clause': clause.strip(),
+            })
+            continue
+
+        m = _INDEX_RE.match(stmt)
+        if m:
+            unique, name, table, cols = m.groups()
+            schema.indexes.append(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {_strip_schema(table)} ({cols})"
+            )
+            continue
+
+        m = _SEQUENCE_RE.match(stmt)
+        if m:
+            schema.sequences[_strip_schema(m.group(1))] = int(m.group(2) or 1)
+            continue
+
+        m = _TRIGGER_RE.match(stmt)
+        if m:
+            name, _event, table, function = m.groups()
+            body = _TRIGGER_BODIES.get(_strip_schema(function))
+            if body:
+                schema.triggers.append(f"CREATE TRIGGER IF NOT EXISTS {name} " + body.format(table=_strip_schema(table)))
+    return schema
+
+
+# --- TRADUCCIÓN DE ERRORES SQLITE -> POSTGREST ---
+
+def _translate_error(exc: sqlite3.Error, table: str, schema: _Schema = None) -> LocalAPIError:
+    text = str(exc)
+    m = re.search(r"CHECK constraint failed: (\w+) IN", text)
+    if m and schema is not None and m.group(1) in schema.enum_columns.get(table, {}):
+        enum_name = schema.enum_columns[table][m.group(1)]
+        return LocalAPIError({'code': '22P02', 'message': f'invalid input value for enum {enum_name}', 'details': text})
+    m = re.search(r"UNIQUE constraint failed: (\w+)\.(\w+)", text)
+    if m:
+        tbl, col = m.groups()
+        constraint = f"{tbl}_pkey" if col == 'id' else f"{tbl}_{col}_key"
+        return LocalAPIError({
+            'code': '23505',
+            'message': f'duplicate key value violates unique constraint "{constraint}"',
+            'details': f'Key ({col}) already exists.',
+        })
+    m = re.search(r"NOT NULL constraint failed: (\w+)\.(\w+)", text)
+    if m:
+        tbl, col = m.groups()
+        return LocalAPIError({
+            'code': '23502',
+            'message': f'null value in column "{col}" of relation "{tbl}" violates not-null constraint',
+        })
+    if 'CHECK constraint failed' in text:
+        return LocalAPIError({'code': '23514', 'message': f'new row for relation "{table}" violates check constraint', 'details': text})
+    if 'FOREIGN KEY constraint failed' in text:
+        return LocalAPIError({'code': '23503', 'message': f'insert or update on table "{table}" violates foreign key constraint', 'details': text})
+    return LocalAPIError({'code': 'XX000', 'message': text})
+
+
+def _ilike(value, pattern):
+    """ILIKE de Postgres: sin distinguir mayúsculas (incluye acentuadas), `%`/`*` y `_`."""
+    if value is None or pattern is None:
+        return None
+    regex = ''.join(
+        '.*' if ch in '%*' else '.' if ch == '_' else re.escape(ch)
+        for ch in str(pattern)
+    )
+    return 1 if re.fullmatch(regex, str(value), re.IGNORECASE | re.DOTALL) else 0
+
+
+# --- CLIENTE Y QUERY BUILDER ---
+
+# Recurso embebido de PostgREST: `alias:tabla!fk!inner(columnas)`
+_EMBED_RE = re.compile(r"^(?:(\w+):)?(\w+)(?:!(\w+))?(?:!(inner|left))?\s*\((.*)\)$", re.DOTALL)
+
+
+class LocalClient:
+    """Cliente con la interfaz de `supabase.Client` respaldado por SQLite."""
+
+    def __init__(self, db_path=None, schema_path=None, latency: float = 0.0):
+        self.db_path = str(db_path or ':memory:')
+        self.latency = max(0.0, float(latency or 0.0))
+        schema_file = Path(schema_path or SCHEMA_PATH)
+        self.schema = translate_schema(schema_file.read_text(encoding='utf-8'))
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.create_function('pg_ilike', 2, _ilike, deterministic=True)
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        if self.db_path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode = WAL')
+        with self._lock:
+            for stmt in self.schema.ddl():
+                self._conn.execute(stmt)
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+        self._watchers = []
+
+    # Interfaz pública compatible ------------------------------------------
+    def table(self, name: str):
+        if name not in self.schema.tables:
+            raise LocalAPIError({'code': '42P01', 'message': f'relation "public.{name}" does not exist'})
+        return LocalQueryBuilder(self, name)
+
+    def from_(self, name: str):
+        return self.table(name)
+
+    def rpc(self, fn: str, params: dict = None):
+        return LocalRPCBuilder(self, fn, params or {})
+
+    # Métricas ---------------------------------------------------------------
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = {'round_trips': 0, 'rows': 0, 'seconds': 0.0}
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Cambios para Realtime -------------------------------------------------
+    def watch_changes(self, tables, callback):
+        """Llama `callback(cambios)` después de cada round trip que escribió en `tables`.
+
+        Cada cambio es un dict como el `data` de los eventos `postgres_changes` de
+        Supabase Realtime: `table`, `type` ('INSERT'/'UPDATE'/'DELETE'), `record`,
+        `old_record` (completo, como con REPLICA IDENTITY FULL), `commit_timestamp` y
+        `columns`. Los anota un trigger TEMP por tabla, así entran también las escrituras
+        de las RPC. Retorna una función para dejar de mirar (quita los triggers de las
+        tablas que ya nadie mira).
+        """
+        tables = [t for t in tables if t in self.schema.tables]
+        with self._lock:
+            self._conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS _realtime_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                f"tabla TEXT NOT NULL, tipo TEXT NOT NULL, nuevo TEXT, viejo TEXT, ts TEXT NOT NULL DEFAULT {_NOW_SQL})"
+            )
+            for table in tables:
+                cols = list(self.schema.column_types[table])
+                for tipo in ('INSERT', 'UPDATE', 'DELETE'):
+                    nuevo = self._json_row('NEW', cols) if tipo != 'DELETE' else 'NULL'
+                    viejo = self._json_row('OLD', cols) if tipo != 'INSERT' else 'NULL'
+                    self._conn.execute(
+                        f"CREATE TEMP TRIGGER IF NOT EXISTS _rt_{table}_{tipo.lower()} AFTER {tipo} ON main.{table} "
+                        f"BEGIN INSERT INTO _realtime_changes (tabla, tipo, nuevo, viejo) "
+                        f"VALUES ('{table}', '{tipo}', {nuevo}, {viejo}); END"
+                    )
+            watcher = (frozenset(tables), callback)
+            self._watchers.append(watcher)
+
+        def _unwatch():
+            with self._lock:
+                if watcher in self._watchers:
+                    self._watchers.remove(watcher)
+                    self._drop_triggers(watcher[0])
+        return _unwatch
+
+    def _drop_triggers(self, tables):
+        """Quita los triggers de `tables` que no siguen mirados; sin watchers vacía la cola
+        (`_run` solo la drena mientras haya alguno)."""
+        miradas = set().union(*(t for t, _cb in self._watchers))
+        for table in set(tables) - miradas:
+            for tipo in ('insert', 'update', 'delete'):
+                self._conn.execute(f"DROP TRIGGER IF EXISTS temp._rt_{table}_{tipo}")
+        if not self._watchers:
+            self._conn.execute("DELETE FROM temp._realtime_changes")
+
+    @staticmethod
+    def _json_row(alias, cols):
+        return "json_object(" + ", ".join(f"'{c}', {alias}.{c}" for c in cols) + ")"
+
+    def _drain_changes(self, conn) -> list:
+        rows = conn.execute("SELECT tabla, tipo, nuevo, viejo, ts FROM temp._realtime_changes ORDER BY seq").fetchall()
+        if not rows:
+            return []
+        conn.execute("DELETE FROM temp._realtime_changes")
+        changes = []
+        for tabla, tipo, nuevo, viejo, ts in rows:
+            types = self.schema.column_types.get(tabla, {})
+            change = {
+                'schema': 'public', 'table': tabla, 'type': tipo, 'commit_timestamp': ts, 'errors': None,
+                'columns': [{'name': c, 'type': t} for c, t in types.items()],
+            }
+            if nuevo is not None:
+                change['record'] = self._json_to_python(tabla, nuevo)
+            change['old_record'] = self._json_to_python(tabla, viejo) if viejo is not None else {}
+            changes.append(change)
+        return changes
+
+    def _json_to_python(self, table: str, text: str) -> dict:
+        types = self.schema.column_types.get(table, {})
+        row = json.loads(text)
+        for key, val in row.items():
+            if val is not None and types.get(key) == 'boolean':
+                row[key] = bool(val)
+        return row
+
+    # Internos ---------------------------------------------------------------
+    def _run(self, fn):
+        """Ejecuta `fn(conn)` como un round trip: latencia simulada + métricas."""
+        start = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            rows = fn(self._conn)
+            watchers = list(self._watchers)
+            changes = self._drain_changes(self._conn) if watchers else ()
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self._stats['round_trips'] += 1
+            self._stats['rows'] += len(rows)
+            self._stats['seconds'] += elapsed
+        for tables, callback in watchers:
+            mine = [c for c in changes if c['table'] in tables]
+            if mine:
+                try:
+                    callback(mine)
+                except Exception as e:
+                    print(f"Error al avisar cambios locales: {e}")
+        return rows
+
+    def _to_python(self, table: str, row) -> dict:
+        types = self.schema.column_types.get(table, {})
+        out = {}
+        for key in row.keys():
+            val = row[key]
+            if val is not None and types.get(key) == 'boolean':
+                val = bool(val)
+            out[key] = val
+        return out
+
+
+class LocalQueryBuilder:
+    """Query builder encadenable: select/insert/update/delete + filtros + execute."""
+
+    _OPS = {
+        'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<=',
+    }
+
+    def __init__(self, client: LocalClient, table: str):
+        self._client = client
+        self._table = table
+        self._action = 'select'
+        self._columns = '*'
+        self._payload = None
+        self._filters = []
+        self._orders = []
+        self._limit = None
+        self._offset = None
+        self._count = None
+        self._embed_filters = {}
+        self._embed_orders = {}
+        self._embed_limits = {}
+        self._on_conflict = None
+        self._ignore_duplicates = False
+
+    # Acciones ---------------------------------------------------------------
+    def select(self, *columns, count=None):
+        self._action = 'select'
+        self._columns = ','.join(columns) if columns else '*'
+        self._count = count
+        return self
+
+    def insert(self, json, *, count=None, returning=None, upsert=False, **_kwargs):
+        self._action = 'insert'
+        self._payload = json
+        return self
+
+    def upsert(self, json, *, count=None, returning=None, ignore_duplicates=False, on_conflict='', **_kwargs):
+        self._action = 'upsert'
+        self._payload = json
+        self._on_conflict = [c.strip() for c in (on_conflict or 'id').split(',') if c.strip()]
+        self._ignore_duplicates = bool(ignore_duplicates)
+        return self
+
+    def update(self, json, *, count=None, returning=None, **_kwargs):
+        self._action = 'update'
+        self._payload = json
+        return self
+
+    def delete(self, *, count=None, returning=None, **_kwargs):
+        self._action = 'delete'
+        return self
+
+    # Filtros ----------------------------------------------------------------
+    def _add_filter(self, op, column, value):
+        if '.' in column:
+            # Filtro sobre un recurso embebido (`clientes.ci_ruc`): se valida al ejecutar
+            name, _, column = column.partition('.')
+            self._embed_filters.setdefault(name, []).append((op, column, value))
+            return self
+        self._check_column(column)
+        self._filters.append((op, column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._add_filter('eq', column, value)
+
+    def neq(self, column, value):
+        return self._add_filter('neq', column, value)
+
+    def gt(self, column, value):
+        return self._add_filter('gt', column, value)
+
+    def gte(self, column, value):
+        return self._add_filter('gte', column, value)
+
+    def lt(self, column, value):
+        return self._add_filter('lt', column, value)
+
+    def lte(self, column, value):
+        return self._add_filter('lte', column, value)
+
+    def in_(self, column, values):
+        return self._add_filter('in', column, list(values or []))
+
+    def ilike(self, column, pattern):
+        return self._add_filter('ilike', column, pattern)
+
+    def is_(self, column, value):
+        return self._add_filter('is', column, value)
+
+    def order(self, column, *, desc=False, nullsfirst=None, foreign_table=None):
+        if foreign_table:
+            self._embed_orders.setdefault(foreign_table, []).append((column, bool(desc), nullsfirst))
+            return self
+        self._check_column(column)
+        self._orders.append((column, bool(desc), nullsfirst))
+        return self
+
+    def limit(self, size, *, foreign_table=None):
+        if foreign_table:
+            self._embed_limits[foreign_table] = int(size)
+            return self
+        self._limit = int(size)
+        return self
+
+    def range(self, start, end, foreign_table=None):
+        self._offset = int(start)
+        self._limit = int(end) - int(start) + 1
+        return self
+
+    # Ejecución --------------------------------------------------------------
+    def execute(self):
+        handler = getattr(self, f'_execute_{self._action}')
+        return handler()
+
+    def _check_column(self, column, table=None):
+        table = table or self._table
+        columns = self._client.schema.column_types[table]
+        if column not in columns:
+            raise LocalAPIError({
+                'code': '42703',
+                'message': f'column {table}.{column} does not exist',
+            })
+
+    @staticmethod
+    def _sql_value(value):
+        if isinstance(value, bool):
+            return int(value)
+        return value
+
+    @classmethod
+    def _filter_clauses(cls, filters, alias=None):
+        prefix = f"{alias}." if alias else ''
+        clauses, params = [], []
+        for op, column, value in filters:
+            column = prefix + column
+            if op in cls._OPS:
+                clauses.append(f"{column} {cls._OPS[op]} ?")
+                params.append(cls._sql_value(value))
+            elif op == 'in':
+                if not value:
+                    clauses.append('0')
+                    continue
+                clauses.append(f"{column} IN ({', '.join('?' for _ in value)})")
+                params.extend(cls._sql_value(v) for v in value)
+            elif op == 'ilike':
+                clauses.append(f"pg_ilike({column}, ?)")
+                params.append(value)
+            elif op == 'is':
+                lowered = str(value).lower()
+                if value is None or lowered == 'null':
+                    clauses.append(f"{column} IS NULL")
+                else:
+                    clauses.append(f"{column} IS ?")
+                    params.append(1 if lowered == 'true' else 0 if lowered == 'false' else value)
+        return clauses, params
+
+    def _where(self):
+        clauses, params = self._filter_clauses(self._filters)
+        sql = (' WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        return sql, params
+
+    @staticmethod
+    def _order_sql(orders, alias=None):
+        if not orders:
+            return ''
+        prefix = f"{alias}." if alias else ''
+        parts = []
+        for column, desc, nullsfirst in orders:
+            # Postgres ordena NULL como el valor más grande
+            if nullsfirst is None:
+                nullsfirst = desc
+            parts.append(f"{prefix}{column} {'DESC' if desc else 'ASC'} NULLS {'FIRST' if nullsfirst else 'LAST'}")
+        return ' ORDER BY ' + ', '.join(parts)
+
+    # Recursos embebidos -----------------------------------------------------
+    def _relation(self, parent, target, hint=None):
+        """Busca la FK que une `parent` con `target` (como hace PostgREST con `!hint`).
+
+        Retorna `('one', fk)` si `parent` referencia a `target` (objeto embebido) o
+        `('many', fk)` si `target` referencia a `parent` (lista embebida).
+        """
+        if target not in self._client.schema.column_types:
+            raise LocalAPIError({
+                'code': 'PGRST200',
+                'message': f"Could not find a relationship between '{parent}' and '{target}' in the schema cache",
+            })
+        candidates = []
+        for fk in self._client.schema.foreign_keys:
+            if fk['table'] == parent and fk['ref_table'] == target:
+                candidates.append(('one', fk))
+            elif fk['table'] == target and fk['ref_table'] == parent:
+                candidates.append(('many', fk))
+        if hint:
+            candidates = [c for c in candidates if hint in (c[1]['name'], c[1]['column'])]
+        if not candidates:
+            raise LocalAPIError({
+                'code': 'PGRST200',
+                'message': f"Could not find a relationship between '{parent}' and '{target}' in the schema cache",
+            })
+        if len(candidates) > 1:
+            raise LocalAPIError({
+                'code': 'PGRST201',
+                'message': f"Could not embed because more than one relationship was found for '{parent}' and '{target}'",
+                'hint': 'Try changing the target to one of: ' + ', '.join(f"'{target}!{fk['name']}'" for _, fk in candidates),
+            })
+        return candidates[0]
+
+    def _parse_select(self, table, text):
+        """Separa `text` en columnas `(alias, columna)` y recursos embebidos."""
+        columns, embeds = [], []
+        for item in _split_top_level(text or '*'):
+            item = item.strip()
+            if not item:
+                continue
+            m = _EMBED_RE.match(item)
+            if m:
+                alias, target, hint, join, inner_text = m.groups()
+                if hint in ('inner', 'left') and join is None:
+                    hint, join = None, hint
+                kind, fk = self._relation(table, target, hint)
+                if kind == 'one':
+                    local_col, remote_col = fk['column'], fk['ref_column']
+                else:
+                    local_col, remote_col = fk['ref_column'], fk['column']
+                embeds.append({
+                    'name': alias or target, 'table': target, 'kind': kind,
+                    'inner': join == 'inner', 'select': inner_text,
+                    'local': local_col, 'remote': remote_col,
+                })
+                continue
+            alias, _, column = item.rpartition(':')
+            if column != '*':
+                self._check_column(column, table)
+            columns.append((alias or column, column))
+        return columns, embeds
+
+    def _fetch(self, conn, table, text, filters=(), orders=(), limit=None, offset=None,
+               restrict=None, keys=(), top=False):
+        """SELECT sobre `table` resolviendo los embebidos con una consulta por recurso.
+
+        `restrict=(columna, valores)` limita las filas (carga de hijos) y `keys` son
+        columnas que se devuelven como `__k_<col>` para que el llamador pueda unir.
+        """
+        columns, embeds = self._parse_select(table, text)
+        embed_filters = self._embed_filters if top else {}
+        known = {e['name'] for e in embeds} | {e['table'] for e in embeds}
+        for name in embed_filters:
+            if name not in known:
+                raise LocalAPIError({
+                    'code': 'PGRST108',
+                    'message': f"'{name}' is not an embedded resource in this request",
+                })
+
+        clauses, params = self._filter_clauses(filters, 't')
+        for e in embeds:
+            e['filters'] = embed_filters.get(e['name'], []) + (
+                embed_filters.get(e['table'], []) if e['table'] != e['name'] else []
+            )
+            for _op, column, _value in e['filters']:
+                self._check_column(column, e['table'])
+            if e['inner']:
+                # !inner: la fila padre solo queda si existe un hijo que pase los filtros
+                sub_clauses, sub_params = self._filter_clauses(e['filters'], 'e')
+                sub_where = (' WHERE ' + ' AND '.join(sub_clauses)) if sub_clauses else ''
+                clauses.append(f"t.{e['local']} IN (SELECT e.{e['remote']} FROM {e['table']} e{sub_where})")
+                params.extend(sub_params)
+        if restrict is not None:
+            col, values = restrict
+            clauses.append(f"t.{col} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+
+        select_parts = []
+        for alias, column in columns:
+            select_parts.append('t.*' if column == '*' else (f't.{column}' if alias == column else f't.{column} AS "{alias}"'))
+        if not select_parts and not embeds:
+            select_parts.append('t.*')
+        hidden = set(keys) | {e['local'] for e in embeds}
+        select_parts.extend(f't.{col} AS "__k_{col}"' for col in sorted(hidden))
+
+        sql = f"SELECT {', '.join(select_parts)} FROM {table} t"
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += self._order_sql(orders, 't')
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+            if offset:
+                sql += ' OFFSET ?'
+                params.append(offset)
+        rows = [self._client._to_python(table, r) for r in conn.execute(sql, params).fetchall()]
+
+        for e in embeds:
+            values = list({r[f"__k_{e['local']}"] for r in rows if r.get(f"__k_{e['local']}") is not None})
+            children = self._fetch(
+                conn, e['table'], e['select'], e['filters'],
+                self._embed_orders.get(e['name']) or self._embed_orders.get(e['table']) or () if top else (),
+                restrict=(e['remote'], values), keys=(e['remote'],),
+            ) if values else []
+            child_limit = (self._embed_limits.get(e['name']) or self._embed_limits.get(e['table'])) if top else None
+            grouped = {}
+            for child in children:
+                key = child.pop(f"__k_{e['remote']}")
+                grouped.setdefault(key, []).append(child)
+            for r in rows:
+                matches = grouped.get(r.get(f"__k_{e['local']}"), [])
+                if e['kind'] == 'one':
+                    r[e['name']] = matches[0] if matches else None
+                else:
+                    r[e['name']] = matches[:child_limit] if child_limit is not None else matches
+
+        for r in rows:
+            for col in hidden - set(keys):
+                r.pop(f'__k_{col}', None)
+        return rows
+
+    def _execute_select(self):
+        def _fn(conn):
+            return self._fetch(
+                conn, self._table, self._columns, self._filters, self._orders,
+                self._limit, self._offset, top=True,
+            )
+
+        rows = self._client._run(_fn)
+        count = len(rows) if self._count else None
+        return LocalResponse(rows, count)
+
+    def _execute_insert(self, conflict_sql=''):
+        payload = self._payload
+        items = payload if isinstance(payload, list) else [payload]
+        table = self._table
+        for item in items:
+            for col in item:
+                self._check_column(col)
+
+        def _fn(conn):
+            out = []
+            try:
+                conn.execute('BEGIN')
+                for item in items:
+                    cols = list(item.keys())
+                    if cols:
+                        conflict = conflict_sql(cols) if callable(conflict_sql) else conflict_sql
+                        sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)}){conflict} RETURNING *"
+                        params = [self._sql_value(item[c]) for c in cols]
+                    else:
+                        sql, params = f"INSERT INTO {table} DEFAULT VALUES RETURNING *", []
+                    out.extend(self._client._to_python(table, r) for r in conn.execute(sql, params).fetchall())
+                conn.execute('COMMIT')
+            except sqlite3.Error as exc:
+                conn.execute('ROLLBACK')
+                raise _translate_error(exc, table, self._client.schema) from exc
+            return out
+
+        return LocalResponse(self._client._run(_fn))
+
+    def _execute_upsert(self):
+        # Igual que PostgREST: `merge-duplicates` actualiza las columnas enviadas, `ignore` no toca la fila
+        for col in self._on_conflict:
+            self._check_column(col)
+        target = ', '.join(self._on_conflict)
+        ignore = self._ignore_duplicates
+
+        def _conflict(cols):
+            sets = ', '.join(f"{c} = excluded.{c}" for c in cols if c not in self._on_conflict)
+            if ignore or not sets:
+                return f" ON CONFLICT ({target}) DO NOTHING"
+            return f" ON CONFLICT ({target}) DO UPDATE SET {sets}"
+        return self._execute_insert(_conflict)
+
+    def _execute_update(self):
+        updates = dict(self._payload or {})
+        if not self._filters:
+            raise LocalAPIError({'code': '21000', 'message': 'UPDATE requires a WHERE clause'})
+        for col in updates:
+            self._check_column(col)
+        where, params = self._where()
+        table = self._table
+        set_sql = ', '.join(f"{c} = ?" for c in updates)
+        set_params = [self._sql_value(v) for v in updates.values()]
+
+        def _fn(conn):
+            if not updates:
+                return []
+            try:
+                cur = conn.execute(f"UPDATE {table} SET {set_sql}{where} RETURNING *", set_params + params)
+                return [self._client._to_python(table, r) for r in cur.fetchall()]
+            except sqlite3.Error as exc:
+                raise _translate_error(exc, table, self._client.schema) from exc
+
+        return LocalResponse(self._client._run(_fn))
+
+    def _execute_delete(self):
+        if not self._filters:
+            raise LocalAPIError({'code': '21000', 'message': 'DELETE requires a WHERE clause'})
+        where, params = self._where()
+        table = self._table
+
+        def _fn(conn):
+            try:
+                cur = conn.execute(f"DELETE FROM {table}{where} RETURNING *", params)
+                return [self._client._to_python(table, r) for r in cur.fetchall()]
+            except sqlite3.Error as exc:
+                raise _translate_error(exc, table, self._client.schema) from exc
+
+        return LocalResponse(self._client._run(_fn))
+
+
+# --- FUNCIONES RPC ---
+# Equivalentes en Python de las funciones plpgsql de `schema_db.sql`. Cada una recibe la
+# conexión dentro de una transacción (BEGIN IMMEDIATE) y los parámetros por nombre.
+
+_RPC_FUNCTIONS = {}
+
+
+def _rpc_function(name, returns=None, setof=False):
+    """Registra `fn` como la función RPC `name`; `returns` es la tabla si devuelve una fila.
+
+    Con `setof=True` (RETURNS SETOF tabla) `fn` retorna los `id` de las filas en orden y
+    el builder las lee con las columnas pedidas en `.select()`, embebidos incluidos.
+    """
+    def decorator(fn):
+        _RPC_FUNCTIONS[name] = (fn, returns, setof)
+        return fn
+    return decorator
+
+
+def _raise(code, message):
+    raise LocalAPIError({'code': code, 'message': message})
+
+
+@_rpc_function('registrar_abono', returns='ordenes_trabajo')
+def _rpc_registrar_abono(conn, p_ot_nro, p_monto, p_creado_por=None, p_observacion=None):
+    if p_monto is None or float(p_monto) <= 0:
+        _raise('P0001', 'Monto inválido para abono.')
+    ot = conn.execute("SELECT id FROM ordenes_trabajo WHERE ot_nro = ?", (p_ot_nro,)).fetchone()
+    if ot is None:
+        _raise('P0002', 'Orden no encontrada para registrar abono.')
+    conn.execute(
+        "INSERT INTO abonos (ot_id, monto, creado_por, observacion) VALUES (?, ?, ?, ?)",
+        (ot['id'], p_monto, p_creado_por, p_observacion),
+    )
+    return conn.execute(
+        "UPDATE ordenes_trabajo SET abonado_total = abonado_total + ?, status = 'Aprobado' WHERE id = ? RETURNING *",
+        (p_monto, ot['id']),
+    ).fetchone()
+
+
+@_rpc_function('eliminar_abono', returns='ordenes_trabajo')
+def _rpc_eliminar_abono(conn, p_abono_id):
+    abono = conn.execute("DELETE FROM abonos WHERE id = ? RETURNING ot_id, monto", (p_abono_id,)).fetchone()
+    if abono is None:
+        _raise('P0002', 'Abono no encontrado.')
+    return conn.execute(
+        "UPDATE ordenes_trabajo SET abonado_total = MAX(abonado_total - ?, 0) WHERE id = ? RETURNING *",
+        (abono['monto'], abono['ot_id']),
+    ).fetchone()
+
+
+@_rpc_function('cancelar_orden', returns='ordenes_trabajo')
+def _rpc_cancelar_orden(conn, p_ot_nro, p_admin_id, p_motivo=None, p_reembolso=0):
+    ot = conn.execute("SELECT * FROM ordenes_trabajo WHERE ot_nro = ?", (p_ot_nro,)).fetchone()
+    if ot is None:
+        _raise('P0002', 'Orden no encontrada.')
+    if ot['status'] == 'Cancelado':
+        _raise('P0001', 'La orden ya fue cancelada previamente.')
+    conn.execute(
+        "INSERT INTO cancelaciones (ot_id, cliente_id, vendedor_id, descripcion, motivo, reembolso, "
+        "estado_anterior, cancelado_por, fecha_creacion_ot) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            ot['id'], ot['cliente_id'], ot['vendedor_id'], ot['descripcion'] or '', p_motivo or '',
+            p_reembolso or 0, ot['status'], p_admin_id, ot['fecha_creacion'] or (ot['created_at'] or '')[:10],
+        ),
+    )
+    return conn.execute(
+        "UPDATE ordenes_trabajo SET status = 'Cancelado' WHERE id = ? RETURNING *", (ot['id'],)
+    ).fetchone()
+
+
+def _nextval(conn, name):
+    row = conn.execute("SELECT last_value, is_called FROM _sequences WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        _raise('42P01', f'relation "public.{name}" does not exist')
+    value = row['last_value'] + 1 if row['is_called'] else row['last_value']
+    conn.execute("UPDATE _sequences SET last_value = ?, is_called = 1 WHERE name = ?", (value, name))
+    return value
+
+
+@_rpc_function('reservar_ot_nros')
+def _rpc_reservar_ot_nros(conn, p_cantidad, p_reservado_por, p_ttl_minutos=120):
+    if p_cantidad is None or not 1 <= int(p_cantidad) <= 100:
+        _raise('P0001', 'Cantidad de números de OT inválida.')
+    cantidad = int(p_cantidad)
+    ttl = max(int(p_ttl_minutos or 120), 1)
+    expira = conn.execute(
+        "SELECT strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now', ?)", (f'+{ttl} minutes',)
+    ).fetchone()[0]
+    nros = [r['ot_nro'] for r in conn.execute(
+        f"SELECT ot_nro FROM ot_nro_reservas WHERE reservado_por IS NULL OR expira_en < {_NOW_SQL} ORDER BY ot_nro LIMIT ?",
+        (cantidad,),
+    ).fetchall()]
+    for nro in nros:
+        conn.execute(
+            "UPDATE ot_nro_reservas SET reservado_por = ?, expira_en = ? WHERE ot_nro = ?",
+            (p_reservado_por, expira, nro),
+        )
+    # Equivalente al setval de schema_db.sql para bases creadas antes de la secuencia
+    conn.execute(
+        "UPDATE _sequences SET last_value = (SELECT MAX(ot_nro) FROM ordenes_trabajo), is_called = 1 "
+        "WHERE name = 'ordenes_trabajo_ot_nro_seq' AND (SELECT MAX(ot_nro) FROM ordenes_trabajo) >= last_value"
+    )
+    while len(nros) < cantidad:
+        nro = _nextval(conn, 'ordenes_trabajo_ot_nro_seq')
+        if conn.execute("SELECT 1 FROM ordenes_trabajo WHERE ot_nro = ?", (nro,)).fetchone():
+            continue
+        cur = conn.execute(
+            "INSERT INTO ot_nro_reservas (ot_nro, reservado_por, expira_en) VALUES (?, ?, ?) ON CONFLICT (ot_nro) DO NOTHING",
+            (nro, p_reservado_por, expira),
+        )
+        if cur.rowcount:
+            nros.append(nro)
+    return nros
+
+
+@_rpc_function('liberar_ot_nros')
+def _rpc_liberar_ot_nros(conn, p_nros, p_reservado_por):
+    nros = list(p_nros or [])
+    if not nros:
+        return 0
+    cur = conn.execute(
+        f"UPDATE ot_nro_reservas SET reservado_por = NULL, expira_en = {_NOW_SQL} "
+        f"WHERE ot_nro IN ({', '.join('?' for _ in nros)}) AND reservado_por = ?",
+        (*nros, p_reservado_por),
+    )
+    return cur.rowcount
+
+
+# --- BÚSQUEDA DIFUSA ---
+# Equivalente de pg_trgm + unaccent para search_work_orders/search_clients: mismos
+# criterios de inclusión (subcadena o word_similarity >= 0.6) y mismo orden.
+
+_WORD_SIMILARITY_THRESHOLD = 0.6
+_SEARCH_MAX_LIMIT = 500
+
+
+def _unaccent(value) -> str:
+    """unaccent(lower(x)): minúsculas sin marcas diacríticas (á -> a, ñ -> n)."""
+    text = str(value or '').lower()
+    if text.isascii():
+        return text
+    return ''.join(ch for ch in unicodedata.normalize('NFKD', text) if not unicodedata.combining(ch))
+
+
+def _trgm_seq(text: str) -> list:
+    """Trigramas de pg_trgm en orden: cada palabra con dos espacios antes y uno después."""
+    seq = []
+    for word in re.findall(r'\w+', text.lower()):
+        padded = f'  {word} '
+        seq.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return seq
+
+
+def _similarity(a: str, b: str) -> float:
+    ga, gb = set(_trgm_seq(a)), set(_trgm_seq(b))
+    if not ga or not gb:
+        return 0.0
+    return len(ga & gb) / len(ga | gb)
+
+
+def _word_similarity(query: str, text: str) -> float:
+    """word_similarity de pg_trgm: la mejor similitud entre los trigramas de `query` y
+    un tramo continuo de los trigramas de `text` (basta probar tramos que empiezan y
+    terminan en un trigrama de `query`)."""
+    gq = set(_trgm_seq(query))
+    if not gq:
+        return 0.0
+    seq = _trgm_seq(text)
+    hits = [i for i, g in enumerate(seq) if g in gq]
+    best = 0.0
+    for n, start in enumerate(hits):
+        extent, common = set(), set()
+        prev = start
+        for end in hits[n:]:
+            extent.update(seq[prev:end + 1])
+            common.add(seq[end])
+            prev = end + 1
+            best = max(best, len(common) / (len(gq) + len(extent) - len(common)))
+        if best >= 1.0:
+            break
+    return best
+
+
+def _search_limit(p_limit) -> int:
+    return min(max(int(p_limit or 50), 1), _SEARCH_MAX_LIMIT)
+
+
+def _search_score(q, texts, exact_texts=()):
+    """Puntaje de una fila para la consulta normalizada `q`, o None si no entra.
+
+    `texts` se comparan por subcadena y word_similarity; `exact_texts` por subcadena y
+    similarity (CI/RUC).
+    """
+    matched = False
+    score = 0.0
+    for text in texts:
+        text = _unaccent(text)
+        ws = _word_similarity(q, text)
+        matched = matched or q in text or ws >= _WORD_SIMILARITY_THRESHOLD
+        score = max(score, ws)
+    for text in exact_texts:
+        text = str(text or '')
+        matched = matched or q in text
+        score = max(score, _similarity(q, text))
+    return score if matched else None
+
+
+@_rpc_function('search_work_orders', returns='ordenes_trabajo', setof=True)
+def _rpc_search_work_orders(conn, p_query, p_status=None, p_limit=50, p_vendedor_id=None):
+    q = _unaccent(p_query).strip()
+    if not q:
+        return []
+    sql = ("SELECT o.id, o.ot_nro, o.descripcion, c.nombre, c.ci_ruc FROM ordenes_trabajo o "
+           "LEFT JOIN clientes c ON c.id = o.cliente_id WHERE 1 = 1")
+    params = []
+    if p_status is not None:
+        sql += " AND o.status = ?"
+        params.append(p_status)
+    if p_vendedor_id is not None:
+        sql += " AND o.vendedor_id = ?"
+        params.append(p_vendedor_id)
+    ranked = []
+    for r in conn.execute(sql, params):
+        exact = str(r['ot_nro']) == q
+        score = _search_score(q, (r['descripcion'], r['nombre']), (r['ci_ruc'],))
+        if exact or score is not None:
+            ranked.append((exact, score or 0.0, r['ot_nro'] or 0, r['id']))
+    ranked.sort(reverse=True)
+    return [r[-1] for r in ranked[:_search_limit(p_limit)]]
+
+
+@_rpc_function('search_clients', returns='clientes', setof=True)
+def _rpc_search_clients(conn, p_query, p_limit=50):
+    q = _unaccent(p_query).strip()
+    if not q:
+        return []
+    ranked = []
+    for r in conn.execute("SELECT id, nombre, ci_ruc FROM clientes"):
+        score = _search_score(q, (r['nombre'],), (r['ci_ruc'],))
+        if score is not None:
+            ranked.append((r['ci_ruc'] == q, score, r['nombre'] or '', r['id']))
+    # Como el ORDER BY de la función: exacto y puntaje desc, nombre asc
+    ranked.sort(key=lambda r: (not r[0], -r[1], r[2]))
+    return [r[-1] for r in ranked[:_search_limit(p_limit)]]
+
+
+class LocalRPCBuilder:
+    """Resultado de `client.rpc(fn, params)`: se ejecuta atómicamente en `execute()`."""
+
+    def __init__(self, client: LocalClient, fn: str, params: dict):
+        self._client = client
+        self._fn = fn
+        self._params = dict(params)
+        self._columns = '*'
+
+    def select(self, *columns):
+        """Columnas (y embebidos) de las filas de una función SETOF, como en PostgREST."""
+        self._columns = ','.join(columns) if columns else '*'
+        return self
+
+    def execute(self):
+        impl, returns, setof = _RPC_FUNCTIONS.get(self._fn, (None, None, False))
+        try:
+            if impl is None:
+                raise TypeError(self._fn)
+            # PostgREST resuelve la función por nombre + nombres de parámetros
+            inspect.signature(impl).bind(None, **self._params)
+        except TypeError:
+            raise LocalAPIError({
+                'code': 'PGRST202',
+                'message': f"Could not find the function public.{self._fn}({', '.join(sorted(self._params))}) in the schema cache",
+            }) from None
+        client = self._client
+
+        def _fn(conn):
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                result = impl(conn, **self._params)
+                conn.execute('COMMIT')
+            except sqlite3.Error as exc:
+                conn.execute('ROLLBACK')
+                raise _translate_error(exc, 'ordenes_trabajo', client.schema) from exc
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            if setof:
+                ids = list(result or ())
+                rows = LocalQueryBuilder(client, returns)._fetch(
+                    conn, returns, self._columns, restrict=('id', ids), keys=('id',),
+                ) if ids else []
+                rank = {row_id: i for i, row_id in enumerate(ids)}
+                rows.sort(key=lambda r: rank[r['__k_id']])
+                for r in rows:
+                    r.pop('__k_id')
+                return rows
+            if returns and result is not None:
+                # Tipo compuesto: PostgREST devuelve la fila como objeto
+                result = client._to_python(returns, result)
+            return [result]
+
+        if setof:
+            return LocalResponse(client._run(_fn))
+        return LocalResponse(client._run(_fn)[0])
+
+
+def create_local_client(db_path=None, latency_ms=None):
+    """Crea el cliente local usando `PLOTMASTER_LOCAL_DB` / `PLOTMASTER_LOCAL_LATENCY_MS`."""
+    path = db_path or os.environ.get("PLOTMASTER_LOCAL_DB") or DEFAULT_DB_PATH
+    if latency_ms is None:
+        try:
+            latency_ms = float(os.environ.get("PLOTMASTER_LOCAL_LATENCY_MS") or 0)
+        except ValueError:
+            latency_ms = 0
+    return LocalClient(db_path=path, latency=latency_ms / 1000.0)
@@ -0,0 +1,137 @@
+"""Servidor Realtime local (websocket) para probar las planillas sin Supabase.
+
+Habla el subconjunto del protocolo de Phoenix que usa el cliente `realtime` de
+supabase-py: `phx_join` con `postgres_changes`, `heartbeat`, `phx_leave` y
+`access_token`. Los cambios los toma del `LocalClient` (`watch_changes`), así que
+cualquier escritura del backend local (tablas o RPC) llega a los suscriptos como
+llegaría desde Supabase. `drop()` corta las conexiones abiertas para probar la vuelta
+al polling y la reconexión.
+
+    server = LocalRealtimeServer(local_client)
+    url = async_service.run_sync(server.start())    # ws://127.0.0.1:<puerto>
+    os.environ['PLOTMASTER_REALTIME_URL'] = url
+"""
+import asyncio
+import json
+
+try:
+    from websockets.asyncio.server import serve
+    from websockets.exceptions import ConnectionClosed
+except ImportError:  # pragma: no cover - dependencia opcional
+    serve = None
+    ConnectionClosed = Exception
+
+
+class LocalRealtimeServer:
+    """Servidor Phoenix mínimo sobre `websockets`, alimentado por un `LocalClient`."""
+
+    def __init__(self, client, host: str = '127.0.0.1', port: int = 0,
+                 tables=('ordenes_trabajo', 'abonos', 'cancelaciones')):
+        self.client = client
+        self.host = host
+        self.port = port
+        self.tables = tuple(tables)
+        self._server = None
+        self._loop = None
+        self._unwatch = None
+        # conexión -> {topic: [bindings con id]}
+        self._subs = {}
+        self._next_id = 0
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self) -> str:
+        """Arranca en el loop actual y retorna la URL para el cliente."""
+        if serve is None:
+            raise RuntimeError("El paquete websockets no está instalado.")
+        self._loop = asyncio.get_running_loop()
+        self._server = await serve(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self._unwatch is None:
+            self._unwatch = self.client.watch_changes(self.tables, self._on_changes)
+        return self.url
+
+    async def stop(self):
+        if self._unwatch is not None:
+            self._unwatch()
+            self._unwatch = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def drop(self):
+        """Corta todas las conexiones (como una caída de red); el servidor sigue escuchando."""
+        for ws in list(self._subs):
+            await ws.close(code=1012, reason="drop")
+
+    # --- PROTOCOLO ---
+
+    async def _handle(self, ws):
+        self._subs[ws] = {}
+        try:
+            async for raw in ws:
+                try:
+                    msg = json.loads(raw)
+                except ValueError:
+                    continue
+                await self._dispatch(ws, msg)
+        except ConnectionClosed:
+            pass
+        finally:
+            self._subs.pop(ws, None)
+
+    async def _reply(self, ws, msg, response=None):
+        await ws.send(json.dumps({
+            'event': 'phx_reply', 'topic': msg.get('topic'), 'ref': msg.get('ref'),
+            'join_ref': msg.get('join_ref'), 'payload': {'status': 'ok', 'response': response or {}},
+        }))
+
+    async def _dispatch(self, ws, msg):
+        event = msg.get('event')
+        topic = msg.get('topic')
+        if event == 'heartbeat':
+            await self._reply(ws, msg)
+        elif event == 'phx_join':
+            config = (msg.get('payload') or {}).get('config') or {}
+            bindings = []
+            for b in config.get('postgres_changes') or ():
+                self._next_id += 1
+                bindings.append({'id': self._next_id, 'event': b.get('event', '*'), 'schema': b.get('schema'),
+                                 'table': b.get('table'), 'filter': b.get('filter')})
+            self._subs.setdefault(ws, {})[topic] = bindings
+            await self._reply(ws, msg, {'postgres_changes': bindings})
+        elif event == 'phx_leave':
+            self._subs.get(ws, {}).pop(topic, None)
+            await self._reply(ws, msg)
+        # access_token, broadcast y presence no hacen falta para las planillas
+
+    # --- CAMBIOS ---
+
+    def _on_changes(self, changes):
+        # Llega desde el hilo que escribió en el backend local
+        if self._loop is not None and not self._loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self._broadcast(changes), self._loop)
+
+    @staticmethod
+    def _matches(binding, change) -> bool:
+        return (binding['event'] in ('*', change['type'])
+                and binding['schema'] in (None, '*', change['schema'])
+                and binding['table'] in (None, '*', change['table']))
+
+    async def _broadcast(self, changes):
+        for ws, topics in list(self._subs.items()):
+            for topic, bindings in list(topics.items()):
+                for change in changes:
+                    ids = [b['id'] for b in bindings if self._matches(b, change)]
+                    if not ids:
+                        continue
+                    try:
+                        await ws.send(json.dumps({
+                            'event': 'postgres_changes', 'topic': topic, 'ref': None,
+                            'payload': {'data': change, 'ids': ids},
+                        }))
+                    except ConnectionClosed:
+                        break
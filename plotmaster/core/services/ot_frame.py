@@ -0,0 +1,355 @@
+"""Almacén columnar de las OTs cargadas en una planilla.
+
+`actualizar_tabla` recorría todos los `WorkOrder` en cada tecla para filtrar por
+estado, y los totales se sumaban fila por fila. `WorkOrderFrame` guarda en arreglos
+(NumPy si está instalado, `array` de la stdlib si no) las columnas que se filtran y se
+suman:
+
+- `ot_nro`, `monto`, `abonado` y `fecha` (ordinal del día; 0 = sin fecha),
+- `estado` y `forma_pago` como códigos enteros sobre un vocabulario,
+- `cliente`, `vendedor` y `descripcion` como listas de textos internados.
+
+`mask(...)` / `positions(...)` filtran por estado, forma de pago, rango de fechas y,
+si el frame se creó con `search_fields`, por texto (un `TrigramIndex` por número de
+OT); `totals(pos)` suma monto, abonado y saldo de esas filas. Las posiciones son índices
+en `records`, la lista con la que se armó el frame, y salen en el orden de las planillas
+(`ot_nro` descendente, como llegan las cargas).
+
+Con `row` (registro -> `(clave, valores, tags)` de la Treeview) el frame mantiene además
+`d.fila` de cada registro: se arma una vez por carga y redibujar la tabla es juntar
+esas tuplas, sin formatear montos ni derivar tags en cada tecla.
+
+Los registros se modifican en el lugar desde la UI (`d.estado = ...`): después hay que
+llamar a `sync(d)` para esa fila (también rearma `d.fila`). Los deltas (Realtime,
+resync) van por `add(nuevos)` y `remove(ots)`: agregan al final de `records` y quitan
+pasando la última fila al hueco, sin rearmar columnas ni índice; `positions` reordena
+por `ot_nro` solo si quedaron desordenadas. `rebuild()` queda para cargas completas.
+"""
+import sys
+from array import array
+from datetime import date
+
+from plotmaster.core.utils.search_index import TrigramIndex
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dependencia opcional
+    np = None
+
+
+def _ordinal(value) -> int:
+    """Día como entero (`date.toordinal`); 0 si falta o no se puede leer."""
+    if not value:
+        return 0
+    if isinstance(value, date):
+        return value.toordinal()
+    try:
+        return date.fromisoformat(str(value)[:10]).toordinal()
+    except ValueError:
+        return 0
+
+
+def _column(typecode: str, values):
+    if np is not None:
+        return np.array(values, dtype=typecode)
+    return array(typecode, values)
+
+
+def _concat(col, typecode: str, values):
+    if np is not None:
+        return np.concatenate((col, np.array(values, dtype=typecode)))
+    col.extend(values)
+    return col
+
+
+def _int(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _intern(text) -> str:
+    return sys.intern(text) if text else ''
+
+
+class _Vocab:
+    """Texto -> código entero (0 = vacío); compara sin mayúsculas ni espacios de borde."""
+
+    __slots__ = ('codes', 'labels')
+
+    def __init__(self):
+        self.codes = {'': 0}
+        self.labels = ['']
+
+    def code(self, text) -> int:
+        key = (text or '').strip().lower()
+        c = self.codes.get(key)
+        if c is None:
+            c = self.codes[key] = len(self.labels)
+            self.labels.append(key)
+        return c
+
+    def lookup(self, texts) -> list:
+        """Códigos de los textos ya vistos (uno desconocido no coincide con ninguna fila)."""
+        keys = ((t or '').strip().lower() for t in texts)
+        return [self.codes[k] for k in keys if k in self.codes]
+
+
+class WorkOrderFrame:
+    """Columnas de una lista de `WorkOrder` para filtrar y sumar sin recorrer objetos."""
+
+    # (columna, typecode): enteros de 64 bits para nros y montos en Gs., float para abonado
+    _NUMERIC = (('ot_nro', 'q'), ('monto', 'q'), ('abonado', 'd'), ('fecha', 'i'),
+                ('estado', 'h'), ('forma_pago', 'h'))
+
+    __slots__ = ('records', 'ot_nro', 'monto', 'abonado', 'fecha', 'estado', 'forma_pago',
+                 'cliente', 'vendedor', 'descripcion', 'search_fields', 'index', 'row', '_size', '_pos',
+                 '_estados', '_formas', '_ordered')
+
+    def __init__(self, records=None, search_fields=(), row=None):
+        """`search_fields`: atributos del registro que entran en la búsqueda por texto;
+        `row`: arma `d.fila` para los registros que no la traen (ver el docstring del módulo)."""
+        self.row = row
+        self._estados = _Vocab()
+        self._formas = _Vocab()
+        self.search_fields = tuple(search_fields)
+        self.index = TrigramIndex() if self.search_fields else None
+        self.rebuild(records if records is not None else [])
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectorized(self) -> bool:
+        return np is not None
+
+    # --- CARGA ---
+
+    def _values(self, d) -> tuple:
+        return (_int(d.ot_nro), _int(d.monto), float(d.abonado or 0), _ordinal(d.fecha),
+                self._estados.code(d.estado), self._formas.code(d.forma_pago))
+
+    def rebuild(self, records=None):
+        """Arma todas las columnas desde `records` (por defecto, la misma lista de antes).
+
+        Si la lista no viene por `ot_nro` descendente (una copia filtrada después de
+        `add`/`remove`, por ejemplo) se ordena en el lugar.
+        """
+        if records is not None:
+            self.records = records
+        nros = [_int(d.ot_nro) for d in self.records]
+        if any(a < b for a, b in zip(nros, nros[1:])):
+            self.records.sort(key=lambda d: _int(d.ot_nro), reverse=True)
+        self._ordered = True
+        rows = [self._values(d) for d in self.records]
+        cols = list(zip(*rows)) if rows else [()] * len(self._NUMERIC)
+        for (name, typecode), values in zip(self._NUMERIC, cols):
+            setattr(self, name, _column(typecode, values))
+        self.cliente = [_intern(d.cliente) for d in self.records]
+        self.vendedor = [_intern(d.vendedor) for d in self.records]
+        self.descripcion = [d.descripcion for d in self.records]
+        self._size = len(self.records)
+        self._pos = {d.ot: i for i, d in enumerate(self.records)}
+        self._fill_rows(self.records)
+        if self.index is not None:
+            # Por número de OT: las que no cambiaron de texto no se reindexan
+            self.index.retain(self._pos.keys())
+            for d in self.records:
+                self._index_row(d)
+
+    def _fill_rows(self, records):
+        row = self.row
+        if row is not None:
+            for d in records:
+                if d.fila is None:
+                    d.fila = row(d)
+
+    def _index_row(self, d):
+        self.index.add(d.ot, *(getattr(d, f) for f in self.search_fields))
+
+    def _check_order(self, nuevos):
+        """Marca el frame como desordenado si `nuevos` al final rompen el `ot_nro` descendente."""
+        if self._ordered and nuevos:
+            nros = [_int(d.ot_nro) for d in nuevos]
+            if any(a < b for a, b in zip(nros, nros[1:])) \
+                    or (self._size and nros[0] > self.ot_nro[self._size - 1]):
+                self._ordered = False
+
+    def _append(self, nuevos):
+        rows = [self._values(d) for d in nuevos]
+        for (name, typecode), values in zip(self._NUMERIC, zip(*rows)):
+            setattr(self, name, _concat(getattr(self, name), typecode, values))
+        self.cliente.extend(_intern(d.cliente) for d in nuevos)
+        self.vendedor.extend(_intern(d.vendedor) for d in nuevos)
+        self.descripcion.extend(d.descripcion for d in nuevos)
+        self._fill_rows(nuevos)
+        for i, d in enumerate(nuevos, self._size):
+            self._pos[d.ot] = i
+            if self.index is not None:
+                self._index_row(d)
+        self._size += len(nuevos)
+
+    def ensure(self, records):
+        """Se pone al día con `records`: agrega solo lo nuevo si la misma lista creció
+        (carga por páginas) y rearma todo si es otra lista."""
+        if records is self.records and len(records) == self._size:
+            return
+        if records is self.records and len(records) > self._size:
+            nuevos = records[self._size:]
+            self._check_order(nuevos)
+            self._append(nuevos)
+        else:
+            self.rebuild(records)
+
+    def sync(self, d):
+        """Reescribe la fila de `d` después de cambiarlo en el lugar. False si no está
+        (`d.fila` se rearma igual: puede ser una OT que solo vino de la búsqueda remota)."""
+        if self.row is not None:
+            d.fila = self.row(d)
+        i = self._pos.get(d.ot)
+        if i is None or self.records[i] is not d:
+            return False
+        for (name, _typecode), value in zip(self._NUMERIC, self._values(d)):
+            getattr(self, name)[i] = value
+        self.cliente[i] = _intern(d.cliente)
+        self.vendedor[i] = _intern(d.vendedor)
+        self.descripcion[i] = d.descripcion
+        if self.index is not None:
+            # Sin cambios de texto el índice queda igual (y sigue refinando la búsqueda)
+            self._index_row(d)
+        return True
+
+    def add(self, nuevos) -> int:
+        """Agrega al final de `records` las OTs que no estaban. Retorna cuántas agregó."""
+        self.ensure(self.records)
+        nuevos = [d for d in nuevos if d.ot not in self._pos]
+        if not nuevos:
+            return 0
+        self._check_order(nuevos)
+        self.records.extend(nuevos)
+        if len(nuevos) > self._size:
+            # Más nuevas que cargadas: sale más barato rearmar (y reordenar) todo
+            self.rebuild()
+        else:
+            self._append(nuevos)
+        return len(nuevos)
+
+    def remove(self, ots) -> int:
+        """Quita las OTs `ots` (números como texto); la última fila pasa al lugar de cada
+        una. Retorna cuántas quitó."""
+        # Si `records` creció sin `ensure` (página recién llegada), primero ponerse al día
+        self.ensure(self.records)
+        quitadas = 0
+        for ot in ots:
+            ot = str(ot)
+            i = self._pos.pop(ot, None)
+            if i is None:
+                continue
+            if self.index is not None:
+                self.index.remove(ot)
+            last = self._size - 1
+            textos = (self.cliente, self.vendedor, self.descripcion)
+            if i != last:
+                movida = self.records[i] = self.records[last]
+                self._pos[movida.ot] = i
+                for name, _typecode in self._NUMERIC:
+                    col = getattr(self, name)
+                    col[i] = col[last]
+                for col in textos:
+                    col[i] = col[last]
+                self._ordered = False
+            self.records.pop()
+            for name, _typecode in self._NUMERIC:
+                col = getattr(self, name)
+                if np is not None:
+                    setattr(self, name, col[:last])
+                else:
+                    col.pop()
+            for col in textos:
+                col.pop()
+            self._size = last
+            quitadas += 1
+        return quitadas
+
+    # --- CONSULTAS ---
+
+    def mask(self, estados=None, formas_pago=None, desde=None, hasta=None, texto=None):
+        """Filas que cumplen todos los filtros dados (`None` = sin filtro).
+
+        `estados`/`formas_pago` son textos (sin distinguir mayúsculas); `desde`/`hasta`
+        fechas inclusive (`date` o ISO); `texto` una subcadena de los `search_fields`. Con
+        NumPy retorna un arreglo booleano; sin NumPy, una lista de bools.
+        """
+        d0, d1 = _ordinal(desde), _ordinal(hasta)
+        hits = self.index.search(texto) if texto and self.index is not None else None
+        if np is not None:
+            keep = np.ones(self._size, dtype=bool)
+            if estados is not None:
+                keep &= np.isin(self.estado, self._estados.lookup(estados))
+            if formas_pago is not None:
+                keep &= np.isin(self.forma_pago, self._formas.lookup(formas_pago))
+            if d0:
+                keep &= self.fecha >= d0
+            if d1:
+                keep &= (self.fecha > 0) & (self.fecha <= d1)
+            if hits is not None:
+                pos = self._pos
+                found = np.zeros(self._size, dtype=bool)
+                found[np.fromiter((pos[k] for k in hits), dtype=np.intp, count=len(hits))] = True
+                keep &= found
+            return keep
+        keep = [True] * self._size
+        if estados is not None:
+            codes = set(self._estados.lookup(estados))
+            keep = [k and c in codes for k, c in zip(keep, self.estado)]
+        if formas_pago is not None:
+            codes = set(self._formas.lookup(formas_pago))
+            keep = [k and c in codes for k, c in zip(keep, self.forma_pago)]
+        if d0 or d1:
+            hasta_ = d1 or sys.maxsize
+            keep = [k and f > 0 and d0 <= f <= hasta_ for k, f in zip(keep, self.fecha)]
+        if hits is not None:
+            found = {self._pos[k] for k in hits}
+            keep = [k and i in found for i, k in enumerate(keep)]
+        return keep
+
+    def positions(self, **filters):
+        """Posiciones (índices en `records`) que pasan `mask(**filters)`, por `ot_nro`
+        descendente."""
+        keep = self.mask(**filters)
+        if np is not None:
+            pos = np.flatnonzero(keep)
+            if not self._ordered:
+                pos = pos[np.argsort(-self.ot_nro[pos], kind='stable')]
+            return pos
+        pos = [i for i, k in enumerate(keep) if k]
+        if not self._ordered:
+            nros = self.ot_nro
+            pos.sort(key=lambda i: -nros[i])
+        return pos
+
+    def index_of(self, ot):
+        """Posición de la OT `ot` (número como texto) o None si no está cargada."""
+        return self._pos.get(str(ot))
+
+    def take(self, positions) -> list:
+        records = self.records
+        return [records[i] for i in positions]
+
+    def totals(self, positions=None) -> dict:
+        """Cantidad y sumas de monto, abonado y saldo (todas las filas si `positions` es None)."""
+        if positions is None:
+            monto, abonado, count = self.monto, self.abonado, self._size
+        elif np is not None:
+            idx = np.asarray(positions, dtype=np.intp)
+            monto, abonado, count = self.monto[idx], self.abonado[idx], len(idx)
+        else:
+            monto = [self.monto[i] for i in positions]
+            abonado = [self.abonado[i] for i in positions]
+            count = len(monto)
+        if np is not None:
+            total, pagado = int(monto.sum()), float(abonado.sum())
+        else:
+            total, pagado = int(sum(monto)), float(sum(abonado))
+        return {'count': count, 'monto': total, 'abonado': pagado, 'saldo': total - pagado}
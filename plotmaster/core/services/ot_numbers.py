@@ -0,0 +1,146 @@
+"""Asignación de números de OT sin colisiones, con bloques reservados.
+
+Cada vendedor reserva un bloque chico de números en un solo round trip
+(`reserve_ot_numbers`) y los entrega localmente sin ir a la base. Los números que no
+se usan vuelven al pool del servidor con `release_all()` (al cerrar la app) o vencen
+solos después de `OT_RESERVA_TTL_MINUTOS`. Sin reserva no hay número: calcularlo
+como max(ot_nro)+1 vuelve a chocar con los bloques que ya tienen otros vendedores.
+"""
+import atexit
+import threading
+import time
+
+from plotmaster.core.services.supabase_service import (
+    OT_RESERVA_TTL_MINUTOS,
+    release_ot_numbers,
+    reserve_ot_numbers,
+)
+
+OT_BLOCK_SIZE = 5
+# Los números locales se descartan un poco antes de que venza la reserva en el servidor
+_EXPIRY_MARGIN_SECONDS = 120
+# Cuánto espera `take` una reserva que ya está en curso antes de darse por vencido
+_REFILL_WAIT_SECONDS = 30
+
+
+class OTNumberAllocator:
+    """Pool local de números de OT reservados para `reservado_por`."""
+
+    def __init__(self, reservado_por: str, block_size: int = OT_BLOCK_SIZE, ttl_minutos: int = OT_RESERVA_TTL_MINUTOS):
+        self.reservado_por = str(reservado_por)
+        self.block_size = max(1, int(block_size))
+        self.ttl_minutos = int(ttl_minutos)
+        self._lock = threading.Lock()
+        # Avisa a quien espera en `take` que terminó la reserva en curso
+        self._refilled = threading.Condition(self._lock)
+        self._pool = []          # números disponibles (orden ascendente)
+        self._expires_at = 0.0   # vencimiento local del bloque actual (monotonic)
+        self._refilling = False  # hay una reserva en curso (a lo sumo una a la vez)
+        self.last_error = None
+
+    def _valid(self):
+        return time.monotonic() < self._expires_at
+
+    def _reserve_block(self):
+        ok, nros = reserve_ot_numbers(self.block_size, self.reservado_por, self.ttl_minutos)
+        if not ok or not nros:
+            self.last_error = nros if not ok else "El servidor no devolvió números de OT."
+            return False
+        self.last_error = None
+        with self._lock:
+            if not self._valid():
+                self._pool = []
+            # Al mezclar bloques vale el vencimiento más cercano (el del bloque anterior)
+            expires_at = time.monotonic() + self.ttl_minutos * 60 - _EXPIRY_MARGIN_SECONDS
+            self._expires_at = min(self._expires_at, expires_at) if self._pool else expires_at
+            self._pool = sorted(set(self._pool) | set(nros))
+        return True
+
+    def _refill(self):
+        # Quien llama ya marcó `_refilling`
+        try:
+            self._reserve_block()
+        finally:
+            with self._refilled:
+                self._refilling = False
+                self._refilled.notify_all()
+
+    def _pop(self):
+        # Con el lock tomado
+        if not self._valid():
+            self._pool = []
+        return self._pool.pop(0) if self._pool else None
+
+    def take(self):
+        """Entrega el próximo número. Solo va a la base cuando el bloque se agotó o venció.
+
+        Retorna None si no se pudo reservar un bloque (sin conexión o sin la RPC); el
+        motivo queda en `last_error`.
+        """
+        with self._refilled:
+            nro = self._pop()
+            if nro is None and self._refilling:
+                # Ya hay una reserva en curso: se espera esa en vez de pedir otro bloque
+                self._refilled.wait_for(lambda: not self._refilling, _REFILL_WAIT_SECONDS)
+                nro = self._pop()
+            reservar = nro is None and not self._refilling
+            if reservar:
+                self._refilling = True
+        if reservar:
+            self._refill()
+            with self._lock:
+                nro = self._pop()
+        if nro is None:
+            return None
+        with self._lock:
+            # Pedir el siguiente bloque en segundo plano antes de quedarse sin números
+            start_refill = not self._pool and not self._refilling
+            if start_refill:
+                self._refilling = True
+        if start_refill:
+            threading.Thread(target=self._refill, daemon=True).start()
+        return nro
+
+    def give_back(self, nro):
+        """Devuelve al pool local un número entregado que no se usó (sigue reservado)."""
+        try:
+            nro = int(nro)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            if self._valid() and nro not in self._pool:
+                self._pool.append(nro)
+                self._pool.sort()
+
+    def release_all(self):
+        """Devuelve al servidor los números reservados sin usar."""
+        with self._lock:
+            nros, self._pool = self._pool, []
+            valid = self._valid()
+        if nros and valid:
+            release_ot_numbers(nros, self.reservado_por)
+
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+
+def get_ot_allocator(reservado_por: str) -> OTNumberAllocator:
+    """Un allocator por vendedor y proceso: sobrevive a que se reconstruya el formulario."""
+    key = str(reservado_por or 'anonimo')
+    with _allocators_lock:
+        allocator = _allocators.get(key)
+        if allocator is None:
+            allocator = _allocators[key] = OTNumberAllocator(key)
+        return allocator
+
+
+@atexit.register
+def _release_all_allocators():
+    with _allocators_lock:
+        allocators = list(_allocators.values())
+    for allocator in allocators:
+        try:
+            allocator.release_all()
+        except Exception:
+            pass
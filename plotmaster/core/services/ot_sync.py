@@ -0,0 +1,143 @@
+"""Sincronización incremental de `ordenes_trabajo`.
+
+`WorkOrderSync` mantiene un espejo local de las OTs (por `ot_nro`) y, después de la
+carga inicial, solo pide las filas con `updated_at` posterior a la última marca de agua
+y los tombstones de `ordenes_trabajo_eliminadas`. Así el costo de "Actualizar" depende
+de cuántas OTs cambiaron y no del tamaño de la tabla.
+"""
+import re
+import threading
+from datetime import datetime, timedelta
+
+from plotmaster.core.utils.singleflight import SingleFlight, coalesce
+from plotmaster.core.services.supabase_service import (
+    get_deleted_work_orders_since,
+    get_work_order_sync_marks,
+    get_work_orders_changed_since,
+    iter_work_orders,
+)
+
+# Margen que se resta a la marca al pedir deltas: `now()` de Postgres es la hora de
+# inicio de la transacción, así que una escritura puede confirmarse con un `updated_at`
+# algo anterior a la marca. Las filas repetidas se descartan al comparar con el espejo.
+SYNC_OVERLAP_SECONDS = 5
+
+# Dos "Actualizar" seguidos sobre el mismo espejo comparten el mismo delta
+_refreshes = SingleFlight()
+
+_FRACTION_RE = re.compile(r"\.(\d+)")
+
+
+def _parse_ts(value):
+    """Parsea un timestamptz de PostgREST (fracción de 1 a 6 dígitos, `Z` u offset)."""
+    if not value:
+        return None
+    text = str(value).strip().replace(' ', 'T').replace('Z', '+00:00')
+    text = _FRACTION_RE.sub(lambda m: '.' + m.group(1)[:6].ljust(6, '0'), text, count=1)
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return None
+
+
+def _shift_mark(mark, seconds):
+    """Resta `seconds` a la marca; si no se puede parsear se usa tal cual."""
+    parsed = _parse_ts(mark)
+    if parsed is None:
+        return mark
+    return (parsed - timedelta(seconds=seconds)).isoformat(timespec='milliseconds')
+
+
+def _max_mark(current, candidate):
+    if not candidate:
+        return current
+    if not current:
+        return candidate
+    a, b = _parse_ts(current), _parse_ts(candidate)
+    if a is None or b is None:
+        return max(current, candidate)
+    return candidate if b > a else current
+
+
+class WorkOrderSync:
+    """Espejo local de OTs con sincronización por `updated_at` + tombstones.
+
+    Uso típico desde la UI (siempre en un hilo de fondo):
+
+        for ok, page in sync.iter_full_load(): ...   # carga inicial paginada
+        ok, cambios = sync.refresh()                 # {'upserted': [...], 'deleted': [...]}
+    """
+
+    def __init__(self, vendedor=None, overlap_seconds: float = SYNC_OVERLAP_SECONDS, vendedor_id=None):
+        self.vendedor = vendedor
+        self.vendedor_id = vendedor_id
+        self.overlap_seconds = overlap_seconds
+        self.rows = {}  # ot_nro -> fila tal como la devuelve el servicio
+        self._updated_mark = None
+        self._deleted_mark = None
+        self._lock = threading.Lock()
+        self.primed = False
+
+    def iter_full_load(self):
+        """Carga completa paginada; al terminar sin errores deja el espejo listo para deltas."""
+        # Las marcas se toman antes de leer: lo que cambie durante la carga vuelve en el próximo delta
+        ok, marks = get_work_order_sync_marks()
+        if not ok:
+            yield False, marks
+            return
+        rows = {}
+        for ok, page in iter_work_orders(vendedor=self.vendedor, vendedor_id=self.vendedor_id):
+            if not ok:
+                yield False, page
+                return
+            for r in page:
+                rows[r.get('ot_nro')] = dict(r)
+            yield True, page
+        with self._lock:
+            self.rows = rows
+            self._updated_mark, self._deleted_mark = marks
+            self.primed = True
+
+    @coalesce(_refreshes)
+    def refresh(self):
+        """Trae solo lo modificado desde la última marca y lo aplica al espejo.
+
+        Retorna `(True, {'upserted': [filas], 'deleted': [ot_nro]})` con los cambios
+        reales (las filas repetidas por el margen no se informan) o `(False, mensaje)`.
+        """
+        if not self.primed:
+            return False, "El espejo de OTs no tiene carga inicial."
+        with self._lock:
+            updated_mark, deleted_mark = self._updated_mark, self._deleted_mark
+        since_upd = _shift_mark(updated_mark, self.overlap_seconds) if updated_mark else None
+        since_del = _shift_mark(deleted_mark, self.overlap_seconds) if deleted_mark else None
+
+        ok, changed = get_work_orders_changed_since(since_upd, vendedor=self.vendedor, vendedor_id=self.vendedor_id)
+        if not ok:
+            return False, changed
+        ok, tombstones = get_deleted_work_orders_since(since_del)
+        if not ok:
+            return False, tombstones
+
+        upserted, deleted = [], []
+        with self._lock:
+            # Primero los borrados: si un ot_nro se borró y se volvió a crear, gana la fila nueva
+            alive = {r.get('ot_nro') for r in changed}
+            for t in tombstones:
+                ot_nro = t.get('ot_nro')
+                deleted_mark = _max_mark(deleted_mark, t.get('deleted_at'))
+                if ot_nro in alive:
+                    continue
+                if self.rows.pop(ot_nro, None) is not None:
+                    deleted.append(ot_nro)
+            for r in changed:
+                updated_mark = _max_mark(updated_mark, r.get('updated_at'))
+                row = dict(r)
+                row.pop('updated_at', None)
+                key = row.get('ot_nro')
+                if self.rows.get(key) == row:
+                    continue
+                self.rows[key] = row
+                upserted.append(dict(row))
+            self._updated_mark, self._deleted_mark = updated_mark, deleted_mark
+        return True, {'upserted': upserted, 'deleted': deleted}
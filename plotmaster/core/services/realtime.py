@@ -0,0 +1,271 @@
+"""Cambios de OTs empujados a las planillas abiertas (Supabase Realtime).
+
+Las planillas solo veían OTs nuevas o pagos de otros usuarios al tocar "Actualizar".
+`WorkOrderFeed` se suscribe a los `postgres_changes` de `ordenes_trabajo`, `abonos` y
+`cancelaciones` y avisa a las planillas qué OTs cambiaron:
+
+- los eventos de una ráfaga (un abono toca `abonos` y `ordenes_trabajo`; una acción en
+  lote, muchas OTs) se juntan durante `DEBOUNCE_SECONDS` en un solo `ChangeBatch`;
+- la planilla pide solo esas OTs, las parchea en el lugar e invalida su detalle;
+- si el canal se cae (o no se puede abrir) se pasa a polling: cada `POLL_SECONDS` se
+  avisa un `ChangeBatch` con `resync=True` (la planilla pide el delta completo) y se
+  vuelve a intentar el canal; al reconectar se pide un delta más por lo perdido.
+
+La suscripción es una sola por proceso y corre en el loop de `async_service`; los
+avisos llegan en ese hilo (la planilla los pasa a Tk con `after`). La URL es
+`PLOTMASTER_REALTIME_URL` o `SUPABASE_URL` + `/realtime/v1`; sin ninguna, `listen` no
+hace nada. Con `PLOTMASTER_BACKEND=local` solo vale `PLOTMASTER_REALTIME_URL` (p. ej. la
+de `local_realtime.LocalRealtimeServer`): los ids de producción no sirven en la base local.
+"""
+import asyncio
+import os
+import threading
+
+from plotmaster.core.services import async_service
+
+try:
+    from realtime import AsyncRealtimeClient, RealtimeSubscribeStates
+except ImportError:  # pragma: no cover - dependencia opcional
+    AsyncRealtimeClient = None
+    RealtimeSubscribeStates = None
+
+WATCHED_TABLES = ('ordenes_trabajo', 'abonos', 'cancelaciones')
+# Ventana para juntar una ráfaga de eventos en un solo aviso
+DEBOUNCE_SECONDS = 0.5
+# Sin canal: cada cuánto se pide el delta y se reintenta la suscripción
+POLL_SECONDS = 30
+# Cada cuánto se revisa que el canal siga vivo
+WATCH_SECONDS = 1.0
+# Plazo para que el servidor confirme la suscripción
+SUBSCRIBE_TIMEOUT_SECONDS = 10
+
+
+def _local_backend() -> bool:
+    backend = (os.environ.get("PLOTMASTER_BACKEND") or "supabase").strip().lower()
+    return backend in ("local", "sqlite")
+
+
+def realtime_url():
+    url = os.environ.get('PLOTMASTER_REALTIME_URL')
+    if url:
+        return url
+    if _local_backend():
+        # `.env` puede traer SUPABASE_URL: no se escucha producción con la base local
+        return None
+    base = os.environ.get('SUPABASE_URL')
+    return base.rstrip('/') + '/realtime/v1' if base else None
+
+
+class ChangeBatch:
+    """OTs tocadas por una ráfaga: `ots` (ot_nro) e `ids` (`ordenes_trabajo.id`).
+
+    `resync` indica que no se sabe qué cambió (polling o reconexión).
+    """
+
+    __slots__ = ('ots', 'ids', 'resync')
+
+    def __init__(self, resync: bool = False):
+        self.ots = set()
+        self.ids = set()
+        self.resync = resync
+
+    def __bool__(self):
+        return bool(self.resync or self.ots or self.ids)
+
+    def add(self, data: dict):
+        """Suma un evento (`data` de `postgres_changes`)."""
+        record = data.get('record') or data.get('old_record') or {}
+        if data.get('table') == 'ordenes_trabajo':
+            if record.get('ot_nro') is not None:
+                self.ots.add(record['ot_nro'])
+            if record.get('id') is not None:
+                self.ids.add(record['id'])
+        else:
+            # abonos / cancelaciones: la OT afectada es `ot_id` (también en el registro viejo)
+            for rec in (data.get('record') or {}, data.get('old_record') or {}):
+                if rec.get('ot_id') is not None:
+                    self.ids.add(rec['ot_id'])
+
+    def __repr__(self):
+        return f"ChangeBatch(ots={sorted(self.ots)!r}, ids={sorted(self.ids)!r}, resync={self.resync!r})"
+
+
+class WorkOrderFeed:
+    """Suscripción compartida a los cambios de OTs (ver el docstring del módulo).
+
+    `mode` es 'off' (sin oyentes), 'connecting', 'realtime' o 'polling'.
+    """
+
+    def __init__(self, url=None, key=None, tables=WATCHED_TABLES, debounce: float = DEBOUNCE_SECONDS,
+                 poll_seconds: float = POLL_SECONDS, watch_seconds: float = WATCH_SECONDS):
+        self.url = url
+        self.key = key
+        self.tables = tuple(tables)
+        self.debounce = debounce
+        self.poll_seconds = poll_seconds
+        self.watch_seconds = watch_seconds
+        self.mode = 'off'
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._future = None
+        # Generación del `_run` vigente: uno que quedó sin oyentes no sigue aunque lleguen otros
+        self._gen = 0
+        self._pending = ChangeBatch()
+        self._flush_handle = None
+        self._caido = False
+
+    def listen(self, fn):
+        """`fn(ChangeBatch)` en cada aviso (desde el loop de fondo). Retorna la función
+        para dejar de escuchar; con el último oyente se cierra la suscripción."""
+        with self._lock:
+            self._listeners.append(fn)
+            if self._future is None:
+                self._gen += 1
+                self._future = async_service.submit(self._run(self._gen))
+
+        def _off():
+            with self._lock:
+                if fn in self._listeners:
+                    self._listeners.remove(fn)
+        return _off
+
+    # --- AVISOS ---
+
+    def _on_change(self, payload):
+        self._pending.add(payload.get('data') or {})
+        self._schedule_flush()
+
+    def _resync(self):
+        self._pending.resync = True
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        # Ventana fija desde el primer evento: una ráfaga larga no posterga el aviso
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.debounce, self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        batch, self._pending = self._pending, ChangeBatch()
+        if not batch:
+            return
+        with self._lock:
+            listeners = list(self._listeners)
+        for fn in listeners:
+            try:
+                fn(batch)
+            except Exception as e:
+                print(f"Error al avisar cambios de OTs: {e}")
+
+    # --- SUSCRIPCIÓN ---
+
+    def _active(self, gen) -> bool:
+        with self._lock:
+            if gen != self._gen:
+                return False
+            if self._listeners:
+                return True
+            self._future = None
+            self.mode = 'off'
+            return False
+
+    async def _run(self, gen):
+        while self._active(gen):
+            client, error = None, "se cerró el canal"
+            try:
+                self.mode = 'connecting'
+                client, channel = await self._subscribe()
+                self.mode = 'realtime'
+                if self._caido:
+                    # Lo que cambió mientras no había canal
+                    self._resync()
+                while self._alive(client, channel):
+                    await asyncio.sleep(self.watch_seconds)
+                    if not self._active(gen):
+                        return
+            except Exception as e:
+                error = e
+            finally:
+                if client is not None:
+                    try:
+                        await client.close()
+                    except Exception:
+                        pass
+            if not self._active(gen):
+                return
+            # Se avisa al entrar en polling, no en cada reintento
+            if self.mode == 'realtime' or not self._caido:
+                print(f"Realtime no disponible ({error}): se consultan las OTs cada {self.poll_seconds:g} s.")
+            self.mode = 'polling'
+            self._caido = True
+            self._resync()
+            await self._sleep(self.poll_seconds, gen)
+
+    async def _sleep(self, seconds, gen):
+        # Corta antes si ya no quedan oyentes
+        loop = asyncio.get_running_loop()
+        fin = loop.time() + seconds
+        while loop.time() < fin and self._active(gen):
+            await asyncio.sleep(min(self.watch_seconds, max(0.0, fin - loop.time())))
+
+    async def _subscribe(self):
+        if AsyncRealtimeClient is None:
+            raise RuntimeError("El paquete realtime no está instalado.")
+        # Sin reconexión propia del cliente: la maneja `_run` (con polling mientras tanto)
+        client = AsyncRealtimeClient(self.url, self.key, auto_reconnect=False, max_retries=1)
+        try:
+            channel = client.channel('plotmaster-ots')
+            for table in self.tables:
+                channel.on_postgres_changes('*', callback=self._on_change, table=table, schema='public')
+            estado = asyncio.get_running_loop().create_future()
+
+            def _on_status(state, err):
+                if not estado.done():
+                    estado.set_result((state, err))
+
+            await channel.subscribe(_on_status)
+            state, err = await asyncio.wait_for(estado, SUBSCRIBE_TIMEOUT_SECONDS)
+            if state != RealtimeSubscribeStates.SUBSCRIBED:
+                raise RuntimeError(f"suscripción {state}: {err}")
+        except BaseException:
+            try:
+                await client.close()
+            except Exception:
+                pass
+            raise
+        return client, channel
+
+    @staticmethod
+    def _alive(client, channel) -> bool:
+        # El cliente no marca la conexión como caída si el servidor la cierra: se mira
+        # también la tarea que lee el websocket
+        listen_task = getattr(client, '_listen_task', None)
+        return (client.is_connected and channel.is_joined
+                and (listen_task is None or not listen_task.done()))
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_feed():
+    """La suscripción compartida del proceso, o None si no hay servidor configurado."""
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            url = realtime_url()
+            if not url:
+                return None
+            key = os.environ.get('PLOTMASTER_REALTIME_KEY')
+            if not key and not _local_backend():
+                key = os.environ.get('SUPABASE_KEY')
+            _feed = WorkOrderFeed(url, key)
+        return _feed
+
+
+def listen(fn):
+    """`WorkOrderFeed.listen` sobre la suscripción compartida; sin Realtime, no hace nada."""
+    feed = get_feed()
+    if feed is None:
+        return lambda: None
+    return feed.listen(fn)
@@ -0,0 +1,246 @@
+"""Registros compactos para las filas que muestran las planillas.
+
+Las planillas tienen miles de OTs en memoria; como dicts cada fila repite sus claves
+y la UI las leía con `.get()` y cadenas de fallbacks (`abonado_total` -> `sena` ->
+suma de `pagos`). Estas clases usan `__slots__` (sin `__dict__` por instancia) y
+resuelven esos fallbacks una sola vez, al armarse desde la fila del servicio con
+`from_row`. La UI usa atributos: `ot.monto`, `ot.abonado`, `pago.fecha`.
+
+`WorkOrder.fila` guarda la fila de la tabla ya armada por la planilla (textos
+formateados y tag); ver `WorkOrderFrame(row=...)`.
+
+Las planillas arman sus OTs solo con `WorkOrder.from_rows` (o pidiendo `as_records=True`
+al servicio), así el estado y los fallbacks son los mismos en la del admin y la del vendedor.
+"""
+
+ENVIO_CON = "Con Envío"
+ENVIO_SIN = "Sin Envío (Retira)"
+
+
+def _amount(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _int_amount(value) -> int:
+    return int(round(_amount(value)))
+
+
+def _date_text(value) -> str:
+    """Fecha `YYYY-MM-DD` a partir de un `date`/`datetime` o de un texto ISO."""
+    if not value:
+        return ''
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    return str(value).split('T')[0]
+
+
+def normalize_estado(value) -> str:
+    """Estado canónico de `ordenes_estados` (tolera mayúsculas y variantes viejas); vacío o
+    desconocido -> 'Pendiente'."""
+    if not value:
+        return 'Pendiente'
+    s = str(value).strip().lower()
+    if 'cancel' in s:
+        return 'Cancelado'
+    if s in ('pendiente', 'pending'):
+        return 'Pendiente'
+    if 'rechaz' in s:
+        return 'Rechazado'
+    if s in ('aprobado', 'aprovado', 'aprobed'):
+        return 'Aprobado'
+    if 'entreg' in s:
+        return 'Entregado'
+    if s in ('finalizado', 'finalizado/a', 'final'):
+        return 'Finalizado'
+    return 'Pendiente'
+
+
+class Abono:
+    """Un pago registrado sobre una OT (tabla `abonos`)."""
+
+    __slots__ = ('id', 'monto', 'fecha', 'creado_por', 'observacion')
+
+    def __init__(self, id=None, monto: float = 0.0, fecha: str = '', creado_por=None, observacion=None):
+        self.id = id
+        self.monto = monto
+        self.fecha = fecha
+        self.creado_por = creado_por
+        self.observacion = observacion
+
+    @classmethod
+    def from_row(cls, row: dict):
+        return cls(
+            id=row.get('id'),
+            monto=_amount(row.get('monto')),
+            fecha=_date_text(row.get('fecha_abono')),
+            creado_por=row.get('creado_por'),
+            observacion=row.get('observacion'),
+        )
+
+    def __repr__(self):
+        return f"Abono(id={self.id!r}, monto={self.monto!r}, fecha={self.fecha!r})"
+
+
+class WorkOrder:
+    """Una OT tal como la muestran las planillas (`ot` es el número como texto)."""
+
+    __slots__ = (
+        'id', 'ot_nro', 'ot', 'fecha', 'cliente', 'cliente_ci_ruc', 'vendedor', 'vendedor_ci_ruc',
+        'descripcion', 'monto', 'sena', 'abonado', 'forma_pago', 'estado', 'solicita_envio',
+        'fecha_entrega', 'pagos', 'fila',
+    )
+
+    def __init__(self, ot_nro=None, id=None, fecha: str = '', cliente: str = '', cliente_ci_ruc: str = '',
+                 vendedor: str = '', vendedor_ci_ruc: str = '', descripcion: str = '', monto: int = 0,
+                 sena: float = 0.0, abonado: float = 0.0, forma_pago: str = '', estado: str = '',
+                 solicita_envio: bool = False, fecha_entrega=None, pagos=None):
+        self.id = id
+        self.ot_nro = ot_nro
+        self.ot = str(ot_nro or '')
+        self.fecha = fecha
+        self.cliente = cliente
+        self.cliente_ci_ruc = cliente_ci_ruc
+        self.vendedor = vendedor
+        self.vendedor_ci_ruc = vendedor_ci_ruc
+        self.descripcion = descripcion
+        self.monto = monto
+        self.sena = sena
+        self.abonado = abonado
+        self.forma_pago = forma_pago
+        self.estado = estado
+        self.solicita_envio = solicita_envio
+        self.fecha_entrega = fecha_entrega
+        self.pagos = pagos if pagos is not None else []
+        # (clave, valores, tags) para la Treeview; None hasta que la planilla la arma
+        self.fila = None
+
+    @classmethod
+    def from_row(cls, row: dict):
+        """Arma la OT desde una fila del servicio (ya aplanada; `abonos` embebidos opcionales)."""
+        pagos = [Abono.from_row(p) for p in (row.get('abonos') or ())]
+        # Abonado: `abonado_total` (esquema actual); si falta, la seña o la suma de los pagos
+        if row.get('abonado_total') is not None:
+            abonado = _amount(row.get('abonado_total'))
+        elif row.get('sena') is not None:
+            abonado = _amount(row.get('sena'))
+        else:
+            abonado = sum(p.monto for p in pagos)
+        return cls(
+            ot_nro=row.get('ot_nro'),
+            id=row.get('id'),
+            fecha=_date_text(row.get('fecha_creacion') or row.get('created_at')),
+            cliente=row.get('cliente') or row.get('cliente_ci_ruc') or '',
+            cliente_ci_ruc=row.get('cliente_ci_ruc') or '',
+            vendedor=row.get('vendedor') or '',
+            vendedor_ci_ruc=row.get('vendedor_ci_ruc') or '',
+            descripcion=row.get('descripcion') or '',
+            monto=_int_amount(row.get('valor_total')),
+            sena=_amount(row.get('sena')),
+            abonado=abonado,
+            forma_pago=row.get('forma_pago') or '',
+            estado=normalize_estado(row.get('status')),
+            solicita_envio=bool(row.get('solicita_envio')),
+            fecha_entrega=row.get('fecha_entrega'),
+            pagos=pagos,
+        )
+
+    @classmethod
+    def from_rows(cls, rows) -> list:
+        """Las OTs de un listado, en el mismo orden."""
+        return [cls.from_row(r) for r in (rows or ())]
+
+    @property
+    def saldo(self):
+        return self.monto - self.abonado
+
+    @property
+    def envio(self) -> str:
+        return ENVIO_CON if self.solicita_envio else ENVIO_SIN
+
+    @property
+    def tag(self) -> str:
+        """Tag de la fila en la Treeview (el estado en minúsculas)."""
+        return (self.estado or '').strip().lower()
+
+    def merge_detail(self, detalle: 'WorkOrder'):
+        """Toma del detalle lo que el listado no trae (pagos) o puede estar desactualizado."""
+        self.pagos = list(detalle.pagos)
+        self.abonado = detalle.abonado
+        self.fecha_entrega = detalle.fecha_entrega
+        self.solicita_envio = detalle.solicita_envio
+        self.forma_pago = detalle.forma_pago or self.forma_pago
+
+    def copy_from(self, other: 'WorkOrder'):
+        """Reemplaza todos los campos en el lugar (las referencias a este objeto siguen valiendo)."""
+        for name in self.__slots__:
+            setattr(self, name, getattr(other, name))
+
+    def __repr__(self):
+        return f"WorkOrder(ot={self.ot!r}, estado={self.estado!r}, monto={self.monto!r}, abonado={self.abonado!r})"
+
+
+class Client:
+    """Un cliente (tabla `clientes`); los textos faltantes quedan como ''."""
+
+    __slots__ = ('id', 'nombre', 'ci_ruc', 'telefono', 'email', 'zona', 'created_at')
+
+    def __init__(self, id=None, nombre: str = '', ci_ruc: str = '', telefono: str = '', email: str = '',
+                 zona: str = '', created_at=None):
+        self.id = id
+        self.nombre = nombre
+        self.ci_ruc = ci_ruc
+        self.telefono = telefono
+        self.email = email
+        self.zona = zona
+        self.created_at = created_at
+
+    @classmethod
+    def from_row(cls, row: dict):
+        return cls(
+            id=row.get('id'),
+            nombre=row.get('nombre') or '',
+            ci_ruc=str(row.get('ci_ruc') or ''),
+            telefono=row.get('telefono') or '',
+            email=row.get('email') or '',
+            zona=row.get('zona') or '',
+            created_at=row.get('created_at'),
+        )
+
+    def __repr__(self):
+        return f"Client(id={self.id!r}, ci_ruc={self.ci_ruc!r}, nombre={self.nombre!r})"
+
+
+class User:
+    """Un vendedor (tabla `usuarios`) sin credenciales: el hash y la sal no se copian."""
+
+    __slots__ = ('id', 'ci_ruc', 'nombre', 'email', 'estado', 'fecha_registro', 'telefono', 'zona')
+
+    def __init__(self, id=None, ci_ruc: str = '', nombre: str = '', email: str = '', estado=None,
+                 fecha_registro=None, telefono: str = '', zona: str = ''):
+        self.id = id
+        self.ci_ruc = ci_ruc
+        self.nombre = nombre
+        self.email = email
+        self.estado = estado
+        self.fecha_registro = fecha_registro
+        self.telefono = telefono
+        self.zona = zona
+
+    @classmethod
+    def from_row(cls, row: dict):
+        return cls(
+            id=row.get('id'),
+            ci_ruc=str(row.get('ci_ruc') or ''),
+            nombre=row.get('nombre') or '',
+            email=row.get('email') or '',
+            estado=row.get('estado'),
+            fecha_registro=row.get('fecha_registro') or row.get('created_at'),
+            telefono=row.get('telefono') or '',
+            zona=row.get('zona') or '',
+        )
+
+    def __repr__(self):
+        return f"User(id={self.id!r}, ci_ruc={self.ci_ruc!r}, nombre={self.nombre!r})"
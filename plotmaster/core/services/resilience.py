@@ -0,0 +1,342 @@
+"""Política común para las llamadas al backend: plazos, reintentos y circuit breaker.
+
+`guard_client(client)` envuelve al cliente de Supabase (o al local) y hace pasar cada
+`.execute()` por `CallPolicy`:
+
+- plazo por llamada: cada request tiene un tiempo máximo (`deadline()` permite fijar un
+  presupuesto total para varias consultas seguidas); el transporte HTTP lo usa como
+  timeout y nunca espera más que lo que queda,
+- reintentos con backoff exponencial y jitter, solo para lecturas (`select`, o RPC de
+  solo lectura) y solo ante errores de red/timeouts,
+- circuit breaker: después de varios errores de red seguidos deja de ir a la red por un
+  rato y falla al instante con `BackendUnavailable`, así la UI no acumula hilos
+  colgados en "Cargando…". Pasado el enfriamiento deja pasar una llamada de prueba.
+
+Los errores que devuelve el servidor (restricciones, RLS, etc.) no se reintentan y
+cuentan como "backend alcanzable" para el breaker.
+"""
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from plotmaster.core.utils import tracing
+
+# Errores de red/timeout: se reintentan y cuentan para el breaker (también los usan
+# quienes cortan un proceso largo para reanudarlo después, p. ej. `bulk_import`)
+try:
+    import httpx
+    TRANSIENT_ERRORS = (httpx.TransportError, ConnectionError, TimeoutError)
+    _TIMEOUT_ERRORS = (httpx.TimeoutException, TimeoutError)
+except ImportError:
+    TRANSIENT_ERRORS = (ConnectionError, TimeoutError)
+    _TIMEOUT_ERRORS = (TimeoutError,)
+
+# Plazo por defecto de una consulta (lecturas / escrituras), en segundos
+READ_DEADLINE_SECONDS = 15.0
+WRITE_DEADLINE_SECONDS = 20.0
+# Backoff de lecturas: 0.2s, 0.4s, 0.8s... con jitter completo y tope
+RETRY_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 0.2
+RETRY_MAX_SECONDS = 2.0
+# Breaker: errores de red seguidos para abrir y tiempo de enfriamiento
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN_SECONDS = 15.0
+
+# Métodos del query builder que convierten la consulta en escritura
+_WRITE_METHODS = frozenset(('insert', 'update', 'upsert', 'delete'))
+
+
+class BackendUnavailable(ConnectionError):
+    """El breaker está abierto: no se intenta la llamada."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Se agotó el plazo de la llamada."""
+
+
+# --- PLAZOS ---
+
+_local = threading.local()
+
+
+def current_deadline():
+    """Instante (monotonic) en que vence el plazo activo en este hilo, o None."""
+    return getattr(_local, 'deadline', None)
+
+
+def remaining_time():
+    """Segundos que quedan del plazo activo (None si no hay plazo)."""
+    deadline = current_deadline()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Fija un plazo para todo lo que se ejecute dentro del bloque en este hilo.
+
+    Los plazos anidados nunca extienden al externo: vale el que vence primero.
+    """
+    previous = current_deadline()
+    new = time.monotonic() + float(seconds)
+    _local.deadline = new if previous is None else min(previous, new)
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+# --- CIRCUIT BREAKER ---
+
+class CircuitBreaker:
+    """closed -> open (tras `failure_threshold` errores de red) -> half_open -> closed."""
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown_seconds: float = BREAKER_COOLDOWN_SECONDS,
+                 clock=time.monotonic):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown_seconds = float(cooldown_seconds)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_error = None
+        self._stats = {'rejected': 0, 'opened': 0}
+
+    def allow(self):
+        """Levanta `BackendUnavailable` si no corresponde ir a la red."""
+        with self._lock:
+            if self._state == 'open':
+                wait = self.cooldown_seconds - (self._clock() - self._opened_at)
+                if wait > 0:
+                    self._stats['rejected'] += 1
+                    raise BackendUnavailable(f"Servidor no disponible; se reintentará en {int(wait) + 1} s.")
+                self._state = 'half_open'
+            if self._state == 'half_open':
+                # Una sola llamada de prueba a la vez
+                if self._probe_in_flight:
+                    self._stats['rejected'] += 1
+                    raise BackendUnavailable("Reconectando con el servidor...")
+                self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._state = 'closed'
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, error):
+        with self._lock:
+            self._failures += 1
+            self._last_error = str(error) or error.__class__.__name__
+            reopen = self._state == 'half_open'
+            self._probe_in_flight = False
+            if reopen or (self._state == 'closed' and self._failures >= self.failure_threshold):
+                self._state = 'open'
+                self._opened_at = self._clock()
+                self._stats['opened'] += 1
+
+    def release_probe(self):
+        """La llamada de prueba terminó sin veredicto (p. ej. se canceló)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def status(self) -> dict:
+        with self._lock:
+            state = self._state
+            retry_in = 0.0
+            if state == 'open':
+                retry_in = max(0.0, self.cooldown_seconds - (self._clock() - self._opened_at))
+                if retry_in == 0.0:
+                    state = 'half_open'
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'retry_in': retry_in,
+                'last_error': self._last_error,
+                **self._stats,
+            }
+
+
+# --- POLÍTICA ---
+
+def _row_count(response) -> int:
+    data = getattr(response, 'data', None)
+    if isinstance(data, list):
+        return len(data)
+    return 0 if data is None else 1
+
+
+class CallPolicy:
+    """Ejecuta una llamada con plazo, reintentos (si es idempotente) y breaker."""
+
+    def __init__(self, breaker: CircuitBreaker = None, attempts: int = RETRY_ATTEMPTS,
+                 base_delay: float = RETRY_BASE_SECONDS, max_delay: float = RETRY_MAX_SECONDS,
+                 read_deadline: float = READ_DEADLINE_SECONDS, write_deadline: float = WRITE_DEADLINE_SECONDS):
+        self.breaker = breaker or CircuitBreaker()
+        self.attempts = max(1, int(attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.read_deadline = read_deadline
+        self.write_deadline = write_deadline
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'retries': 0, 'failures': 0, 'deadline_exceeded': 0}
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _backoff(self, attempt: int) -> float:
+        # Jitter completo: evita que varios hilos reintenten todos al mismo tiempo
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, fn, idempotent: bool = False):
+        self._count('calls')
+        budget = self.read_deadline if idempotent else self.write_deadline
+        with deadline(budget):
+            attempts = self.attempts if idempotent else 1
+            for attempt in range(attempts):
+                left = remaining_time()
+                if left is not None and left <= 0:
+                    self._count('deadline_exceeded')
+                    raise DeadlineExceeded("Se agotó el tiempo de espera de la consulta.")
+                self.breaker.allow()
+                tracing.add('round_trips')
+                try:
+                    result = fn()
+                except TRANSIENT_ERRORS as e:
+                    self.breaker.record_failure(e)
+                    delay = self._backoff(attempt)
+                    left = remaining_time()
+                    if attempt + 1 >= attempts or (left is not None and left <= delay):
+                        self._count('failures')
+                        if isinstance(e, _TIMEOUT_ERRORS):
+                            self._count('deadline_exceeded')
+                        raise
+                    self._count('retries')
+                    time.sleep(delay)
+                    continue
+                except Exception:
+                    # El servidor respondió (error de datos/permisos): el backend está vivo
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_success()
+                tracing.add('rows', _row_count(result))
+                return result
+
+    async def acall(self, coro_fn, idempotent: bool = False):
+        """Igual que `call` para corrutinas: `coro_fn()` crea la corrutina de cada intento.
+
+        El plazo se aplica con `asyncio.wait_for` (no hay plazo por hilo en el event loop).
+        """
+        self._count('calls')
+        loop = asyncio.get_running_loop()
+        expires = loop.time() + (self.read_deadline if idempotent else self.write_deadline)
+        attempts = self.attempts if idempotent else 1
+        for attempt in range(attempts):
+            left = expires - loop.time()
+            if left <= 0:
+                self._count('deadline_exceeded')
+                raise DeadlineExceeded("Se agotó el tiempo de espera de la consulta.")
+            self.breaker.allow()
+            tracing.add('round_trips')
+            try:
+                result = await asyncio.wait_for(coro_fn(), timeout=left)
+            except TRANSIENT_ERRORS as e:
+                self.breaker.record_failure(e)
+                delay = self._backoff(attempt)
+                if attempt + 1 >= attempts or expires - loop.time() <= delay:
+                    self._count('failures')
+                    if isinstance(e, _TIMEOUT_ERRORS):
+                        self._count('deadline_exceeded')
+                    raise
+                self._count('retries')
+                await asyncio.sleep(delay)
+                continue
+            except asyncio.CancelledError:
+                # Cancelada desde afuera: no dice nada del backend, pero libera la prueba
+                self.breaker.release_probe()
+                raise
+            except Exception:
+                self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            tracing.add('rows', _row_count(result))
+            return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+        out['breaker'] = self.breaker.status()
+        return out
+
+
+# --- ENVOLTURA DEL CLIENTE ---
+
+class _GuardedQuery:
+    """Proxy de un query builder: encadena igual que el original y protege `execute()`."""
+
+    __slots__ = ('_query', '_policy', '_idempotent')
+
+    def __init__(self, query, policy, idempotent):
+        self._query = query
+        self._policy = policy
+        self._idempotent = idempotent
+
+    def _wrap(self, result, name):
+        if not hasattr(result, 'execute'):
+            return result
+        idempotent = self._idempotent
+        if name in _WRITE_METHODS:
+            idempotent = False
+        elif name == 'select' and idempotent is None:
+            idempotent = True
+        return _GuardedQuery(result, self._policy, idempotent)
+
+    def execute(self):
+        return self._policy.call(self._query.execute, idempotent=bool(self._idempotent))
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if not callable(attr):
+            # p. ej. `.not_` es una propiedad que devuelve el builder
+            return self._wrap(attr, name)
+
+        def _chained(*args, **kwargs):
+            return self._wrap(attr(*args, **kwargs), name)
+        return _chained
+
+
+class GuardedClient:
+    """Cliente con la misma interfaz (`table`, `from_`, `rpc`) cuyas consultas pasan por `policy`."""
+
+    def __init__(self, client, policy: CallPolicy = None, readonly_rpcs=()):
+        self._client = client
+        self.policy = policy or CallPolicy()
+        self.readonly_rpcs = set(readonly_rpcs)
+
+    def table(self, name):
+        return _GuardedQuery(self._client.table(name), self.policy, None)
+
+    def from_(self, name):
+        return _GuardedQuery(self._client.from_(name), self.policy, None)
+
+    def rpc(self, fn, params=None, *args, **kwargs):
+        query = self._client.rpc(fn, params if params is not None else {}, *args, **kwargs)
+        return _GuardedQuery(query, self.policy, fn in self.readonly_rpcs)
+
+    @property
+    def unwrapped(self):
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def guard_client(client, policy: CallPolicy = None, readonly_rpcs=()):
+    """Envuelve `client` (None queda None: sin conexión los servicios ya lo manejan)."""
+    if client is None:
+        return None
+    return GuardedClient(client, policy, readonly_rpcs)
@@ -0,0 +1,48 @@
+"""Sesión del usuario autenticado.
+
+Se crea una sola vez al iniciar sesión (`authenticate_user`) con la fila de `usuarios`
+ya verificada, y se pasa a los módulos del vendedor. Así el alta y el listado de OTs
+usan `vendedor_id` directo en lugar de volver a resolver al vendedor por CI/RUC o nombre
+en cada guardado o refresco.
+"""
+
+# Campos sensibles que nunca se guardan en la sesión
+_PRIVATE_FIELDS = ('password_hash', 'salt')
+
+
+class UserSession:
+    """Identidad y perfil del usuario logueado (sin credenciales)."""
+
+    def __init__(self, user_id, ci_ruc, nombre, email=None, estado=None, profile=None):
+        self.user_id = user_id
+        self.ci_ruc = ci_ruc
+        self.nombre = nombre or ci_ruc or ""
+        self.email = email
+        self.estado = estado
+        self.profile = dict(profile or {})
+
+    @classmethod
+    def from_user_row(cls, row: dict):
+        """Arma la sesión a partir de una fila de `usuarios` (descarta hash y salt)."""
+        profile = {k: v for k, v in (row or {}).items() if k not in _PRIVATE_FIELDS}
+        return cls(
+            user_id=profile.get('id'),
+            ci_ruc=profile.get('ci_ruc'),
+            nombre=profile.get('nombre'),
+            email=profile.get('email'),
+            estado=profile.get('estado'),
+            profile=profile,
+        )
+
+    @property
+    def vendedor_id(self):
+        """Id del usuario como vendedor (`ordenes_trabajo.vendedor_id`)."""
+        return self.user_id
+
+    @property
+    def vendedor(self):
+        """Identificador legible (CI/RUC, o el nombre si no hay CI) para etiquetas y reservas."""
+        return self.ci_ruc or self.nombre
+
+    def __repr__(self):
+        return f"UserSession(user_id={self.user_id!r}, ci_ruc={self.ci_ruc!r}, nombre={self.nombre!r})"
@@ -1,5 +1,5 @@
 import os
-import time
+import sys
 from pathlib import Path
 from supabase import create_client, Client
 from dotenv import load_dotenv
@@ -8,6 +8,13 @@ import hmac
 import secrets
 from datetime import datetime, date
 
+from plotmaster.core.services import records
+from plotmaster.core.services.resilience import guard_client
+from plotmaster.core.services.session import UserSession
+from plotmaster.core.utils.cache import LRUTTLCache
+from plotmaster.core.utils import tracing
+from plotmaster.core.utils.singleflight import SingleFlight, coalesce, invalidates
+
 # --- CONFIGURACIÓN INICIAL DEL CLIENTE SUPABASE ---
 
 # Cargar variables de entorno desde ubicaciones conocidas (raíz y apps)
@@ -16,11 +23,37 @@ load_dotenv(_ROOT_DIR / ".env")
 load_dotenv(_ROOT_DIR / "plotmaster/apps/admin/.env")
 load_dotenv(_ROOT_DIR / "plotmaster/apps/vendor/.env")
 
+def _client_options():
+    """Opciones del cliente con el transporte HTTP compartido (pool + límite de concurrencia).
+
+    Versiones de supabase-py sin `httpx_client` en las opciones usan su cliente por defecto.
+    """
+    try:
+        from supabase.lib.client_options import SyncClientOptions
+        from plotmaster.core.services.transport import get_http_client
+        return SyncClientOptions(httpx_client=get_http_client())
+    except (ImportError, TypeError) as e:
+        print(f"Transporte HTTP compartido no disponible, se usa el de supabase-py: {e}")
+        return None
+
+
 def init_supabase_client():
     """
     Inicializa y devuelve el cliente de Supabase usando variables de entorno.
+    Con `PLOTMASTER_BACKEND=local` devuelve el backend SQLite embebido (sin red).
     Retorna None si las variables no están configuradas.
     """
+    backend = (os.environ.get("PLOTMASTER_BACKEND") or "supabase").strip().lower()
+    if backend in ("local", "sqlite"):
+        try:
+            from plotmaster.core.services.local_backend import create_local_client
+            client = create_local_client()
+            print(f"Backend local SQLite activo ({client.db_path}).")
+            return client
+        except Exception as e:
+            print(f"Error al iniciar el backend local: {e}")
+            return None
+
     url = os.environ.get("SUPABASE_URL")
     key = os.environ.get("SUPABASE_KEY")
 
@@ -29,52 +62,122 @@ def init_supabase_client():
         return None
 
     try:
-        supabase: Client = create_client(url, key)
+        supabase: Client = create_client(url, key, options=_client_options())
         print("Conexión con Supabase establecida correctamente.")
         return supabase
     except Exception as e:
         print(f"Error al conectar con Supabase: {e}")
         return None
 
-# Inicializar el cliente una sola vez para ser usado en todo el módulo
-supabase = init_supabase_client()
+# Funciones RPC de solo lectura (se pueden reintentar como cualquier SELECT)
+SEARCH_RPCS = ('search_work_orders', 'search_clients')
+
+# Inicializar el cliente una sola vez para ser usado en todo el módulo.
+# Cada `.execute()` pasa por la política común (plazo, reintentos de lecturas y breaker).
+supabase = guard_client(init_supabase_client(), readonly_rpcs=SEARCH_RPCS)
+
 
-# Cache simple para datos referenciales (usuarios/clientes) con TTL corto
+def get_backend_status():
+    """Estado de la conexión para la UI, sin ir a la red.
+
+    `state`: 'closed' (ok), 'open' (sin conexión, falla al instante), 'half_open'
+    (probando reconectar) o 'offline' (cliente no configurado). Incluye `retry_in`,
+    `last_error` y los contadores de la política (llamadas, reintentos, fallos).
+    """
+    if not supabase:
+        return {'state': 'offline', 'retry_in': 0.0, 'last_error': "No hay conexión con la base de datos."}
+    stats = supabase.policy.stats()
+    status = stats.pop('breaker')
+    status.update(stats)
+    return status
+
+# Cache de datos referenciales (usuarios/clientes): LRU + TTL por entrada.
+# Claves: `id` -> fila completa y `('ci_ruc', valor)` -> id.
 _LOOKUP_TTL_SECONDS = 90
-_lookup_cache = {
-    'expires_at': 0.0,
-    'clientes': {},
-    'usuarios': {},
-}
+_LOOKUP_NEGATIVE_TTL_SECONDS = 30
+_LOOKUP_MAX_ENTRIES = 4096
+_clientes_cache = LRUTTLCache(_LOOKUP_MAX_ENTRIES, _LOOKUP_TTL_SECONDS, _LOOKUP_NEGATIVE_TTL_SECONDS)
+_usuarios_cache = LRUTTLCache(_LOOKUP_MAX_ENTRIES, _LOOKUP_TTL_SECONDS, _LOOKUP_NEGATIVE_TTL_SECONDS)
 
 
-def _reset_lookup_cache():
-    _lookup_cache['clientes'].clear()
-    _lookup_cache['usuarios'].clear()
-    _lookup_cache['expires_at'] = time.time() + _LOOKUP_TTL_SECONDS
+def _forget_lookup(cache, rows=None, ci_ruc=()):
+    """Invalida solo las entradas tocadas por una escritura (por id y por CI/RUC)."""
+    ids = {r.get('id') for r in (rows or []) if isinstance(r, dict) and r.get('id') is not None}
+    ci_values = {str(c) for c in ci_ruc if c}
+    ci_values.update(str(r['ci_ruc']) for r in (rows or []) if isinstance(r, dict) and r.get('ci_ruc'))
+    cache.invalidate(*ids, *(('ci_ruc', c) for c in ci_values))
+    # Un CI/RUC viejo puede seguir apuntando al id (cambio de CI/RUC), y sin filas
+    # devueltas no conocemos el id: barrer las entradas que referencian lo tocado
+    cache.invalidate_where(
+        lambda v: (isinstance(v, dict) and (v.get('id') in ids or str(v.get('ci_ruc')) in ci_values))
+        or (not isinstance(v, dict) and v in ids)
+    )
 
 
-def _ensure_lookup_cache():
-    if time.time() > _lookup_cache['expires_at']:
-        _reset_lookup_cache()
+# Lecturas idénticas concurrentes (clicks repetidos, eventos duplicados de la UI)
+# comparten una sola request; las escrituras cortan la coalescencia con lecturas previas.
+_reads = SingleFlight()
+
+
+def get_coalescing_stats():
+    """Cantidad de llamadas reales y de llamadas que reutilizaron una en vuelo."""
+    return _reads.stats()
+
+
+def get_transport_stats():
+    """Uso del pool HTTP (ver `core.services.transport`); con el backend local no hay pool."""
+    from plotmaster.core.services.transport import get_transport_stats as _stats
+    return _stats()
+
+
+def get_lookup_cache_stats():
+    """Métricas de la cache de clientes/usuarios (aciertos, fallos, expulsiones, tamaño)."""
+    return {'clientes': _clientes_cache.stats(), 'usuarios': _usuarios_cache.stats()}
 
 
 # --- FUNCIONES PARA INTERACTUAR CON LA BASE DE DATOS ---
 
-def get_next_ot_number():
-    """Obtiene el último número de OT de la base de datos y devuelve el siguiente."""
-    if not supabase: return 1001 # Valor por defecto si no hay conexión
+# Reserva de números de OT por bloques (ver `ot_numbers.OTNumberAllocator`)
+OT_RESERVA_TTL_MINUTOS = 120
+
+
+def reserve_ot_numbers(cantidad: int, reservado_por: str, ttl_minutos: int = OT_RESERVA_TTL_MINUTOS):
+    """Reserva `cantidad` números de OT en un solo round trip (RPC `reservar_ot_nros`).
 
+    Retorna (True, [números]) o (False, mensaje).
+    """
+    if not supabase: return False, "No hay conexión con la base de datos."
     try:
-        response = supabase.table('ordenes_trabajo').select('ot_nro').order('ot_nro', desc=True).limit(1).execute()
-        if response.data:
-            last_ot_number = response.data[0]['ot_nro']
-            return last_ot_number + 1
-        else:
-            return 1001 # Si no hay OTs, empezar desde 1001
+        resp = supabase.rpc('reservar_ot_nros', {
+            'p_cantidad': int(cantidad),
+            'p_reservado_por': str(reservado_por),
+            'p_ttl_minutos': int(ttl_minutos),
+        }).execute()
+        data = resp.data or []
+        # SETOF/array de enteros según la versión de PostgREST
+        nros = [int(d.get('reservar_ot_nros') if isinstance(d, dict) else d) for d in data]
+        return True, sorted(nros)
+    except Exception as e:
+        msg = _rpc_error_message(e)
+        if msg:
+            return False, msg
+        print(f"Error al reservar números de OT: {e}")
+        return False, f"Error al reservar números de OT: {e}"
+
+
+def release_ot_numbers(nros, reservado_por: str):
+    """Devuelve números reservados que no se usaron. Retorna (True, cantidad) o (False, mensaje)."""
+    if not supabase: return False, "No hay conexión con la base de datos."
+    nros = [int(n) for n in (nros or [])]
+    if not nros:
+        return True, 0
+    try:
+        resp = supabase.rpc('liberar_ot_nros', {'p_nros': nros, 'p_reservado_por': str(reservado_por)}).execute()
+        return True, int(resp.data or 0)
     except Exception as e:
-        print(f"Error al obtener el siguiente número de OT: {e}")
-        return 1001 # Fallback
+        print(f"Error al liberar números de OT: {e}")
+        return False, f"Error al liberar números de OT: {e}"
+
 
 def get_next_client_number():
     """Obtiene el último ID de cliente de la base de datos y devuelve el siguiente."""
@@ -92,90 +195,102 @@ def get_next_client_number():
         print(f"Error al obtener el siguiente número de cliente: {e}")
         return 1 # Fallback
 
+# Las lecturas que también tiene `async_service` se parten en la consulta (`_*_query`,
+# recibe el cliente) y el procesado de la respuesta (`_*_result`): cada módulo solo
+# cambia cómo se espera el `.execute()`.
+
+def _client_by_ci_ruc_query(client, ci_ruc):
+    return client.table('clientes').select('id, nombre, telefono, email').eq('ci_ruc', ci_ruc).limit(1)
+
+
+def _client_by_ci_ruc_result(ci_ruc, response):
+    if not response.data:
+        return None
+    row = response.data[0]
+    # De paso queda el id en cache para el alta de la OT
+    _clientes_cache.put(('ci_ruc', ci_ruc), row.get('id'))
+    row['ci_ruc'] = ci_ruc
+    return records.Client.from_row(row)
+
+
+@coalesce(_reads)
 def find_client_by_ci_ruc(ci_ruc: str):
-    """Busca un cliente por su CI/RUC y devuelve un dict {nombre, telefono, email} o None."""
+    """Busca un cliente por su CI/RUC y devuelve un `Client` (id, nombre, teléfono, email) o None."""
     if not supabase: return None
 
     try:
-        response = supabase.table('clientes').select('nombre, telefono, email').eq('ci_ruc', ci_ruc).limit(1).execute()
-        if response.data:
-            row = response.data[0]
-            return {
-                'nombre': row.get('nombre'),
-                'telefono': row.get('telefono'),
-                'email': row.get('email')
-            }
-        return None
+        return _client_by_ci_ruc_result(ci_ruc, _client_by_ci_ruc_query(supabase, ci_ruc).execute())
     except Exception as e:
         print(f"Error al buscar cliente: {e}")
         return None
 
 
+def _client_id_query(client, ci_ruc):
+    return client.table('clientes').select('id').eq('ci_ruc', ci_ruc).limit(1)
+
+
+def _client_id_result(ci_ruc, response):
+    if response.data:
+        cid = response.data[0].get('id')
+        _clientes_cache.put(('ci_ruc', ci_ruc), cid)
+        return cid
+    _clientes_cache.put_missing(('ci_ruc', ci_ruc))
+    return None
+
+
+@coalesce(_reads)
 def get_client_id_by_ci_ruc(ci_ruc: str):
     """Devuelve el `id` del cliente dado su `ci_ruc` o None."""
     if not supabase: return None
+    found, cid = _clientes_cache.lookup(('ci_ruc', ci_ruc))
+    if found:
+        return cid
     try:
-        resp = supabase.table('clientes').select('id').eq('ci_ruc', ci_ruc).limit(1).execute()
-        if resp.data:
-            return resp.data[0].get('id')
-        return None
+        return _client_id_result(ci_ruc, _client_id_query(supabase, ci_ruc).execute())
     except Exception as e:
         print(f"Error al obtener id de cliente: {e}")
         return None
 
 
-def get_clients_by_ids(ids: list):
-    """Devuelve un dict id->cliente_row para los ids provistos."""
+def _rows_by_ids_query(client, table, missing):
+    return client.table(table).select('*').in_('id', missing)
+
+
+def _rows_by_ids_result(cache, missing, result, response):
+    """Completa `result` (id -> fila) con la respuesta y guarda todo en `cache`."""
+    for r in (response.data or []):
+        cache.put(r.get('id'), r)
+        result[r.get('id')] = r
+    # Ids inexistentes: cache negativa para no volver a pedirlos enseguida
+    for key in missing:
+        if key not in result:
+            cache.put_missing(key)
+    return result
+
+
+def _rows_by_ids(cache, table, ids):
     if not supabase or not ids: return {}
-    _ensure_lookup_cache()
-    result = {}
-    missing = []
     # Evitar ids duplicados y aprovechar cache en memoria para lecturas repetidas
-    for cid in set(ids):
-        if cid in _lookup_cache['clientes']:
-            result[cid] = _lookup_cache['clientes'][cid]
-        else:
-            missing.append(cid)
+    result, missing = cache.get_many(ids)
     if not missing:
         return result
     try:
-        resp = supabase.table('clientes').select('*').in_('id', missing).execute()
-        rows = resp.data or []
-        for r in rows:
-            cid = r.get('id')
-            _lookup_cache['clientes'][cid] = r
-            result[cid] = r
-        return result
+        return _rows_by_ids_result(cache, missing, result, _rows_by_ids_query(supabase, table, missing).execute())
     except Exception as e:
-        print(f"Error al obtener clientes por ids: {e}")
+        print(f"Error al obtener {table} por ids: {e}")
         return result
 
 
+def get_clients_by_ids(ids: list):
+    """Devuelve un dict id->cliente_row para los ids provistos."""
+    return _rows_by_ids(_clientes_cache, 'clientes', ids)
+
+
 def get_users_by_ids(ids: list):
     """Devuelve un dict id->usuario_row para los ids provistos (tabla usuarios)."""
-    if not supabase or not ids: return {}
-    _ensure_lookup_cache()
-    result = {}
-    missing = []
-    for uid in set(ids):
-        if uid in _lookup_cache['usuarios']:
-            result[uid] = _lookup_cache['usuarios'][uid]
-        else:
-            missing.append(uid)
-    if not missing:
-        return result
-    try:
-        resp = supabase.table('usuarios').select('*').in_('id', missing).execute()
-        rows = resp.data or []
-        for r in rows:
-            uid = r.get('id')
-            _lookup_cache['usuarios'][uid] = r
-            result[uid] = r
-        return result
-    except Exception as e:
-        print(f"Error al obtener usuarios por ids: {e}")
-        return result
+    return _rows_by_ids(_usuarios_cache, 'usuarios', ids)
 
+@invalidates(_reads)
 def insert_client(nombre: str, ci_ruc: str, telefono: str, zona: str, email: str = None):
     """Inserta un nuevo cliente en la base de datos."""
     if not supabase: return False, "No hay conexión con la base de datos."
@@ -190,7 +305,8 @@ def insert_client(nombre: str, ci_ruc: str, telefono: str, zona: str, email: str
         }).execute()
         if hasattr(response, 'error') and response.error:
             return False, str(response.error)
-        _reset_lookup_cache()
+        # El CI/RUC/id nuevo puede estar en la cache negativa
+        _forget_lookup(_clientes_cache, response.data, ci_ruc=[ci_ruc])
         return True, "Cliente guardado correctamente."
     except Exception as e:
         # Manejar error de duplicado de CI/RUC
@@ -203,6 +319,7 @@ def insert_client(nombre: str, ci_ruc: str, telefono: str, zona: str, email: str
 
 
 
+@invalidates(_reads)
 def update_user_by_id(user_id, updates: dict):
     """Actualiza un usuario identificado por su `id` en la tabla 'usuarios'."""
     if not supabase: return False, "No hay conexión con la base de datos."
@@ -228,7 +345,7 @@ def update_user_by_id(user_id, updates: dict):
                 val_db = row.get(k)
                 if (val_db or '') != (v or ''):
                     return False, f"Campo '{k}' no se actualizó correctamente. Esperado: '{v}', DB: '{val_db}'"
-            _reset_lookup_cache()
+            _forget_lookup(_usuarios_cache, (response.data or []) + [row])
             return True, "Usuario actualizado"
         except Exception as e:
             print(f"Error verificando actualización por id: {e}")
@@ -251,57 +368,115 @@ def get_admin_by_ci_ruc(ci_ruc: str):
         return None
 
 
-def _hash_password(password: str, salt: str = None) -> tuple:
+# Iteraciones PBKDF2 para hashes nuevos. Cada usuario guarda las suyas en `pw_iteraciones`,
+# así que subir este valor no invalida los hashes existentes (se actualizan al loguearse).
+PASSWORD_ITERATIONS = int(os.environ.get("PLOTMASTER_PW_ITERATIONS") or 100_000)
+# Valor con el que se generaron los hashes anteriores a la columna `pw_iteraciones`
+_LEGACY_PASSWORD_ITERATIONS = 100_000
+
+CANCELLED_MESSAGE = "Operación cancelada."
+
+
+class AuthCancelled(Exception):
+    """La vista canceló la operación de autenticación/registro en curso."""
+
+
+def _auth_step(progress, cancelled, mensaje: str, fraccion: float):
+    """Punto de control entre pasos: corta si se canceló y si no informa el avance."""
+    if cancelled is not None and cancelled():
+        raise AuthCancelled()
+    if progress is not None:
+        progress(mensaje, fraccion)
+
+
+def _hash_password(password: str, salt: str = None, iterations: int = None) -> tuple:
     """Devuelve (salt, password_hash) usando PBKDF2-HMAC-SHA256."""
     if salt is None:
         salt = secrets.token_hex(16)
     pw_bytes = password.encode('utf-8')
     salt_bytes = salt.encode('utf-8')
-    hash_digest = hashlib.pbkdf2_hmac('sha256', pw_bytes, salt_bytes, 100_000)
+    hash_digest = hashlib.pbkdf2_hmac('sha256', pw_bytes, salt_bytes, int(iterations or PASSWORD_ITERATIONS))
     return salt, hash_digest.hex()
 
 
-def _verify_password(password: str, salt: str, password_hash: str) -> bool:
-    _, new_hash = _hash_password(password, salt)
+def _password_iterations(row: dict) -> int:
+    """Iteraciones con las que se generó el hash de la fila (las viejas no tienen columna)."""
+    return int((row or {}).get('pw_iteraciones') or _LEGACY_PASSWORD_ITERATIONS)
+
+
+def _verify_password(password: str, salt: str, password_hash: str, iterations: int = _LEGACY_PASSWORD_ITERATIONS) -> bool:
+    _, new_hash = _hash_password(password, salt, iterations)
     return hmac.compare_digest(new_hash, password_hash)
 
 
-def verify_admin_credentials(ci_ruc: str, password: str):
-    """Verifica credenciales contra la tabla `administradores`. Retorna (True, nombre) o (False, mensaje)."""
+def _check_password(row: dict, password: str, tabla: str, progress=None, cancelled=None):
+    """Verifica la contraseña de `row` y, si el hash usa un costo distinto al actual,
+    lo regenera con `PASSWORD_ITERATIONS` (sin bloquear el login si eso falla)."""
+    iterations = _password_iterations(row)
+    _auth_step(progress, cancelled, "Verificando contraseña...", 0.4)
+    if not _verify_password(password, row.get('salt'), row.get('password_hash'), iterations):
+        return False
+    if iterations != PASSWORD_ITERATIONS and 'pw_iteraciones' in row and row.get('id') is not None:
+        _auth_step(progress, cancelled, "Actualizando credenciales...", 0.8)
+        try:
+            salt, pw_hash = _hash_password(password)
+            supabase.table(tabla).update({
+                'salt': salt, 'password_hash': pw_hash, 'pw_iteraciones': PASSWORD_ITERATIONS,
+            }).eq('id', row['id']).execute()
+            if tabla == 'usuarios':
+                _forget_lookup(_usuarios_cache, [row])
+            _reads.bump()
+        except Exception as e:
+            print(f"No se pudo actualizar el hash de contraseña: {e}")
+    return True
+
+
+def verify_admin_credentials(ci_ruc: str, password: str, progress=None, cancelled=None):
+    """Verifica credenciales contra la tabla `administradores`. Retorna (True, nombre) o (False, mensaje).
+
+    `progress(mensaje, fraccion)` y `cancelled()` son opcionales (ver `core.services.auth`).
+    """
     if not supabase:
         return False, "No hay conexión con la base de datos."
     try:
+        _auth_step(progress, cancelled, "Buscando administrador...", 0.1)
         admin = get_admin_by_ci_ruc(ci_ruc)
         if not admin:
             return False, "Administrador no encontrado."
-        salt = admin.get('salt')
-        pw_hash = admin.get('password_hash')
-        if not salt or not pw_hash:
+        if not admin.get('salt') or not admin.get('password_hash'):
             return False, "Credenciales incompletas para el administrador."
-        if _verify_password(password, salt, pw_hash):
+        if _check_password(admin, password, 'administradores', progress, cancelled):
+            _auth_step(progress, cancelled, "Listo", 1.0)
             return True, {
                 'id': admin.get('id'),
                 'ci_ruc': admin.get('ci_ruc'),
                 'nombre': admin.get('nombre')
             }
         return False, "Contraseña incorrecta."
+    except AuthCancelled:
+        return False, CANCELLED_MESSAGE
     except Exception as e:
         print(f"Error al verificar credenciales admin: {e}")
         return False, f"Error al verificar credenciales: {e}"
 
 
-def create_admin(nombre: str, ci_ruc: str, password: str, email: str = None, estado: str = 'activo'):
+@invalidates(_reads)
+def create_admin(nombre: str, ci_ruc: str, password: str, email: str = None, estado: str = 'activo', progress=None, cancelled=None):
     """Crea un administrador en la tabla 'administradores'. Retorna (True, mensaje) o (False, mensaje)."""
     if not supabase:
         return False, "No hay conexión con la base de datos."
 
-    salt, pw_hash = _hash_password(password)
     try:
+        _auth_step(progress, cancelled, "Generando credenciales...", 0.1)
+        salt, pw_hash = _hash_password(password)
+        # Último punto de cancelación: después del insert ya no se puede deshacer
+        _auth_step(progress, cancelled, "Registrando administrador...", 0.7)
         data = {
             'nombre': nombre,
             'ci_ruc': ci_ruc,
             'password_hash': pw_hash,
             'salt': salt,
+            'pw_iteraciones': PASSWORD_ITERATIONS,
             'email': email,
             'fecha_registro': datetime.utcnow().isoformat(),
             'estado': estado
@@ -310,6 +485,8 @@ def create_admin(nombre: str, ci_ruc: str, password: str, email: str = None, est
         if hasattr(response, 'error') and response.error:
             raise Exception(response.error)
         return True, "Administrador registrado correctamente."
+    except AuthCancelled:
+        return False, CANCELLED_MESSAGE
     except Exception as e:
         err_str = str(e).lower()
         if 'duplicate' in err_str or 'unique' in err_str:
@@ -321,45 +498,225 @@ def create_admin(nombre: str, ci_ruc: str, password: str, email: str = None, est
 
 
 # --- FUNCIONES RELACIONADAS A ORDENES DE TRABAJO PARA ADMIN ---
+
+# Cliente y vendedor embebidos vía FK: una sola consulta en lugar de 3 round trips
+_OT_EMBEDS = (
+    'cliente_ref:clientes!ordenes_trabajo_cliente_id_fkey(nombre,ci_ruc),'
+    'vendedor_ref:usuarios!ordenes_trabajo_vendedor_id_fkey(nombre,ci_ruc)'
+)
+# Columnas del listado de OTs (solo las necesarias para reducir ancho de banda)
+_OT_LIST_COLUMNS = 'id,ot_nro,cliente_id,vendedor_id,descripcion,valor_total,sena,abonado_total,forma_pago,solicita_envio,status,fecha_creacion,fecha_entrega,created_at,' + _OT_EMBEDS
+# Tamaño de página por defecto; debe quedar por debajo del max-rows de PostgREST
+OT_PAGE_SIZE = 500
+
+
+def _flatten_work_order(d):
+    """Pasa los recursos embebidos a los campos de texto que usa la UI."""
+    cliente = d.pop('cliente_ref', None) or {}
+    vendedor = d.pop('vendedor_ref', None) or {}
+    d['cliente'] = cliente.get('nombre') or cliente.get('ci_ruc') or ''
+    d['cliente_ci_ruc'] = cliente.get('ci_ruc') or ''
+    d['vendedor'] = vendedor.get('nombre') or vendedor.get('ci_ruc') or ''
+    d['vendedor_ci_ruc'] = vendedor.get('ci_ruc') or ''
+    return d
+
+
+def _enrich_work_orders(data):
+    """Agrega los campos de texto `cliente` y `vendedor` a las filas de OTs."""
+    for d in data:
+        # Mantener compatibilidad con UI: campos `cliente` y `vendedor` como texto
+        _flatten_work_order(d)
+        # Exponer abonado_total para UI
+        d['abonado_total'] = d.get('abonado_total', 0) or 0
+    return data
+
+
+def _resolve_vendedor_id(vendedor):
+    """Resuelve el `id` de un vendedor dado su CI/RUC o id. Retorna None si no existe."""
+    cached = _usuarios_cache.get(('ci_ruc', str(vendedor)))
+    if cached is not None:
+        return cached
+    try:
+        resp_ci = supabase.table('usuarios').select('id').eq('ci_ruc', str(vendedor)).limit(1).execute()
+        if resp_ci.data:
+            vid = resp_ci.data[0].get('id')
+            _usuarios_cache.put(('ci_ruc', str(vendedor)), vid)
+            return vid
+    except Exception:
+        pass
+    try:
+        maybe_id = int(vendedor)
+        resp_id = supabase.table('usuarios').select('id').eq('id', maybe_id).limit(1).execute()
+        if resp_id.data:
+            return resp_id.data[0].get('id')
+    except Exception:
+        pass
+    return None
+
+
+def _work_orders_page_query(client, vendedor_id, last_ot, page_size):
+    qb = client.table('ordenes_trabajo').select(_OT_LIST_COLUMNS)
+    if vendedor_id is not None:
+        qb = qb.eq('vendedor_id', vendedor_id)
+    if last_ot is not None:
+        qb = qb.lt('ot_nro', last_ot)
+    return qb.order('ot_nro', desc=True).limit(page_size)
+
+
+def _work_orders_result(rows, as_records=False):
+    """Filas del listado enriquecidas (o `WorkOrder` con `as_records`)."""
+    rows = _enrich_work_orders(rows)
+    return records.WorkOrder.from_rows(rows) if as_records else rows
+
+
+def iter_work_orders(vendedor=None, page_size: int = OT_PAGE_SIZE, vendedor_id=None, as_records: bool = False):
+    """Recorre `ordenes_trabajo` por páginas usando keyset (`ot_nro < último visto`).
+
+    Genera tuplas `(True, filas)` por página, ya enriquecidas, en orden `ot_nro` desc,
+    o un único `(False, mensaje)` si falla. Siempre genera al menos una página (puede
+    venir vacía). `vendedor` (id o CI/RUC) aplica el mismo filtro que
+    `get_work_orders_by_vendedor`; con `vendedor_id` (p. ej. de la `UserSession`) se
+    filtra directo sin resolver al vendedor. Con `as_records` las páginas son `WorkOrder`.
+    """
+    if not supabase:
+        yield False, "No hay conexión con la base de datos."
+        return
+    page_size = max(1, int(page_size or OT_PAGE_SIZE))
+    if vendedor_id is None and vendedor is not None:
+        vendedor_id = _resolve_vendedor_id(vendedor)
+        if vendedor_id is None:
+            yield True, []
+            return
+    last_ot = None
+    while True:
+        try:
+            response = _work_orders_page_query(supabase, vendedor_id, last_ot, page_size).execute()
+            rows = response.data or []
+            page = _work_orders_result(rows, as_records)
+        except Exception as e:
+            print(f"Error al obtener página de órdenes de trabajo: {e}")
+            yield False, f"Error inesperado al obtener las órdenes de trabajo: {e}"
+            return
+        yield True, page
+        if len(rows) < page_size:
+            return
+        last_ot = rows[-1].get('ot_nro')
+
+
+def _collect_work_orders(vendedor=None, vendedor_id=None):
+    data = []
+    for ok, page in iter_work_orders(vendedor=vendedor, vendedor_id=vendedor_id):
+        if not ok:
+            return False, page
+        data.extend(page)
+    return True, data
+
+
+@coalesce(_reads)
 def get_all_work_orders():
+    if not supabase: return False, "No hay conexión con la base de datos."
+    # Paginado por keyset para no depender del max-rows de PostgREST
+    return _collect_work_orders()
+
+
+@coalesce(_reads)
+def get_work_order_sync_marks():
+    """Marcas de agua actuales: `(True, (max updated_at, max deleted_at))`.
+
+    Se piden antes de una carga completa; cualquier cambio posterior queda por encima
+    de estas marcas y lo trae `get_work_orders_changed_since`.
+    """
     if not supabase: return False, "No hay conexión con la base de datos."
     try:
-        # Seleccionamos solo las columnas necesarias para reducir ancho de banda
-        response = (
-            supabase
-            .table('ordenes_trabajo')
-            .select('id,ot_nro,cliente_id,vendedor_id,descripcion,valor_total,sena,abonado_total,forma_pago,solicita_envio,status,fecha_creacion,fecha_entrega,created_at')
-            .order('ot_nro', desc=True)
-            .execute()
-        )
-        data = response.data or []
-        # Enriquecer con nombres de cliente y vendedor (si vienen ids)
-        cliente_ids = list({d.get('cliente_id') for d in data if d.get('cliente_id')})
-        vendedor_ids = list({d.get('vendedor_id') for d in data if d.get('vendedor_id')})
-        clientes = get_clients_by_ids(cliente_ids)
-        usuarios = get_users_by_ids(vendedor_ids)
-        out = []
-        for d in data:
-            # Mantener compatibilidad con UI: campos `cliente` y `vendedor` como texto
-            cliente_txt = ''
-            vendedor_txt = ''
-            cid = d.get('cliente_id')
-            vid = d.get('vendedor_id')
-            if cid and clientes.get(cid):
-                cliente_txt = clientes[cid].get('nombre') or clientes[cid].get('ci_ruc') or ''
-            if vid and usuarios.get(vid):
-                vendedor_txt = usuarios[vid].get('nombre') or usuarios[vid].get('ci_ruc') or ''
-            # Exponer abonado_total para UI
-            d['abonado_total'] = d.get('abonado_total', 0) or 0
-            d['cliente'] = cliente_txt
-            d['vendedor'] = vendedor_txt
-            out.append(d)
-        return True, out
+        resp_upd = supabase.table('ordenes_trabajo').select('updated_at').order('updated_at', desc=True).limit(1).execute()
+        resp_del = supabase.table('ordenes_trabajo_eliminadas').select('deleted_at').order('deleted_at', desc=True).limit(1).execute()
+        updated_mark = resp_upd.data[0].get('updated_at') if resp_upd.data else None
+        deleted_mark = resp_del.data[0].get('deleted_at') if resp_del.data else None
+        return True, (updated_mark, deleted_mark)
+    except Exception as e:
+        print(f"Error al obtener marcas de sincronización: {e}")
+        return False, f"Error al obtener marcas de sincronización: {e}"
+
+
+@coalesce(_reads)
+def get_work_orders_changed_since(since, vendedor=None, page_size: int = OT_PAGE_SIZE, vendedor_id=None):
+    """OTs con `updated_at >= since` (mismas columnas y forma que el listado)."""
+    if not supabase: return False, "No hay conexión con la base de datos."
+    page_size = max(1, int(page_size or OT_PAGE_SIZE))
+    try:
+        if vendedor_id is None and vendedor is not None:
+            vendedor_id = _resolve_vendedor_id(vendedor)
+            if vendedor_id is None:
+                return True, []
+        rows = []
+        start = 0
+        while True:
+            qb = supabase.table('ordenes_trabajo').select(_OT_LIST_COLUMNS + ',updated_at')
+            if since:
+                qb = qb.gte('updated_at', since)
+            if vendedor_id is not None:
+                qb = qb.eq('vendedor_id', vendedor_id)
+            # Los deltas son chicos: alcanza con paginar por rango sobre un orden estable
+            response = qb.order('updated_at').order('ot_nro').range(start, start + page_size - 1).execute()
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                break
+            start += page_size
+        return True, _enrich_work_orders(rows)
+    except Exception as e:
+        print(f"Error al obtener OTs modificadas: {e}")
+        return False, f"Error al obtener OTs modificadas: {e}"
+
+
+@coalesce(_reads)
+def get_deleted_work_orders_since(since):
+    """Tombstones de OTs borradas con `deleted_at >= since`: lista de `{ot_nro, deleted_at}`."""
+    if not supabase: return False, "No hay conexión con la base de datos."
+    try:
+        qb = supabase.table('ordenes_trabajo_eliminadas').select('ot_nro,deleted_at')
+        if since:
+            qb = qb.gte('deleted_at', since)
+        response = qb.order('deleted_at').execute()
+        return True, response.data or []
+    except Exception as e:
+        print(f"Error al obtener OTs eliminadas: {e}")
+        return False, f"Error al obtener OTs eliminadas: {e}"
+
+
+@coalesce(_reads)
+def get_work_orders_by_refs(ot_nros=(), ids=(), vendedor=None, vendedor_id=None, as_records: bool = False):
+    """OTs por número y/o por `id` (mismas columnas y forma que el listado).
+
+    Lo usan las planillas para traer solo las OTs que avisó Realtime (los abonos y las
+    cancelaciones traen el `id` de la OT, no el número). Con `vendedor`/`vendedor_id`
+    solo vienen las de ese vendedor; las que no existen no vienen. Con `as_records`,
+    como `WorkOrder`.
+    """
+    if not supabase: return False, "No hay conexión con la base de datos."
+    try:
+        if vendedor_id is None and vendedor is not None:
+            vendedor_id = _resolve_vendedor_id(vendedor)
+            if vendedor_id is None:
+                return True, []
+        rows = {}
+        for column, values in (('ot_nro', ot_nros), ('id', ids)):
+            values = sorted({int(v) for v in values if v is not None})
+            if not values:
+                continue
+            qb = supabase.table('ordenes_trabajo').select(_OT_LIST_COLUMNS).in_(column, values)
+            if vendedor_id is not None:
+                qb = qb.eq('vendedor_id', vendedor_id)
+            for r in qb.execute().data or []:
+                rows[r.get('id')] = r
+        data = _enrich_work_orders(sorted(rows.values(), key=lambda r: r.get('ot_nro') or 0, reverse=True))
+        return True, records.WorkOrder.from_rows(data) if as_records else data
     except Exception as e:
-        print(f"Error al obtener las órdenes de trabajo: {e}")
-        return False, f"Error inesperado al obtener las órdenes de trabajo: {e}"
+        print(f"Error al obtener OTs: {e}")
+        return False, f"Error al obtener OTs: {e}"
 
 
+@coalesce(_reads)
 def get_work_orders_between(fecha_desde, fecha_hasta, sort_desc=False, status: str = None, forma_pago: str = None):
     """Obtiene OTs entre fechas con filtros opcionales por `status` y `forma_pago`.
 
@@ -381,7 +738,7 @@ def get_work_orders_between(fecha_desde, fecha_hasta, sort_desc=False, status: s
         qb = (
             supabase
             .table('ordenes_trabajo')
-            .select('id,ot_nro,cliente_id,vendedor_id,descripcion,valor_total,abonado_total,forma_pago,solicita_envio,status,fecha_creacion,fecha_entrega,created_at')
+            .select('id,ot_nro,cliente_id,vendedor_id,descripcion,valor_total,abonado_total,forma_pago,solicita_envio,status,fecha_creacion,fecha_entrega,created_at,' + _OT_EMBEDS)
             .gte('fecha_creacion', f_ini)
             .lte('fecha_creacion', f_fin)
             .order('fecha_creacion', desc=bool(sort_desc))
@@ -395,23 +752,17 @@ def get_work_orders_between(fecha_desde, fecha_hasta, sort_desc=False, status: s
         resp = qb.execute()
         rows = resp.data or []
 
-        cliente_ids = list({r.get('cliente_id') for r in rows if r.get('cliente_id')})
-        vendedor_ids = list({r.get('vendedor_id') for r in rows if r.get('vendedor_id')})
-        clientes = get_clients_by_ids(cliente_ids)
-        vendedores = get_users_by_ids(vendedor_ids)
-
         enriched = []
         for r in rows:
-            cid = r.get('cliente_id')
-            vid = r.get('vendedor_id')
+            _flatten_work_order(r)
             enriched.append({
                 'ot_nro': r.get('ot_nro'),
                 'fecha_creacion': _format_date_value(r.get('fecha_creacion') or r.get('created_at')),
                 'fecha_entrega': _format_date_value(r.get('fecha_entrega')),
-                'cliente': clientes.get(cid, {}).get('nombre') or clientes.get(cid, {}).get('ci_ruc') or '',
-                'cliente_ci_ruc': clientes.get(cid, {}).get('ci_ruc') or '',
-                'vendedor': vendedores.get(vid, {}).get('nombre') or vendedores.get(vid, {}).get('ci_ruc') or '',
-                'vendedor_ci_ruc': vendedores.get(vid, {}).get('ci_ruc') or '',
+                'cliente': r['cliente'],
+                'cliente_ci_ruc': r['cliente_ci_ruc'],
+                'vendedor': r['vendedor'],
+                'vendedor_ci_ruc': r['vendedor_ci_ruc'],
                 'descripcion': r.get('descripcion') or '',
                 'valor_total': float(r.get('valor_total') or 0),
                 'abonado_total': float(r.get('abonado_total') or 0),
@@ -439,94 +790,122 @@ def get_finalized_work_orders_between(fecha_desde, fecha_hasta, sort_desc=False)
     return get_work_orders_between(fecha_desde, fecha_hasta, sort_desc=sort_desc, status='Finalizado')
 
 
+def _work_order_detail_query(client, ot_nro):
+    # OT + cliente + vendedor + historial de abonos en un solo round trip
+    return (
+        client
+        .table('ordenes_trabajo')
+        .select(
+            'id,ot_nro,cliente_id,vendedor_id,descripcion,valor_total,sena,abonado_total,forma_pago,solicita_envio,status,fecha_creacion,fecha_entrega,created_at,'
+            + _OT_EMBEDS + ',abonos(id,monto,fecha_abono,creado_por,observacion)'
+        )
+        .eq('ot_nro', ot_nro)
+        .order('fecha_abono', desc=True, foreign_table='abonos')
+        .limit(1)
+    )
+
+
+def _work_order_detail_result(response):
+    """`WorkOrder` del detalle (None si no existe): `cliente` por CI/RUC y los abonos
+    (con id, para borrarlos)."""
+    row = (response.data[0] if response.data else None)
+    if not row:
+        return None
+    _flatten_work_order(row)
+    row['cliente'] = row.get('cliente_ci_ruc') or row.get('cliente') or ''
+    row['abonado_total'] = row.get('abonado_total', 0) or 0
+    return records.WorkOrder.from_row(row)
+
+
+@coalesce(_reads)
 def get_work_order_by_ot(ot_nro):
+    """Detalle de una OT como `WorkOrder` (con `pagos`), `(True, None)` si no existe."""
     if not supabase: return False, "No hay conexión con la base de datos."
     try:
-        response = (
-            supabase
-            .table('ordenes_trabajo')
-            .select('id,ot_nro,cliente_id,vendedor_id,descripcion,valor_total,sena,abonado_total,forma_pago,solicita_envio,status,fecha_creacion,fecha_entrega,created_at')
-            .eq('ot_nro', ot_nro)
-            .limit(1)
-            .execute()
-        )
-        row = (response.data[0] if response.data else None)
-        if not row:
-            return True, None
-        # Enriquecer con nombres de cliente y vendedor (si vienen ids)
-        try:
-            cid = row.get('cliente_id')
-            vid = row.get('vendedor_id')
-            clientes = get_clients_by_ids([cid]) if cid else {}
-            usuarios = get_users_by_ids([vid]) if vid else {}
-            cliente_txt = ''
-            vendedor_txt = ''
-            if cid and clientes.get(cid):
-                cliente_txt = clientes[cid].get('ci_ruc') or clientes[cid].get('nombre') or ''
-            if vid and usuarios.get(vid):
-                vendedor_txt = usuarios[vid].get('nombre') or usuarios[vid].get('ci_ruc') or ''
-            row['cliente'] = cliente_txt
-            row['vendedor'] = vendedor_txt
-        except Exception:
-            pass
-
-        # Obtener historial de abonos (incluir id para operaciones de borrado)
-        ot_id = row.get('id')
-        pagos = []
-        try:
-            resp_ab = supabase.table('abonos').select('id,monto,fecha_abono,creado_por,observacion').eq('ot_id', ot_id).order('fecha_abono', desc=True).execute()
-            for p in (resp_ab.data or []):
-                pagos.append({
-                    'id': p.get('id'),
-                    'm': float(p.get('monto') or 0),
-                    'f': (p.get('fecha_abono') or '').split('T')[0],
-                    'creado_por': p.get('creado_por'),
-                    'observacion': p.get('observacion')
-                })
-        except Exception:
-            pagos = []
-        row['pagos'] = pagos
-        # Asegurar abonado_total existe
-        row['abonado_total'] = row.get('abonado_total', 0) or 0
-        return True, row
+        return True, _work_order_detail_result(_work_order_detail_query(supabase, ot_nro).execute())
     except Exception as e:
         print(f"Error al obtener OT: {e}")
         return False, f"Error inesperado al obtener la OT: {e}"
 
 
+# Tope de resultados de la búsqueda en el servidor (la función SQL corta en 500)
+SEARCH_LIMIT = 50
+
+
+def _search_work_orders_query(client, texto, status, limit, vendedor_id):
+    return client.rpc('search_work_orders', {
+        'p_query': texto,
+        'p_status': status or None,
+        'p_limit': int(limit or SEARCH_LIMIT),
+        'p_vendedor_id': vendedor_id,
+    }).select(_OT_LIST_COLUMNS)
+
+
+@coalesce(_reads)
+def search_work_orders(query: str, status: str = None, limit: int = SEARCH_LIMIT, vendedor=None, vendedor_id=None,
+                       as_records: bool = False):
+    """Busca OTs en toda la tabla, no solo en lo que la planilla tiene cargado.
+
+    Coincide por número exacto, descripción, nombre o CI/RUC del cliente, sin distinguir
+    mayúsculas ni tildes y tolerando errores de tipeo (`search_work_orders` de
+    schema_db.sql, con pg_trgm). Retorna filas como las del listado (con `as_records`,
+    `WorkOrder`, como `search_clients` retorna `Client`), las más parecidas primero;
+    `status` y el vendedor (`vendedor` o `vendedor_id`, como en `iter_work_orders`) filtran.
+    """
+    if not supabase: return False, "No hay conexión con la base de datos."
+    texto = str(query or '').strip()
+    if not texto:
+        return True, []
+    try:
+        if vendedor_id is None and vendedor is not None:
+            vendedor_id = _resolve_vendedor_id(vendedor)
+            if vendedor_id is None:
+                return True, []
+        response = _search_work_orders_query(supabase, texto, status, limit, vendedor_id).execute()
+        return True, _work_orders_result(response.data or [], as_records)
+    except Exception as e:
+        print(f"Error al buscar OTs: {e}")
+        return False, f"Error inesperado al buscar OTs: {e}"
+
+
+def _rpc_row(response):
+    """Fila devuelta por una función RPC (objeto o lista de un elemento)."""
+    data = getattr(response, 'data', None)
+    if isinstance(data, list):
+        return data[0] if data else None
+    return data
+
+
+def _rpc_error_message(exc):
+    """Mensaje de negocio de las funciones RPC (P0001/P0002); None si es otro error."""
+    if getattr(exc, 'code', None) in ('P0001', 'P0002'):
+        return getattr(exc, 'message', None) or str(exc)
+    return None
+
+
+def _ot_key(ot_nro):
+    try:
+        return int(ot_nro)
+    except Exception:
+        return ot_nro
+
+
+@invalidates(_reads)
 def delete_abono(abono_id: int):
-    """Elimina un abono por `id` y actualiza `ordenes_trabajo.abonado_total`.
+    """Elimina un abono por `id` y descuenta su monto de `ordenes_trabajo.abonado_total`.
+
+    Todo ocurre en la función RPC `eliminar_abono` (una transacción, un round trip).
     Retorna (True, msg) o (False, msg).
     """
     if not supabase:
         return False, "No hay conexión con la base de datos."
     try:
-        # Obtener el abono para conocer ot_id y monto
-        sel = supabase.table('abonos').select('id,ot_id,monto').eq('id', abono_id).limit(1).execute()
-        if not getattr(sel, 'data', None):
-            return False, "Abono no encontrado."
-        ab = sel.data[0]
-        ot_id = ab.get('ot_id')
-        monto = float(ab.get('monto') or 0)
-
-        # Borrar el abono
-        resp_del = supabase.table('abonos').delete().eq('id', abono_id).execute()
-        if hasattr(resp_del, 'error') and resp_del.error:
-            return False, str(resp_del.error)
-
-        # Actualizar abonado_total en la orden restando el monto (no bajar de 0)
-        resp_ot = supabase.table('ordenes_trabajo').select('id,abonado_total').eq('id', ot_id).limit(1).execute()
-        if getattr(resp_ot, 'data', None):
-            cur = float(resp_ot.data[0].get('abonado_total') or 0)
-            nuevo = cur - monto
-            if nuevo < 0:
-                nuevo = 0
-            upd = supabase.table('ordenes_trabajo').update({'abonado_total': nuevo}).eq('id', ot_id).execute()
-            if hasattr(upd, 'error') and upd.error:
-                return False, str(upd.error)
-
+        supabase.rpc('eliminar_abono', {'p_abono_id': abono_id}).execute()
         return True, "Abono eliminado correctamente."
     except Exception as e:
+        msg = _rpc_error_message(e)
+        if msg:
+            return False, msg
         print(f"Error al eliminar abono {abono_id}: {e}")
         return False, f"Error al eliminar abono: {e}"
 
@@ -551,60 +930,104 @@ def _normalize_text(value):
     return text
 
 
+def _status_update_query(client, ot_nro, status, fecha_entrega):
+    updates = {'status': status}
+    fecha_payload = _format_date_value(fecha_entrega)
+    if fecha_payload is not None:
+        updates['fecha_entrega'] = fecha_payload
+    return client.table('ordenes_trabajo').update(updates).eq('ot_nro', ot_nro)
+
+
+def _status_update_result(response):
+    if hasattr(response, 'error') and response.error:
+        return False, str(response.error)
+    if not getattr(response, 'data', None):
+        return False, "No se actualizó ninguna orden (OT no encontrada o sin permisos)."
+    return True, "Estado actualizado"
+
+
+@invalidates(_reads)
 def update_work_order_status(ot_nro, status, fecha_entrega=None):
     if not supabase: return False, "No hay conexión con la base de datos."
     try:
-        updates = {'status': status}
-        fecha_payload = _format_date_value(fecha_entrega)
-        if fecha_payload is not None:
-            updates['fecha_entrega'] = fecha_payload
-        response = supabase.table('ordenes_trabajo').update(updates).eq('ot_nro', ot_nro).execute()
-        if hasattr(response, 'error') and response.error:
-            return False, str(response.error)
-        if not getattr(response, 'data', None):
-            return False, "No se actualizó ninguna orden (OT no encontrada o sin permisos)."
-        return True, "Estado actualizado"
+        return _status_update_result(_status_update_query(supabase, ot_nro, status, fecha_entrega).execute())
     except Exception as e:
         print(f"Error al actualizar estado OT: {e}")
         return False, f"Error al actualizar estado: {e}"
 
 
+# OTs por request en las operaciones en lote (la lista va en la URL del filtro `in`)
+BULK_CHUNK_SIZE = 200
+
+
+@invalidates(_reads)
+def update_work_orders_status(ot_nros, status, fecha_entrega=None, from_status=None):
+    """Cambia el estado de varias OTs con un `update ... where ot_nro in (...)` por tanda.
+
+    `from_status` (str o lista) limita el cambio a las OTs que siguen en ese estado en la
+    BD: si otro usuario ya la movió, esa OT no se toca.
+    Retorna `{ot_nro: (ok, msg)}` con el resultado de cada OT pedida, por número
+    normalizado (`'0101'` -> `'101'`, como lo devuelve la BD).
+    """
+    pedidas = list(dict.fromkeys(str(_ot_key(n)).strip() for n in ot_nros if str(n).strip()))
+    if not pedidas:
+        return {}
+    if not supabase:
+        return {ot: (False, "No hay conexión con la base de datos.") for ot in pedidas}
+    updates = {'status': status}
+    fecha_payload = _format_date_value(fecha_entrega)
+    if fecha_payload is not None:
+        updates['fecha_entrega'] = fecha_payload
+    if isinstance(from_status, str):
+        from_status = [from_status]
+    resultados = {}
+    for i in range(0, len(pedidas), BULK_CHUNK_SIZE):
+        tanda = pedidas[i:i + BULK_CHUNK_SIZE]
+        try:
+            qb = supabase.table('ordenes_trabajo').update(updates).in_('ot_nro', [_ot_key(ot) for ot in tanda])
+            if from_status:
+                qb = qb.in_('status', list(from_status))
+            response = qb.execute()
+            actualizadas = {str(r.get('ot_nro')) for r in (getattr(response, 'data', None) or [])}
+        except Exception as e:
+            print(f"Error al actualizar estado de OTs en lote: {e}")
+            for ot in tanda:
+                resultados[ot] = (False, f"Error al actualizar estado: {e}")
+            continue
+        for ot in tanda:
+            if ot in actualizadas:
+                resultados[ot] = (True, "Estado actualizado")
+            elif from_status:
+                resultados[ot] = (False, "No se actualizó (la OT cambió de estado o no existe).")
+            else:
+                resultados[ot] = (False, "No se actualizó (OT no encontrada o sin permisos).")
+    return resultados
+
+
+@invalidates(_reads)
 def cancel_work_order(ot_nro, admin_id, motivo=None, reembolso=0):
+    """Cancela la OT y registra el historial en `cancelaciones` (RPC `cancelar_orden`)."""
     if not supabase:
         return False, "No hay conexión con la base de datos."
     if not admin_id:
         return False, "No se encontró administrador autenticado."
     try:
-        response = supabase.table('ordenes_trabajo').select('*').eq('ot_nro', ot_nro).limit(1).execute()
-        row = (response.data[0] if response.data else None)
-        if not row:
-            return False, "Orden no encontrada."
-        if (row.get('status') or '').strip().lower() == 'cancelado':
-            return False, "La orden ya fue cancelada previamente."
-        cancel_payload = {
-            'ot_id': row.get('id'),
-            'cliente_id': row.get('cliente_id'),
-            'vendedor_id': row.get('vendedor_id'),
-            'descripcion': row.get('descripcion') or '',
-            'motivo': motivo or '',
-            'reembolso': float(reembolso) if reembolso else 0,
-            'estado_anterior': row.get('status') or 'Pendiente',
-            'cancelado_por': admin_id,
-            'fecha_creacion_ot': _format_date_value(row.get('fecha_creacion') or row.get('created_at')) or date.today().isoformat(),
-            'fecha_cancelacion': datetime.utcnow().isoformat()
-        }
-        ins = supabase.table('cancelaciones').insert(cancel_payload).execute()
-        if hasattr(ins, 'error') and ins.error:
-            return False, str(ins.error)
-        upd = supabase.table('ordenes_trabajo').update({'status': 'Cancelado'}).eq('id', row.get('id')).execute()
-        if hasattr(upd, 'error') and upd.error:
-            return False, str(upd.error)
+        supabase.rpc('cancelar_orden', {
+            'p_ot_nro': _ot_key(ot_nro),
+            'p_admin_id': admin_id,
+            'p_motivo': motivo or '',
+            'p_reembolso': float(reembolso) if reembolso else 0,
+        }).execute()
         return True, "Orden cancelada"
     except Exception as e:
+        msg = _rpc_error_message(e)
+        if msg:
+            return False, msg
         print(f"Error al cancelar OT {ot_nro}: {e}")
         return False, f"Error al cancelar la OT: {e}"
 
 
+@invalidates(_reads)
 def update_work_order_details(ot_nro, updates: dict):
     if not supabase:
         return False, "No hay conexión con la base de datos."
@@ -626,50 +1049,35 @@ def update_work_order_details(ot_nro, updates: dict):
         return False, f"Error al actualizar orden: {e}"
 
 
+@invalidates(_reads)
 def add_sena_to_order(ot_nro, amount):
     """Registra un abono en la tabla `abonos` y actualiza `ordenes_trabajo.abonado_total`.
+
+    La función RPC `registrar_abono` inserta el abono, suma el total y aprueba la OT en
+    una sola transacción (sin carreras entre administradores).
     Retorna (True, mensaje) o (False, mensaje).
     """
-    # Nuevo comportamiento: registrar un abono en la tabla `abonos` y actualizar `abonado_total`
     if not supabase:
         return False, "No hay conexión con la base de datos."
     try:
-        resp = supabase.table('ordenes_trabajo').select('id, abonado_total').eq('ot_nro', ot_nro).limit(1).execute()
-        if not getattr(resp, 'data', None):
-            return False, "Orden no encontrada para registrar abono."
-        row = resp.data[0]
-        try:
-            add_val = float(amount)
-        except Exception:
-            return False, "Monto inválido para abono."
-        ot_id = row.get('id')
-        cur_ab = float(row.get('abonado_total') or 0)
-        # Insertar registro en abonos (creado_por queda null si no hay contexto)
-        try:
-            ins = supabase.table('abonos').insert({
-                'ot_id': ot_id,
-                'monto': add_val
-            }).execute()
-            if hasattr(ins, 'error') and ins.error:
-                return False, str(ins.error)
-        except Exception as e:
-            print(f"Error al insertar abono: {e}")
-            return False, f"Error al insertar abono: {e}"
-        nuevo = cur_ab + add_val
-        upd = supabase.table('ordenes_trabajo').update({'abonado_total': nuevo}).eq('id', ot_id).execute()
-        if hasattr(upd, 'error') and upd.error:
-            return False, str(upd.error)
-        # Autorizar automáticamente la orden al registrar abono: marcar como 'Aprobado'
-        try:
-            supabase.table('ordenes_trabajo').update({'status': 'Aprobado'}).eq('id', ot_id).execute()
-        except Exception:
-            pass
+        add_val = float(amount)
+    except Exception:
+        return False, "Monto inválido para abono."
+    try:
+        # creado_por queda null si no hay contexto
+        resp = supabase.rpc('registrar_abono', {'p_ot_nro': _ot_key(ot_nro), 'p_monto': add_val}).execute()
+        row = _rpc_row(resp) or {}
+        nuevo = float(row.get('abonado_total') or 0)
         return True, f"Abono registrado. Abonado total: {nuevo}"
     except Exception as e:
+        msg = _rpc_error_message(e)
+        if msg:
+            return False, msg
         print(f"Error al registrar abono OT {ot_nro}: {e}")
         return False, f"Error al registrar abono: {e}"
 
 
+@invalidates(_reads)
 def update_work_order_value(ot_nro, valor_total):
     if not supabase: return False, "No hay conexión con la base de datos."
     try:
@@ -684,6 +1092,7 @@ def update_work_order_value(ot_nro, valor_total):
         return False, f"Error al actualizar valor: {e}"
 
 
+@invalidates(_reads)
 def delete_work_order(ot_nro):
     if not supabase: return False, "No hay conexión con la base de datos."
     try:
@@ -699,28 +1108,64 @@ def delete_work_order(ot_nro):
 
 
 # --- FUNCIONES PARA CLIENTES ---
+def _all_clients_query(client):
+    return client.table('clientes').select('*').order('created_at', desc=True)
+
+
+def _clients_result(response):
+    return [records.Client.from_row(r) for r in (response.data or [])]
+
+
+@coalesce(_reads)
 def get_all_clients():
+    """Todos los clientes como `Client`, los más nuevos primero."""
     if not supabase: return False, "No hay conexión con la base de datos."
     try:
-        response = supabase.table('clientes').select('*').order('created_at', desc=True).execute()
-        return True, (response.data or [])
+        return True, _clients_result(_all_clients_query(supabase).execute())
     except Exception as e:
         print(f"Error al obtener clientes: {e}")
         return False, f"Error inesperado al obtener clientes: {e}"
 
 
+def _search_clients_query(client, texto, limit):
+    return client.rpc('search_clients', {'p_query': texto, 'p_limit': int(limit or SEARCH_LIMIT)})
+
+
+@coalesce(_reads)
+def search_clients(query: str, limit: int = SEARCH_LIMIT):
+    """Clientes cuyo nombre o CI/RUC se parecen a `query` (`Client`, los más parecidos primero)."""
+    if not supabase: return False, "No hay conexión con la base de datos."
+    texto = str(query or '').strip()
+    if not texto:
+        return True, []
+    try:
+        return True, _clients_result(_search_clients_query(supabase, texto, limit).execute())
+    except Exception as e:
+        print(f"Error al buscar clientes: {e}")
+        return False, f"Error inesperado al buscar clientes: {e}"
+
+
+def _all_users_query(client):
+    # La columna de fecha en `usuarios` es `fecha_registro` según el nuevo esquema
+    return client.table('usuarios').select('*').order('fecha_registro', desc=True)
+
+
+def _users_result(response):
+    return [records.User.from_row(r) for r in (response.data or [])]
+
+
+@coalesce(_reads)
 def get_all_users():
-    """Devuelve todos los usuarios (vendedores) desde la tabla 'usuarios'."""
+    """Devuelve todos los usuarios (vendedores) de la tabla 'usuarios' como `User` (sin hash ni sal)."""
     if not supabase: return False, "No hay conexión con la base de datos."
     try:
-        # La columna de fecha en `usuarios` es `fecha_registro` según el nuevo esquema
-        response = supabase.table('usuarios').select('*').order('fecha_registro', desc=True).execute()
-        return True, (response.data or [])
+        return True, _users_result(_all_users_query(supabase).execute())
     except Exception as e:
         print(f"Error al obtener usuarios: {e}")
         return False, f"Error inesperado al obtener usuarios: {e}"
 
 
+@invalidates(_reads)
 def update_user(ci_ruc, updates: dict):
     """Actualiza un usuario identificado por su CI/RUC en la tabla 'usuarios'."""
     if not supabase: return False, "No hay conexión con la base de datos."
@@ -740,7 +1185,7 @@ def update_user(ci_ruc, updates: dict):
                     continue
                 if (row.get(k) or '') != (v or ''):
                     return False, f"Campo '{k}' no se actualizó correctamente. Esperado: '{v}', DB: '{row.get(k)}'"
-            _reset_lookup_cache()
+            _forget_lookup(_usuarios_cache, response.data, ci_ruc=[ci_ruc, ci_select])
             return True, "Usuario actualizado"
         except Exception as e:
             print(f"Error verificando actualización por CI/RUC: {e}")
@@ -750,6 +1195,7 @@ def update_user(ci_ruc, updates: dict):
         return False, f"Error al actualizar usuario: {e}"
 
 
+@invalidates(_reads)
 def delete_user(ci_ruc: str):
     """Elimina un usuario (vendedor) por su CI/RUC de la tabla 'usuarios'."""
     if not supabase: return False, "No hay conexión con la base de datos."
@@ -759,13 +1205,14 @@ def delete_user(ci_ruc: str):
             return False, str(response.error)
         if not getattr(response, 'data', None):
             return False, "No se eliminó ningún usuario (CI/RUC no encontrado o sin permisos)."
-        _reset_lookup_cache()
+        _forget_lookup(_usuarios_cache, response.data, ci_ruc=[ci_ruc])
         return True, "Usuario eliminado"
     except Exception as e:
         print(f"Error al eliminar usuario: {e}")
         return False, f"Error al eliminar usuario: {e}"
 
 
+@invalidates(_reads)
 def update_client(ci_ruc, updates: dict):
     if not supabase: return False, "No hay conexión con la base de datos."
     try:
@@ -774,13 +1221,14 @@ def update_client(ci_ruc, updates: dict):
             return False, str(response.error)
         if not getattr(response, 'data', None):
             return False, "No se actualizó ningún cliente (CI/RUC no encontrado o sin permisos)."
-        _reset_lookup_cache()
+        _forget_lookup(_clientes_cache, response.data, ci_ruc=[ci_ruc, (updates or {}).get('ci_ruc')])
         return True, "Cliente actualizado"
     except Exception as e:
         print(f"Error al actualizar cliente: {e}")
         return False, f"Error al actualizar cliente: {e}"
 
 
+@invalidates(_reads)
 def delete_client(ci_ruc: str):
     """Elimina un cliente por su CI/RUC."""
     if not supabase: return False, "No hay conexión con la base de datos."
@@ -790,44 +1238,47 @@ def delete_client(ci_ruc: str):
             return False, str(response.error)
         if not getattr(response, 'data', None):
             return False, "No se eliminó ningún cliente (CI/RUC no encontrado o sin permisos)."
-        _reset_lookup_cache()
+        _forget_lookup(_clientes_cache, response.data, ci_ruc=[ci_ruc])
         return True, "Cliente eliminado"
     except Exception as e:
         print(f"Error al eliminar cliente: {e}")
         return False, f"Error al eliminar cliente: {e}"
 
 
-def get_work_orders_by_client(ci_ruc: str):
-    """Devuelve las órdenes de trabajo asociadas al CI/RUC del cliente."""
+def _client_work_orders_query(client, cid):
+    return client.table('ordenes_trabajo').select('*').eq('cliente_id', cid).order('fecha_creacion', desc=True)
+
+
+def _client_work_orders_result(ci_ruc, response, as_records=False):
+    data = response.data or []
+    # Añadir campo cliente textual
+    for d in data:
+        d['cliente'] = ci_ruc
+        d['abonado_total'] = d.get('abonado_total', 0) or 0
+    return records.WorkOrder.from_rows(data) if as_records else data
+
+
+@coalesce(_reads)
+def get_work_orders_by_client(ci_ruc: str, as_records: bool = False):
+    """Devuelve las órdenes de trabajo asociadas al CI/RUC del cliente (`WorkOrder` con
+    `as_records`)."""
     if not supabase:
         return False, "No hay conexión con la base de datos."
-    # Intentar una vez y reintentar una vez si hay un cierre de conexión inesperado
-    import time
-    for attempt in range(2):
-        try:
-                # Resolver cliente id y filtrar por cliente_id
-                cid = get_client_id_by_ci_ruc(ci_ruc)
-                if cid is None:
-                    return True, []
-                response = supabase.table('ordenes_trabajo').select('*').eq('cliente_id', cid).order('fecha_creacion', desc=True).execute()
-                data = response.data or []
-                # Añadir campo cliente textual
-                for d in data:
-                    d['cliente'] = ci_ruc
-                    d['abonado_total'] = d.get('abonado_total', 0) or 0
-                return True, data
-        except Exception as e:
-            err_str = str(e)
-            print(f"Error al obtener OTs por cliente (attempt {attempt+1}): {err_str}")
-            # Si es el primer intento, esperar un breve periodo y reintentar
-            if attempt == 0:
-                time.sleep(0.5)
-                continue
-            return False, f"Error inesperado al obtener OTs: {err_str}"
+    # Los cortes de conexión se reintentan en la política común (resilience.py)
+    try:
+        # Resolver cliente id y filtrar por cliente_id
+        cid = get_client_id_by_ci_ruc(ci_ruc)
+        if cid is None:
+            return True, []
+        return True, _client_work_orders_result(ci_ruc, _client_work_orders_query(supabase, cid).execute(), as_records)
+    except Exception as e:
+        print(f"Error al obtener OTs por cliente: {e}")
+        return False, f"Error inesperado al obtener OTs: {e}"
 
 
 # --- FUNCIONES DE USUARIOS (VENDEDORES) ---
 
+@coalesce(_reads)
 def get_user_by_ci_ruc(ci_ruc: str):
     """Devuelve el registro del usuario (dict) o None si no existe."""
     if not supabase:
@@ -842,18 +1293,22 @@ def get_user_by_ci_ruc(ci_ruc: str):
         return None
 
 
-def create_user(nombre: str, ci_ruc: str, password: str, email: str = None, estado: str = 'activo'):
+@invalidates(_reads)
+def create_user(nombre: str, ci_ruc: str, password: str, email: str = None, estado: str = 'activo', progress=None, cancelled=None):
     """Crea un usuario en la tabla 'usuarios'. Retorna (True, mensaje) o (False, mensaje)."""
     if not supabase:
         return False, "No hay conexión con la base de datos."
 
-    salt, pw_hash = _hash_password(password)
     try:
+        _auth_step(progress, cancelled, "Generando credenciales...", 0.1)
+        salt, pw_hash = _hash_password(password)
+        _auth_step(progress, cancelled, "Registrando usuario...", 0.7)
         data = {
             'nombre': nombre,
             'ci_ruc': ci_ruc,
             'password_hash': pw_hash,
             'salt': salt,
+            'pw_iteraciones': PASSWORD_ITERATIONS,
             'email': email,
             'fecha_registro': datetime.utcnow().isoformat(),
             'estado': estado
@@ -861,8 +1316,10 @@ def create_user(nombre: str, ci_ruc: str, password: str, email: str = None, esta
         response = supabase.table('usuarios').insert(data).execute()
         if hasattr(response, 'error') and response.error:
             raise Exception(response.error)
-        _reset_lookup_cache()
+        _forget_lookup(_usuarios_cache, response.data, ci_ruc=[ci_ruc])
         return True, "Usuario registrado correctamente."
+    except AuthCancelled:
+        return False, CANCELLED_MESSAGE
     except Exception as e:
         err_str = str(e).lower()
         if 'duplicate' in err_str or 'unique' in err_str:
@@ -873,30 +1330,53 @@ def create_user(nombre: str, ci_ruc: str, password: str, email: str = None, esta
         return False, f"Error inesperado al crear usuario: {e}"
 
 
-def verify_user_credentials(ci_ruc: str, password: str):
-    """Verifica credenciales. Retorna (True, nombre) o (False, mensaje)."""
+def authenticate_user(ci_ruc: str, password: str, progress=None, cancelled=None):
+    """Verifica credenciales. Retorna (True, UserSession) o (False, mensaje).
+
+    La sesión lleva el `id` ya resuelto: los módulos del vendedor lo usan como
+    `vendedor_id` y no vuelven a buscar al usuario en cada operación.
+    `progress(mensaje, fraccion)` y `cancelled()` son opcionales (ver `core.services.auth`).
+    """
     if not supabase:
         return False, "No hay conexión con la base de datos."
     try:
+        _auth_step(progress, cancelled, "Buscando usuario...", 0.1)
         user = get_user_by_ci_ruc(ci_ruc)
         if not user:
             return False, "Usuario no encontrado."
-        salt = user.get('salt')
-        pw_hash = user.get('password_hash')
-        if not salt or not pw_hash:
+        if not user.get('salt') or not user.get('password_hash'):
             return False, "Credenciales incompletas para el usuario."
-        if _verify_password(password, salt, pw_hash):
-            return True, user.get('nombre')
-        return False, "Contraseña incorrecta."
+        if not _check_password(user, password, 'usuarios', progress, cancelled):
+            return False, "Contraseña incorrecta."
+        _auth_step(progress, cancelled, "Listo", 1.0)
+        session = UserSession.from_user_row(user)
+        if session.user_id is not None:
+            _usuarios_cache.put(('ci_ruc', str(user.get('ci_ruc'))), session.user_id)
+        return True, session
+    except AuthCancelled:
+        return False, CANCELLED_MESSAGE
     except Exception as e:
         print(f"Error al verificar credenciales: {e}")
         return False, f"Error al verificar credenciales: {e}"
 
 
+def verify_user_credentials(ci_ruc: str, password: str):
+    """Verifica credenciales. Retorna (True, nombre) o (False, mensaje)."""
+    ok, result = authenticate_user(ci_ruc, password)
+    if not ok:
+        return False, result
+    return True, result.nombre
+
+
 # --- FUNCIONES DE OTs PARA VENDEDOR ---
 
+@invalidates(_reads)
 def insert_work_order(ot_data: dict):
-    """Inserta una OT desde el flujo de vendedor. Espera claves: ot_nro, fecha, valor, vendedor, ci_ruc, etc."""
+    """Inserta una OT desde el flujo de vendedor. Espera claves: ot_nro, fecha, valor, vendedor, ci_ruc, etc.
+
+    Si vienen `vendedor_id` (de la `UserSession`) y/o `cliente_id`, se usan directo y no
+    se consulta `usuarios`/`clientes` para resolverlos.
+    """
     if not supabase:
         return False, "No hay conexión con la base de datos."
 
@@ -928,7 +1408,9 @@ def insert_work_order(ot_data: dict):
         }
 
         ci = ot_data.get('ci_ruc')
-        if ci:
+        if ot_data.get('cliente_id') is not None:
+            payload['cliente_id'] = ot_data['cliente_id']
+        elif ci:
             cid = get_client_id_by_ci_ruc(ci)
             if cid is None:
                 return False, f"Cliente con CI/RUC {ci} no encontrado."
@@ -937,7 +1419,9 @@ def insert_work_order(ot_data: dict):
         if 'descripcion' in ot_data:
             payload['descripcion'] = ot_data['descripcion']
 
-        if 'vendedor' in ot_data and ot_data['vendedor']:
+        if ot_data.get('vendedor_id') is not None:
+            payload['vendedor_id'] = ot_data['vendedor_id']
+        elif 'vendedor' in ot_data and ot_data['vendedor']:
             v = ot_data['vendedor']
             vendedor_id = None
             try:
@@ -975,55 +1459,23 @@ def insert_work_order(ot_data: dict):
             return False, str(response.error)
         return True, "Orden de Trabajo guardada correctamente."
     except Exception as e:
-        if 'duplicate key value violates unique constraint "ordenes_trabajo_pkey"' in str(e):
+        if 'duplicate key value violates unique constraint "ordenes_trabajo_ot_nro_key"' in str(e) \
+                or 'duplicate key value violates unique constraint "ordenes_trabajo_pkey"' in str(e):
             return False, f"La Orden de Trabajo Nro. {ot_data['ot_nro']} ya existe."
         print(f"Error al insertar OT: {e}")
         return False, f"Error inesperado al guardar la OT: {e}"
 
 
-def get_work_orders_by_vendedor(vendedor: str):
-    """Obtiene OTs filtradas por vendedor (id o ci_ruc)."""
+@coalesce(_reads)
+def get_work_orders_by_vendedor(vendedor: str = None, vendedor_id=None):
+    """Obtiene OTs filtradas por vendedor (id o ci_ruc), o directo por `vendedor_id`."""
     if not supabase:
         return False, "No hay conexión con la base de datos."
-    try:
-        vendedor_id = None
-        try:
-            resp_ci = supabase.table('usuarios').select('id').eq('ci_ruc', str(vendedor)).limit(1).execute()
-            if resp_ci.data:
-                vendedor_id = resp_ci.data[0].get('id')
-        except Exception:
-            vendedor_id = None
-        if vendedor_id is None:
-            try:
-                maybe_id = int(vendedor)
-                resp_id = supabase.table('usuarios').select('id').eq('id', maybe_id).limit(1).execute()
-                if resp_id.data:
-                    vendedor_id = resp_id.data[0].get('id')
-            except Exception:
-                vendedor_id = None
-        if vendedor_id is None:
-            return True, []
+    return _collect_work_orders(vendedor=vendedor, vendedor_id=vendedor_id)
 
-        response = (
-            supabase
-            .table('ordenes_trabajo')
-            .select('id,ot_nro,cliente_id,vendedor_id,descripcion,valor_total,sena,abonado_total,forma_pago,solicita_envio,status,fecha_creacion,fecha_entrega,created_at')
-            .eq('vendedor_id', vendedor_id)
-            .order('ot_nro', desc=True)
-            .execute()
-        )
-        data = response.data or []
-        cliente_ids = list({d.get('cliente_id') for d in data if d.get('cliente_id')})
-        vendedor_ids = list({d.get('vendedor_id') for d in data if d.get('vendedor_id')})
-        clientes = get_clients_by_ids(cliente_ids)
-        usuarios = get_users_by_ids(vendedor_ids)
-        for d in data:
-            cid = d.get('cliente_id')
-            vid = d.get('vendedor_id')
-            d['cliente'] = clientes.get(cid, {}).get('nombre') or clientes.get(cid, {}).get('ci_ruc') or ''
-            d['vendedor'] = usuarios.get(vid, {}).get('nombre') or usuarios.get(vid, {}).get('ci_ruc') or ''
-            d['abonado_total'] = d.get('abonado_total', 0) or 0
-        return True, data
-    except Exception as e:
-        print(f"Error al obtener las órdenes de trabajo por vendedor: {e}")
-        return False, f"Error inesperado al obtener las órdenes de trabajo: {e}"
+
+# Trazas por llamada (tiempo, round trips, filas, bytes, cache) de todas las funciones públicas
+# (las de métricas se excluyen: el indicador de estado y el panel las piden cada 2 s)
+tracing.instrument_module(sys.modules[__name__], exclude=(
+    'get_backend_status', 'get_coalescing_stats', 'get_transport_stats', 'get_lookup_cache_stats',
+))
@@ -0,0 +1,225 @@
+"""Transporte HTTP compartido para el cliente de Supabase.
+
+Todos los hilos de fondo de la UI usan el mismo `httpx.Client`, con:
+- un pool acotado de conexiones keep-alive (las ráfagas de detalle/lookup reutilizan
+  conexiones ya abiertas en lugar de pagar un handshake TLS cada una),
+- HTTP/2 cuando el paquete `h2` está instalado (varias requests por conexión),
+- un semáforo que limita cuántas requests hay en vuelo a la vez por app,
+- métricas de uso del pool (`get_transport_stats()`).
+
+Variables de entorno:
+- `PLOTMASTER_HTTP_MAX_CONCURRENCY`: requests simultáneas (por defecto 8).
+- `PLOTMASTER_HTTP_MAX_CONNECTIONS`: conexiones en el pool (por defecto 10).
+- `PLOTMASTER_HTTP_KEEPALIVE_SECONDS`: cuánto vive una conexión ociosa (por defecto 60).
+"""
+import atexit
+import importlib.util
+import os
+import threading
+import time
+import weakref
+
+import httpx
+
+from plotmaster.core.services.resilience import remaining_time
+from plotmaster.core.utils import tracing
+
+# httpx solo negocia HTTP/2 si está instalado `h2` (pip install httpx[http2])
+_H2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.environ.get(name) or default))
+    except ValueError:
+        return default
+
+
+HTTP_MAX_CONCURRENCY = _env_int("PLOTMASTER_HTTP_MAX_CONCURRENCY", 8)
+HTTP_MAX_CONNECTIONS = _env_int("PLOTMASTER_HTTP_MAX_CONNECTIONS", 10)
+HTTP_KEEPALIVE_SECONDS = _env_int("PLOTMASTER_HTTP_KEEPALIVE_SECONDS", 60)
+# Timeout por request; los plazos por operación los agrega la capa de servicios
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+
+
+class BoundedTransport(httpx.BaseTransport):
+    """`httpx.HTTPTransport` con límite de requests en vuelo y contadores de uso."""
+
+    def __init__(self, max_concurrency: int = HTTP_MAX_CONCURRENCY, max_connections: int = HTTP_MAX_CONNECTIONS,
+                 keepalive_seconds: float = HTTP_KEEPALIVE_SECONDS, http2: bool = _H2_AVAILABLE):
+        self.max_concurrency = max_concurrency
+        self.http2 = bool(http2 and _H2_AVAILABLE)
+        self._inner = httpx.HTTPTransport(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_seconds,
+            ),
+        )
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._seen_connections = weakref.WeakSet()
+        self._stats = {}
+        self.reset_stats()
+
+    def _apply_deadline(self, request: httpx.Request):
+        """Recorta los timeouts de la request a lo que queda del plazo de la llamada."""
+        left = remaining_time()
+        if left is None:
+            return None
+        if left <= 0:
+            raise httpx.PoolTimeout("Se agotó el plazo de la llamada antes de enviarla.", request=request)
+        timeouts = dict(request.extensions.get('timeout') or {})
+        for key in ('connect', 'read', 'write', 'pool'):
+            current = timeouts.get(key)
+            timeouts[key] = left if current is None else min(current, left)
+        request.extensions['timeout'] = timeouts
+        return left
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        left = self._apply_deadline(request)
+        waited = not self._slots.acquire(blocking=False)
+        if waited and not self._slots.acquire(timeout=left if left is not None else -1):
+            with self._lock:
+                self._stats['waited'] += 1
+                self._stats['errors'] += 1
+            raise httpx.PoolTimeout("Se agotó el plazo esperando un lugar para la request.", request=request)
+        wait_time = time.perf_counter() - started
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['waited'] += int(waited)
+            self._stats['wait_seconds'] += wait_time
+            self._stats['in_flight'] += 1
+            self._stats['peak_in_flight'] = max(self._stats['peak_in_flight'], self._stats['in_flight'])
+        try:
+            response = self._inner.handle_request(request)
+            try:
+                # El cuerpo se lee dentro del slot: la conexión vuelve al pool antes de liberarlo
+                response.read()
+            except BaseException:
+                response.close()
+                raise
+            tracing.add('bytes', len(response.content))
+            return response
+        except Exception:
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            self._track_connections()
+            with self._lock:
+                self._stats['in_flight'] -= 1
+            self._slots.release()
+
+    def _connections(self):
+        pool = getattr(self._inner, '_pool', None)
+        try:
+            return list(pool.connections) if pool is not None else []
+        except Exception:
+            return []
+
+    def _track_connections(self):
+        opened = 0
+        for conn in self._connections():
+            if conn not in self._seen_connections:
+                self._seen_connections.add(conn)
+                opened += 1
+        if opened:
+            with self._lock:
+                self._stats['connections_opened'] += opened
+
+    def reset_stats(self):
+        with self._lock:
+            in_flight = self._stats.get('in_flight', 0)
+            self._stats = {
+                'requests': 0, 'errors': 0, 'waited': 0, 'wait_seconds': 0.0,
+                'in_flight': in_flight, 'peak_in_flight': in_flight, 'connections_opened': 0,
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+        conns = self._connections()
+        idle = 0
+        for conn in conns:
+            try:
+                idle += int(conn.is_idle())
+            except Exception:
+                pass
+        out.update({
+            'http2': self.http2,
+            'max_concurrency': self.max_concurrency,
+            'utilization': out['in_flight'] / self.max_concurrency,
+            'pool_connections': len(conns),
+            'pool_idle': idle,
+            # Requests que reutilizaron una conexión abierta en vez de abrir otra
+            'reused': max(0, out['requests'] - out['errors'] - out['connections_opened']),
+        })
+        return out
+
+    def close(self):
+        self._inner.close()
+
+
+_client = None
+_transport = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """`httpx.Client` del proceso (se crea la primera vez que se pide)."""
+    global _client, _transport
+    with _client_lock:
+        if _client is None:
+            _transport = BoundedTransport()
+            _client = httpx.Client(transport=_transport, timeout=HTTP_TIMEOUT, follow_redirects=True)
+        return _client
+
+
+def create_async_http_client() -> httpx.AsyncClient:
+    """`httpx.AsyncClient` con los mismos límites de pool/HTTP2 (para `async_service`).
+
+    El límite de requests en vuelo lo aplica quien lo usa con un `asyncio.Semaphore`.
+    """
+    return httpx.AsyncClient(
+        http2=_H2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+        ),
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+    )
+
+
+def get_transport_stats() -> dict:
+    """Uso del pool: requests, en vuelo, esperas por el semáforo, conexiones abiertas/ociosas."""
+    with _client_lock:
+        transport = _transport
+    if transport is None:
+        return {'active': False}
+    out = transport.stats()
+    out['active'] = True
+    return out
+
+
+def reset_transport_stats():
+    with _client_lock:
+        transport = _transport
+    if transport is not None:
+        transport.reset_stats()
+
+
+@atexit.register
+def close_http_client():
+    global _client, _transport
+    with _client_lock:
+        client, _client, _transport = _client, None, None
+    if client is not None:
+        try:
+            client.close()
+        except Exception:
+            pass
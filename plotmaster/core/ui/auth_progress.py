@@ -0,0 +1,75 @@
+"""Indicador de avance para login/registro en segundo plano (ver `core.services.auth`)."""
+import customtkinter as ctk
+
+
+class AuthProgressPanel(ctk.CTkFrame):
+    """Barra de progreso + mensaje + botón "Cancelar" que sigue a un `AuthTask`.
+
+    Mientras la tarea corre se deshabilitan `busy_widgets` (p. ej. el botón INGRESAR)
+    para evitar logins duplicados. El panel se muestra con `pack` solo durante la tarea.
+    """
+
+    def __init__(self, parent, width: int = 250, **kwargs):
+        kwargs.setdefault("fg_color", "transparent")
+        super().__init__(parent, **kwargs)
+        self._task = None
+        self._busy_widgets = ()
+        self._pack_kwargs = {}
+
+        self.status_label = ctk.CTkLabel(self, text="", font=ctk.CTkFont(size=12), text_color="gray40")
+        self.status_label.pack(pady=(0, 4))
+        self.progress_bar = ctk.CTkProgressBar(self, width=width, height=8)
+        self.progress_bar.set(0)
+        self.progress_bar.pack()
+        self.cancel_button = ctk.CTkButton(self, text="Cancelar", width=100, height=26,
+                                           fg_color="transparent", text_color=("gray10", "gray90"),
+                                           hover_color=("gray70", "gray30"), command=self.cancel)
+        self.cancel_button.pack(pady=(6, 0))
+
+    @property
+    def busy(self) -> bool:
+        return self._task is not None
+
+    def run(self, task, on_done, busy_widgets=(), **pack_kwargs):
+        """Arranca `task` y llama `on_done(ok, resultado)` en el hilo de Tk al terminar."""
+        if self._task is not None:
+            return None
+        self._task = task
+        self._busy_widgets = tuple(busy_widgets)
+        self._set_busy(True)
+        self.status_label.configure(text="Conectando...")
+        self.progress_bar.set(0)
+        self.pack(**(pack_kwargs or {"pady": (0, 10)}))
+
+        def _done(ok, result):
+            self._finish()
+            on_done(ok, result)
+
+        return task.watch(self, on_progress=self._on_progress, on_done=_done)
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._finish()
+
+    def _on_progress(self, mensaje, fraccion):
+        self.status_label.configure(text=mensaje)
+        self.progress_bar.set(max(0.0, min(1.0, float(fraccion))))
+
+    def _finish(self):
+        self._task = None
+        self._set_busy(False)
+        self.pack_forget()
+
+    def _set_busy(self, busy: bool):
+        for widget in self._busy_widgets:
+            try:
+                widget.configure(state="disabled" if busy else "normal")
+            except Exception:
+                pass
+
+    def destroy(self):
+        # Cerrar la ventana no deja un login corriendo en segundo plano
+        if self._task is not None:
+            self._task.cancel()
+        super().destroy()
@@ -0,0 +1,45 @@
+"""Indicador del estado de conexión con el backend (circuit breaker de `resilience`)."""
+import customtkinter as ctk
+
+from plotmaster.core.services.supabase_service import get_backend_status
+
+# Refresco del indicador; `get_backend_status` no va a la red
+STATUS_REFRESH_MS = 2000
+
+_STATES = {
+    'closed': ("●  Conectado", "#8BC34A"),
+    'half_open': ("●  Reconectando...", "#FFC107"),
+    'open': ("●  Sin conexión", "#FF7043"),
+    'offline': ("●  Sin base de datos", "#BDBDBD"),
+}
+
+
+class BackendStatusLabel(ctk.CTkLabel):
+    """Etiqueta que muestra si el backend responde o si el breaker está cortando llamadas."""
+
+    def __init__(self, parent, refresh_ms: int = STATUS_REFRESH_MS, **kwargs):
+        kwargs.setdefault("font", ctk.CTkFont(size=12))
+        super().__init__(parent, text="", **kwargs)
+        self.refresh_ms = refresh_ms
+        self._after_id = None
+        self.refresh()
+
+    def refresh(self):
+        try:
+            status = get_backend_status()
+        except Exception as e:
+            status = {'state': 'offline', 'last_error': str(e)}
+        texto, color = _STATES.get(status.get('state'), _STATES['offline'])
+        if status.get('state') == 'open' and status.get('retry_in'):
+            texto += f" (reintento en {int(status['retry_in']) + 1} s)"
+        self.configure(text=texto, text_color=color)
+        self._after_id = self.after(self.refresh_ms, self.refresh)
+
+    def destroy(self):
+        if self._after_id is not None:
+            try:
+                self.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        super().destroy()
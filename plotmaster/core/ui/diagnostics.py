@@ -0,0 +1,152 @@
+"""Panel de diagnóstico (oculto) con las trazas de `core.utils.tracing`.
+
+Se abre con Ctrl+Shift+D desde la ventana del administrador: una fila por función del
+servicio con llamadas, latencias (p50/p95/p99/máx), round trips y filas por llamada,
+bytes, aciertos de cache y errores; abajo el estado del pool HTTP y del breaker.
+"""
+from tkinter import filedialog, messagebox, ttk
+
+import customtkinter as ctk
+
+from plotmaster.core.services.supabase_service import get_backend_status, get_transport_stats
+from plotmaster.core.utils import tracing
+
+DIAGNOSTICS_REFRESH_MS = 2000
+
+_COLUMNAS = (
+    ("fn", "FUNCIÓN", 260, "w"),
+    ("calls", "LLAMADAS", 80, "e"),
+    ("errors", "ERRORES", 70, "e"),
+    ("p50", "P50 ms", 70, "e"),
+    ("p95", "P95 ms", 70, "e"),
+    ("p99", "P99 ms", 70, "e"),
+    ("max", "MÁX ms", 80, "e"),
+    ("rt", "RT/LLAM.", 80, "e"),
+    ("rows", "FILAS/LLAM.", 90, "e"),
+    ("kb", "KB", 70, "e"),
+    ("cache", "CACHE %", 70, "e"),
+    ("callers", "LLAMADO DESDE", 260, "w"),
+)
+
+
+def _fmt_ms(value):
+    return "-" if value is None else (f"{value:.1f}" if value < 100 else f"{value:.0f}")
+
+
+class DiagnosticsWindow(ctk.CTkToplevel):
+    """Tabla con las estadísticas por función; se refresca sola mientras está abierta."""
+
+    def __init__(self, parent, refresh_ms: int = DIAGNOSTICS_REFRESH_MS):
+        super().__init__(parent)
+        self.title("Diagnóstico del servicio")
+        self.geometry("1250x520")
+        self.refresh_ms = refresh_ms
+        self._after_id = None
+
+        barra = ctk.CTkFrame(self, fg_color="transparent")
+        barra.pack(fill="x", padx=12, pady=(12, 6))
+        ctk.CTkLabel(barra, text="Trazas por función", font=("Arial", 16, "bold")).pack(side="left")
+        ctk.CTkButton(barra, text="Reiniciar", width=100, fg_color="#C0392B", command=self._reset).pack(side="right", padx=4)
+        ctk.CTkButton(barra, text="Guardar JSON", width=120, command=self._dump).pack(side="right", padx=4)
+        ctk.CTkButton(barra, text="Actualizar", width=100, command=self.refresh).pack(side="right", padx=4)
+
+        cont = ctk.CTkFrame(self, fg_color="transparent")
+        cont.pack(fill="both", expand=True, padx=12)
+        cont.grid_rowconfigure(0, weight=1)
+        cont.grid_columnconfigure(0, weight=1)
+        self.tabla = ttk.Treeview(cont, columns=[c[0] for c in _COLUMNAS], show="headings")
+        for key, titulo, ancho, anchor in _COLUMNAS:
+            self.tabla.heading(key, text=titulo)
+            self.tabla.column(key, width=ancho, anchor=anchor, stretch=key in ("fn", "callers"))
+        scroll = ctk.CTkScrollbar(cont, orientation="vertical", command=self.tabla.yview)
+        self.tabla.configure(yscrollcommand=scroll.set)
+        self.tabla.grid(row=0, column=0, sticky="nsew")
+        scroll.grid(row=0, column=1, sticky="ns")
+
+        self.lbl_resumen = ctk.CTkLabel(self, text="", font=("Consolas", 11), justify="left", anchor="w")
+        self.lbl_resumen.pack(fill="x", padx=12, pady=(6, 12))
+
+        if not tracing.ENABLED:
+            self.lbl_resumen.configure(text="Las trazas están desactivadas (PLOTMASTER_TRACING=0).")
+        self.refresh()
+
+    def refresh(self):
+        if self._after_id is not None:
+            try:
+                self.after_cancel(self._after_id)
+            except Exception:
+                pass
+        snap = tracing.snapshot()
+        funciones = sorted(snap['functions'].items(), key=lambda kv: kv[1]['latency']['p95_ms'] or 0, reverse=True)
+        for iid in self.tabla.get_children():
+            self.tabla.delete(iid)
+        for nombre, st in funciones:
+            lat, per_call, totals = st['latency'], st['per_call'], st['totals']
+            consultas = totals['cache_hits'] + totals['cache_misses']
+            cache = f"{100.0 * totals['cache_hits'] / consultas:.0f}" if consultas else "-"
+            callers = ", ".join(f"{c.rsplit('.', 1)[-1]}×{n}" for c, n in
+                                sorted(st['callers'].items(), key=lambda kv: kv[1], reverse=True)[:3])
+            self.tabla.insert("", "end", values=(
+                nombre, st['calls'], st['errors'], _fmt_ms(lat['p50_ms']), _fmt_ms(lat['p95_ms']),
+                _fmt_ms(lat['p99_ms']), _fmt_ms(lat['max_ms']), f"{per_call.get('round_trips', 0):.1f}",
+                f"{per_call.get('rows', 0):.0f}", f"{totals['bytes'] / 1024:.0f}", cache, callers,
+            ))
+        if tracing.ENABLED:
+            self.lbl_resumen.configure(text=self._resumen_backend())
+        self._after_id = self.after(self.refresh_ms, self.refresh)
+
+    @staticmethod
+    def _resumen_backend() -> str:
+        try:
+            pool, estado = get_transport_stats(), get_backend_status()
+        except Exception as e:
+            return f"Sin datos del backend: {e}"
+        lineas = [f"Backend: {estado.get('state')}   fallos seguidos: {estado.get('consecutive_failures', 0)}"
+                  f"   rechazadas por breaker: {estado.get('rejected', 0)}"]
+        if pool.get('active'):
+            lineas.append(
+                f"HTTP: {pool['requests']} requests, {pool['in_flight']} en vuelo (pico {pool['peak_in_flight']}), "
+                f"{pool['pool_connections']} conexiones ({pool['pool_idle']} ociosas), {pool['reused']} reutilizadas, "
+                f"esperas por cupo: {pool['waited']}"
+            )
+        return "\n".join(lineas)
+
+    def _dump(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json", initialfile="plotmaster_trace.json",
+                                            filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            tracing.dump(path)
+            messagebox.showinfo("Guardado", f"Trazas guardadas en {path}", parent=self)
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo guardar: {e}", parent=self)
+
+    def _reset(self):
+        tracing.reset()
+        self.refresh()
+
+    def destroy(self):
+        if self._after_id is not None:
+            try:
+                self.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        super().destroy()
+
+
+def bind_diagnostics_shortcut(root, sequence: str = "<Control-Shift-D>"):
+    """Asocia el atajo que abre (o trae al frente) el panel de diagnóstico."""
+    state = {'window': None}
+
+    def _open(_event=None):
+        win = state['window']
+        if win is not None and win.winfo_exists():
+            win.lift()
+            win.focus_force()
+            return
+        state['window'] = DiagnosticsWindow(root)
+
+    root.bind_all(sequence, _open)
+    return _open
@@ -0,0 +1,106 @@
+"""Búsqueda en el servidor para las cajas de búsqueda de las planillas.
+
+Las planillas filtran lo que ya tienen en memoria. Mientras la carga sigue (todavía no
+llegaron todas las páginas) o cuando en lo cargado no aparece nada (un error de tipeo,
+una tilde), `RemoteSearch` pide la misma consulta a `search_work_orders` /
+`search_clients` del servicio y la planilla suma esos resultados a los suyos.
+
+Las consultas se piden por el loop de `async_service` y el resultado vuelve en el hilo
+de Tk; una respuesta que llega después de que el texto cambió se descarta.
+"""
+from plotmaster.core.services import async_service
+
+# Con menos letras la búsqueda en el servidor devuelve demasiado ruido
+MIN_QUERY_LEN = 3
+
+
+class RemoteSearch:
+    """Última búsqueda en el servidor de una caja de búsqueda.
+
+    `search(texto)` retorna la corrutina del servicio (`(ok, filas)`); `on_results()` se
+    llama en el hilo de Tk cuando hay resultados nuevos para la consulta actual.
+    """
+
+    def __init__(self, widget, search, on_results, min_len: int = MIN_QUERY_LEN):
+        self.widget = widget
+        self.search = search
+        self.on_results = on_results
+        self.min_len = min_len
+        self.query = None
+        self.results = []
+        self._future = None
+
+    @staticmethod
+    def _key(texto) -> str:
+        return ' '.join(str(texto or '').lower().split())
+
+    def request(self, texto):
+        """Pide `texto` al servidor salvo que sea la consulta actual (o demasiado corta)."""
+        q = self._key(texto)
+        if len(q) < self.min_len:
+            self.clear()
+            return
+        if q == self.query:
+            return
+        self.clear()
+        self.query = q
+        self._future = async_service.run_in_tk(
+            self.widget,
+            self.search(q),
+            lambda res: self._done(q, *res),
+            on_error=lambda exc: self._done(q, False, f"Error inesperado: {exc}"),
+        )
+
+    def _done(self, q, ok, rows):
+        if q != self.query:
+            return
+        self._future = None
+        if not ok:
+            # Sin servidor la planilla sigue con lo que tiene cargado
+            print(f"Búsqueda en el servidor no disponible: {rows}")
+            return
+        self.results = list(rows or [])
+        self.on_results()
+
+    def results_for(self, texto) -> list:
+        """Resultados del servidor si `texto` es la consulta pedida; si no, ninguno."""
+        return self.results if self.query is not None and self._key(texto) == self.query else []
+
+    def clear(self):
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+        self.query = None
+        self.results = []
+
+
+def merge_work_orders(frame, visibles, remotas, estado=None):
+    """Suma a las filas `visibles` del `WorkOrderFrame` las OTs del servidor que faltan.
+
+    Las que ya están cargadas se muestran con el registro local (el que edita la UI); las
+    que no, con el del servidor. `estado` filtra las remotas igual que la planilla.
+    Retorna `(filas, solo_remotas, totales)`.
+    """
+    ya = set(int(i) for i in visibles)
+    extra_pos, solo_remotas = [], []
+    for d in remotas:
+        if estado is not None and d.tag != estado.strip().lower():
+            continue
+        i = frame.index_of(d.ot)
+        if i is None:
+            solo_remotas.append(d)
+        elif i not in ya:
+            ya.add(i)
+            extra_pos.append(i)
+    if extra_pos:
+        visibles = [int(i) for i in visibles] + extra_pos
+    filas = frame.take(visibles) + solo_remotas
+    totales = frame.totals(visibles)
+    if solo_remotas:
+        monto = sum(d.monto for d in solo_remotas)
+        abonado = sum(d.abonado for d in solo_remotas)
+        totales['count'] += len(solo_remotas)
+        totales['monto'] += monto
+        totales['abonado'] += abonado
+        totales['saldo'] += monto - abonado
+    return filas, solo_remotas, totales
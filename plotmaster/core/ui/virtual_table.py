@@ -0,0 +1,486 @@
+"""Treeview virtual para planillas con miles de filas.
+
+`actualizar_tabla` borraba todos los ítems del `ttk.Treeview` y volvía a insertar cada
+fila que pasaba el filtro: Tk terminaba con miles de ítems y cada tecla en la búsqueda
+era una reconstrucción completa. `VirtualTreeview` guarda las filas en Python y solo
+crea ítems para la parte visible más un margen (`buffer`) arriba y abajo:
+
+- al scrollear, la rueda y el teclado mueven la vista nativa dentro de ese margen;
+  cerca del borde la ventana se corre y los mismos ítems se reescriben con otras filas;
+- la barra de scroll ve el total de filas (`yview` / `yscrollcommand` virtuales);
+- la selección se guarda por clave, así sobrevive al scroll y a `set_rows`;
+  `selection()` e `item(clave)` trabajan con claves, y `<<TreeviewSelect>>` se avisa
+  igual que antes (solo cuando cambia la selección);
+- `set_rows` reconcilia por clave: la primera fila visible sigue siendo la misma si
+  todavía está, cada ítem conserva la fila que ya mostraba y a Tk solo llegan las
+  celdas/tags que cambiaron, los ítems que hay que mover y los que sobran.
+
+Se usa como un Treeview: columnas, encabezados, tags y `bind` son los nativos. Las
+filas se cargan con `set_rows([(clave, valores, tags), ...])`.
+"""
+import tkinter as tk
+from bisect import bisect_left
+from tkinter import ttk
+
+# Filas materializadas por encima y por debajo de lo visible
+BUFFER_ROWS = 20
+# Alto de fila y de encabezado si todavía no se pudo medir (Treeview por defecto)
+_DEFAULT_ROW_PX = 20
+_DEFAULT_HEADING_PX = 24
+_SHIFT, _CONTROL = 0x0001, 0x0004
+
+
+class RowWindow:
+    """Filas, selección por clave y qué tramo está materializado (sin Tk).
+
+    `top` es la primera fila visible, `start` la primera materializada; el tramo
+    materializado tiene `pool` filas e incluye siempre a las visibles.
+    """
+
+    __slots__ = ('rows', 'index', 'selected', 'start', 'top', 'visible', 'buffer')
+
+    def __init__(self, visible: int = 10, buffer: int = BUFFER_ROWS):
+        self.rows = []
+        self.index = {}
+        # dict como conjunto ordenado de claves seleccionadas
+        self.selected = {}
+        self.start = 0
+        self.top = 0
+        self.visible = max(1, int(visible))
+        # Con menos de 2 filas de margen la vista nativa no tendría hacia dónde moverse
+        self.buffer = max(2, int(buffer))
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def pool(self) -> int:
+        return min(len(self.rows), self.visible + 2 * self.buffer)
+
+    def set_rows(self, rows) -> bool:
+        """Reemplaza las filas; True si se cayó de la selección alguna clave que ya no está.
+
+        Si la primera fila visible sigue estando, la vista queda en ella (aunque se hayan
+        agregado o quitado filas arriba); si no, queda en la misma posición.
+        """
+        ancla = self.rows[self.top][0] if self.top < len(self.rows) else None
+        self.rows = rows if isinstance(rows, list) else list(rows)
+        self.index = {r[0]: i for i, r in enumerate(self.rows)}
+        antes = len(self.selected)
+        self.selected = {k: None for k in self.selected if k in self.index}
+        self.scroll_to(self.index.get(ancla, self.top))
+        return len(self.selected) != antes
+
+    def scroll_to(self, top, force: bool = False) -> bool:
+        """Lleva la primera fila visible a `top`; True si hay que correr la ventana (repintar)."""
+        n = len(self.rows)
+        self.top = max(0, min(int(top), n - self.visible)) if n > self.visible else 0
+        lo, hi = self.start, self.start + self.pool
+        margin = self.buffer // 2
+        if not force and hi <= n and lo <= self.top and self.top + self.visible <= hi \
+                and (lo == 0 or self.top - lo >= margin) and (hi >= n or hi - self.top - self.visible >= margin):
+            return False
+        self.start = max(0, min(self.top - self.buffer, n - self.pool))
+        return True
+
+    def see(self, key) -> bool:
+        """Scrollea lo mínimo para que se vea la fila `key`; True si hay que repintar."""
+        i = self.index.get(key)
+        if i is None:
+            return False
+        if i < self.top:
+            return self.scroll_to(i)
+        if i >= self.top + self.visible:
+            return self.scroll_to(i - self.visible + 1)
+        return False
+
+    def window(self) -> list:
+        return self.rows[self.start:self.start + self.pool]
+
+    def fractions(self) -> tuple:
+        """(primera, última) como fracción del total, para la barra de scroll."""
+        n = len(self.rows)
+        if not n:
+            return 0.0, 1.0
+        return self.top / n, min(1.0, (self.top + self.visible) / n)
+
+    def selection(self) -> tuple:
+        return tuple(sorted(self.selected, key=self.index.__getitem__))
+
+    def replace(self, keys) -> bool:
+        nuevas = {k: None for k in keys if k in self.index}
+        changed = nuevas.keys() != self.selected.keys()
+        self.selected = nuevas
+        return changed
+
+    def add(self, keys) -> bool:
+        antes = len(self.selected)
+        self.selected.update((k, None) for k in keys if k in self.index)
+        return len(self.selected) != antes
+
+    def remove(self, keys) -> bool:
+        antes = len(self.selected)
+        for k in keys:
+            self.selected.pop(k, None)
+        return len(self.selected) != antes
+
+    def merge(self, window_keys, chosen) -> bool:
+        """Aplica lo que el usuario eligió entre las filas materializadas; el resto queda igual."""
+        chosen = set(chosen)
+        changed = False
+        for k in window_keys:
+            if k in chosen:
+                if k not in self.selected:
+                    self.selected[k] = None
+                    changed = True
+            elif self.selected.pop(k, 0) is None:
+                changed = True
+        return changed
+
+
+def _keys(items) -> list:
+    """Claves de `selection_set(a, b)` o `selection_set((a, b))`, como acepta ttk."""
+    out = []
+    for item in items:
+        if isinstance(item, (list, tuple)):
+            out.extend(item)
+        else:
+            out.append(item)
+    return out
+
+
+def _moves(actual, destino) -> list:
+    """Movimientos `(ítem, índice)` que llevan el orden `actual` a `destino` (mismos ítems).
+
+    Quedan quietos los ítems de la subsecuencia creciente más larga; cada uno de los
+    demás va detrás de su anterior en `destino`. El índice es el de `Treeview.move`,
+    que primero saca el ítem y después lo inserta.
+    """
+    pos = {s: i for i, s in enumerate(actual)}
+    seq = [pos[s] for s in destino]
+    # Subsecuencia creciente más larga de `seq` (colas + anterior de cada elemento)
+    colas, colas_idx, previo = [], [], [-1] * len(seq)
+    for i, v in enumerate(seq):
+        j = bisect_left(colas, v)
+        if j:
+            previo[i] = colas_idx[j - 1]
+        if j == len(colas):
+            colas.append(v)
+            colas_idx.append(i)
+        else:
+            colas[j] = v
+            colas_idx[j] = i
+    quietos = set()
+    i = colas_idx[-1] if colas_idx else -1
+    while i >= 0:
+        quietos.add(i)
+        i = previo[i]
+    orden = list(actual)
+    out = []
+    for i, s in enumerate(destino):
+        if i in quietos:
+            continue
+        orden.remove(s)
+        j = orden.index(destino[i - 1]) + 1 if i else 0
+        orden.insert(j, s)
+        out.append((s, j))
+    return out
+
+
+class VirtualTreeview(ttk.Treeview):
+    """`ttk.Treeview` que solo materializa la ventana visible (ver el docstring del módulo)."""
+
+    def __init__(self, master=None, buffer: int = BUFFER_ROWS, **kw):
+        self._yscroll = kw.pop('yscrollcommand', None)
+        super().__init__(master, **kw)
+        self._win = RowWindow(int(self.cget('height') or 10), buffer)
+        # Ítems reales reciclados, en el orden en que están en Tk: slot -> posición
+        # dentro de la ventana, y la fila (clave, valores, tags) que muestra cada uno
+        self._slots = []
+        self._slot_pos = {}
+        self._painted = {}
+        self._select_handlers = []
+        self._replace_next = False
+        self._focus_key = None
+        self._paint_pending = None
+        self._row_px = None
+        self._heading_px = None
+        super().configure(yscrollcommand=self._on_native_yscroll)
+        super().bind('<<TreeviewSelect>>', self._on_native_select)
+        super().bind('<Configure>', self._on_configure, add='+')
+        super().bind('<ButtonPress-1>', self._on_press, add='+')
+        super().bind('<KeyPress>', self._on_press, add='+')
+
+    # --- FILAS ---
+
+    def set_rows(self, rows):
+        """Reemplaza el contenido: `rows` son tuplas `(clave, valores, tags)`."""
+        if self._win.set_rows(rows):
+            self._fire_select()
+        self._paint()
+
+    def get_children(self, item=None):
+        return tuple(r[0] for r in self._win.rows)
+
+    def exists(self, item):
+        return item in self._win.index
+
+    def item(self, item, option=None, **kw):
+        i = self._win.index.get(item)
+        if i is None:
+            return super().item(item, option, **kw)
+        key, values, tags = self._win.rows[i]
+        if kw:
+            values = tuple(kw.get('values', values))
+            tags = kw.get('tags', tags)
+            tags = (tags,) if isinstance(tags, str) else tuple(tags)
+            self._win.rows[i] = (key, values, tags)
+            self._paint()
+            return None
+        info = {'text': '', 'image': '', 'values': list(values), 'open': 0, 'tags': list(tags)}
+        return info[option] if option else info
+
+    def insert(self, parent, index, iid=None, **kw):
+        """Compatibilidad con el uso de Treeview: agrega una fila (se pinta en el próximo idle)."""
+        key = iid if iid is not None else f"fila{len(self._win.rows)}"
+        tags = kw.get('tags', ())
+        row = (key, tuple(kw.get('values', ())), (tags,) if isinstance(tags, str) else tuple(tags))
+        win = self._win
+        if index == 'end':
+            win.index[key] = len(win.rows)
+            win.rows.append(row)
+        else:
+            rows = list(win.rows)
+            rows.insert(int(index), row)
+            win.set_rows(rows)
+        self._schedule_paint()
+        return key
+
+    def delete(self, *items):
+        fuera = set(_keys(items))
+        if self._win.set_rows([r for r in self._win.rows if r[0] not in fuera]):
+            self._fire_select()
+        self._schedule_paint()
+
+    def _schedule_paint(self):
+        if self._paint_pending is None:
+            self._paint_pending = self.after_idle(self._paint)
+
+    # --- SELECCIÓN POR CLAVE ---
+
+    def selection(self):
+        return self._win.selection()
+
+    def selection_set(self, *items):
+        self._change_selection(self._win.replace(_keys(items)))
+
+    def selection_add(self, *items):
+        self._change_selection(self._win.add(_keys(items)))
+
+    def selection_remove(self, *items):
+        self._change_selection(self._win.remove(_keys(items)))
+
+    def _change_selection(self, changed):
+        self._paint()
+        if changed:
+            self._fire_select()
+
+    def bind(self, sequence=None, func=None, add=None):
+        # Los avisos de selección los da el widget (por clave), no los slots nativos
+        if sequence == '<<TreeviewSelect>>' and func is not None:
+            if not add:
+                self._select_handlers.clear()
+            self._select_handlers.append(func)
+            return None
+        return super().bind(sequence, func, add)
+
+    def _fire_select(self, event=None):
+        if event is None:
+            event = tk.Event()
+            event.widget = self
+        for handler in list(self._select_handlers):
+            handler(event)
+
+    def _on_press(self, event):
+        # Clic o tecla sin Shift/Ctrl: la selección nueva reemplaza también a la que no se ve
+        self._replace_next = not (event.state & (_SHIFT | _CONTROL))
+        self.after_idle(self._clear_replace)
+
+    def _clear_replace(self):
+        self._replace_next = False
+
+    def _on_native_select(self, event):
+        window = self._win.window()
+        chosen = [window[self._slot_pos[s]][0] for s in super().selection() if s in self._slot_pos]
+        focus = super().focus()
+        if focus in self._slot_pos:
+            self._focus_key = window[self._slot_pos[focus]][0]
+        if self._replace_next:
+            self._replace_next = False
+            changed = self._win.replace(chosen)
+        else:
+            # También llegan acá los ecos de `_paint`: no cambian nada y no se avisan
+            changed = self._win.merge([r[0] for r in window], chosen)
+        if changed:
+            self._fire_select(event)
+
+    # --- SCROLL VIRTUAL ---
+
+    def configure(self, cnf=None, **kw):
+        if isinstance(cnf, dict) and 'yscrollcommand' in cnf:
+            cnf = dict(cnf)
+            kw['yscrollcommand'] = cnf.pop('yscrollcommand')
+        if 'yscrollcommand' in kw:
+            self._yscroll = kw.pop('yscrollcommand')
+            self._report()
+            if not kw and not cnf:
+                return None
+        return super().configure(cnf, **kw)
+
+    config = configure
+
+    def yview(self, *args):
+        win = self._win
+        if not args:
+            return win.fractions()
+        if args[0] == 'moveto':
+            top = int(float(args[1]) * len(win))
+        elif args[0] == 'scroll':
+            step = win.visible if str(args[2]).startswith('page') else 1
+            top = win.top + int(float(args[1])) * step
+        else:
+            return None
+        self._scroll_to(top)
+        return None
+
+    def yview_moveto(self, fraction):
+        self.yview('moveto', fraction)
+
+    def yview_scroll(self, number, what):
+        self.yview('scroll', number, what)
+
+    def see(self, item):
+        if item not in self._win.index:
+            return super().see(item)
+        if self._win.see(item):
+            self._paint()
+        else:
+            self._place_view()
+        self._report()
+
+    def _scroll_to(self, top):
+        if self._win.scroll_to(top):
+            self._paint()
+        else:
+            self._place_view()
+            self._report()
+
+    def _on_native_yscroll(self, first, last):
+        # La vista nativa se movió (rueda, teclado): traducir a la fila virtual
+        pool = len(self._slots)
+        if pool:
+            top = self._win.start + int(round(float(first) * pool))
+            if top != self._win.top and self._win.scroll_to(top):
+                self._paint()
+                return
+        self._report()
+
+    def _report(self):
+        if self._yscroll is not None:
+            self._yscroll(*self._win.fractions())
+
+    def _place_view(self):
+        if self._slots:
+            super().yview_moveto((self._win.top - self._win.start) / len(self._slots))
+
+    # --- PINTADO ---
+
+    def _paint(self):
+        """Lleva los ítems reciclados a las filas de la ventana actual, tocando solo lo que cambió.
+
+        Un ítem que ya muestra una fila de la ventana se queda con ella (a lo sumo se mueve
+        o se le reescriben las celdas si cambiaron); los libres toman las filas nuevas y
+        los que sobran se borran.
+        """
+        if self._paint_pending is not None:
+            try:
+                self.after_cancel(self._paint_pending)
+            except Exception:
+                pass
+            self._paint_pending = None
+        win = self._win
+        window = win.window()
+        painted = self._painted
+        wanted = {r[0] for r in window}
+        por_clave, libres = {}, []
+        for slot in self._slots:
+            row = painted.get(slot)
+            if row is not None and row[0] in wanted and row[0] not in por_clave:
+                por_clave[row[0]] = slot
+            else:
+                libres.append(slot)
+        libres.reverse()
+        actual = list(self._slots)
+        slots = []
+        for key, _values, _tags in window:
+            slot = por_clave.get(key)
+            if slot is None:
+                if libres:
+                    slot = libres.pop()
+                else:
+                    slot = super().insert('', 'end')
+                    actual.append(slot)
+            slots.append(slot)
+        if libres:
+            super().delete(*libres)
+            for slot in libres:
+                painted.pop(slot, None)
+            sobran = set(libres)
+            actual = [s for s in actual if s not in sobran]
+        for slot, index in _moves(actual, slots):
+            super().move(slot, '', index)
+        self._slots = slots
+        self._slot_pos = {s: i for i, s in enumerate(slots)}
+        seleccion, focus = [], None
+        for slot, row in zip(slots, window):
+            if painted.get(slot) != row:
+                super().item(slot, values=row[1], tags=row[2])
+                painted[slot] = row
+            if row[0] in win.selected:
+                seleccion.append(slot)
+            if row[0] == self._focus_key:
+                focus = slot
+        if set(seleccion) != set(super().selection()):
+            super().selection_set(seleccion)
+        if focus is not None and super().focus() != focus:
+            super().focus(focus)
+        self._place_view()
+        self._report()
+        if self._row_px is None and slots:
+            # Primeras filas pintadas: medir el alto real y recalcular cuántas entran
+            self.after_idle(self._on_configure)
+
+    def _measure(self):
+        """Alto de fila y de encabezado medidos sobre un ítem visible (una vez)."""
+        if self._row_px is not None or not self._slots:
+            return
+        slot = self._slots[min(self._win.top - self._win.start, len(self._slots) - 1)]
+        box = super().bbox(slot)
+        if box:
+            self._heading_px, self._row_px = box[1], box[3]
+
+    def _visible_rows(self) -> int:
+        height = self.winfo_height()
+        if height <= 1:
+            return self._win.visible
+        self._measure()
+        row_px = self._row_px or _DEFAULT_ROW_PX
+        heading_px = self._heading_px if self._heading_px is not None else _DEFAULT_HEADING_PX
+        return max(1, (height - heading_px) // row_px)
+
+    def _on_configure(self, _event=None):
+        visible = self._visible_rows()
+        if visible != self._win.visible:
+            self._win.visible = visible
+            self._win.scroll_to(self._win.top, force=True)
+            self._paint()
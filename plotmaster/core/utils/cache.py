@@ -0,0 +1,123 @@
+"""Cache en memoria con LRU + TTL, segura para usar desde varios hilos.
+
+Pensada para datos referenciales (clientes/usuarios) que leen los hilos de fondo de la UI:
+- tamaño acotado con expulsión LRU,
+- TTL por entrada (las entradas vencen de a una, no todas juntas),
+- cache negativa: recordar por un rato que un id no existe,
+- invalidación por clave para que una escritura no borre todo lo demás,
+- contadores de aciertos/fallos/expulsiones para medir cuánto ahorra.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from plotmaster.core.utils import tracing
+
+# Marca interna de "se consultó y no existe"
+_NEGATIVE = object()
+
+
+class LRUTTLCache:
+    """Mapa clave -> valor con capacidad máxima, vencimiento por entrada y métricas."""
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 90, negative_ttl_seconds: float = 30, clock=time.monotonic):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.negative_ttl_seconds = float(negative_ttl_seconds)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # clave -> (vence, valor)
+        self._stats = {}
+        self.reset_stats()
+
+    # Lectura ----------------------------------------------------------------
+    def lookup(self, key):
+        """Retorna `(encontrado, valor)`. Un negativo vigente es `(True, None)`."""
+        result = self._lookup(key)
+        tracing.add('cache_hits' if result[0] else 'cache_misses')
+        return result
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    if value is _NEGATIVE:
+                        self._stats['negative_hits'] += 1
+                        return True, None
+                    self._stats['hits'] += 1
+                    return True, value
+                del self._data[key]
+                self._stats['expirations'] += 1
+            self._stats['misses'] += 1
+            return False, None
+
+    def get(self, key, default=None):
+        found, value = self.lookup(key)
+        return value if found and value is not None else default
+
+    def get_many(self, keys):
+        """Separa `keys` en `(encontrados, faltantes)`; los negativos no van en ninguno."""
+        found, missing = {}, []
+        for key in dict.fromkeys(keys):
+            hit, value = self.lookup(key)
+            if not hit:
+                missing.append(key)
+            elif value is not None:
+                found[key] = value
+        return found, missing
+
+    # Escritura --------------------------------------------------------------
+    def put(self, key, value, ttl_seconds: float = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else float(ttl_seconds)
+        with self._lock:
+            self._data[key] = (self._clock() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def put_missing(self, key):
+        """Registra que `key` no existe (cache negativa con TTL propio)."""
+        if self.negative_ttl_seconds > 0:
+            self.put(key, _NEGATIVE, self.negative_ttl_seconds)
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    self._stats['invalidations'] += 1
+
+    def invalidate_where(self, predicate):
+        """Invalida las entradas (no negativas) cuyo valor cumple `predicate(valor)`."""
+        with self._lock:
+            doomed = [k for k, (_, v) in self._data.items() if v is not _NEGATIVE and predicate(v)]
+            for key in doomed:
+                del self._data[key]
+            self._stats['invalidations'] += len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    # Métricas ---------------------------------------------------------------
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {
+                'hits': 0, 'negative_hits': 0, 'misses': 0,
+                'evictions': 0, 'expirations': 0, 'invalidations': 0,
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out['size'] = len(self._data)
+        lookups = out['hits'] + out['negative_hits'] + out['misses']
+        out['hit_ratio'] = ((out['hits'] + out['negative_hits']) / lookups) if lookups else 0.0
+        return out
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
@@ -0,0 +1,60 @@
+"""Formato de montos y fechas para la UI, memoizado.
+
+Cada planilla tenía su `_format_gs` (el admin con punto de miles, el vendedor con coma)
+y el detalle pasaba cada fecha por `strptime` en cada refresco. Los montos y las fechas
+se repiten mucho entre filas (precios de lista, el mismo día de carga), así que el texto
+se cachea por valor: la primera vez se formatea y después es una búsqueda en un dict.
+"""
+from datetime import datetime
+from functools import lru_cache
+
+_CACHE_SIZE = 4096
+
+
+def clean_amount(valor) -> int:
+    """Monto en Gs. como entero: números tal cual (redondeados) y de un texto solo sus
+    dígitos ("1.500.000" -> 1500000), con signo si empieza con '-'."""
+    if isinstance(valor, (int, float)):
+        try:
+            return int(round(valor))
+        except Exception:
+            return 0
+    s = str(valor or '').strip()
+    neg = s.startswith("-")
+    digits = "".join(ch for ch in s if ch.isdigit())
+    if not digits:
+        return 0
+    num = int(digits)
+    return -num if neg else num
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _amount_text(num: int) -> str:
+    return f"{num:,}".replace(",", ".")
+
+
+def format_amount(valor) -> str:
+    """Punto de miles, sin unidad: 1500000 -> "1.500.000"."""
+    return _amount_text(clean_amount(valor))
+
+
+def format_gs(valor) -> str:
+    """Con la unidad: 1500000 -> "1.500.000 Gs."."""
+    return _amount_text(clean_amount(valor)) + " Gs."
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _date_text(fecha_texto: str) -> str:
+    try:
+        return datetime.strptime(fecha_texto, "%Y-%m-%d").strftime("%d/%m/%Y")
+    except ValueError:
+        return fecha_texto
+
+
+def format_date(raw_fecha) -> str:
+    """Fecha ISO (o `date`/`datetime`) como `dd/mm/aaaa`; si no se puede leer, el texto tal cual."""
+    if not raw_fecha:
+        return ""
+    if hasattr(raw_fecha, 'isoformat'):
+        raw_fecha = raw_fecha.isoformat()
+    return _date_text(str(raw_fecha).split('T')[0])
@@ -0,0 +1,146 @@
+"""Índice de trigramas para buscar por subcadena en las planillas.
+
+Las planillas buscaban pasando a minúsculas cliente, descripción y vendedor de cada
+fila en cada tecla. `TrigramIndex` guarda por clave el texto ya normalizado y, por
+cada trigrama, el conjunto de claves que lo contienen:
+
+- una consulta con alguna palabra de 3+ letras intersecta los conjuntos de sus
+  trigramas y confirma la subcadena solo en esos candidatos;
+- si la consulta extiende a la anterior ("jua" -> "juan") y el índice no cambió, se
+  revisan solo los resultados anteriores;
+- `add`/`remove` actualizan una clave sin rearmar el índice.
+
+Solo se indexan trigramas dentro de cada palabra. Los trigramas de cada palabra se
+calculan una vez: nombres y palabras de las descripciones se repiten mucho entre
+filas. La confirmación final con `in` sobre el texto completo mantiene el resultado
+exacto aunque la consulta tenga espacios.
+
+La normalización (`fold`) es la de `_normalize_text` del servicio: minúsculas y
+vocales sin tilde. Los campos de una clave se unen con un salto de línea, así que una
+consulta no matchea "a caballo" entre dos campos.
+"""
+
+_TILDES = (('á', 'a'), ('é', 'e'), ('í', 'i'), ('ó', 'o'), ('ú', 'u'), ('ü', 'u'))
+_SEP = '\n'
+
+
+def fold(value) -> str:
+    """Minúsculas y vocales sin tilde (no recorta espacios: se busca por subcadena)."""
+    text = str(value or '').lower()
+    if not text.isascii():
+        for orig, repl in _TILDES:
+            if orig in text:
+                text = text.replace(orig, repl)
+    return text
+
+
+class TrigramIndex:
+    """Claves -> texto normalizado, con postings por trigrama."""
+
+    __slots__ = ('_texts', '_postings', '_words', '_version', '_last')
+
+    def __init__(self):
+        self._texts = {}
+        self._postings = {}
+        # palabra -> frozenset de sus trigramas
+        self._words = {}
+        self._version = 0
+        # (versión, consulta normalizada, resultado) de la última búsqueda
+        self._last = None
+
+    def __len__(self):
+        return len(self._texts)
+
+    def __contains__(self, key):
+        return key in self._texts
+
+    def _trigrams(self, text: str) -> set:
+        words = self._words
+        grams = set()
+        for word in set(text.split()):
+            g = words.get(word)
+            if g is None:
+                g = words[word] = frozenset(word[i:i + 3] for i in range(len(word) - 2))
+            grams |= g
+        return grams
+
+    def add(self, key, *fields):
+        """Indexa (o reindexa) `key` con el texto de `fields`; si no cambió no hace nada."""
+        text = _SEP.join(fold(f) for f in fields)
+        anterior = self._texts.get(key)
+        if anterior == text:
+            return
+        if anterior is not None:
+            self._unlink(key, anterior)
+        self._texts[key] = text
+        postings = self._postings
+        for gram in self._trigrams(text):
+            keys = postings.get(gram)
+            if keys is None:
+                postings[gram] = {key}
+            else:
+                keys.add(key)
+        self._version += 1
+
+    def remove(self, key) -> bool:
+        text = self._texts.pop(key, None)
+        if text is None:
+            return False
+        self._unlink(key, text)
+        self._version += 1
+        return True
+
+    def _unlink(self, key, text):
+        for gram in self._trigrams(text):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def retain(self, keys):
+        """Quita las claves que no están en `keys` (un `set`); las demás quedan como estaban."""
+        for key in [k for k in self._texts if k not in keys]:
+            self.remove(key)
+
+    def clear(self):
+        self._texts.clear()
+        self._postings.clear()
+        self._words.clear()
+        self._version += 1
+        self._last = None
+
+    def search(self, query):
+        """Claves cuyo texto contiene `query` (sin distinguir mayúsculas ni tildes).
+
+        Retorna None si la consulta queda vacía (= no filtrar) y si no un `set`.
+        """
+        q = fold(query)
+        if not q:
+            return None
+        last = self._last
+        if last is not None and last[0] == self._version and last[1] in q:
+            # Todo lo que contiene `q` contiene también a la consulta anterior
+            candidates = last[2]
+        else:
+            candidates = self._candidates(q)
+        texts = self._texts
+        result = {k for k in candidates if q in texts[k]}
+        self._last = (self._version, q, result)
+        return result
+
+    def _candidates(self, q: str):
+        """Claves con todos los trigramas de las palabras de `q` (empezando por el más raro);
+        si ninguna palabra llega a 3 letras, todas."""
+        grams = {w[i:i + 3] for w in q.split() for i in range(len(w) - 2)}
+        if not grams:
+            return self._texts.keys()
+        postings = sorted((self._postings.get(g, ()) for g in grams), key=len)
+        if not postings[0]:
+            return ()
+        out = set(postings[0])
+        for keys in postings[1:]:
+            out &= keys
+            if not out:
+                break
+        return out
@@ -0,0 +1,125 @@
+"""Coalescencia de llamadas idénticas en vuelo ("single-flight").
+
+Si varios hilos piden lo mismo (misma función y argumentos) mientras la primera
+llamada sigue en curso, solo esa llamada va a la red; el resto espera y recibe una
+copia del resultado (o la misma excepción).
+
+    _reads = SingleFlight()
+
+    @coalesce(_reads)
+    def get_work_order_by_ot(ot_nro): ...
+
+    @invalidates(_reads)
+    def update_work_order_status(ot_nro, status): ...
+
+`invalidates` sube la generación del grupo al terminar una escritura: quien llegue
+después ya no se suma a una lectura que arrancó antes de esa escritura.
+"""
+import copy
+import functools
+import threading
+
+from plotmaster.core.utils import tracing
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error', 'waiters', 'copies')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self.copies = []
+
+
+class SingleFlight:
+    """Grupo de llamadas coalescibles; cada clave tiene a lo sumo una llamada en vuelo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._generation = 0
+        self._stats = {'calls': 0, 'shared': 0}
+
+    def bump(self):
+        """Nueva generación: las llamadas siguientes no se suman a las que ya están en vuelo."""
+        with self._lock:
+            self._generation += 1
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            key = (self._generation, key)
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats['calls'] += 1
+            else:
+                call.waiters += 1
+                self._stats['shared'] += 1
+
+        if not leader:
+            tracing.add('coalesced')
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            with self._lock:
+                return call.copies.pop()
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+                # Una copia por seguidor: nadie comparte dicts/listas mutables con el líder
+                if call.error is None:
+                    call.copies = [copy.deepcopy(call.result) for _ in range(call.waiters)]
+            call.event.set()
+        return call.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out['in_flight'] = len(self._calls)
+        return out
+
+
+def _make_key(fn, args, kwargs):
+    key = (fn.__module__, fn.__qualname__, args, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def coalesce(group: SingleFlight):
+    """Decorador: las llamadas concurrentes con los mismos argumentos comparten resultado."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = _make_key(fn, args, kwargs)
+            if key is None:
+                # Argumentos no hasheables (listas, dicts): llamada normal
+                return fn(*args, **kwargs)
+            return group.do(key, fn, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def invalidates(group: SingleFlight):
+    """Decorador para escrituras: al terminar, corta la coalescencia con lecturas previas."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                group.bump()
+        return wrapper
+    return decorator
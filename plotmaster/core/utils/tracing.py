@@ -0,0 +1,317 @@
+"""Trazas por llamada e histogramas de latencia de la capa de servicios.
+
+`instrument_module(mod)` envuelve las funciones públicas de un módulo (lo usa
+`supabase_service`). Cada llamada abre un span que junta:
+
+- tiempo de pared,
+- round trips al backend, filas devueltas y bytes recibidos (los suman `resilience`
+  y `transport` con `add()` mientras el span está activo),
+- aciertos/fallos de las caches LRU y lecturas compartidas por `SingleFlight`,
+- el módulo que hizo la llamada.
+
+Los spans anidados (una función del servicio que llama a otra) suman también en el
+span de afuera. Por función se guarda un histograma de latencias; `snapshot()` lo
+devuelve y `dump()` lo escribe en JSON. `add_hook(fn)` recibe cada llamada terminada.
+
+Variables de entorno:
+- `PLOTMASTER_TRACING=0`: no instrumenta (costo cero).
+- `PLOTMASTER_TRACE_FILE`: al salir de la app se vuelca ahí el snapshot.
+"""
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+ENABLED = (os.environ.get("PLOTMASTER_TRACING") or "1").strip().lower() not in ("0", "false", "no", "off")
+TRACE_FILE = os.environ.get("PLOTMASTER_TRACE_FILE") or None
+
+# Límites de los buckets del histograma, en ms (el último es "más de 10 s")
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+# Últimas llamadas que se guardan completas (para el panel de diagnóstico)
+RECENT_CALLS = 200
+
+_COUNTERS = ('round_trips', 'rows', 'bytes', 'cache_hits', 'cache_misses', 'coalesced')
+
+_current = contextvars.ContextVar('plotmaster_span', default=None)
+
+
+class _Span:
+    __slots__ = ('name', 'parent', 'counters')
+
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.counters = dict.fromkeys(_COUNTERS, 0)
+
+
+def add(counter: str, n: int = 1):
+    """Suma `n` al contador del span activo (y a los de afuera). Sin span no hace nada."""
+    span = _current.get()
+    while span is not None:
+        span.counters[counter] = span.counters.get(counter, 0) + n
+        span = span.parent
+
+
+def active() -> bool:
+    return _current.get() is not None
+
+
+class LatencyHistogram:
+    """Histograma de latencias con buckets fijos; los percentiles son aproximados."""
+
+    __slots__ = ('counts', 'count', 'total_ms', 'min_ms', 'max_ms')
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = None
+        self.max_ms = 0.0
+
+    def record(self, ms: float):
+        i = 0
+        while i < len(HISTOGRAM_BOUNDS_MS) and ms > HISTOGRAM_BOUNDS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.min_ms = ms if self.min_ms is None else min(self.min_ms, ms)
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p: float):
+        """Límite superior del bucket donde cae el percentil `p` (0-100)."""
+        if not self.count:
+            return None
+        target = self.count * p / 100.0
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target and n:
+                return HISTOGRAM_BOUNDS_MS[i] if i < len(HISTOGRAM_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> dict:
+        labels = [f"<={b}ms" for b in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        return {
+            'count': self.count,
+            'mean_ms': (self.total_ms / self.count) if self.count else None,
+            'min_ms': self.min_ms,
+            'max_ms': self.max_ms if self.count else None,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'buckets': {label: n for label, n in zip(labels, self.counts) if n},
+        }
+
+
+class _FunctionStats:
+    __slots__ = ('histogram', 'calls', 'errors', 'totals', 'callers')
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.calls = 0
+        self.errors = 0
+        self.totals = dict.fromkeys(_COUNTERS, 0)
+        self.callers = {}
+
+
+_lock = threading.Lock()
+_stats = {}
+_recent = deque(maxlen=RECENT_CALLS)
+_hooks = []
+
+
+def add_hook(fn):
+    """`fn(registro)` se llama con cada llamada terminada (dict, ver `_finish`)."""
+    with _lock:
+        _hooks.append(fn)
+    return fn
+
+
+def remove_hook(fn):
+    with _lock:
+        if fn in _hooks:
+            _hooks.remove(fn)
+
+
+def _finish(name, caller, started_wall, elapsed_ms, span, ok):
+    record = {
+        'fn': name,
+        'caller': caller,
+        'ts': started_wall,
+        'ms': elapsed_ms,
+        'ok': ok,
+        'nested': span.parent is not None,
+        **span.counters,
+    }
+    with _lock:
+        st = _stats.get(name)
+        if st is None:
+            st = _stats[name] = _FunctionStats()
+        st.histogram.record(elapsed_ms)
+        st.calls += 1
+        st.errors += int(not ok)
+        for key, n in span.counters.items():
+            st.totals[key] = st.totals.get(key, 0) + n
+        st.callers[caller] = st.callers.get(caller, 0) + 1
+        _recent.append(record)
+        hooks = list(_hooks)
+    for hook in hooks:
+        try:
+            hook(record)
+        except Exception as e:
+            print(f"Error en hook de trazas: {e}")
+
+
+def _caller_module(depth: int = 2) -> str:
+    try:
+        return sys._getframe(depth).f_globals.get('__name__', '?')
+    except ValueError:
+        return '?'
+
+
+async def _run_traced(label, caller, coro):
+    span = _Span(label, _current.get())
+    token = _current.set(span)
+    wall, started = time.time(), time.perf_counter()
+    ok = False
+    try:
+        result = await coro
+        ok = not (isinstance(result, tuple) and len(result) == 2 and result[0] is False)
+        return result
+    finally:
+        _current.reset(token)
+        _finish(label, caller, wall, (time.perf_counter() - started) * 1000.0, span, ok)
+
+
+def traced(fn=None, *, name: str = None):
+    """Decorador: registra cada llamada a `fn` (funciones comunes; las corrutinas también)."""
+    if fn is None:
+        return functools.partial(traced, name=name)
+    if not ENABLED or inspect.isasyncgenfunction(fn):
+        # Generadores async: las funciones que los consumen ya quedan registradas
+        return fn
+    label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+    if inspect.iscoroutinefunction(fn):
+        # Quien llama se toma al crear la corrutina: cuando corre, el que la ejecuta es el event loop
+        @functools.wraps(fn)
+        def async_wrapper(*args, **kwargs):
+            return _run_traced(label, _caller_module(), fn(*args, **kwargs))
+        async_wrapper.__traced__ = True
+        return async_wrapper
+
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def gen_wrapper(*args, **kwargs):
+            # Solo cuenta el tiempo dentro del generador, no el de quien consume las páginas
+            caller = _caller_module()
+            span = _Span(label, _current.get())
+            wall, elapsed = time.time(), 0.0
+            ok = False
+            gen = fn(*args, **kwargs)
+            try:
+                while True:
+                    token = _current.set(span)
+                    started = time.perf_counter()
+                    try:
+                        item = next(gen)
+                    except StopIteration:
+                        ok = True
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - started
+                        _current.reset(token)
+                    yield item
+            except GeneratorExit:
+                # Quien consume cortó antes del final: no es un error
+                ok = True
+                gen.close()
+                raise
+            finally:
+                _finish(label, caller, wall, elapsed * 1000.0, span, ok)
+        gen_wrapper.__traced__ = True
+        return gen_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        caller = _caller_module()
+        span = _Span(label, _current.get())
+        token = _current.set(span)
+        wall, started = time.time(), time.perf_counter()
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            # Los servicios devuelven (ok, msg) en vez de levantar: también cuenta como error
+            ok = not (isinstance(result, tuple) and len(result) == 2 and result[0] is False)
+            return result
+        finally:
+            _current.reset(token)
+            _finish(label, caller, wall, (time.perf_counter() - started) * 1000.0, span, ok)
+    wrapper.__traced__ = True
+    return wrapper
+
+
+def instrument_module(module, exclude=()):
+    """Envuelve con `traced` las funciones públicas definidas en `module` (en el lugar)."""
+    if not ENABLED:
+        return []
+    done = []
+    for attr, value in list(vars(module).items()):
+        if attr.startswith('_') or attr in exclude or not inspect.isfunction(value):
+            continue
+        if value.__module__ != module.__name__ or getattr(value, '__traced__', False):
+            continue
+        setattr(module, attr, traced(value))
+        done.append(attr)
+    return done
+
+
+# --- LECTURA / VOLCADO ---
+
+def snapshot() -> dict:
+    """Estadísticas por función (histograma, totales, por llamada, quién llama) + últimas llamadas."""
+    with _lock:
+        items = [(name, st.histogram.to_dict(), st.calls, st.errors, dict(st.totals), dict(st.callers))
+                 for name, st in _stats.items()]
+        recent = list(_recent)
+    functions = {}
+    for name, hist, calls, errors, totals, callers in items:
+        functions[name] = {
+            'calls': calls,
+            'errors': errors,
+            'latency': hist,
+            'totals': totals,
+            'per_call': {k: v / calls for k, v in totals.items()} if calls else {},
+            'callers': callers,
+        }
+    return {'generated_at': time.time(), 'enabled': ENABLED, 'functions': functions, 'recent': recent}
+
+
+def dump(path=None) -> str:
+    """Escribe `snapshot()` en JSON; retorna la ruta usada."""
+    path = path or TRACE_FILE or 'plotmaster_trace.json'
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f, ensure_ascii=False, indent=2)
+    return path
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _recent.clear()
+
+
+@atexit.register
+def _dump_at_exit():
+    if TRACE_FILE and ENABLED:
+        try:
+            dump(TRACE_FILE)
+        except Exception as e:
+            print(f"No se pudo guardar el archivo de trazas: {e}")
@@ -56,6 +56,8 @@ CREATE SEQUENCE IF NOT EXISTS public.clientes_id_seq;
 CREATE SEQUENCE IF NOT EXISTS public.ordenes_trabajo_id_seq;
 CREATE SEQUENCE IF NOT EXISTS public.abonos_id_seq;
 CREATE SEQUENCE IF NOT EXISTS public.historial_cancelaciones_ot_id_seq;
+-- Numeración de OTs (ot_nro): la consumen las reservas de reservar_ot_nros
+CREATE SEQUENCE IF NOT EXISTS public.ordenes_trabajo_ot_nro_seq START WITH 1001;
 
 -- =========================
 -- TABLAS
@@ -69,6 +71,7 @@ CREATE TABLE IF NOT EXISTS public.usuarios (
   email text,
   password_hash text NOT NULL,
   salt text NOT NULL,
+  pw_iteraciones integer NOT NULL DEFAULT 100000,
   estado public.estado_usuarios NOT NULL DEFAULT 'activo',
   fecha_registro timestamptz NOT NULL DEFAULT now()
 );
@@ -81,10 +84,15 @@ CREATE TABLE IF NOT EXISTS public.administradores (
   email text,
   password_hash text NOT NULL,
   salt text NOT NULL,
+  pw_iteraciones integer NOT NULL DEFAULT 100000,
   estado public.estado_usuarios NOT NULL DEFAULT 'activo',
   fecha_registro timestamptz NOT NULL DEFAULT now()
 );
 
+-- Costo PBKDF2 por usuario: las bases creadas antes de la columna quedan con el valor histórico
+ALTER TABLE public.usuarios ADD COLUMN IF NOT EXISTS pw_iteraciones integer NOT NULL DEFAULT 100000;
+ALTER TABLE public.administradores ADD COLUMN IF NOT EXISTS pw_iteraciones integer NOT NULL DEFAULT 100000;
+
 -- Tabla: clientes
 CREATE TABLE IF NOT EXISTS public.clientes (
   id bigint DEFAULT nextval('public.clientes_id_seq'::regclass) PRIMARY KEY,
@@ -153,6 +161,27 @@ CREATE TABLE IF NOT EXISTS public.pending_work_orders (
   created_at TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 
+-- Tabla: ordenes_trabajo_eliminadas (tombstones para la sincronización incremental)
+-- La llena el trigger de borrado de ordenes_trabajo; los clientes piden las filas con deleted_at posterior a su marca.
+CREATE TABLE IF NOT EXISTS public.ordenes_trabajo_eliminadas (
+  ot_nro integer PRIMARY KEY,
+  deleted_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- Tabla: ot_nro_reservas (números de OT reservados por bloque para cada vendedor)
+-- reservado_por NULL = número devuelto, disponible para la próxima reserva; lo mismo si expira_en ya pasó.
+-- La fila se borra sola cuando se inserta la OT con ese número (trigger más abajo).
+CREATE TABLE IF NOT EXISTS public.ot_nro_reservas (
+  ot_nro integer PRIMARY KEY,
+  reservado_por text,
+  expira_en timestamptz NOT NULL DEFAULT now()
+);
+
+-- Alinear la secuencia con las OTs ya cargadas (números asignados antes de la secuencia)
+SELECT setval('public.ordenes_trabajo_ot_nro_seq', s.m, true)
+  FROM (SELECT MAX(ot_nro) AS m FROM public.ordenes_trabajo) s
+ WHERE s.m IS NOT NULL AND s.m >= (SELECT last_value FROM public.ordenes_trabajo_ot_nro_seq);
+
 -- =========================
 -- CONSTRAINTS / FOREIGN KEYS
 -- =========================
@@ -225,6 +254,9 @@ CREATE INDEX IF NOT EXISTS idx_ordenes_trabajo_cliente_id ON public.ordenes_trab
 CREATE INDEX IF NOT EXISTS idx_ordenes_trabajo_vendedor_id ON public.ordenes_trabajo (vendedor_id);
 CREATE INDEX IF NOT EXISTS idx_ordenes_trabajo_status ON public.ordenes_trabajo (status);
 CREATE INDEX IF NOT EXISTS idx_ordenes_trabajo_fecha_creacion ON public.ordenes_trabajo (fecha_creacion);
+CREATE INDEX IF NOT EXISTS idx_ordenes_trabajo_updated_at ON public.ordenes_trabajo (updated_at);
+CREATE INDEX IF NOT EXISTS idx_ordenes_trabajo_eliminadas_deleted_at ON public.ordenes_trabajo_eliminadas (deleted_at);
+CREATE INDEX IF NOT EXISTS idx_ot_nro_reservas_expira_en ON public.ot_nro_reservas (expira_en);
 
 -- Abonos
 CREATE INDEX IF NOT EXISTS idx_abonos_ot_id ON public.abonos (ot_id);
@@ -256,6 +288,8 @@ CREATE INDEX IF NOT EXISTS idx_pending_work_orders_monto_abonado ON public.pendi
 -- ALTER TABLE public.abonos ENABLE ROW LEVEL SECURITY;
 -- ALTER TABLE public.cancelaciones ENABLE ROW LEVEL SECURITY;
 -- ALTER TABLE public.pending_work_orders ENABLE ROW LEVEL SECURITY;
+-- ALTER TABLE public.ordenes_trabajo_eliminadas ENABLE ROW LEVEL SECURITY;
+-- ALTER TABLE public.ot_nro_reservas ENABLE ROW LEVEL SECURITY;
 
 -- =========================
 -- EJEMPLOS/EXTRAS: POLÍTICAS RLS DETECTADAS (esqueleto)
@@ -298,17 +332,314 @@ CREATE INDEX IF NOT EXISTS idx_pending_work_orders_monto_abonado ON public.pendi
 -- TRIGGERS (si los hubiera)
 -- =========================
 
--- Nota: No se detectaron triggers en el resumen proporcionado. Si tiene triggers (ej. para actualizar updated_at),
--- agréguelos aquí. Ejemplo de trigger para actualizar updated_at en ordenes_trabajo:
+-- updated_at de ordenes_trabajo: lo usa la sincronización incremental como marca de agua,
+-- por eso se mantiene en la base y no desde los clientes.
+CREATE OR REPLACE FUNCTION public.update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at = now();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_ordenes_update_updated_at ON public.ordenes_trabajo;
+CREATE TRIGGER trg_ordenes_update_updated_at
+  BEFORE UPDATE ON public.ordenes_trabajo
+  FOR EACH ROW EXECUTE FUNCTION public.update_updated_at_column();
+
+-- Tombstone por cada OT borrada (si se vuelve a borrar el mismo ot_nro, se actualiza la fecha).
+CREATE OR REPLACE FUNCTION public.registrar_ot_eliminada()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO public.ordenes_trabajo_eliminadas (ot_nro, deleted_at)
+  VALUES (OLD.ot_nro, now())
+  ON CONFLICT (ot_nro) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS trg_ordenes_registrar_eliminada ON public.ordenes_trabajo;
+CREATE TRIGGER trg_ordenes_registrar_eliminada
+  AFTER DELETE ON public.ordenes_trabajo
+  FOR EACH ROW EXECUTE FUNCTION public.registrar_ot_eliminada();
+
+-- Al guardar una OT su número deja de estar reservado.
+CREATE OR REPLACE FUNCTION public.consumir_reserva_ot()
+RETURNS TRIGGER AS $$
+BEGIN
+  DELETE FROM public.ot_nro_reservas WHERE ot_nro = NEW.ot_nro;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
 
--- CREATE OR REPLACE FUNCTION public.update_updated_at_column()
--- RETURNS TRIGGER AS $$
--- BEGIN
---   NEW.updated_at = now();
---   RETURN NEW;
--- END;
--- $$ LANGUAGE plpgsql SECURITY DEFINER;
+DROP TRIGGER IF EXISTS trg_ordenes_consumir_reserva ON public.ordenes_trabajo;
+CREATE TRIGGER trg_ordenes_consumir_reserva
+  AFTER INSERT ON public.ordenes_trabajo
+  FOR EACH ROW EXECUTE FUNCTION public.consumir_reserva_ot();
 
--- CREATE TRIGGER trg_ordenes_update_updated_at
---   BEFORE UPDATE ON public.ordenes_trabajo
---   FOR EACH ROW EXECUTE FUNCTION public.update_updated_at_column();
\ No newline at end of file
+-- Mantenimiento sugerido: purgar tombstones viejos (el espejo de la app vive lo que dura la sesión,
+-- así que alcanza con una ventana bastante mayor que una jornada).
+-- DELETE FROM public.ordenes_trabajo_eliminadas WHERE deleted_at < now() - interval '90 days';
+
+-- =========================
+-- FUNCIONES RPC (escrituras de varios pasos en una sola transacción)
+-- =========================
+-- Se llaman con supabase.rpc('<funcion>', {...}). Bloquean la OT con FOR UPDATE, así dos
+-- administradores no pisan abonado_total entre sí, y devuelven la OT ya actualizada.
+-- Los errores de negocio usan P0002 (no encontrado) y P0001 (regla) con el mensaje para el usuario.
+
+CREATE OR REPLACE FUNCTION public.registrar_abono(
+  p_ot_nro integer,
+  p_monto numeric,
+  p_creado_por bigint DEFAULT NULL,
+  p_observacion text DEFAULT NULL
+)
+RETURNS public.ordenes_trabajo AS $$
+DECLARE
+  v_ot public.ordenes_trabajo;
+BEGIN
+  IF p_monto IS NULL OR p_monto <= 0 THEN
+    RAISE EXCEPTION 'Monto inválido para abono.' USING ERRCODE = 'P0001';
+  END IF;
+  SELECT * INTO v_ot FROM public.ordenes_trabajo WHERE ot_nro = p_ot_nro FOR UPDATE;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'Orden no encontrada para registrar abono.' USING ERRCODE = 'P0002';
+  END IF;
+  INSERT INTO public.abonos (ot_id, monto, creado_por, observacion)
+  VALUES (v_ot.id, p_monto, p_creado_por, p_observacion);
+  -- Registrar un abono autoriza la orden
+  UPDATE public.ordenes_trabajo
+     SET abonado_total = abonado_total + p_monto,
+         status = 'Aprobado'
+   WHERE id = v_ot.id
+  RETURNING * INTO v_ot;
+  RETURN v_ot;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.eliminar_abono(p_abono_id bigint)
+RETURNS public.ordenes_trabajo AS $$
+DECLARE
+  v_ot_id bigint;
+  v_monto numeric;
+  v_ot public.ordenes_trabajo;
+BEGIN
+  SELECT ot_id INTO v_ot_id FROM public.abonos WHERE id = p_abono_id;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'Abono no encontrado.' USING ERRCODE = 'P0002';
+  END IF;
+  -- Primero la OT (mismo orden de bloqueo que registrar_abono)
+  PERFORM 1 FROM public.ordenes_trabajo WHERE id = v_ot_id FOR UPDATE;
+  DELETE FROM public.abonos WHERE id = p_abono_id RETURNING monto INTO v_monto;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'Abono no encontrado.' USING ERRCODE = 'P0002';
+  END IF;
+  UPDATE public.ordenes_trabajo
+     SET abonado_total = GREATEST(abonado_total - v_monto, 0)
+   WHERE id = v_ot_id
+  RETURNING * INTO v_ot;
+  RETURN v_ot;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.cancelar_orden(
+  p_ot_nro integer,
+  p_admin_id bigint,
+  p_motivo text DEFAULT NULL,
+  p_reembolso numeric DEFAULT 0
+)
+RETURNS public.ordenes_trabajo AS $$
+DECLARE
+  v_ot public.ordenes_trabajo;
+BEGIN
+  SELECT * INTO v_ot FROM public.ordenes_trabajo WHERE ot_nro = p_ot_nro FOR UPDATE;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'Orden no encontrada.' USING ERRCODE = 'P0002';
+  END IF;
+  IF v_ot.status = 'Cancelado' THEN
+    RAISE EXCEPTION 'La orden ya fue cancelada previamente.' USING ERRCODE = 'P0001';
+  END IF;
+  INSERT INTO public.cancelaciones (
+    ot_id, cliente_id, vendedor_id, descripcion, motivo, reembolso,
+    estado_anterior, cancelado_por, fecha_creacion_ot
+  ) VALUES (
+    v_ot.id, v_ot.cliente_id, v_ot.vendedor_id, COALESCE(v_ot.descripcion, ''), COALESCE(p_motivo, ''),
+    COALESCE(p_reembolso, 0), v_ot.status, p_admin_id, COALESCE(v_ot.fecha_creacion, v_ot.created_at::date)
+  );
+  UPDATE public.ordenes_trabajo SET status = 'Cancelado' WHERE id = v_ot.id
+  RETURNING * INTO v_ot;
+  RETURN v_ot;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Reserva un bloque de números de OT para `p_reservado_por` (un round trip por bloque).
+-- Primero reutiliza números devueltos o vencidos; el resto sale de la secuencia, salteando
+-- números ya usados (p. ej. OTs cargadas a mano). Devuelve los números en orden.
+CREATE OR REPLACE FUNCTION public.reservar_ot_nros(
+  p_cantidad integer,
+  p_reservado_por text,
+  p_ttl_minutos integer DEFAULT 120
+)
+RETURNS integer[] AS $$
+DECLARE
+  v_nros integer[] := '{}';
+  v_nro integer;
+  v_expira timestamptz := now() + make_interval(mins => GREATEST(COALESCE(p_ttl_minutos, 120), 1));
+BEGIN
+  IF p_cantidad IS NULL OR p_cantidad < 1 OR p_cantidad > 100 THEN
+    RAISE EXCEPTION 'Cantidad de números de OT inválida.' USING ERRCODE = 'P0001';
+  END IF;
+  FOR v_nro IN
+    SELECT ot_nro FROM public.ot_nro_reservas
+     WHERE reservado_por IS NULL OR expira_en < now()
+     ORDER BY ot_nro
+     LIMIT p_cantidad
+     FOR UPDATE SKIP LOCKED
+  LOOP
+    UPDATE public.ot_nro_reservas
+       SET reservado_por = p_reservado_por, expira_en = v_expira
+     WHERE ot_nro = v_nro;
+    v_nros := v_nros || v_nro;
+  END LOOP;
+  WHILE COALESCE(array_length(v_nros, 1), 0) < p_cantidad LOOP
+    v_nro := nextval('public.ordenes_trabajo_ot_nro_seq');
+    CONTINUE WHEN EXISTS (SELECT 1 FROM public.ordenes_trabajo WHERE ot_nro = v_nro);
+    INSERT INTO public.ot_nro_reservas (ot_nro, reservado_por, expira_en)
+    VALUES (v_nro, p_reservado_por, v_expira)
+    ON CONFLICT (ot_nro) DO NOTHING;
+    IF FOUND THEN
+      v_nros := v_nros || v_nro;
+    END IF;
+  END LOOP;
+  RETURN v_nros;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Devuelve números reservados que no se usaron; retorna cuántos se liberaron.
+CREATE OR REPLACE FUNCTION public.liberar_ot_nros(p_nros integer[], p_reservado_por text)
+RETURNS integer AS $$
+DECLARE
+  v_count integer;
+BEGIN
+  UPDATE public.ot_nro_reservas
+     SET reservado_por = NULL, expira_en = now()
+   WHERE ot_nro = ANY(p_nros) AND reservado_por = p_reservado_por;
+  GET DIAGNOSTICS v_count = ROW_COUNT;
+  RETURN v_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- =========================
+-- BÚSQUEDA DIFUSA (pg_trgm + unaccent)
+-- =========================
+-- Las planillas solo tienen cargada una ventana de OTs/clientes; search_work_orders y
+-- search_clients buscan en toda la tabla sin distinguir mayúsculas ni tildes. Una fila
+-- entra si contiene la consulta (LIKE '%q%') o si se le parece lo suficiente (`<%`,
+-- word_similarity >= pg_trgm.word_similarity_threshold, 0.6 por defecto); las más
+-- parecidas van primero. Los índices GIN de trigramas sirven a las dos condiciones.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() es STABLE (depende del diccionario); los índices necesitan una expresión IMMUTABLE
+CREATE OR REPLACE FUNCTION public.f_unaccent(text)
+RETURNS text AS $$
+  SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+CREATE INDEX IF NOT EXISTS idx_ordenes_trabajo_descripcion_trgm
+  ON public.ordenes_trabajo USING gin (public.f_unaccent(lower(descripcion)) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_clientes_nombre_trgm
+  ON public.clientes USING gin (public.f_unaccent(lower(nombre)) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_clientes_ci_ruc_trgm
+  ON public.clientes USING gin (ci_ruc gin_trgm_ops);
+
+-- OTs por número exacto, descripción, nombre o CI/RUC del cliente. `p_status` y
+-- `p_vendedor_id` filtran (NULL = sin filtro); como máximo 500 filas.
+CREATE OR REPLACE FUNCTION public.search_work_orders(
+  p_query text,
+  p_status text DEFAULT NULL,
+  p_limit integer DEFAULT 50,
+  p_vendedor_id bigint DEFAULT NULL
+)
+RETURNS SETOF public.ordenes_trabajo AS $$
+  WITH q AS (
+    SELECT t, replace(replace(replace(t, '\', '\\'), '%', '\%'), '_', '\_') AS p
+      FROM (SELECT public.f_unaccent(lower(btrim(p_query))) AS t) s
+     WHERE t <> ''
+  )
+  SELECT o.*
+    FROM public.ordenes_trabajo o
+    LEFT JOIN public.clientes c ON c.id = o.cliente_id
+    CROSS JOIN q
+   WHERE (p_status IS NULL OR o.status::text = p_status)
+     AND (p_vendedor_id IS NULL OR o.vendedor_id = p_vendedor_id)
+     AND (
+       o.ot_nro::text = q.t
+       OR public.f_unaccent(lower(o.descripcion)) LIKE '%' || q.p || '%'
+       OR q.t <% public.f_unaccent(lower(o.descripcion))
+       OR public.f_unaccent(lower(c.nombre)) LIKE '%' || q.p || '%'
+       OR q.t <% public.f_unaccent(lower(c.nombre))
+       OR c.ci_ruc LIKE '%' || q.p || '%'
+     )
+   ORDER BY
+     (o.ot_nro::text = q.t) DESC,
+     GREATEST(
+       word_similarity(q.t, public.f_unaccent(lower(COALESCE(o.descripcion, '')))),
+       word_similarity(q.t, public.f_unaccent(lower(COALESCE(c.nombre, '')))),
+       similarity(q.t, COALESCE(c.ci_ruc, ''))
+     ) DESC,
+     o.ot_nro DESC
+   LIMIT LEAST(GREATEST(COALESCE(p_limit, 50), 1), 500);
+$$ LANGUAGE sql STABLE;
+
+-- Clientes por nombre o CI/RUC (el CI/RUC exacto primero); como máximo 500 filas.
+CREATE OR REPLACE FUNCTION public.search_clients(
+  p_query text,
+  p_limit integer DEFAULT 50
+)
+RETURNS SETOF public.clientes AS $$
+  WITH q AS (
+    SELECT t, replace(replace(replace(t, '\', '\\'), '%', '\%'), '_', '\_') AS p
+      FROM (SELECT public.f_unaccent(lower(btrim(p_query))) AS t) s
+     WHERE t <> ''
+  )
+  SELECT c.*
+    FROM public.clientes c
+    CROSS JOIN q
+   WHERE public.f_unaccent(lower(c.nombre)) LIKE '%' || q.p || '%'
+      OR q.t <% public.f_unaccent(lower(c.nombre))
+      OR c.ci_ruc LIKE '%' || q.p || '%'
+   ORDER BY
+     (c.ci_ruc = q.t) DESC,
+     GREATEST(
+       word_similarity(q.t, public.f_unaccent(lower(COALESCE(c.nombre, '')))),
+       similarity(q.t, COALESCE(c.ci_ruc, ''))
+     ) DESC,
+     c.nombre
+   LIMIT LEAST(GREATEST(COALESCE(p_limit, 50), 1), 500);
+$$ LANGUAGE sql STABLE;
+
+-- =========================
+-- REALTIME (cambios empujados a las planillas abiertas)
+-- =========================
+-- Las planillas escuchan postgres_changes de estas tablas y piden solo las OTs tocadas.
+-- REPLICA IDENTITY FULL hace que un DELETE mande la fila vieja completa (abonos y
+-- cancelaciones necesitan `ot_id` para saber qué OT refrescar).
+ALTER TABLE public.ordenes_trabajo REPLICA IDENTITY FULL;
+ALTER TABLE public.abonos REPLICA IDENTITY FULL;
+ALTER TABLE public.cancelaciones REPLICA IDENTITY FULL;
+
+DO $$
+DECLARE
+  t text;
+BEGIN
+  FOREACH t IN ARRAY ARRAY['ordenes_trabajo', 'abonos', 'cancelaciones'] LOOP
+    IF NOT EXISTS (
+      SELECT 1 FROM pg_publication_tables
+       WHERE pubname = 'supabase_realtime' AND schemaname = 'public' AND tablename = t
+    ) THEN
+      EXECUTE format('ALTER PUBLICATION supabase_realtime ADD TABLE public.%I', t);
+    END IF;
+  END LOOP;
+END;
+$$;
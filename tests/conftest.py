@@ -0,0 +1,37 @@
+"""Las pruebas corren siempre contra el backend local en memoria (sin red).
+
+Las variables se fijan antes de importar `supabase_service`, que crea el cliente al
+importarse; `.env` no las pisa (`load_dotenv` no sobrescribe).
+"""
+import os
+
+os.environ['PLOTMASTER_BACKEND'] = 'local'
+os.environ['PLOTMASTER_LOCAL_DB'] = ':memory:'
+os.environ.pop('PLOTMASTER_REALTIME_URL', None)
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def seed():
+    """Alta de datos de prueba: `seed(ci_ruc, vendedor, ots=(), **campos)`.
+
+    Crea el cliente y el vendedor si no existen y las OTs `ots` (con `campos` de
+    `insert_work_order`: valor, descripcion...). Retorna `{ot_nro: id}`. La base en
+    memoria es una sola para toda la sesión: cada módulo usa su CI/RUC y sus números.
+    """
+    from plotmaster.core.services import supabase_service as svc
+
+    def _seed(ci_ruc, vendedor, ots=(), cliente=None, zona='Asunción', **campos):
+        if svc.get_client_id_by_ci_ruc(ci_ruc) is None:
+            assert svc.insert_client(cliente or f'Cliente {ci_ruc}', ci_ruc, '0981', zona)[0]
+        if svc.get_user_by_ci_ruc(vendedor) is None:
+            assert svc.create_user(f'Vendedor {vendedor}', vendedor, 'pw')[0]
+        ids = {}
+        for nro in ots:
+            ok, msg = svc.insert_work_order({'fecha': '2026-01-01', 'valor': 100000, **campos,
+                                             'ot_nro': nro, 'ci_ruc': ci_ruc, 'vendedor': vendedor})
+            assert ok, msg
+            ids[nro] = svc.supabase.table('ordenes_trabajo').select('id').eq('ot_nro', nro).execute().data[0]['id']
+        return ids
+    return _seed
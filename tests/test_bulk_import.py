@@ -0,0 +1,209 @@
+"""Normalización de planillas y corridas de `ImportJob` (OTs existentes, reanudar)."""
+import csv
+from datetime import date, datetime
+
+import pytest
+
+from plotmaster.core.services import bulk_import as bi
+from plotmaster.core.services import supabase_service as svc
+
+
+# --- PARSERS ---
+
+@pytest.mark.parametrize('valor, esperado', [
+    ('1.500.000', 1500000),
+    ('1,500,000', 1500000),
+    ('Gs. 1500000', 1500000),
+    ('₲ 1.500.000', 1500000),
+    ('1500000.0', 1500000),
+    ('1.500', 1500),
+    (1500000.0, 1500000),
+    (1500, 1500),
+    ('', 0),
+    (None, 0),
+])
+def test_parse_monto(valor, esperado):
+    assert bi.parse_monto(valor) == esperado
+
+
+def test_parse_monto_decimales_como_celda_numerica():
+    # Texto y número redondean igual
+    assert bi.parse_monto('1,50') == bi.parse_monto(1.5) == 2
+    assert bi.parse_monto('10.4') == bi.parse_monto(10.4) == 10
+
+
+@pytest.mark.parametrize('valor', ['abc', '-5', '12a', True])
+def test_parse_monto_invalido(valor):
+    with pytest.raises(ValueError):
+        bi.parse_monto(valor)
+
+
+def test_parse_monto_requerido():
+    with pytest.raises(ValueError):
+        bi.parse_monto('  ', requerido=True)
+
+
+@pytest.mark.parametrize('valor, esperado', [
+    ('01/02/2024', '2024-02-01'),
+    ('2024-02-01', '2024-02-01'),
+    ('2024-02-01T10:30:00', '2024-02-01'),
+    ('01-02-2024', '2024-02-01'),
+    ('1/2/24', '2024-02-01'),
+    ('01.02.2024', '2024-02-01'),
+    (datetime(2024, 2, 1, 10, 30), '2024-02-01'),
+    (date(2024, 2, 1), '2024-02-01'),
+    ('', None),
+])
+def test_parse_fecha(valor, esperado):
+    assert bi.parse_fecha(valor) == esperado
+
+
+@pytest.mark.parametrize('valor', ['31/02/2024', 'ayer', '2024/13/01'])
+def test_parse_fecha_invalida(valor):
+    with pytest.raises(ValueError):
+        bi.parse_fecha(valor)
+
+
+def test_parse_fecha_requerida():
+    with pytest.raises(ValueError):
+        bi.parse_fecha(None, requerido=True)
+
+
+@pytest.mark.parametrize('valor, esperado', [
+    ('1.234.567', '1234567'),
+    ('80012345 - 6', '80012345-6'),
+    (1234567.0, '1234567'),
+    (' 4400 ', '4400'),
+])
+def test_normalize_ci_ruc(valor, esperado):
+    assert bi.normalize_ci_ruc(valor) == esperado
+
+
+@pytest.mark.parametrize('valor', ['', None, 'abc', '12', '1234-56'])
+def test_normalize_ci_ruc_invalido(valor):
+    with pytest.raises(ValueError):
+        bi.normalize_ci_ruc(valor)
+
+
+@pytest.mark.parametrize('valor, esperado', [
+    ('', 'Pendiente'), ('  FINALIZADO ', 'Finalizado'), ('cancelado', 'Cancelado'),
+])
+def test_parse_estado(valor, esperado):
+    assert bi.parse_estado(valor) == esperado
+
+
+def test_parse_estado_desconocido():
+    with pytest.raises(ValueError):
+        bi.parse_estado('en proceso')
+
+
+@pytest.mark.parametrize('valor, esperado', [
+    ('asuncion', 'Asunción'), ('Nemby', 'Ñemby'), (' fernando  de la MORA', 'Fernando de la Mora'),
+    ('Encarnación', 'Otro'), ('', None),
+])
+def test_normalize_zona(valor, esperado):
+    assert bi.normalize_zona(valor) == esperado
+
+
+def test_map_headers():
+    headers = ['Nro. OT', 'Fecha', 'CI/RUC', 'Valor Total', 'Forma de Pago', 'Estado', 'Observación', 'Total']
+    indices = bi._map_headers(headers, bi._COLUMNAS_OTS)
+    assert indices == {'ot_nro': 0, 'fecha_creacion': 1, 'cliente': 2, 'valor_total': 3,
+                       'forma_pago': 4, 'status': 5}
+
+
+def test_map_headers_sin_tildes_ni_mayusculas():
+    indices = bi._map_headers(['NOMBRE', 'ci_ruc', 'Teléfono', 'E-Mail', 'Ciudad'], bi._COLUMNAS_CLIENTES)
+    assert indices == {'nombre': 0, 'ci_ruc': 1, 'telefono': 2, 'email': 3, 'zona': 4}
+    indices = bi._map_headers(['Nº OT', 'Seña', 'Envío'], bi._COLUMNAS_OTS)
+    assert indices == {'ot_nro': 0, 'sena': 1, 'solicita_envio': 2}
+
+
+# --- IMPORTACIÓN (backend local) ---
+
+@pytest.fixture(scope='module')
+def vendedor(seed):
+    seed('5500', 'imp-v1', zona='Luque')
+    return 'imp-v1'
+
+
+def _csv(path, filas):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['Nro OT', 'Fecha', 'CI/RUC', 'Vendedor', 'Valor', 'Estado'])
+        w.writerows(filas)
+    return str(path)
+
+
+def _reporte(job):
+    with open(job.errores_path, newline='', encoding='utf-8-sig') as f:
+        return list(csv.reader(f))
+
+
+def _ot(ot_nro):
+    return svc.supabase.table('ordenes_trabajo').select('valor_total,status').eq('ot_nro', ot_nro).execute().data[0]
+
+
+def test_ots_existentes_no_se_pisan_por_defecto(tmp_path, seed, vendedor):
+    seed('5500', vendedor, ots=[7001])
+    path = _csv(tmp_path / 'ots.csv', [
+        ['7001', '01/01/2020', '5500', vendedor, '999', 'Finalizado'],
+        ['7002', '01/01/2020', '5500', vendedor, '500', 'Finalizado'],
+    ])
+    job = bi.ImportJob('ots', path)
+    ok, r = job.run()
+    assert ok
+    assert (r['escritas'], r['omitidas'], r['errores']) == (1, 1, 0)
+    assert _ot(7001) == {'valor_total': 100000, 'status': 'Pendiente'}
+    assert _ot(7002)['valor_total'] == 500
+    reporte = _reporte(job)
+    assert [(f[0], f[1]) for f in reporte[1:]] == [('2', 'ot_nro')]
+    assert '7001' in reporte[1][2]
+
+
+def test_ots_existentes_se_sobrescriben_con_flag(tmp_path, seed, vendedor):
+    seed('5500', vendedor, ots=[7011])
+    path = _csv(tmp_path / 'ots.csv', [['7011', '01/01/2020', '5500', vendedor, '999', 'Finalizado']])
+    ok, r = bi.ImportJob('ots', path, on_existing='update').run()
+    assert ok and r['escritas'] == 1
+    assert _ot(7011) == {'valor_total': 999, 'status': 'Finalizado'}
+
+
+def test_on_existing_desconocido(tmp_path):
+    with pytest.raises(ValueError):
+        bi.ImportJob('ots', tmp_path / 'x.csv', on_existing='replace')
+
+
+def test_reanudar_no_duplica_el_reporte(tmp_path, vendedor, monkeypatch):
+    path = _csv(tmp_path / 'ots.csv', [
+        ['7021', '01/01/2020', '5500', vendedor, '100', ''],
+        ['7022', 'mal', '5500', vendedor, '100', ''],     # lote 1: error de fecha
+        ['7023', '01/01/2020', '5500', vendedor, '100', ''],
+        ['7024', '01/01/2020', '5500', vendedor, 'x', ''],  # lote 2: error de monto
+        ['7025', '01/01/2020', '5500', vendedor, '100', ''],
+    ])
+    escribir = bi.ImportJob._escribir
+    llamadas = []
+
+    def _cortar(self, filas):
+        llamadas.append(len(filas))
+        if len(llamadas) == 2:
+            raise ConnectionError("sin red")
+        return escribir(self, filas)
+
+    monkeypatch.setattr(bi.ImportJob, '_escribir', _cortar)
+    job = bi.ImportJob('ots', path, chunk_size=2)
+    ok, msg = job.run()
+    assert not ok and 'reanudar' in msg
+    # El lote cortado ya había reportado su error
+    assert [f[0] for f in _reporte(job)[1:]] == ['3', '5']
+
+    monkeypatch.setattr(bi.ImportJob, '_escribir', escribir)
+    job = bi.ImportJob('ots', path, chunk_size=2)
+    ok, r = job.run()
+    assert ok and r['completo']
+    reporte = _reporte(job)
+    assert reporte[0][:3] == ['fila', 'columna', 'error']
+    assert [f[0] for f in reporte[1:]] == ['3', '5']
+    assert r['errores'] == 2 and r['escritas'] == 3
+    assert not (tmp_path / 'ots.csv.import.json').exists()
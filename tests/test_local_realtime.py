@@ -0,0 +1,133 @@
+"""`WorkOrderFeed` contra `LocalRealtimeServer`: avisos, caída y polling."""
+import time
+
+import pytest
+
+pytest.importorskip('realtime')
+pytest.importorskip('websockets')
+
+from plotmaster.core.services import async_service
+from plotmaster.core.services import supabase_service as svc
+from plotmaster.core.services.local_backend import LocalClient
+from plotmaster.core.services.local_realtime import LocalRealtimeServer
+from plotmaster.core.services.realtime import WorkOrderFeed
+
+
+def _esperar(cond, timeout=5.0):
+    fin = time.monotonic() + timeout
+    while time.monotonic() < fin:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture(scope='module')
+def server():
+    srv = LocalRealtimeServer(svc.supabase)
+    async_service.run_sync(srv.start())
+    yield srv
+    async_service.run_sync(srv.stop())
+
+
+@pytest.fixture(scope='module')
+def cliente(seed):
+    seed('4400', 'rt-v1')
+    return '4400'
+
+
+@pytest.fixture
+def feed(server):
+    f = WorkOrderFeed(server.url, 'local', debounce=0.1, poll_seconds=0.5, watch_seconds=0.05)
+    avisos = []
+    off = f.listen(avisos.append)
+    assert _esperar(lambda: f.mode == 'realtime'), f.mode
+    yield f, avisos
+    off()
+    assert _esperar(lambda: f.mode == 'off')
+
+
+@pytest.fixture
+def nueva_ot(seed, cliente):
+    """Alta de una OT del cliente del módulo; retorna su id."""
+    return lambda ot_nro: seed(cliente, 'rt-v1', ots=[ot_nro])[ot_nro]
+
+
+def test_insert_avisa_ot_e_id(feed, nueva_ot):
+    f, avisos = feed
+    ot_id = nueva_ot(9101)
+    assert _esperar(lambda: avisos)
+    batch = avisos[0]
+    assert 9101 in batch.ots and ot_id in batch.ids
+    assert not batch.resync
+
+
+def test_abono_llega_en_un_solo_aviso(feed, nueva_ot):
+    f, avisos = feed
+    ot_id = nueva_ot(9102)
+    assert _esperar(lambda: avisos)
+    avisos.clear()
+    # `registrar_abono` toca `abonos` y `ordenes_trabajo`: la ventana los junta
+    assert svc.add_sena_to_order(9102, 5000)[0]
+    assert _esperar(lambda: avisos)
+    time.sleep(0.3)
+    assert len(avisos) == 1
+    assert avisos[0].ots == {9102} and avisos[0].ids == {ot_id}
+
+
+def test_delete_avisa_ot(feed, nueva_ot):
+    f, avisos = feed
+    ot_id = nueva_ot(9103)
+    assert _esperar(lambda: avisos)
+    avisos.clear()
+    assert svc.delete_work_order(9103)[0]
+    assert _esperar(lambda: any(9103 in b.ots for b in avisos))
+    assert any(ot_id in b.ids for b in avisos)
+
+
+def test_caida_pasa_a_polling_y_reconecta(feed, server, nueva_ot):
+    f, avisos = feed
+    async_service.run_sync(server.drop())
+    # Sin canal: resync (la planilla pide el delta) y reintento de la suscripción
+    assert _esperar(lambda: any(b.resync for b in avisos))
+    assert _esperar(lambda: f.mode == 'realtime')
+    avisos.clear()
+    nueva_ot(9104)
+    assert _esperar(lambda: any(9104 in b.ots for b in avisos))
+
+
+def test_sin_servidor_queda_en_polling():
+    srv = LocalRealtimeServer(svc.supabase)
+    url = async_service.run_sync(srv.start())
+    async_service.run_sync(srv.stop())
+    f = WorkOrderFeed(url, 'local', debounce=0.05, poll_seconds=0.3, watch_seconds=0.05)
+    avisos = []
+    off = f.listen(avisos.append)
+    try:
+        assert _esperar(lambda: len(avisos) >= 2)
+        assert f.mode in ('polling', 'connecting')
+        assert all(b.resync and not b.ots and not b.ids for b in avisos)
+    finally:
+        off()
+    assert _esperar(lambda: f.mode == 'off')
+
+
+def test_unwatch_quita_triggers_y_vacia_la_cola():
+    client = LocalClient(':memory:')
+    try:
+        avisos = []
+        off_ots = client.watch_changes(['ordenes_trabajo'], avisos.extend)
+        off_cli = client.watch_changes(['clientes'], avisos.extend)
+        triggers = "SELECT name FROM sqlite_temp_master WHERE type = 'trigger'"
+        off_cli()
+        nombres = {r[0] for r in client._conn.execute(triggers)}
+        assert nombres and all(n.startswith('_rt_ordenes_trabajo_') for n in nombres)
+        off_ots()
+        assert not client._conn.execute(triggers).fetchall()
+        # Sin watchers no se anota nada (antes la cola crecía sin que nadie la drene)
+        client.table('clientes').insert({'nombre': 'X', 'ci_ruc': '4499', 'telefono': '1',
+                                         'zona': 'Asunción'}).execute()
+        assert not client._conn.execute("SELECT 1 FROM temp._realtime_changes").fetchall()
+        assert not avisos
+    finally:
+        client.close()
@@ -0,0 +1,63 @@
+"""Las variantes `as_records=True` del servicio arman las mismas `WorkOrder` que `from_rows`."""
+import pytest
+
+from plotmaster.core.services import async_service
+from plotmaster.core.services import supabase_service as svc
+from plotmaster.core.services.records import WorkOrder, normalize_estado
+
+
+def _campos(d):
+    return {name: getattr(d, name) for name in WorkOrder.__slots__ if name != 'pagos'}
+
+
+@pytest.fixture(scope='module')
+def ots(seed):
+    seed('6600', 'rec-v1', ots=(8101, 8102), cliente='Cliente Records', zona='Limpio', valor=1000,
+         descripcion='Lona records')
+    return (8101, 8102)
+
+
+@pytest.mark.parametrize('valor, esperado', [
+    (None, 'Pendiente'), ('aprobado', 'Aprobado'), ('APROBADO', 'Aprobado'), ('Cancelada', 'Cancelado'),
+    ('entregado', 'Entregado'), ('Rechazado', 'Rechazado'), ('pending', 'Pendiente'), ('raro', 'Pendiente'),
+])
+def test_normalize_estado(valor, esperado):
+    assert normalize_estado(valor) == esperado
+
+
+def test_from_row_estado_canonico():
+    assert WorkOrder.from_row({'ot_nro': 1, 'status': 'finalizado'}).estado == 'Finalizado'
+
+
+def test_refs_as_records(ots):
+    ok, filas = svc.get_work_orders_by_refs(ots, ())
+    ok2, registros = svc.get_work_orders_by_refs(ots, (), as_records=True)
+    assert ok and ok2
+    assert all(isinstance(d, WorkOrder) for d in registros)
+    assert [_campos(d) for d in registros] == [_campos(d) for d in WorkOrder.from_rows(filas)]
+    assert [d.ot for d in registros] == ['8102', '8101']
+
+
+def test_search_as_records(ots):
+    ok, registros = svc.search_work_orders('lona records', vendedor='rec-v1', as_records=True)
+    assert ok and {d.ot_nro for d in registros} == set(ots)
+    assert all(d.cliente == 'Cliente Records' and d.estado == 'Pendiente' for d in registros)
+    ok, registros = async_service.run_sync(async_service.search_work_orders('lona records', as_records=True))
+    assert ok and all(isinstance(d, WorkOrder) for d in registros)
+
+
+def test_iter_as_records(ots):
+    paginas = list(svc.iter_work_orders(vendedor='rec-v1', as_records=True))
+    assert all(ok for ok, _p in paginas)
+    assert [d.ot_nro for _ok, p in paginas for d in p] == [8102, 8101]
+
+
+def test_by_client_as_records(ots):
+    ok, filas = svc.get_work_orders_by_client('6600')
+    ok2, registros = svc.get_work_orders_by_client('6600', as_records=True)
+    assert ok and ok2
+    assert [_campos(d) for d in registros] == [_campos(d) for d in WorkOrder.from_rows(filas)]
+    assert {d.ot for d in registros} == {str(n) for n in ots}
+    assert all(d.cliente == '6600' for d in registros)
+    ok, registros = async_service.run_sync(async_service.get_work_orders_by_client('6600', as_records=True))
+    assert ok and {d.ot for d in registros} == {str(n) for n in ots}